@@ -0,0 +1,26 @@
+"""add the judge key map to tasks
+
+Revision ID: add_task_encryption_keys
+Revises: idempotency_key_client_lease
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_task_encryption_keys'
+down_revision = 'idempotency_key_client_lease'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Judge ID -> wrapped data key of the task payload, so judges can be re-wrapped
+    # without re-encrypting the payload. Older tasks keep the key table of their
+    # envelope header until they are first re-wrapped.
+    op.add_column('tasks', sa.Column('encryption_keys', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('tasks', 'encryption_keys')
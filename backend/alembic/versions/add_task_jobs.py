@@ -0,0 +1,43 @@
+"""add task_jobs table for the asynchronous task creation pipeline
+
+Revision ID: add_task_jobs
+Revises: extract_inline_blobs
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_task_jobs'
+down_revision = 'extract_inline_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create task_jobs table
+    op.create_table('task_jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('creator_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('status', sa.Enum('QUEUED', 'ENCRYPTING', 'STORING', 'MINTING', 'COMPLETED', 'FAILED', name='task_job_status'), nullable=False, server_default='QUEUED'),
+        sa.Column('task_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('nft_id', sa.String(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('stage_timings', sa.JSON(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['creator_id'], ['agents.id'], ),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_task_jobs_creator_id', 'task_jobs', ['creator_id'])
+
+
+def downgrade():
+    op.drop_index('ix_task_jobs_creator_id', table_name='task_jobs')
+    op.drop_table('task_jobs')
+    op.execute("DROP TYPE task_job_status")
@@ -0,0 +1,35 @@
+"""add task key grants for staking workers
+
+Revision ID: add_task_key_grants
+Revises: add_task_encryption_keys
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_task_key_grants'
+down_revision = 'add_task_encryption_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('task_key_grants',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('task_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('agent_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('wrapped_key', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['task_id'], ['tasks.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['agent_id'], ['agents.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('task_id', 'agent_id', name='uq_task_key_grants_task_agent')
+    )
+
+
+def downgrade():
+    op.drop_table('task_key_grants')
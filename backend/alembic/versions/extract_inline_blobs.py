@@ -0,0 +1,85 @@
+"""extract inline encrypted blobs into the blob store
+
+Revision ID: extract_inline_blobs
+Revises: add_social_profiles_and_portfolio
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.encryption.envelope import is_envelope
+from app.storage.blob_store import blob_store, is_blob_ref
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# revision identifiers, used by Alembic.
+revision = 'extract_inline_blobs'
+down_revision = 'add_social_profiles_and_portfolio'
+branch_labels = None
+depends_on = None
+
+# Tables and columns that hold encrypted content
+BLOB_COLUMNS = [
+    ('tasks', 'encrypted_payload_url'),
+    ('deliverables', 'encrypted_content_url'),
+]
+
+# Rows read per query, so large tables are never loaded at once
+BATCH_SIZE = 500
+
+
+def _is_inline(value):
+    # Inline ciphertext is base64, so it never contains a URL scheme separator
+    return bool(value) and not is_blob_ref(value) and "://" not in value
+
+
+def _rows(conn, table, column):
+    # Page through the table by primary key; rows updated along the way are not revisited
+    last_id = None
+    while True:
+        query = f"SELECT id, {column} FROM {table}"
+        if last_id is not None:
+            query += " WHERE id > :last_id"
+        rows = conn.execute(
+            sa.text(f"{query} ORDER BY id LIMIT :limit"), {"last_id": last_id, "limit": BATCH_SIZE}
+        ).fetchall()
+        yield from rows
+        if len(rows) < BATCH_SIZE:
+            return
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    # Move inline ciphertext into the blob store and replace it with a reference
+    conn = op.get_bind()
+    for table, column in BLOB_COLUMNS:
+        for row_id, value in _rows(conn, table, column):
+            if not _is_inline(value):
+                continue
+            ref = blob_store.put(value.encode('utf-8'))
+            conn.execute(
+                sa.text(f"UPDATE {table} SET {column} = :ref WHERE id = :id"),
+                {"ref": ref, "id": row_id}
+            )
+
+
+def downgrade():
+    # Inline the referenced ciphertext again; blobs are left in the store
+    conn = op.get_bind()
+    for table, column in BLOB_COLUMNS:
+        for row_id, value in _rows(conn, table, column):
+            if not is_blob_ref(value):
+                continue
+            content = blob_store.get(value)
+            if is_envelope(content):
+                # Binary envelopes are not text and cannot be read by the code this
+                # revision predates, so they stay in the store
+                logger.warning(f"Leaving binary envelope {value} of {table} {row_id} in the blob store")
+                continue
+            conn.execute(
+                sa.text(f"UPDATE {table} SET {column} = :value WHERE id = :id"),
+                {"value": content.decode('utf-8'), "id": row_id}
+            )
@@ -0,0 +1,36 @@
+"""scope idempotency keys per client and add a lease to in-progress claims
+
+Revision ID: idempotency_key_client_lease
+Revises: add_idempotency_keys
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'idempotency_key_client_lease'
+down_revision = 'add_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('idempotency_keys', sa.Column('client', sa.String(length=255), nullable=False, server_default=''))
+    op.add_column('idempotency_keys', sa.Column('locked_until', sa.DateTime(), nullable=True))
+    op.drop_constraint('uq_idempotency_keys_key_path', 'idempotency_keys', type_='unique')
+    op.create_unique_constraint(
+        'uq_idempotency_keys_key_path_client', 'idempotency_keys', ['key', 'path', 'client']
+    )
+
+
+def downgrade():
+    op.drop_constraint('uq_idempotency_keys_key_path_client', 'idempotency_keys', type_='unique')
+    # Rows from different clients may now share a key; keep one of each before restoring the old constraint
+    op.execute(
+        "DELETE FROM idempotency_keys a USING idempotency_keys b "
+        "WHERE a.key = b.key AND a.path = b.path AND a.id < b.id"
+    )
+    op.create_unique_constraint('uq_idempotency_keys_key_path', 'idempotency_keys', ['key', 'path'])
+    op.drop_column('idempotency_keys', 'locked_until')
+    op.drop_column('idempotency_keys', 'client')
@@ -0,0 +1,66 @@
+import os
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.encryption.key_grants import key_grant_issuer
+from app.encryption.rewrap import RewrapError
+from app.storage.blob_store import is_blob_ref, parse_blob_ref
+
+# Where routes that read encrypted content decrypt it unless the request picks a mode:
+# "server" decrypts with the principal's private key held by the server, "client"
+# returns the ciphertext reference and the principal's wrapped key for the caller to
+# decrypt with its own private key
+DECRYPTION_MODES = ("server", "client")
+DEFAULT_DECRYPTION_MODE = os.getenv("DECRYPTION_MODE", "server")
+
+
+def decryption_mode(
+    decryption: Optional[str] = Query(None, description='"server" or "client"; defaults to DECRYPTION_MODE')
+) -> str:
+    """
+    Dependency resolving a request's decryption mode.
+
+    Raises:
+        HTTPException: 400 if the mode is unknown
+    """
+    mode = decryption or DEFAULT_DECRYPTION_MODE
+    if mode not in DECRYPTION_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported decryption mode: {mode}")
+    return mode
+
+
+def sealed_content(ref: str, wrapped_key: str) -> Dict[str, Any]:
+    """
+    Describe encrypted content for client-side decryption.
+
+    Args:
+        ref: Value of the encrypted_payload_url / encrypted_content_url column
+        wrapped_key: The principal's base64 wrapped data key
+
+    Returns:
+        Dict with the ciphertext reference, the blob download path (None for legacy
+        inline content, which is returned as "ciphertext" instead) and the wrapped key
+    """
+    if is_blob_ref(ref):
+        return {"ref": ref, "url": f"/api/blobs/{parse_blob_ref(ref)}", "wrapped_key": wrapped_key}
+    return {"ref": None, "url": None, "ciphertext": ref, "wrapped_key": wrapped_key}
+
+
+async def granted_key(db: AsyncSession, task_id: UUID, agent_id: UUID) -> str:
+    """
+    Get the task data key wrapped for an agent, issuing its key grant now if it has none.
+
+    Raises:
+        HTTPException: 404 if the task or the agent's public key does not exist, 409 if
+            no judge's private key can unwrap the data key
+        CryptoPoolBusyError: If the crypto pool is saturated
+    """
+    try:
+        return await key_grant_issuer.issue(db, task_id, agent_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RewrapError as e:
+        raise HTTPException(status_code=409, detail=f"Cannot grant task key: {str(e)}")
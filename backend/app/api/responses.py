@@ -0,0 +1,36 @@
+from typing import Any, Iterable, Type
+
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+
+from app.schemas.base import list_adapter
+
+# Default response class for the API
+DefaultResponse = ORJSONResponse
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize content to JSON bytes with the same encoder used for API responses.
+    """
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def list_response(schema: Type[BaseModel], items: Iterable[Any], status_code: int = 200) -> Response:
+    """
+    Serialize a list of ORM objects straight to JSON bytes.
+    Validation and serialization both run in pydantic-core through a cached TypeAdapter,
+    skipping FastAPI's per-item response_model validation and jsonable_encoder pass.
+
+    Args:
+        schema: Pydantic schema for a single item
+        items: ORM objects or dicts to serialize
+        status_code: HTTP status code
+
+    Returns:
+        JSON response
+    """
+    adapter = list_adapter(schema)
+    content = adapter.dump_json(adapter.validate_python(list(items), from_attributes=True))
+    return Response(content=content, status_code=status_code, media_type="application/json")
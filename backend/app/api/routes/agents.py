@@ -7,6 +7,7 @@ from app.db.database import get_db
 from app.db.services.agent_service import agent_service
 from app.db.models.agent import AgentType
 from app.schemas.agent import Agent, AgentCreate, AgentUpdate
+from app.api.responses import list_response
 
 router = APIRouter()
 
@@ -23,10 +24,12 @@ async def get_agents(
     if agent_type:
         try:
             agent_type_enum = AgentType(agent_type)
-            return await agent_service.get_by_type(db, agent_type_enum, skip, limit)
+            agents = await agent_service.get_by_type(db, agent_type_enum, skip, limit)
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid agent type: {agent_type}")
-    return await agent_service.get_multi(db, skip=skip, limit=limit)
+    else:
+        agents = await agent_service.get_multi(db, skip=skip, limit=limit)
+    return list_response(Agent, agents)
 
 @router.get("/{agent_id}", response_model=Agent)
 async def get_agent(
@@ -121,7 +124,7 @@ async def search_agents(
     """
     Search agents by name or description
     """
-    return await agent_service.search_agents(db, search_term, skip, limit)
+    return list_response(Agent, await agent_service.search_agents(db, search_term, skip, limit))
 
 @router.delete("/{agent_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_agent(
@@ -0,0 +1,148 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import FileResponse, StreamingResponse, Response
+from typing import Iterator, Optional, Tuple
+import logging
+import os
+
+from app.storage.blob_store import (
+    blob_store, parse_blob_ref, make_blob_ref, BlobNotFoundError, BlobTooLargeError, CHUNK_SIZE
+)
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Uploads are unauthenticated, so they are off unless explicitly enabled and always size-capped
+UPLOADS_ENABLED = os.getenv("BLOB_UPLOADS_ENABLED", "false").lower() == "true"
+MAX_UPLOAD_BYTES = int(os.getenv("BLOB_MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range HTTP Range header into an inclusive (start, end) byte range.
+    Returns None if the header should be ignored and the full blob served.
+
+    Raises:
+        HTTPException: If the range cannot be satisfied
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+
+    start_str, _, end_str = spec.strip().partition("-")
+    try:
+        if start_str == "":
+            # Suffix range: last N bytes
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+
+    end = min(end, size - 1)
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def _iter_range(ref: str, start: int, end: int) -> Iterator[bytes]:
+    with blob_store.open(ref) as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def upload_blob(request: Request):
+    """
+    Upload a blob by streaming the request body into the store
+    """
+    if not UPLOADS_ENABLED:
+        raise HTTPException(status_code=403, detail="Blob uploads are disabled")
+
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Blob exceeds the maximum size of {MAX_UPLOAD_BYTES} bytes"
+    )
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise too_large
+
+    try:
+        ref = await blob_store.put_stream(request.stream(), max_size=MAX_UPLOAD_BYTES)
+        return {"ref": ref, "size": blob_store.size(ref)}
+    except BlobTooLargeError:
+        raise too_large
+    except Exception as e:
+        logger.error(f"Error uploading blob: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error uploading blob: {str(e)}")
+
+
+@router.get("/{digest}")
+async def get_blob(digest: str, request: Request):
+    """
+    Download a blob, honouring single-range Range requests
+    """
+    try:
+        ref = make_blob_ref(parse_blob_ref(digest))
+        size = blob_store.size(ref)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid blob digest")
+    except BlobNotFoundError:
+        raise HTTPException(status_code=404, detail="Blob not found")
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{parse_blob_ref(ref)}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+
+    range_header = request.headers.get("range")
+    byte_range = _parse_range(range_header, size) if range_header else None
+
+    if byte_range is None:
+        path = blob_store.local_path(ref)
+        if path:
+            return FileResponse(path, media_type="application/octet-stream", headers=headers)
+        return StreamingResponse(_iter_range(ref, 0, size - 1), media_type="application/octet-stream", headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _iter_range(ref, start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type="application/octet-stream",
+        headers=headers
+    )
+
+
+@router.head("/{digest}")
+async def head_blob(digest: str):
+    """
+    Check whether a blob exists and get its size
+    """
+    try:
+        ref = make_blob_ref(parse_blob_ref(digest))
+        size = blob_store.size(ref)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid blob digest")
+    except BlobNotFoundError:
+        raise HTTPException(status_code=404, detail="Blob not found")
+
+    return Response(
+        media_type="application/octet-stream",
+        headers={"Content-Length": str(size), "Accept-Ranges": "bytes"}
+    )
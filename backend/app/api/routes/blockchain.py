@@ -14,14 +14,13 @@ from app.db.services.agent_service import agent_service
 from app.db.models.stake import StakeStatus
 from app.schemas.wallet import Wallet
 from app.schemas.stake import StakeCreate, Stake
-from app.blockchain.solana_client import SolanaClient
+from app.blockchain.solana_client import KeypairLoadError, solana_client
+from app.events.invalidation import invalidation_channel
+from app.encryption.key_grants import key_grant_issuer
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Initialize Solana client
-solana_client = SolanaClient()
-
 @router.post("/mint-nft")
 async def mint_nft(
     title: str = Body(...),
@@ -127,6 +126,9 @@ async def stake_sol(
         }
         stake = await stake_service.create(db, obj_in=stake_data)
         
+        # Wrap the task's data key for the agent in the background
+        key_grant_issuer.schedule(task_id, agent.id)
+        
         # Update task status to STAKED if it was CREATED
         if task.status == "CREATED":
             await task_service.update_status(db, task_id, "STAKED")
@@ -294,6 +296,25 @@ async def submit_deliverable(
         logger.error(f"Error submitting deliverable: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error submitting deliverable: {str(e)}")
 
+@router.post("/reload-config")
+async def reload_config():
+    """
+    Reload the Solana keypair and program ID in every API worker,
+    e.g. after the program has been redeployed
+    """
+    # Load in this worker first so a bad keypair file fails the request instead of
+    # being replaced; other workers log the same error and keep their current keypair
+    try:
+        solana_client.reload()
+    except KeypairLoadError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+    await invalidation_channel.publish("solana_client", local=False)
+    return {
+        "program_id": str(solana_client.program_id),
+        "payer": str(solana_client.keypair.public_key),
+    }
+
 @router.get("/wallet/{wallet_address}", response_model=Wallet)
 async def get_wallet_info(
     wallet_address: str,
@@ -11,8 +11,12 @@ from app.db.services.task_service import task_service
 from app.db.models.deliverable import DeliverableStatus
 from app.db.models.agent import Agent
 from app.schemas.deliverable import Deliverable, DeliverableCreate, DeliverableUpdate
-from app.encryption.service import encryption_service
+from app.api.responses import list_response
+from app.encryption.async_service import async_encryption_service, CryptoPoolBusyError
 from app.encryption.db_service import key_management_service
+from app.encryption.decrypted_cache import decrypted_cache
+from app.storage.blob_store import blob_store
+from app.api.decryption import decryption_mode, sealed_content
 
 router = APIRouter()
 
@@ -29,10 +33,12 @@ async def get_deliverables(
     if status:
         try:
             deliverable_status = DeliverableStatus(status)
-            return await deliverable_service.get_by_status(db, deliverable_status)
+            deliverables = await deliverable_service.get_by_status(db, deliverable_status)
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
-    return await deliverable_service.get_multi(db, skip=skip, limit=limit)
+    else:
+        deliverables = await deliverable_service.get_multi(db, skip=skip, limit=limit)
+    return list_response(Deliverable, deliverables)
 
 @router.get("/{deliverable_id}", response_model=Deliverable)
 async def get_deliverable(
@@ -78,19 +84,19 @@ async def create_deliverable(
     
     # Encrypt deliverable content
     try:
-        encryption_result = encryption_service.encrypt_deliverable(content, judge_public_keys)
+        encryption_result = await async_encryption_service.encrypt_deliverable(content, judge_public_keys)
         
-        # Update deliverable data with encrypted content URL and encryption keys
-        # In a real implementation, the encrypted content would be stored in IPFS or S3
-        # For now, we'll just store the encrypted content directly
-        deliverable_data = deliverable_in.dict()
-        deliverable_data["encrypted_content_url"] = encryption_result["encrypted_content"]
+        # Store the encrypted content in the blob store and keep only its reference
+        deliverable_data = deliverable_in.model_dump()
+        deliverable_data["encrypted_content_url"] = await blob_store.put_async(encryption_result["encrypted_content"])
         deliverable_data["encryption_keys"] = encryption_result["encrypted_keys"]
         deliverable_data["status"] = DeliverableStatus.SUBMITTED
         
         # Create deliverable with updated data
         deliverable_create = DeliverableCreate(**deliverable_data)
         return await deliverable_service.create(db, obj_in=deliverable_create)
+    except CryptoPoolBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error encrypting deliverable content: {str(e)}")
 
@@ -137,7 +143,7 @@ async def get_deliverables_by_task(
     """
     Get all deliverables for a task
     """
-    return await deliverable_service.get_by_task(db, task_id)
+    return list_response(Deliverable, await deliverable_service.get_by_task(db, task_id))
 
 @router.get("/agent/{agent_id}", response_model=List[Deliverable])
 async def get_deliverables_by_agent(
@@ -147,7 +153,7 @@ async def get_deliverables_by_agent(
     """
     Get all deliverables submitted by an agent
     """
-    return await deliverable_service.get_by_agent(db, agent_id)
+    return list_response(Deliverable, await deliverable_service.get_by_agent(db, agent_id))
 
 @router.post("/{deliverable_id}/judge/{judge_id}", response_model=Dict[str, Any])
 async def judge_deliverable(
@@ -155,10 +161,13 @@ async def judge_deliverable(
     judge_id: UUID,
     score: float = Body(...),
     feedback: str = Body(...),
+    mode: str = Depends(decryption_mode),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Judge a deliverable and decrypt its content
+    Judge a deliverable and decrypt its content.
+    With ?decryption=client, the content reference and the judge's wrapped key are
+    returned as "encrypted_content" instead of the content.
     """
     # Get the deliverable
     deliverable = await deliverable_service.get(db, deliverable_id)
@@ -180,23 +189,35 @@ async def judge_deliverable(
     if judge_id not in judge_ids:
         raise HTTPException(status_code=403, detail="Judge not assigned to this task")
     
-    # Get the judge's private key
-    private_key = await key_management_service.get_agent_private_key(judge_id)
-    if not private_key:
-        raise HTTPException(status_code=404, detail="Private key not found")
-    
     # Get the encrypted key for this judge
     if not deliverable.encryption_keys or str(judge_id) not in deliverable.encryption_keys:
         raise HTTPException(status_code=404, detail="Encryption key not found for this judge")
     
     encrypted_key = deliverable.encryption_keys[str(judge_id)]
     
+    if mode == "client":
+        # The judge decrypts with its own private key; only the score is recorded here
+        updated_deliverable = await deliverable_service.update_score(
+            db, deliverable_id, str(judge_id), score, feedback
+        )
+        return {
+            "deliverable": Deliverable.model_validate(updated_deliverable),
+            "encrypted_content": sealed_content(deliverable.encrypted_content_url, encrypted_key)
+        }
+    
+    # Get the judge's private key
+    private_key = await key_management_service.get_agent_private_key(judge_id)
+    if not private_key:
+        raise HTTPException(status_code=404, detail="Private key not found")
+    
     try:
-        # Decrypt the deliverable
-        decrypted_content = encryption_service.decrypt_deliverable(
-            deliverable.encrypted_content_url,
-            encrypted_key,
-            private_key
+        # Decrypt the deliverable, unless this judge already did on an earlier scoring call
+        async def decrypt():
+            encrypted = await blob_store.resolve_bytes_async(deliverable.encrypted_content_url)
+            return await async_encryption_service.decrypt_deliverable(encrypted, encrypted_key, private_key)
+        
+        decrypted_content = await decrypted_cache.get_or_decrypt(
+            deliverable.id, judge_id, deliverable.encrypted_content_url, decrypt
         )
         
         # Update the deliverable with the judge's score and feedback
@@ -205,9 +226,11 @@ async def judge_deliverable(
         )
         
         return {
-            "deliverable": Deliverable.from_orm(updated_deliverable),
+            "deliverable": Deliverable.model_validate(updated_deliverable),
             "content": decrypted_content
         }
+    except CryptoPoolBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error decrypting deliverable: {str(e)}")
 
@@ -222,4 +245,5 @@ async def delete_deliverable(
     deliverable = await deliverable_service.remove(db, id=deliverable_id)
     if not deliverable:
         raise HTTPException(status_code=404, detail="Deliverable not found")
+    decrypted_cache.invalidate_object(deliverable_id)
     return None
\ No newline at end of file
@@ -1,35 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from typing import Dict, List, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Body
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Dict, List, Any, Optional
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
+import os
 import json
 import base64
+import asyncio
+import logging
+import orjson
 
 from app.db.database import get_db
-from app.encryption.service import encryption_service
+from app.encryption.async_service import async_encryption_service, CryptoPoolBusyError
 from app.encryption.db_service import key_management_service
+from app.encryption.key_wrap import SCHEMES, scheme_of
+from app.encryption.decrypted_cache import decrypted_cache
 from app.db.services.agent_service import agent_service
 from app.db.services.task_service import task_service
 from app.db.services.deliverable_service import deliverable_service
+from app.api.decryption import decryption_mode, granted_key, sealed_content
+from app.storage.blob_store import blob_store
+from app.schemas.deliverable import DeliverableBatchDecrypt
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Most deliverables one batch decrypt request may select
+DECRYPT_BATCH_MAX = int(os.getenv("DECRYPT_BATCH_MAX", "200"))
+# Format the /task/encrypt and /deliverable/encrypt responses use unless the request picks
+# one: "json" is the legacy base64 JSON (AES-CBC) package existing clients parse, "binary"
+# the base64 of a binary AES-GCM envelope
+ENCRYPT_RESPONSE_ENVELOPE = os.getenv("ENCRYPT_RESPONSE_ENVELOPE", "json")
+
+
+def response_envelope(
+    envelope: Optional[str] = Query(None, description='"json" or "binary"; defaults to ENCRYPT_RESPONSE_ENVELOPE')
+) -> str:
+    """
+    Dependency resolving the envelope format of an encrypt response.
+
+    Raises:
+        HTTPException: 400 if the format is unknown
+    """
+    envelope = envelope or ENCRYPT_RESPONSE_ENVELOPE
+    if envelope not in ("json", "binary"):
+        raise HTTPException(status_code=400, detail=f"Unsupported envelope format: {envelope}")
+    return envelope
+
+
+def _encode_envelope(encrypted: bytes, envelope: str) -> str:
+    # The legacy package is base64 text already
+    if envelope == "json":
+        return encrypted.decode('utf-8')
+    return base64.b64encode(encrypted).decode('utf-8')
 
 @router.post("/keys/generate/{agent_id}", status_code=status.HTTP_201_CREATED)
 async def generate_keys(
     agent_id: UUID,
+    scheme: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
     """
     Generate a new key pair for an agent.
     The public key is stored in the database, and the private key is stored securely.
+    The key-wrap scheme ("rsa" or "x25519") defaults to the server's KEY_WRAP_SCHEME.
     """
+    if scheme is not None and scheme not in SCHEMES:
+        raise HTTPException(status_code=400, detail=f"Unsupported key-wrap scheme: {scheme}")
+    
     # Check if agent exists
     agent = await agent_service.get(db, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
     # Generate keys
-    success = await key_management_service.generate_keys_for_agent(db, agent_id)
+    success = await key_management_service.generate_keys_for_agent(db, agent_id, scheme)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to generate keys")
     
@@ -53,16 +98,19 @@ async def get_public_key(
     if not public_key:
         raise HTTPException(status_code=404, detail="Public key not found")
     
-    return {"public_key": public_key}
+    return {"public_key": public_key, "scheme": scheme_of(public_key).name}
 
 @router.post("/task/encrypt")
 async def encrypt_task_payload(
     payload: Dict[str, Any] = Body(...),
     judge_ids: List[UUID] = Body(...),
+    envelope: str = Depends(response_envelope),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Encrypt a task payload for multiple judges.
+    The encrypted payload is the legacy base64 JSON package unless ?envelope=binary asks
+    for the base64 of a binary envelope; judges' wrapped keys are base64 either way.
     """
     try:
         # Get public keys for judges
@@ -71,12 +119,16 @@ async def encrypt_task_payload(
             raise HTTPException(status_code=404, detail="No judge public keys found")
         
         # Encrypt payload
-        encryption_result = encryption_service.encrypt_task_payload(payload, judge_public_keys)
+        encryption_result = await async_encryption_service.encrypt_task_payload(
+            payload, judge_public_keys, envelope_format=envelope
+        )
         
         return {
-            "encrypted_payload": encryption_result["encrypted_payload"],
+            "encrypted_payload": _encode_envelope(encryption_result["encrypted_payload"], envelope),
             "encrypted_keys": encryption_result["encrypted_keys"]
         }
+    except CryptoPoolBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error encrypting task payload: {str(e)}")
 
@@ -84,11 +136,14 @@ async def encrypt_task_payload(
 async def decrypt_task_payload(
     task_id: UUID,
     agent_id: UUID = Body(...),
+    mode: str = Depends(decryption_mode),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Decrypt a task payload for an agent.
     This endpoint should only be accessible to agents who have staked on the task.
+    With ?decryption=client, the payload reference and the agent's wrapped key are
+    returned as "encrypted_payload" instead.
     """
     try:
         # Get the task
@@ -102,25 +157,29 @@ async def decrypt_task_payload(
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
         
+        # Get the data key wrapped for this agent: the key granted when it staked,
+        # issued now if it has none yet
+        encrypted_key = await granted_key(db, task_id, agent_id)
+        if mode == "client":
+            return {"encrypted_payload": sealed_content(task.encrypted_payload_url, encrypted_key)}
+        
         # Get the agent's private key
         private_key = await key_management_service.get_agent_private_key(agent_id)
         if not private_key:
             raise HTTPException(status_code=404, detail="Private key not found")
         
-        # Get the encrypted key for this agent
-        # In a real system, this would be stored in a stake record
-        # For now, we'll just use the task's encryption_key field
-        if not task.encryption_key:
-            raise HTTPException(status_code=404, detail="Encryption key not found")
-        
-        # Decrypt the payload
-        decrypted_payload = encryption_service.decrypt_task_payload(
-            task.encrypted_payload_url,
-            task.encryption_key,
-            private_key
+        # Decrypt the payload, unless this agent already did
+        async def decrypt():
+            encrypted = await blob_store.resolve_bytes_async(task.encrypted_payload_url)
+            return await async_encryption_service.decrypt_task_payload(encrypted, encrypted_key, private_key)
+        
+        decrypted_payload = await decrypted_cache.get_or_decrypt(
+            task.id, agent_id, task.encrypted_payload_url, decrypt
         )
         
         return {"payload": decrypted_payload}
+    except (HTTPException, CryptoPoolBusyError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error decrypting task payload: {str(e)}")
 
@@ -128,10 +187,13 @@ async def decrypt_task_payload(
 async def encrypt_deliverable(
     deliverable: Dict[str, Any] = Body(...),
     judge_ids: List[UUID] = Body(...),
+    envelope: str = Depends(response_envelope),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Encrypt a deliverable for multiple judges.
+    The encrypted content is the legacy base64 JSON package unless ?envelope=binary asks
+    for the base64 of a binary envelope; judges' wrapped keys are base64 either way.
     """
     try:
         # Get public keys for judges
@@ -140,12 +202,16 @@ async def encrypt_deliverable(
             raise HTTPException(status_code=404, detail="No judge public keys found")
         
         # Encrypt deliverable
-        encryption_result = encryption_service.encrypt_deliverable(deliverable, judge_public_keys)
+        encryption_result = await async_encryption_service.encrypt_deliverable(
+            deliverable, judge_public_keys, envelope_format=envelope
+        )
         
         return {
-            "encrypted_content": encryption_result["encrypted_content"],
+            "encrypted_content": _encode_envelope(encryption_result["encrypted_content"], envelope),
             "encrypted_keys": encryption_result["encrypted_keys"]
         }
+    except CryptoPoolBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error encrypting deliverable: {str(e)}")
 
@@ -153,11 +219,14 @@ async def encrypt_deliverable(
 async def decrypt_deliverable(
     deliverable_id: UUID,
     judge_id: UUID = Body(...),
+    mode: str = Depends(decryption_mode),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Decrypt a deliverable for a judge.
     This endpoint should only be accessible to judges assigned to the task.
+    With ?decryption=client, the content reference and the judge's wrapped key are
+    returned as "encrypted_deliverable" instead.
     """
     try:
         # Get the deliverable
@@ -171,28 +240,107 @@ async def decrypt_deliverable(
         if not judge:
             raise HTTPException(status_code=404, detail="Judge not found")
         
-        # Get the judge's private key
-        private_key = await key_management_service.get_agent_private_key(judge_id)
-        if not private_key:
-            raise HTTPException(status_code=404, detail="Private key not found")
-        
         # Get the encrypted key for this judge
         if not deliverable.encryption_keys or str(judge_id) not in deliverable.encryption_keys:
             raise HTTPException(status_code=404, detail="Encryption key not found for this judge")
         
         encrypted_key = deliverable.encryption_keys[str(judge_id)]
+        if mode == "client":
+            return {"encrypted_deliverable": sealed_content(deliverable.encrypted_content_url, encrypted_key)}
         
-        # Decrypt the deliverable
-        decrypted_deliverable = encryption_service.decrypt_deliverable(
-            deliverable.encrypted_content_url,
-            encrypted_key,
-            private_key
+        # Get the judge's private key
+        private_key = await key_management_service.get_agent_private_key(judge_id)
+        if not private_key:
+            raise HTTPException(status_code=404, detail="Private key not found")
+        
+        # Decrypt the deliverable, unless this judge already did
+        async def decrypt():
+            encrypted = await blob_store.resolve_bytes_async(deliverable.encrypted_content_url)
+            return await async_encryption_service.decrypt_deliverable(encrypted, encrypted_key, private_key)
+        
+        decrypted_deliverable = await decrypted_cache.get_or_decrypt(
+            deliverable.id, judge_id, deliverable.encrypted_content_url, decrypt
         )
         
         return {"deliverable": decrypted_deliverable}
+    except CryptoPoolBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error decrypting deliverable: {str(e)}")
 
+@router.post("/deliverable/decrypt-batch")
+async def decrypt_deliverables(
+    request: DeliverableBatchDecrypt,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Decrypt a task's deliverables, or the listed ones, for a judge.
+    The judge's key is loaded once and the deliverables are fetched in one query, then
+    decrypted concurrently in the crypto pool. Results are streamed as newline-delimited
+    JSON in completion order, one object per deliverable with either "deliverable" or
+    "error" (and "retry_after" when the crypto pool was saturated).
+    """
+    judge = await agent_service.get(db, request.judge_id)
+    if not judge:
+        raise HTTPException(status_code=404, detail="Judge not found")
+    
+    private_key = await key_management_service.get_agent_private_key(request.judge_id)
+    if not private_key:
+        raise HTTPException(status_code=404, detail="Private key not found")
+    
+    if request.task_id is not None:
+        deliverables = await deliverable_service.get_by_task(db, request.task_id)
+        requested = [deliverable.id for deliverable in deliverables]
+    else:
+        deliverables = None
+        requested = list(dict.fromkeys(request.deliverable_ids))
+    if len(requested) > DECRYPT_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {DECRYPT_BATCH_MAX} deliverables can be decrypted at once")
+    if deliverables is None:
+        deliverables = await deliverable_service.get_many(db, requested)
+    
+    found = {deliverable.id: deliverable for deliverable in deliverables}
+    judge_key = str(request.judge_id)
+    # Bound the work in flight so one batch does not overflow the crypto pool's wait queue
+    slots = asyncio.Semaphore(max(1, async_encryption_service.max_pending))
+    
+    async def decrypt_one(deliverable_id: UUID) -> Dict[str, Any]:
+        deliverable = found.get(deliverable_id)
+        if deliverable is None:
+            return {"deliverable_id": str(deliverable_id), "error": "Deliverable not found"}
+        if not deliverable.encryption_keys or judge_key not in deliverable.encryption_keys:
+            return {"deliverable_id": str(deliverable_id), "error": "Encryption key not found for this judge"}
+        
+        async def decrypt():
+            encrypted = await blob_store.resolve_bytes_async(deliverable.encrypted_content_url)
+            return await async_encryption_service.decrypt_deliverable(
+                encrypted, deliverable.encryption_keys[judge_key], private_key
+            )
+        
+        try:
+            async with slots:
+                content = await decrypted_cache.get_or_decrypt(
+                    deliverable.id, request.judge_id, deliverable.encrypted_content_url, decrypt
+                )
+            return {"deliverable_id": str(deliverable_id), "deliverable": content}
+        except CryptoPoolBusyError as e:
+            return {"deliverable_id": str(deliverable_id), "error": str(e), "retry_after": e.retry_after}
+        except Exception as e:
+            logger.error(f"Error decrypting deliverable {deliverable_id}: {e}")
+            return {"deliverable_id": str(deliverable_id), "error": f"Error decrypting deliverable: {str(e)}"}
+    
+    async def results() -> AsyncIterator[bytes]:
+        tasks = [asyncio.ensure_future(decrypt_one(deliverable_id)) for deliverable_id in requested]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield orjson.dumps(await next_result) + b"\n"
+        finally:
+            # The client went away; stop the decryptions still waiting for the pool
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
 @router.post("/encrypt")
 async def encrypt_data(
     data: str = Body(...),
@@ -202,12 +350,14 @@ async def encrypt_data(
     Encrypt arbitrary data with a public key.
     """
     try:
-        encrypted_data = encryption_service.encrypt_with_public_key(
+        encrypted_data = await async_encryption_service.encrypt_with_public_key(
             public_key,
             data.encode('utf-8')
         )
         
         return {"encrypted_data": base64.b64encode(encrypted_data).decode('utf-8')}
+    except CryptoPoolBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error encrypting data: {str(e)}")
 
@@ -220,11 +370,13 @@ async def decrypt_data(
     Decrypt arbitrary data with a private key.
     """
     try:
-        decrypted_data = encryption_service.decrypt_with_private_key(
+        decrypted_data = await async_encryption_service.decrypt_with_private_key(
             private_key,
             base64.b64decode(encrypted_data)
         )
         
         return {"decrypted_data": decrypted_data.decode('utf-8')}
+    except CryptoPoolBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error decrypting data: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Optional
+from uuid import UUID
+import logging
+
+from app.events.status_events import status_events, SubscriberLimitError
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("/status")
+async def stream_status_events(
+    request: Request,
+    task_id: Optional[UUID] = None,
+    creator_id: Optional[UUID] = None,
+    judge_id: Optional[UUID] = None,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Stream task, deliverable and stake status changes as Server-Sent Events.
+    Filter by task, creator or judge. Reconnecting clients resume from the
+    Last-Event-ID header (or the last_event_id query parameter).
+    """
+    if last_event_id_header:
+        try:
+            last_event_id = int(last_event_id_header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    if status_events.full:
+        raise HTTPException(status_code=503, detail="Too many event subscribers", headers={"Retry-After": "5"})
+
+    async def event_stream() -> AsyncIterator[bytes]:
+        # Tell EventSource clients how long to wait before reconnecting
+        yield b"retry: 3000\n\n"
+        try:
+            async for event in status_events.subscribe(
+                task_id=str(task_id) if task_id else None,
+                creator_id=str(creator_id) if creator_id else None,
+                judge_id=str(judge_id) if judge_id else None,
+                last_event_id=last_event_id,
+            ):
+                if event is None:
+                    if await request.is_disconnected():
+                        return
+                    yield b": keep-alive\n\n"
+                else:
+                    yield event.to_sse()
+        except SubscriberLimitError:
+            logger.warning("Status event subscriber limit reached")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+async def get_status_event_stats():
+    """
+    Get status event broker counters
+    """
+    return status_events.stats()
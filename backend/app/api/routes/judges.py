@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Body
+from typing import List, Optional, Dict, Any
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -9,9 +9,11 @@ from app.db.services.task_service import task_service
 from app.db.services.agent_service import agent_service
 from app.db.services.deliverable_service import deliverable_service
 from app.db.models.agent import AgentType
+from app.encryption.rewrap import key_rewrap_service
 from app.schemas.judge import Judge, JudgeCreate, JudgeUpdate
 from app.schemas.task import Task
 from app.schemas.agent import Agent
+from app.api.responses import list_response
 
 router = APIRouter()
 
@@ -24,7 +26,7 @@ async def get_judges(
     """
     Get all judges
     """
-    return await judge_service.get_all_judges(db, skip, limit)
+    return list_response(Agent, await judge_service.get_all_judges(db, skip, limit))
 
 @router.get("/{judge_id}", response_model=Agent)
 async def get_judge(
@@ -74,7 +76,38 @@ async def get_judge_tasks(
         raise HTTPException(status_code=404, detail="Judge not found")
     
     # Get tasks assigned to this judge
-    return await task_service.get_by_judge(db, judge_id, skip, limit)
+    return list_response(Task, await task_service.get_by_judge(db, judge_id, skip, limit))
+
+@router.post("/{judge_id}/rewrap", status_code=status.HTTP_202_ACCEPTED)
+async def rewrap_judge_keys(
+    judge_id: UUID,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+) -> Dict[str, Any]:
+    """
+    Start re-wrapping the judge's data keys on all of its open tasks in a background job,
+    e.g. after it rotated its key pair, without re-encrypting payloads or deliverables.
+    Poll the returned job for the result. Tasks that failed are listed and left
+    unchanged; the job can be run again.
+    """
+    judge = await agent_service.get(db, judge_id)
+    if not judge or judge.agent_type != AgentType.JUDGE:
+        raise HTTPException(status_code=404, detail="Judge not found")
+    
+    response.headers["Location"] = f"/api/judges/{judge_id}/rewrap"
+    return key_rewrap_service.start_judge_rewrap(judge_id)
+
+@router.get("/{judge_id}/rewrap")
+async def get_rewrap_job(judge_id: UUID) -> Dict[str, Any]:
+    """
+    Get the status of the judge's last re-wrap job.
+    Jobs run in the API worker that accepted them, which is the only one that knows them.
+    """
+    job = key_rewrap_service.judge_rewrap_job(judge_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Re-wrap job not found")
+    
+    return job
 
 @router.post("/{judge_id}/score")
 async def submit_score(
@@ -140,7 +173,7 @@ async def get_judges_by_specialization(
     """
     Get judges by specialization
     """
-    return await judge_service.get_judges_by_specialization(db, specialization, skip, limit)
+    return list_response(Judge, await judge_service.get_judges_by_specialization(db, specialization, skip, limit))
 
 @router.put("/{judge_id}", response_model=Agent)
 async def update_judge(
@@ -1,20 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Header, Response
 from typing import List, Optional, Dict, Any
-from uuid import UUID
+from uuid import UUID, uuid4
+import asyncio
+import hashlib
+import os
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 import json
 
 from app.db.database import get_db
 from app.db.services.task_service import task_service
+from app.db.services.task_job_service import task_job_service
 from app.db.models.task import TaskStatus
+from app.db.models.task_job import TaskJobStatus
 from app.db.models.agent import Agent
 from app.schemas.task import Task, TaskCreate, TaskUpdate
-from app.encryption.service import encryption_service
+from app.schemas.task_job import TaskJob, TaskJobCreate
+from app.schemas.task_overview import TaskOverview
+from app.api.responses import list_response
+from app.encryption.async_service import async_encryption_service, CryptoPoolBusyError
 from app.encryption.db_service import key_management_service
+from app.encryption.decrypted_cache import decrypted_cache
+from app.encryption.rewrap import key_rewrap_service, RewrapError
+from app.api.decryption import decryption_mode, granted_key, sealed_content
+from app.storage.blob_store import blob_store
+from app.pipeline.task_creation import task_creation_pipeline, PipelineFullError
 
 router = APIRouter()
 
+# Seconds clients may reuse a task overview before revalidating it with its ETag
+OVERVIEW_MAX_AGE = int(os.getenv("TASK_OVERVIEW_MAX_AGE", "5"))
+
 @router.get("/", response_model=List[Task])
 async def get_tasks(
     status: Optional[str] = None,
@@ -28,10 +44,61 @@ async def get_tasks(
     if status:
         try:
             task_status = TaskStatus(status)
-            return await task_service.get_by_status(db, task_status, skip, limit)
+            tasks = await task_service.get_by_status(db, task_status, skip, limit)
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
-    return await task_service.get_multi(db, skip=skip, limit=limit)
+    else:
+        tasks = await task_service.get_multi(db, skip=skip, limit=limit)
+    return list_response(Task, tasks)
+
+@router.post("/jobs", response_model=TaskJob, status_code=status.HTTP_202_ACCEPTED)
+async def submit_task_job(
+    job_in: TaskJobCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Queue a task for asynchronous creation.
+    Encryption, storage and NFT minting run in the background; poll the returned job for progress.
+    """
+    try:
+        job = await task_creation_pipeline.submit(db, job_in)
+    except PipelineFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    response.headers["Location"] = f"/api/tasks/jobs/{job.id}"
+    return job
+
+@router.get("/jobs/metrics")
+async def get_task_job_metrics():
+    """
+    Get per-stage throughput metrics for the task creation pipeline
+    """
+    return task_creation_pipeline.stats()
+
+@router.get("/jobs/{job_id}", response_model=TaskJob)
+async def get_task_job(
+    job_id: UUID,
+    wait: float = 0,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the status of a task creation job.
+    With wait > 0, long-poll for up to `wait` seconds (max 30) until the job finishes.
+    """
+    job = await task_job_service.get(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(max(wait, 0), 30)
+    while job.status not in (TaskJobStatus.COMPLETED, TaskJobStatus.FAILED) and loop.time() < deadline:
+        # Return the connection to the pool while waiting so long-polls cannot exhaust it
+        await db.close()
+        await task_creation_pipeline.wait_for_update(job_id, timeout=min(1.0, deadline - loop.time()))
+        job = await task_job_service.get(db, job_id)
+    
+    return job
 
 @router.get("/{task_id}", response_model=Task)
 async def get_task(
@@ -46,6 +113,27 @@ async def get_task(
         raise HTTPException(status_code=404, detail="Task not found")
     return task
 
+@router.get("/{task_id}/overview", response_model=TaskOverview)
+async def get_task_overview(
+    task_id: UUID,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get a task with its judges, deliverable summaries with score aggregates and stake counts.
+    Responses carry an ETag; send it back in If-None-Match to get 304 when nothing changed.
+    """
+    overview = await task_service.get_overview(db, task_id)
+    if not overview:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    content = TaskOverview.model_validate(overview, from_attributes=True).model_dump_json().encode()
+    etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={OVERVIEW_MAX_AGE}"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
 @router.post("/", response_model=Task, status_code=status.HTTP_201_CREATED)
 async def create_task(
     task_in: TaskCreate,
@@ -57,8 +145,8 @@ async def create_task(
     """
     # Generate a mock NFT ID for now
     # In a real implementation, this would come from the blockchain service
-    task_data = task_in.dict()
-    task_data["nft_id"] = f"nft_{UUID().hex[:8]}"
+    task_data = task_in.model_dump()
+    task_data["nft_id"] = f"nft_{uuid4().hex[:8]}"
     task_data["status"] = TaskStatus.CREATED
     
     # Get public keys for judges
@@ -68,22 +156,23 @@ async def create_task(
     
     # Encrypt payload
     try:
-        encryption_result = encryption_service.encrypt_task_payload(payload, judge_public_keys)
+        encryption_result = await async_encryption_service.encrypt_task_payload(payload, judge_public_keys)
         
-        # Update task data with encrypted payload URL and encryption key
-        # In a real implementation, the encrypted payload would be stored in IPFS or S3
-        # For now, we'll just store the encrypted payload directly
-        task_data["encrypted_payload_url"] = encryption_result["encrypted_payload"]
+        # Store the encrypted payload in the blob store and keep only its reference
+        task_data["encrypted_payload_url"] = await blob_store.put_async(encryption_result["encrypted_payload"])
         
         # In a real implementation, the encryption keys would be stored in a separate table
         # For now, we'll just store the first encryption key in the task
         if encryption_result["encrypted_keys"]:
             first_judge_id = next(iter(encryption_result["encrypted_keys"]))
             task_data["encryption_key"] = encryption_result["encrypted_keys"][first_judge_id]
+        task_data["encryption_keys"] = encryption_result["encrypted_keys"]
         
         # Create task with updated data
         task_create = TaskCreate(**task_data)
         return await task_service.create_with_judges(db, task_create)
+    except CryptoPoolBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error encrypting task payload: {str(e)}")
 
@@ -122,6 +211,31 @@ async def update_task_status(
     
     return task
 
+@router.put("/{task_id}/judges", response_model=Task)
+async def update_task_judges(
+    task_id: UUID,
+    judge_ids: List[UUID] = Body(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Replace a task's judges.
+    The data keys of the payload and deliverables are re-wrapped for the new judges;
+    the encrypted content itself is not touched. Removed judges lose their wrapped keys
+    here but keep them in the stored content's envelope header, so removal does not
+    revoke a removed judge's access to the blob itself.
+    """
+    if not judge_ids:
+        raise HTTPException(status_code=400, detail="A task needs at least one judge")
+    
+    task = await task_service.get(db, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    try:
+        return await key_rewrap_service.set_task_judges(db, task, judge_ids)
+    except RewrapError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 @router.get("/creator/{creator_id}", response_model=List[Task])
 async def get_tasks_by_creator(
     creator_id: UUID,
@@ -132,7 +246,7 @@ async def get_tasks_by_creator(
     """
     Get tasks created by a specific creator
     """
-    return await task_service.get_by_creator(db, creator_id, skip, limit)
+    return list_response(Task, await task_service.get_by_creator(db, creator_id, skip, limit))
 
 @router.get("/judge/{judge_id}", response_model=List[Task])
 async def get_tasks_by_judge(
@@ -144,17 +258,20 @@ async def get_tasks_by_judge(
     """
     Get tasks assigned to a specific judge
     """
-    return await task_service.get_by_judge(db, judge_id, skip, limit)
+    return list_response(Task, await task_service.get_by_judge(db, judge_id, skip, limit))
 
 @router.post("/{task_id}/stake/{agent_id}", response_model=Dict[str, Any])
 async def stake_on_task(
     task_id: UUID,
     agent_id: UUID,
+    mode: str = Depends(decryption_mode),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Stake on a task and get access to the encrypted payload.
     In a real implementation, this would verify the stake on the blockchain.
+    With ?decryption=client, the payload reference and the agent's wrapped key are
+    returned as "encrypted_payload" for the agent to decrypt itself.
     """
     # Get the task
     task = await task_service.get(db, task_id)
@@ -168,32 +285,42 @@ async def stake_on_task(
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
+    # Get the data key wrapped for this agent: its key grant, issued now if the
+    # background grant has not landed yet
+    encrypted_key = await granted_key(db, task_id, agent_id)
+    
+    if mode == "client":
+        # The agent decrypts with its own private key; the server only looks up its key grant
+        await task_service.update_status(db, task_id, TaskStatus.STAKED)
+        return {
+            "task": Task.model_validate(task),
+            "encrypted_payload": sealed_content(task.encrypted_payload_url, encrypted_key)
+        }
+    
     # Get the agent's private key
     private_key = await key_management_service.get_agent_private_key(agent_id)
     if not private_key:
         raise HTTPException(status_code=404, detail="Private key not found")
     
-    # Get the encrypted key for this agent
-    # In a real implementation, this would be stored in a stake record
-    # For now, we'll just use the task's encryption_key field
-    if not task.encryption_key:
-        raise HTTPException(status_code=404, detail="Encryption key not found")
-    
     try:
-        # Decrypt the payload
-        decrypted_payload = encryption_service.decrypt_task_payload(
-            task.encrypted_payload_url,
-            task.encryption_key,
-            private_key
+        # Decrypt the payload, unless this agent already did
+        async def decrypt():
+            encrypted = await blob_store.resolve_bytes_async(task.encrypted_payload_url)
+            return await async_encryption_service.decrypt_task_payload(encrypted, encrypted_key, private_key)
+        
+        decrypted_payload = await decrypted_cache.get_or_decrypt(
+            task.id, agent_id, task.encrypted_payload_url, decrypt
         )
         
         # Update task status to STAKED
         await task_service.update_status(db, task_id, TaskStatus.STAKED)
         
         return {
-            "task": Task.from_orm(task),
+            "task": Task.model_validate(task),
             "payload": decrypted_payload
         }
+    except CryptoPoolBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error decrypting task payload: {str(e)}")
 
@@ -208,4 +335,5 @@ async def delete_task(
     task = await task_service.remove(db, id=task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    decrypted_cache.invalidate_object(task_id)
     return None
\ No newline at end of file
@@ -7,15 +7,12 @@ import logging
 from app.db.database import get_db
 from app.db.services.wallet_service import wallet_service
 from app.db.services.agent_service import agent_service
-from app.blockchain.solana_client import SolanaClient
+from app.blockchain.solana_client import solana_client
 from app.schemas.wallet import Wallet, WalletCreate
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Initialize Solana client
-solana_client = SolanaClient()
-
 @router.post("/create/{agent_id}", response_model=Wallet, status_code=status.HTTP_201_CREATED)
 async def create_agent_wallet(
     agent_id: UUID,
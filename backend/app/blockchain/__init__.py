@@ -5,6 +5,6 @@ This module provides integration with blockchain technologies,
 specifically Solana for the XAAM protocol.
 """
 
-from .solana_client import SolanaClient
+from .solana_client import KeypairLoadError, SolanaClient, solana_client
 
-__all__ = ["SolanaClient"]
\ No newline at end of file
+__all__ = ["KeypairLoadError", "SolanaClient", "solana_client"]
\ No newline at end of file
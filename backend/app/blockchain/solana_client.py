@@ -7,6 +7,7 @@ It handles operations like creating task NFTs, staking, and distributing rewards
 
 import json
 import os
+import time
 import base64
 from typing import List, Dict, Any, Optional
 from pathlib import Path
@@ -21,6 +22,14 @@ from solana.rpc.commitment import Confirmed
 from solders.transaction import Transaction
 from solders.pubkey import Pubkey as PublicKey
 
+from app.events.invalidation import invalidation_channel
+from app.metrics.prometheus import observe_rpc, solana_rpc_errors_total
+
+
+class KeypairLoadError(Exception):
+    """Raised when the payer keypair file is missing or invalid and may not be regenerated"""
+    pass
+
 # Define a Keypair class that uses nacl
 class Keypair:
     """Keypair class using PyNaCl for cryptographic operations."""
@@ -70,38 +79,86 @@ class SolanaClient:
         """
         # Use environment variables if not provided
         self.rpc_url = rpc_url or os.getenv("SOLANA_RPC_URL", "https://api.devnet.solana.com")
-        keypair_path = keypair_path or os.getenv("SOLANA_KEYPAIR_PATH", "keypair.json")
+        self.keypair_path = keypair_path or os.getenv("SOLANA_KEYPAIR_PATH", "keypair.json")
         
         # Initialize Solana client
         self.client = Client(self.rpc_url)
         
-        # Load keypair
+        self.keypair = self._load_keypair(self.keypair_path)
+        self.program_id = self._load_program_id()
+    
+    def _load_keypair(self, keypair_path: str, create: bool = True) -> Keypair:
+        """
+        Load the payer keypair, creating it if the file does not exist.
+
+        Args:
+            keypair_path: Path to the keypair JSON file
+            create: Whether to generate a keypair when the file is missing or invalid
+
+        Raises:
+            KeypairLoadError: If the file is missing or invalid and `create` is False
+        """
         try:
             with open(keypair_path, 'r') as f:
                 secret_key = json.load(f)
-                self.keypair = Keypair.from_secret_key(bytes(secret_key))
-        except (FileNotFoundError, json.JSONDecodeError):
-            # Generate new keypair if file doesn't exist or is invalid
-            self.keypair = Keypair()
-            # Save keypair
-            dir_path = os.path.dirname(keypair_path)
-            if dir_path:  # Only create directories if there's a directory part in the path
-                os.makedirs(dir_path, exist_ok=True)
+                return Keypair.from_secret_key(bytes(secret_key))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError, ValueError) as e:
+            if not create:
+                raise KeypairLoadError(f"Cannot load payer keypair from {keypair_path}: {e}") from e
+        
+        # Generate new keypair if file doesn't exist or is invalid
+        keypair = Keypair()
+        dir_path = os.path.dirname(keypair_path)
+        if dir_path:  # Only create directories if there's a directory part in the path
+            os.makedirs(dir_path, exist_ok=True)
+        try:
+            # Create the file exclusively so concurrent workers agree on one keypair
+            fd = os.open(keypair_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            # Another worker created it first; wait for it to finish writing
+            for _ in range(50):
+                try:
+                    with open(keypair_path, 'r') as f:
+                        return Keypair.from_secret_key(bytes(json.load(f)))
+                except json.JSONDecodeError:
+                    time.sleep(0.01)
+            # Still invalid, so replace it
             with open(keypair_path, 'w') as f:
-                json.dump(list(self.keypair.secret_key), f)
-        
-        # Load program ID
+                json.dump(list(keypair.secret_key), f)
+            return keypair
+        with os.fdopen(fd, 'w') as f:
+            json.dump(list(keypair.secret_key), f)
+        return keypair
+    
+    def _load_program_id(self) -> PublicKey:
+        """
+        Load the deployed program ID.
+        """
         program_id_path = Path(__file__).parent.parent.parent.parent / "solana" / "program_id.json"
         try:
             with open(program_id_path, 'r') as f:
                 program_data = json.load(f)
-                self.program_id = PublicKey.from_string(program_data["programId"])
+                return PublicKey.from_string(program_data["programId"])
         except (FileNotFoundError, json.JSONDecodeError, KeyError):
             # Use a default program ID if file doesn't exist or is invalid
             # This should be replaced with the actual program ID after deployment
             # Convert string to bytes for solders 0.14.4 compatibility
-            self.program_id = PublicKey.from_string("11111111111111111111111111111111")
+            return PublicKey.from_string("11111111111111111111111111111111")
+    
+    def reload(self):
+        """
+        Re-read the keypair and program ID, e.g. after a program redeploy or keypair rotation.
+        Unlike startup, a missing or invalid keypair file is an error: silently switching to a
+        new, unfunded payer would break every transaction. The current keypair is kept.
+
+        Raises:
+            KeypairLoadError: If the keypair file is missing or invalid
+        """
+        keypair = self._load_keypair(self.keypair_path, create=False)
+        self.keypair = keypair
+        self.program_id = self._load_program_id()
     
+    @observe_rpc("create_task_nft")
     async def create_task_nft(
         self,
         title: str,
@@ -148,6 +205,7 @@ class SolanaClient:
             "task_nft": str(task_keypair.public_key),  # In a real implementation, this would be different
         }
     
+    @observe_rpc("stake_on_task")
     async def stake_on_task(
         self,
         agent_public_key: str,
@@ -187,6 +245,7 @@ class SolanaClient:
             "stake_account": str(stake_keypair.public_key),
         }
     
+    @observe_rpc("submit_deliverable")
     async def submit_deliverable(
         self,
         agent_public_key: str,
@@ -227,6 +286,7 @@ class SolanaClient:
             "deliverable_account": str(deliverable_keypair.public_key),
         }
     
+    @observe_rpc("judge_deliverable")
     async def judge_deliverable(
         self,
         judge_public_key: str,
@@ -263,6 +323,7 @@ class SolanaClient:
             "signature": signature,
         }
     
+    @observe_rpc("complete_task")
     async def complete_task(
         self,
         creator_public_key: str,
@@ -297,6 +358,7 @@ class SolanaClient:
             "signature": signature,
         }
     
+    @observe_rpc("get_account_balance")
     async def get_account_balance(self, public_key: str) -> int:
         """
         Get the SOL balance of an account.
@@ -341,6 +403,8 @@ class SolanaClient:
         except Exception as e:
             import traceback
             error_traceback = traceback.format_exc()
+            # The error is swallowed below, so count it here
+            solana_rpc_errors_total.labels("get_account_balance").inc()
             print(f"Error getting balance: {e}")
             print(f"Error type: {type(e)}")
             print(f"Traceback: {error_traceback}")
@@ -362,6 +426,7 @@ class SolanaClient:
             "private_key": base64.b64encode(wallet_keypair.secret_key).decode('utf-8')
         }
     
+    @observe_rpc("airdrop")
     async def airdrop(self, public_key: str, amount: int = 1000000000) -> Optional[str]:
         """
         Request an airdrop of SOL to an account (only works on devnet and testnet).
@@ -408,4 +473,11 @@ class SolanaClient:
             print(f"Error type: {type(e)}")
             print(f"Traceback: {error_traceback}")
             # Re-raise the exception to propagate it to the caller
-            raise e
\ No newline at end of file
+            raise e
+
+
+# Create a singleton instance
+solana_client = SolanaClient()
+
+# Reload the keypair and program ID in every worker when any of them is told to
+invalidation_channel.subscribe("solana_client", lambda payload: solana_client.reload())
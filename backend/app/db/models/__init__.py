@@ -4,6 +4,9 @@ from app.db.models.deliverable import Deliverable
 from app.db.models.stake import Stake
 from app.db.models.wallet import Wallet
 from app.db.models.judge import Judge
+from app.db.models.task_job import TaskJob
+from app.db.models.idempotency_key import IdempotencyKey
+from app.db.models.task_key_grant import TaskKeyGrant
 
 # Export all models
 __all__ = [
@@ -12,5 +15,8 @@ __all__ = [
     "Deliverable",
     "Stake",
     "Wallet",
-    "Judge"
+    "Judge",
+    "TaskJob",
+    "IdempotencyKey",
+    "TaskKeyGrant"
 ]
\ No newline at end of file
@@ -3,7 +3,7 @@ from sqlalchemy.dialects.postgresql import UUID
 import enum
 from app.db.models.base import BaseModel
 
-class AgentType(enum.Enum):
+class AgentType(str, enum.Enum):
     WORKER = "WORKER"
     JUDGE = "JUDGE"
 
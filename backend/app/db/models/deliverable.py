@@ -5,7 +5,7 @@ import enum
 from datetime import datetime
 from app.db.models.base import BaseModel
 
-class DeliverableStatus(enum.Enum):
+class DeliverableStatus(str, enum.Enum):
     SUBMITTED = "SUBMITTED"
     JUDGED = "JUDGED"
     ACCEPTED = "ACCEPTED"
@@ -17,7 +17,7 @@ class Deliverable(BaseModel):
     
     task_id = Column(UUID(as_uuid=True), ForeignKey('tasks.id'), nullable=False)
     agent_id = Column(UUID(as_uuid=True), ForeignKey('agents.id'), nullable=False)
-    encrypted_content_url = Column(String, nullable=False)
+    encrypted_content_url = Column(String, nullable=False)  # Blob reference (sha256:<digest>) or external URL
     encryption_keys = Column(JSON, nullable=True)  # Map of judge ID -> encrypted key
     submission_time = Column(DateTime, default=datetime.utcnow, nullable=False)
     scores = Column(JSON, nullable=True)  # Map of judge ID -> score
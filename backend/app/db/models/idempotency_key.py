@@ -0,0 +1,25 @@
+from sqlalchemy import Column, String, Integer, DateTime, LargeBinary, Boolean, Index, UniqueConstraint
+from app.db.models.base import BaseModel
+
+class IdempotencyKey(BaseModel):
+    """Stored response for a request made with an Idempotency-Key header"""
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(255), nullable=False)
+    path = Column(String, nullable=False)
+    client = Column(String(255), nullable=False, default="")  # Client identity; keys are scoped per client
+    request_hash = Column(String(64), nullable=False)  # SHA-256 of method, path and body
+    completed = Column(Boolean, default=False, nullable=False)  # False while the first request is in flight
+    locked_until = Column(DateTime, nullable=True)  # An unfinished claim past this time may be reclaimed
+    status_code = Column(Integer, nullable=True)
+    content_type = Column(String, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('key', 'path', 'client', name='uq_idempotency_keys_key_path_client'),
+        Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+    
+    def __repr__(self):
+        return f"<IdempotencyKey(key='{self.key}', path='{self.path}', completed={self.completed})>"
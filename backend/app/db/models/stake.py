@@ -5,7 +5,7 @@ import enum
 from datetime import datetime
 from app.db.models.base import BaseModel
 
-class StakeStatus(enum.Enum):
+class StakeStatus(str, enum.Enum):
     ACTIVE = "ACTIVE"
     RETURNED = "RETURNED"
     FORFEITED = "FORFEITED"
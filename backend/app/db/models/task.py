@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, Enum, ForeignKey, Table
+from sqlalchemy import Column, String, Float, DateTime, Enum, ForeignKey, Table, JSON
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.orm import relationship
 import enum
@@ -14,7 +14,7 @@ task_judge_association = Table(
     Column('judge_id', UUID(as_uuid=True), ForeignKey('agents.id'), primary_key=True)
 )
 
-class TaskStatus(enum.Enum):
+class TaskStatus(str, enum.Enum):
     CREATED = "CREATED"
     STAKED = "STAKED"
     IN_PROGRESS = "IN_PROGRESS"
@@ -29,8 +29,9 @@ class Task(BaseModel):
     nft_id = Column(String, nullable=False)
     title = Column(String, nullable=False)
     summary = Column(String, nullable=False)
-    encrypted_payload_url = Column(String, nullable=False)
+    encrypted_payload_url = Column(String, nullable=False)  # Blob reference (sha256:<digest>) or external URL
     encryption_key = Column(String, nullable=True)  # Encrypted with worker's public key
+    encryption_keys = Column(JSON, nullable=True)  # Map of judge ID -> encrypted key
     creator_id = Column(UUID(as_uuid=True), ForeignKey('agents.id'), nullable=False)
     status = Column(Enum(TaskStatus), default=TaskStatus.CREATED, nullable=False)
     deadline = Column(DateTime, nullable=False)
@@ -39,7 +40,7 @@ class Task(BaseModel):
     
     # Relationships
     creator = relationship("Agent", foreign_keys=[creator_id], backref="created_tasks")
-    judges = relationship("Agent", secondary=task_judge_association, backref="judged_tasks")
+    judges = relationship("Agent", secondary=task_judge_association, backref="judged_tasks", lazy="selectin")
     deliverables = relationship("Deliverable", back_populates="task")
     stakes = relationship("Stake", back_populates="task")
     
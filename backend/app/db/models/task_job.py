@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, JSON
+from sqlalchemy.dialects.postgresql import UUID
+import enum
+from app.db.models.base import BaseModel
+
+class TaskJobStatus(str, enum.Enum):
+    QUEUED = "QUEUED"
+    ENCRYPTING = "ENCRYPTING"
+    STORING = "STORING"
+    MINTING = "MINTING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+class TaskJob(BaseModel):
+    """Task creation job tracking a task through the asynchronous creation pipeline"""
+    __tablename__ = "task_jobs"
+    
+    creator_id = Column(UUID(as_uuid=True), ForeignKey('agents.id'), nullable=False)
+    title = Column(String, nullable=False)
+    status = Column(Enum(TaskJobStatus), default=TaskJobStatus.QUEUED, nullable=False)
+    task_id = Column(UUID(as_uuid=True), ForeignKey('tasks.id'), nullable=True)
+    nft_id = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    stage_timings = Column(JSON, nullable=True)  # Map of stage -> seconds
+    completed_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<TaskJob(id={self.id}, title='{self.title}', status={self.status})>"
\ No newline at end of file
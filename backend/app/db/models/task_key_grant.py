@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, ForeignKey, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.models.base import BaseModel
+
+class TaskKeyGrant(BaseModel):
+    """A task payload's data key wrapped for an agent that staked on the task"""
+    __tablename__ = "task_key_grants"
+    
+    task_id = Column(UUID(as_uuid=True), ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False)
+    agent_id = Column(UUID(as_uuid=True), ForeignKey('agents.id'), nullable=False)
+    wrapped_key = Column(String, nullable=False)  # Base64 data key wrapped with the agent's public key
+    
+    __table_args__ = (
+        # Also the index behind the (task, agent) lookup
+        UniqueConstraint('task_id', 'agent_id', name='uq_task_key_grants_task_agent'),
+    )
+    
+    def __repr__(self):
+        return f"<TaskKeyGrant(task_id={self.task_id}, agent_id={self.agent_id})>"
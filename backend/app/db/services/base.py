@@ -51,7 +51,7 @@ class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         if isinstance(obj_in, dict):
             obj_in_data = obj_in
         else:
-            obj_in_data = obj_in.dict(exclude_unset=True)
+            obj_in_data = obj_in.model_dump(exclude_unset=True)
         
         db_obj = self.model(**obj_in_data)
         db.add(db_obj)
@@ -72,7 +72,7 @@ class BaseService(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
-            update_data = obj_in.dict(exclude_unset=True)
+            update_data = obj_in.model_dump(exclude_unset=True)
         
         for field in update_data:
             if hasattr(db_obj, field):
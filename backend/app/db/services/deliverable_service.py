@@ -8,6 +8,7 @@ from datetime import datetime
 from app.db.models.deliverable import Deliverable, DeliverableStatus
 from app.schemas.deliverable import DeliverableCreate, DeliverableUpdate
 from app.db.services.base import BaseService
+from app.events.status_events import status_events
 
 
 class DeliverableService(BaseService[Deliverable, DeliverableCreate, DeliverableUpdate]):
@@ -22,6 +23,26 @@ class DeliverableService(BaseService[Deliverable, DeliverableCreate, Deliverable
         result = await db.execute(query)
         return result.scalars().all()
     
+    async def get_by_tasks(self, db: AsyncSession, task_ids: List[UUID]) -> List[Deliverable]:
+        """
+        Get the deliverables of several tasks in one query
+        """
+        if not task_ids:
+            return []
+        query = select(self.model).where(self.model.task_id.in_(task_ids))
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    async def get_many(self, db: AsyncSession, deliverable_ids: List[UUID]) -> List[Deliverable]:
+        """
+        Get several deliverables by ID in one query
+        """
+        if not deliverable_ids:
+            return []
+        query = select(self.model).where(self.model.id.in_(deliverable_ids))
+        result = await db.execute(query)
+        return result.scalars().all()
+    
     async def get_by_agent(self, db: AsyncSession, agent_id: UUID) -> List[Deliverable]:
         """
         Get all deliverables submitted by an agent
@@ -75,6 +96,11 @@ class DeliverableService(BaseService[Deliverable, DeliverableCreate, Deliverable
         db.add(deliverable)
         await db.commit()
         await db.refresh(deliverable)
+        
+        await status_events.publish_for_task(
+            db, "deliverable.score", deliverable.id, deliverable.task_id, deliverable.status,
+            data={"agent_id": str(deliverable.agent_id), "judge_id": str(judge_id), "score": score}
+        )
         return deliverable
     
     async def update_status(self, db: AsyncSession, deliverable_id: UUID, status: DeliverableStatus) -> Optional[Deliverable]:
@@ -90,6 +116,11 @@ class DeliverableService(BaseService[Deliverable, DeliverableCreate, Deliverable
         db.add(deliverable)
         await db.commit()
         await db.refresh(deliverable)
+        
+        await status_events.publish_for_task(
+            db, "deliverable.status", deliverable.id, deliverable.task_id, deliverable.status,
+            data={"agent_id": str(deliverable.agent_id)}
+        )
         return deliverable
     
     async def get_by_status(self, db: AsyncSession, status: DeliverableStatus) -> List[Deliverable]:
@@ -0,0 +1,115 @@
+from typing import Optional
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete, or_
+from sqlalchemy.exc import IntegrityError
+
+from app.db.models.idempotency_key import IdempotencyKey
+
+
+class IdempotencyService:
+    """
+    Service for storing and replaying responses to idempotent requests
+    """
+
+    async def get(self, db: AsyncSession, key: str, path: str, client: str = "") -> Optional[IdempotencyKey]:
+        """
+        Get a client's unexpired record for a key on a path.
+        Unfinished claims whose lease has run out are ignored, since the request holding them died.
+        """
+        now = datetime.utcnow()
+        query = select(IdempotencyKey).where(
+            IdempotencyKey.key == key,
+            IdempotencyKey.path == path,
+            IdempotencyKey.client == client,
+            IdempotencyKey.expires_at > now,
+            or_(IdempotencyKey.completed.is_(True), IdempotencyKey.locked_until > now)
+        )
+        result = await db.execute(query)
+        return result.scalars().first()
+
+    async def begin(
+        self,
+        db: AsyncSession,
+        key: str,
+        path: str,
+        request_hash: str,
+        ttl_seconds: int,
+        client: str = "",
+        lease_seconds: int = 120,
+    ) -> Optional[IdempotencyKey]:
+        """
+        Claim a key for a new request.
+
+        Args:
+            lease_seconds: How long the claim blocks retries if the request never finishes
+
+        Returns:
+            The in-progress record, or None if another request already holds the key
+        """
+        now = datetime.utcnow()
+        # Clear an expired record, or a claim abandoned by a crashed request, so the key can be reused
+        await db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.path == path,
+                IdempotencyKey.client == client,
+                or_(
+                    IdempotencyKey.expires_at <= now,
+                    (IdempotencyKey.completed.is_(False)) & (IdempotencyKey.locked_until <= now)
+                )
+            )
+        )
+        record = IdempotencyKey(
+            key=key,
+            path=path,
+            client=client,
+            request_hash=request_hash,
+            completed=False,
+            locked_until=now + timedelta(seconds=lease_seconds),
+            expires_at=now + timedelta(seconds=ttl_seconds)
+        )
+        db.add(record)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return None
+        await db.refresh(record)
+        return record
+
+    async def complete(
+        self, db: AsyncSession, record: IdempotencyKey, status_code: int, content_type: Optional[str], body: bytes
+    ) -> IdempotencyKey:
+        """
+        Store the response for a claimed key
+        """
+        record.completed = True
+        record.status_code = status_code
+        record.content_type = content_type
+        record.response_body = body
+        db.add(record)
+        await db.commit()
+        return record
+
+    async def release(self, db: AsyncSession, record: IdempotencyKey):
+        """
+        Drop a claimed key without storing a response so the request can be retried
+        """
+        await db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record.id))
+        await db.commit()
+
+    async def purge_expired(self, db: AsyncSession) -> int:
+        """
+        Delete expired records
+        """
+        result = await db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+        )
+        await db.commit()
+        return result.rowcount
+
+
+# Create a singleton instance
+idempotency_service = IdempotencyService()
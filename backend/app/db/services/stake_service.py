@@ -8,6 +8,7 @@ from datetime import datetime
 from app.db.models.stake import Stake, StakeStatus
 from app.schemas.stake import StakeCreate, StakeUpdate
 from app.db.services.base import BaseService
+from app.events.status_events import status_events
 
 
 class StakeService(BaseService[Stake, StakeCreate, StakeUpdate]):
@@ -65,6 +66,11 @@ class StakeService(BaseService[Stake, StakeCreate, StakeUpdate]):
         db.add(stake)
         await db.commit()
         await db.refresh(stake)
+        
+        await status_events.publish_for_task(
+            db, "stake.released", stake.id, stake.task_id, stake.status,
+            data={"agent_id": str(stake.agent_id), "amount": stake.amount}
+        )
         return stake
     
     async def get_agent_active_stakes_total(self, db: AsyncSession, agent_id: UUID) -> float:
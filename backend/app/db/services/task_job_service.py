@@ -0,0 +1,79 @@
+from typing import Iterable, Optional, Dict
+from uuid import UUID
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+
+from app.db.models.task_job import TaskJob, TaskJobStatus
+from app.schemas.task_job import TaskJobCreate, TaskJobUpdate
+from app.db.services.base import BaseService
+
+
+class TaskJobService(BaseService[TaskJob, TaskJobCreate, TaskJobUpdate]):
+    def __init__(self):
+        super().__init__(TaskJob)
+    
+    async def update_status(
+        self,
+        db: AsyncSession,
+        job_id: UUID,
+        status: TaskJobStatus,
+        stage_timings: Optional[Dict[str, float]] = None,
+        **fields
+    ) -> Optional[TaskJob]:
+        """
+        Update a job's status, recording stage timings and any result fields
+        """
+        job = await self.get(db, job_id)
+        if not job:
+            return None
+        
+        job.status = status
+        if stage_timings is not None:
+            job.stage_timings = stage_timings
+        for field, value in fields.items():
+            setattr(job, field, value)
+        if status in (TaskJobStatus.COMPLETED, TaskJobStatus.FAILED):
+            job.completed_at = datetime.utcnow()
+        
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    
+    async def touch(self, db: AsyncSession, job_ids: Iterable[UUID]) -> None:
+        """
+        Record that the jobs are still being worked on
+        """
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        await db.execute(
+            update(TaskJob).where(TaskJob.id.in_(job_ids)).values(updated_at=datetime.utcnow())
+        )
+        await db.commit()
+    
+    async def fail_stale(self, db: AsyncSession, older_than: float) -> int:
+        """
+        Fail unfinished jobs that no pipeline has touched for `older_than` seconds,
+        such as jobs that were in flight when their API worker restarted
+        
+        Returns:
+            Number of jobs failed
+        """
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(TaskJob)
+            .where(
+                TaskJob.status.notin_([TaskJobStatus.COMPLETED, TaskJobStatus.FAILED]),
+                TaskJob.updated_at < now - timedelta(seconds=older_than),
+            )
+            .values(status=TaskJobStatus.FAILED, error="Abandoned: the worker processing this job stopped", completed_at=now)
+        )
+        await db.commit()
+        return result.rowcount
+
+
+# Create a singleton instance
+task_job_service = TaskJobService()
\ No newline at end of file
@@ -0,0 +1,65 @@
+from typing import Optional
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete
+from sqlalchemy.future import select
+from sqlalchemy.exc import IntegrityError
+
+from app.db.models.task_key_grant import TaskKeyGrant
+
+
+class TaskKeyGrantService:
+    """
+    Service for the task payload data keys wrapped for staking agents
+    """
+
+    async def get_wrapped_key(self, db: AsyncSession, task_id: UUID, agent_id: UUID) -> Optional[str]:
+        """
+        Get the data key wrapped for an agent, in one lookup on the (task, agent) index.
+
+        Returns:
+            Base64 wrapped key, or None if the agent has no grant for the task
+        """
+        result = await db.execute(
+            select(TaskKeyGrant.wrapped_key).where(TaskKeyGrant.task_id == task_id, TaskKeyGrant.agent_id == agent_id)
+        )
+        return result.scalars().first()
+
+    async def put(self, db: AsyncSession, task_id: UUID, agent_id: UUID, wrapped_key: str) -> str:
+        """
+        Store an agent's grant, replacing any previous one.
+
+        Returns:
+            The stored wrapped key
+        """
+        result = await db.execute(
+            select(TaskKeyGrant).where(TaskKeyGrant.task_id == task_id, TaskKeyGrant.agent_id == agent_id)
+        )
+        grant = result.scalars().first()
+        if grant is None:
+            grant = TaskKeyGrant(task_id=task_id, agent_id=agent_id, wrapped_key=wrapped_key)
+        else:
+            grant.wrapped_key = wrapped_key
+        db.add(grant)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Granted concurrently; the data key is the same, so either wrapped copy works
+            await db.rollback()
+            return await self.get_wrapped_key(db, task_id, agent_id)
+        return wrapped_key
+
+    async def delete_by_agent(self, db: AsyncSession, agent_id: UUID) -> int:
+        """
+        Delete an agent's grants, e.g. when its key pair is rotated, without committing,
+        so the deletion is part of the caller's transaction.
+
+        Returns:
+            Number of grants deleted
+        """
+        result = await db.execute(delete(TaskKeyGrant).where(TaskKeyGrant.agent_id == agent_id))
+        return result.rowcount
+
+
+# Create a singleton instance
+task_key_grant_service = TaskKeyGrantService()
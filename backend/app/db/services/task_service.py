@@ -1,14 +1,17 @@
-from typing import List, Optional, Dict
+from typing import Any, Iterable, List, Optional, Dict
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, func
 from datetime import datetime
 
 from app.db.models.task import Task, TaskStatus
 from app.db.models.agent import Agent
+from app.db.models.deliverable import Deliverable
+from app.db.models.stake import Stake
 from app.schemas.task import TaskCreate, TaskUpdate
 from app.db.services.base import BaseService
+from app.events.status_events import status_events
 
 
 class TaskService(BaseService[Task, TaskCreate, TaskUpdate]):
@@ -20,7 +23,7 @@ class TaskService(BaseService[Task, TaskCreate, TaskUpdate]):
         Create a new task with judges
         """
         # Create task
-        task_data = obj_in.dict(exclude={"judges"})
+        task_data = obj_in.model_dump(exclude={"judges"})
         task = self.model(**task_data)
         
         # Add judges
@@ -73,6 +76,8 @@ class TaskService(BaseService[Task, TaskCreate, TaskUpdate]):
         db.add(task)
         await db.commit()
         await db.refresh(task)
+        
+        await status_events.publish_for_task(db, "task.status", task.id, task.id, task.status)
         return task
     
     async def search_tasks(self, db: AsyncSession, search_term: str, skip: int = 0, limit: int = 100) -> List[Task]:
@@ -101,6 +106,86 @@ class TaskService(BaseService[Task, TaskCreate, TaskUpdate]):
         result = await db.execute(query)
         return result.scalars().all()
 
+    
+    async def get_overview(self, db: AsyncSession, task_id: UUID) -> Optional[Dict[str, Any]]:
+        """
+        Get a task with its judges, deliverable summaries with score aggregates and stake counts.
+        Runs a fixed number of queries however many judges, deliverables or stakes the task has:
+        the task, its judges (selectin), the deliverable columns and the grouped stake counts.
+        Encrypted deliverable content and keys are not loaded.
+        """
+        task = await self.get(db, task_id)
+        if not task:
+            return None
+        
+        result = await db.execute(
+            select(
+                Deliverable.id,
+                Deliverable.agent_id,
+                Deliverable.status,
+                Deliverable.submission_time,
+                Deliverable.scores,
+            )
+            .where(Deliverable.task_id == task_id)
+            .order_by(Deliverable.submission_time)
+        )
+        deliverable_rows = result.all()
+        
+        result = await db.execute(
+            select(Stake.status, func.count(Stake.id), func.coalesce(func.sum(Stake.amount), 0.0))
+            .where(Stake.task_id == task_id)
+            .group_by(Stake.status)
+        )
+        stake_rows = result.all()
+        
+        judge_ids = {str(judge.id) for judge in task.judges}
+        scored_by_judge = dict.fromkeys(judge_ids, 0)
+        all_scores = []
+        deliverables = []
+        for row in deliverable_rows:
+            scores = row.scores or {}
+            for judge_id in scores:
+                if judge_id in scored_by_judge:
+                    scored_by_judge[judge_id] += 1
+            all_scores.extend(scores.values())
+            deliverables.append({
+                "id": row.id,
+                "agent_id": row.agent_id,
+                "status": row.status,
+                "submission_time": row.submission_time,
+                "score": _score_summary(scores.values()),
+                "pending_judges": len(judge_ids - set(scores)),
+            })
+        
+        return {
+            "task": task,
+            "judges": [
+                {
+                    "id": judge.id,
+                    "name": judge.name,
+                    "wallet_address": judge.wallet_address,
+                    "public_key": judge.public_key,
+                    "reputation_score": judge.reputation_score,
+                    "scored_deliverables": scored_by_judge[str(judge.id)],
+                }
+                for judge in task.judges
+            ],
+            "deliverables": deliverables,
+            "score": _score_summary(all_scores),
+            "stakes": {
+                "count": sum(count for _, count, _ in stake_rows),
+                "total_amount": float(sum(amount for _, _, amount in stake_rows)),
+                "by_status": {getattr(status, "value", status): count for status, count, _ in stake_rows},
+            },
+        }
+
+
+def _score_summary(scores: Iterable[float]) -> Dict[str, Any]:
+    values = [float(score) for score in scores if score is not None]
+    if not values:
+        return {"count": 0, "mean": None, "min": None, "max": None}
+    return {"count": len(values), "mean": sum(values) / len(values), "min": min(values), "max": max(values)}
+
 
 # Create a singleton instance
 task_service = TaskService()
\ No newline at end of file
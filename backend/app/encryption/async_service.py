@@ -0,0 +1,362 @@
+import os
+import time
+import base64
+import asyncio
+import logging
+import multiprocessing
+from Crypto.Random import get_random_bytes
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Optional, Tuple, Union
+
+from app.encryption.service import encryption_service
+from app.encryption.compression import compression_ratio
+from app.encryption.key_cache import hit_rate
+from app.metrics.prometheus import observe_crypto
+
+logger = logging.getLogger(__name__)
+
+
+def _invoke(method: str, *args: Any) -> Any:
+    """
+    Call an EncryptionService method on the singleton of the current process.
+    Module-level so it can be pickled and sent to pool workers; each worker process
+    uses its own singleton, which keeps any per-process state warm between calls.
+    """
+    return getattr(encryption_service, method)(*args)
+
+
+# Highest key revocation sequence number applied in this process
+_applied_revocation = 0
+
+
+def _invoke_tracked(method: str, revocations: Tuple[Tuple[int, str], ...], *args: Any) -> Tuple[Any, int, Dict[str, Dict]]:
+    """
+    Apply pending key revocations, call the method and report this process's key cache
+    and compression counters.
+
+    Returns:
+        Tuple of (result, process ID, dict of counter group -> counters)
+    """
+    global _applied_revocation
+    if revocations:
+        encryption_service.invalidate_keys([key_id for seq, key_id in revocations if seq > _applied_revocation])
+        _applied_revocation = max(_applied_revocation, revocations[-1][0])
+    result = _invoke(method, *args)
+    counters = {
+        "key_cache": encryption_service.key_cache_counters(),
+        "compression": encryption_service.compression_counters(),
+    }
+    return result, os.getpid(), counters
+
+
+class CryptoPoolBusyError(Exception):
+    """Raised when the crypto pool's wait queue is full or a caller waited too long for a slot"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AsyncEncryptionService:
+    """
+    Async facade over EncryptionService.
+    CPU-bound RSA and AES operations are dispatched to a process or thread pool so they
+    do not block the event loop. At most `max_pending` operations are submitted to the
+    pool at once; further callers wait on the event loop until a slot frees up.
+    At most `max_waiting` callers may wait, each for up to `wait_timeout` seconds;
+    beyond that, operations fail fast with CryptoPoolBusyError.
+    
+    Encrypting for many judges wraps the data key in parallel: the judges are split
+    into batches of at least `wrap_batch_size` keys, one pool call per batch, and the
+    data is then sealed under the pre-wrapped key.
+    """
+
+    def __init__(
+        self,
+        pool_type: str = None,
+        max_workers: int = None,
+        max_pending: int = None,
+        max_waiting: int = None,
+        wait_timeout: float = None,
+        wrap_batch_size: int = None,
+    ):
+        """
+        Initialize the async encryption service.
+
+        Args:
+            pool_type: "process" or "thread". Defaults to the CRYPTO_POOL_TYPE environment variable.
+            max_workers: Number of pool workers. Defaults to CRYPTO_POOL_WORKERS or the CPU count.
+            max_pending: Maximum operations submitted to the pool at once. Defaults to
+                CRYPTO_POOL_MAX_PENDING or four per worker.
+            max_waiting: Maximum callers waiting for a pool slot. Defaults to
+                CRYPTO_POOL_MAX_WAITING or four times max_pending.
+            wait_timeout: Seconds a caller may wait for a slot. Defaults to
+                CRYPTO_POOL_WAIT_TIMEOUT or 5.
+            wrap_batch_size: Minimum public keys per parallel key-wrapping call; fewer keys
+                are wrapped in the encrypting call itself. Defaults to CRYPTO_WRAP_BATCH_SIZE or 8.
+        """
+        self.pool_type = pool_type or os.getenv("CRYPTO_POOL_TYPE", "process")
+        if self.pool_type not in ("process", "thread"):
+            raise ValueError(f"Unsupported crypto pool type: {self.pool_type}")
+        self.max_workers = max_workers or int(os.getenv("CRYPTO_POOL_WORKERS", "0")) or os.cpu_count() or 1
+        self.max_pending = max_pending or int(os.getenv("CRYPTO_POOL_MAX_PENDING", "0")) or self.max_workers * 4
+        self.max_waiting = max_waiting or int(os.getenv("CRYPTO_POOL_MAX_WAITING", "0")) or self.max_pending * 4
+        self.wait_timeout = wait_timeout or float(os.getenv("CRYPTO_POOL_WAIT_TIMEOUT", "5"))
+        self.wrap_batch_size = wrap_batch_size or int(os.getenv("CRYPTO_WRAP_BATCH_SIZE", "8"))
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.parallel_wraps = 0
+        # Recent key revocations, forwarded to pool processes with each call so they drop
+        # rotated keys from their key caches; a process idle through more than maxlen
+        # revocations keeps the older entries until they age out of its LRU
+        self._revocations: deque = deque(maxlen=64)
+        self._revocation_seq = 0
+        # Latest key cache and compression counters reported by each pool process
+        self._key_cache_counters: Dict[int, Dict[str, int]] = {}
+        self._compression_counters: Dict[int, Dict[str, Any]] = {}
+
+    @property
+    def executor(self) -> Executor:
+        # Created lazily so importing the module does not spawn worker processes
+        if self._executor is None:
+            if self.pool_type == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(os.getenv("CRYPTO_POOL_START_METHOD", "spawn")),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crypto")
+            logger.info(f"Started crypto {self.pool_type} pool with {self.max_workers} workers")
+        return self._executor
+
+    async def _acquire(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return
+
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise CryptoPoolBusyError("Crypto pool queue is full")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise CryptoPoolBusyError("Timed out waiting for the crypto pool")
+        finally:
+            self.waiting -= 1
+
+    async def _run(self, method: str, *args: Any) -> Any:
+        """
+        Run an EncryptionService method in the pool.
+
+        Raises:
+            CryptoPoolBusyError: If the wait queue is full or no slot freed up within wait_timeout
+        """
+        start = time.perf_counter()
+        await self._acquire()
+        success = False
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, pid, counters = await loop.run_in_executor(
+                self.executor, partial(_invoke_tracked, method, tuple(self._revocations), *args)
+            )
+            self._key_cache_counters[pid] = counters["key_cache"]
+            self._compression_counters[pid] = counters["compression"]
+            success = True
+            return result
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self._slots.release()
+            observe_crypto(method, start, success)
+
+    async def generate_key_pair(self, key_size: int = 2048, scheme: str = "rsa") -> Tuple[str, str]:
+        return await self._run("generate_key_pair", key_size, scheme)
+
+    async def encrypt_with_public_key(self, public_key: str, data: bytes) -> bytes:
+        return await self._run("encrypt_with_public_key", public_key, data)
+
+    async def decrypt_with_private_key(self, private_key: str, encrypted_data: bytes) -> bytes:
+        return await self._run("decrypt_with_private_key", private_key, encrypted_data)
+
+    async def wrap_key(self, data_key: bytes, public_keys: Dict[str, str]) -> Dict[str, bytes]:
+        """
+        Wrap one data key for many public keys, in parallel batches across the pool.
+        Each worker reuses the key objects in its own key cache.
+
+        Returns:
+            Dict of principal ID -> wrapped key, in the order of public_keys
+        """
+        items = list(public_keys.items())
+        batches = max(1, min(self.max_workers, len(items) // self.wrap_batch_size))
+        if batches == 1:
+            return await self._run("wrap_key", data_key, public_keys)
+
+        self.parallel_wraps += 1
+        bounds = [len(items) * i // batches for i in range(batches + 1)]
+        results = await asyncio.gather(*(
+            self._run("wrap_key", data_key, dict(items[start:end]))
+            for start, end in zip(bounds, bounds[1:])
+        ))
+        wrapped_keys = {}
+        for result in results:
+            wrapped_keys.update(result)
+        return wrapped_keys
+
+    async def rewrap_key(self, encrypted_key: str, private_key: str, public_keys: Dict[str, str]) -> Dict[str, str]:
+        return await self._run("rewrap_key", encrypted_key, private_key, public_keys)
+
+    async def _prewrap(self, public_keys: Dict[str, str]) -> Tuple[Optional[bytes], Optional[Dict[str, bytes]]]:
+        # Only worth a separate round of pool calls if the keys span several batches
+        if len(public_keys) < self.wrap_batch_size * 2 or self.max_workers < 2:
+            return None, None
+        data_key = get_random_bytes(32)
+        return data_key, await self.wrap_key(data_key, public_keys)
+
+    async def encrypt_task_payload(self, payload: Dict[str, Any], judge_public_keys: Dict[str, str],
+                                       envelope_format: str = None) -> Dict[str, Any]:
+        data_key, wrapped_keys = await self._prewrap(judge_public_keys)
+        return await self._run("encrypt_task_payload", payload, judge_public_keys, data_key, wrapped_keys, envelope_format)
+
+    async def decrypt_task_payload(self, encrypted_payload: Union[str, bytes], encrypted_key: str, private_key: str) -> Dict[str, Any]:
+        return await self._run("decrypt_task_payload", encrypted_payload, encrypted_key, private_key)
+
+    async def encrypt_deliverable(self, deliverable: Dict[str, Any], judge_public_keys: Dict[str, str],
+                                      envelope_format: str = None) -> Dict[str, Any]:
+        data_key, wrapped_keys = await self._prewrap(judge_public_keys)
+        return await self._run("encrypt_deliverable", deliverable, judge_public_keys, data_key, wrapped_keys, envelope_format)
+
+    async def decrypt_deliverable(self, encrypted_content: Union[str, bytes], encrypted_key: str, private_key: str) -> Dict[str, Any]:
+        return await self._run("decrypt_deliverable", encrypted_content, encrypted_key, private_key)
+
+    async def encrypt_iter(
+        self, chunks: AsyncIterable[bytes], public_keys: Dict[str, str], chunk_size: int = None
+    ) -> Tuple[Dict[str, str], AsyncIterator[bytes]]:
+        """
+        Encrypt an async byte stream into a chunked envelope, one chunk in memory at a time.
+        The stream's state cannot move between processes, so chunks are sealed on the
+        default thread executor rather than in the crypto pool.
+
+        Args:
+            chunks: Plaintext bytes, in pieces of any size
+            public_keys: Dict of principal ID -> public key
+            chunk_size: Plaintext bytes per chunk. Defaults to the service's chunk size.
+
+        Returns:
+            Tuple of (dict of principal ID -> base64 wrapped key, iterator of envelope bytes),
+            e.g. for blob_store.put_stream
+        """
+        encryptor = await asyncio.to_thread(encryption_service.stream_encryptor, public_keys, chunk_size)
+
+        async def envelope() -> AsyncIterator[bytes]:
+            async for data in chunks:
+                out = await asyncio.to_thread(encryptor.update, data)
+                if out:
+                    yield out
+            yield await asyncio.to_thread(encryptor.finalize)
+
+        encrypted_keys = {
+            principal_id: base64.b64encode(wrapped).decode('utf-8')
+            for principal_id, wrapped in encryptor.wrapped_keys.items()
+        }
+        return encrypted_keys, envelope()
+
+    async def decrypt_iter(
+        self, chunks: AsyncIterable[bytes], encrypted_key: Optional[str], private_key: str
+    ) -> AsyncIterator[bytes]:
+        """
+        Decrypt a chunked envelope from an async byte stream, one chunk in memory at a time.
+        Each chunk is verified before it is yielded; if iteration raises, the plaintext
+        already yielded must be discarded.
+
+        Args:
+            chunks: Envelope bytes, in pieces of any size
+            encrypted_key: Encrypted AES key (base64), or None if the envelope has a single key
+            private_key: Private key as PEM string
+        """
+        # Importing the private key on a key cache miss is CPU work too, so keep it off the loop
+        decryptor = await asyncio.to_thread(encryption_service.stream_decryptor, encrypted_key, private_key)
+        async for data in chunks:
+            out = await asyncio.to_thread(decryptor.update, data)
+            if out:
+                yield out
+        out = await asyncio.to_thread(decryptor.finalize)
+        if out:
+            yield out
+
+    def invalidate_keys(self, fingerprints: Iterable[str]):
+        """
+        Drop rotated keys from the key caches of this process and of the pool processes.
+        Pool processes apply the revocation on their next call.
+
+        Args:
+            fingerprints: Fingerprints of the PEM keys to drop
+        """
+        fingerprints = list(fingerprints)
+        encryption_service.invalidate_keys(fingerprints)
+        if self.pool_type == "process":
+            for key_id in fingerprints:
+                self._revocation_seq += 1
+                self._revocations.append((self._revocation_seq, key_id))
+
+    def key_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get key cache counters summed over the pool processes, with the overall hit rate.
+        """
+        totals = {"size": 0, "hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        for counters in self._key_cache_counters.values():
+            for key in totals:
+                totals[key] += counters.get(key, 0)
+        totals["processes"] = len(self._key_cache_counters)
+        totals["hit_rate"] = hit_rate(totals)
+        return totals
+
+    def compression_stats(self) -> Dict[str, Any]:
+        """
+        Get compression counters summed over the pool processes, with the overall ratio.
+        """
+        totals = dict.fromkeys(encryption_service.compression_counters(), 0)
+        for counters in self._compression_counters.values():
+            for key in totals:
+                totals[key] += counters.get(key, 0)
+        totals["algorithm"] = encryption_service.compression.algorithm
+        totals["ratio"] = compression_ratio(totals)
+        return totals
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get pool configuration and queue counters.
+        """
+        return {
+            "pool_type": self.pool_type,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "max_waiting": self.max_waiting,
+            "pending": self.pending,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "parallel_wraps": self.parallel_wraps,
+        }
+
+    def shutdown(self):
+        """
+        Shut down the worker pool.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Create a singleton instance
+async_encryption_service = AsyncEncryptionService()
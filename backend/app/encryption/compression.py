@@ -0,0 +1,152 @@
+"""
+Compression of plaintext before it is encrypted.
+
+Ciphertext does not compress, so JSON payloads and deliverables are compressed
+first when ENCRYPTION_COMPRESSION selects an algorithm. The algorithm is recorded
+in the (authenticated) envelope header, so data is always readable whatever the
+current setting. zstd needs the optional zstandard package.
+"""
+import io
+import os
+import time
+import threading
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+from app.encryption.envelope import EnvelopeError
+
+# Algorithm IDs stored in the envelope header
+NONE = 0
+ZLIB = 1
+ZSTD = 2
+
+ALGORITHMS = {"none": NONE, "zlib": ZLIB, "zstd": ZSTD}
+DEFAULT_LEVELS = {ZLIB: 6, ZSTD: 3}
+
+
+class Compression:
+    """
+    Compresses plaintext with the configured algorithm and decompresses any supported one.
+    Data shorter than `min_size`, or that does not shrink, is stored uncompressed.
+    Decompressed data is capped at `max_size` bytes, so a crafted envelope cannot
+    expand without bound.
+    """
+
+    def __init__(self, algorithm: str = None, level: int = None, min_size: int = None, max_size: int = None):
+        """
+        Args:
+            algorithm: "none", "zlib" or "zstd". Defaults to ENCRYPTION_COMPRESSION or "none".
+            level: Compression level. Defaults to ENCRYPTION_COMPRESSION_LEVEL or the
+                algorithm's default (zlib 6, zstd 3).
+            min_size: Smallest plaintext worth compressing. Defaults to
+                ENCRYPTION_COMPRESSION_MIN_SIZE or 256 bytes.
+            max_size: Largest decompressed size accepted. Defaults to
+                ENCRYPTION_MAX_DECOMPRESSED_SIZE or 256 MiB.
+        """
+        self.algorithm = algorithm or os.getenv("ENCRYPTION_COMPRESSION", "none")
+        if self.algorithm not in ALGORITHMS:
+            raise ValueError(f"Unsupported compression algorithm: {self.algorithm}")
+        self.algorithm_id = ALGORITHMS[self.algorithm]
+        if self.algorithm_id == ZSTD and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        self.level = level or int(os.getenv("ENCRYPTION_COMPRESSION_LEVEL", "0")) or DEFAULT_LEVELS.get(self.algorithm_id)
+        self.min_size = min_size if min_size is not None else int(os.getenv("ENCRYPTION_COMPRESSION_MIN_SIZE", "256"))
+        self.max_size = max_size or int(os.getenv("ENCRYPTION_MAX_DECOMPRESSED_SIZE", str(256 * 1024 * 1024)))
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_seconds = 0.0
+        self.decompressed = 0
+        self.decompress_seconds = 0.0
+
+    def compress(self, data: bytes) -> Tuple[int, bytes]:
+        """
+        Compress plaintext with the configured algorithm.
+
+        Returns:
+            Tuple of (algorithm ID, data); the ID is NONE if the data was left as is
+        """
+        if self.algorithm_id == NONE:
+            return NONE, data
+        if len(data) < self.min_size:
+            with self._lock:
+                self.skipped += 1
+            return NONE, data
+
+        start = time.perf_counter()
+        if self.algorithm_id == ZLIB:
+            compressed = zlib.compress(data, self.level)
+        else:
+            compressed = zstandard.ZstdCompressor(level=self.level).compress(data)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.compress_seconds += elapsed
+            if len(compressed) >= len(data):
+                self.skipped += 1
+                return NONE, data
+            self.compressed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(compressed)
+        return self.algorithm_id, compressed
+
+    def decompress(self, algorithm_id: int, data: bytes) -> bytes:
+        """
+        Decompress data compressed with any supported algorithm.
+
+        Raises:
+            EnvelopeError: If the algorithm is unknown or unavailable, or the data is
+                malformed or decompresses beyond max_size
+        """
+        start = time.perf_counter()
+        try:
+            if algorithm_id == ZLIB:
+                decompressor = zlib.decompressobj()
+                plaintext = decompressor.decompress(data, self.max_size + 1)
+                if not decompressor.eof:
+                    raise EnvelopeError("Compressed data is truncated or exceeds the size limit")
+            elif algorithm_id == ZSTD:
+                if zstandard is None:
+                    raise EnvelopeError("zstd compressed data needs the zstandard package")
+                with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+                    plaintext = reader.read(self.max_size + 1)
+            else:
+                raise EnvelopeError(f"Unsupported compression algorithm: {algorithm_id}")
+        except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+            raise EnvelopeError(f"Malformed compressed data: {e}")
+        if len(plaintext) > self.max_size:
+            raise EnvelopeError("Decompressed data exceeds the size limit")
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.decompressed += 1
+            self.decompress_seconds += elapsed
+        return plaintext
+
+    def counters(self) -> Dict[str, Any]:
+        """
+        Get the raw counters, which can be summed across processes.
+        """
+        return {
+            "compressed": self.compressed,
+            "skipped": self.skipped,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "compress_seconds": self.compress_seconds,
+            "decompressed": self.decompressed,
+            "decompress_seconds": self.decompress_seconds,
+        }
+
+
+def compression_ratio(counters: Dict[str, Any]) -> Optional[float]:
+    """
+    Get compressed size over original size of the data that was compressed.
+    """
+    return counters["bytes_out"] / counters["bytes_in"] if counters["bytes_in"] else None
@@ -1,32 +1,79 @@
 import logging
-from typing import Optional, List, Dict
+from collections import OrderedDict
+from typing import Any, Optional, List, Dict
 from uuid import UUID
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.db.models.agent import Agent
+from app.db.services.task_key_grant_service import task_key_grant_service
 from app.encryption.service import encryption_service
+from app.encryption.async_service import async_encryption_service, CryptoPoolBusyError
+from app.encryption.key_cache import fingerprint
+from app.encryption.key_pool import key_pool
+from app.encryption.key_wrap import get_scheme
+from app.events.invalidation import invalidation_channel
 
 logger = logging.getLogger(__name__)
 
 class KeyManagementService:
     """
     Service for managing encryption keys in the database.
+    Agent public keys are cached per process; rotations are broadcast over the
+    invalidation channel so every API worker drops its cached copy, along with the
+    imported key objects the encryption key caches hold for the old key pair.
     """
     
-    async def generate_keys_for_agent(self, db: AsyncSession, agent_id: UUID) -> bool:
+    def __init__(self, cache_size: int = 4096):
+        self.cache_size = cache_size
+        self._public_keys: OrderedDict = OrderedDict()
+    
+    def _cache_public_key(self, agent_id: str, public_key: str):
+        self._public_keys[agent_id] = public_key
+        self._public_keys.move_to_end(agent_id)
+        if len(self._public_keys) > self.cache_size:
+            self._public_keys.popitem(last=False)
+    
+    def invalidate_public_key(self, payload: Dict[str, Any]):
+        """
+        Drop an agent's cached public and private keys and the cached key objects of its old key pair.
+        """
+        self._public_keys.pop(payload.get("agent_id"), None)
+        if encryption_service.keystore and payload.get("agent_id"):
+            encryption_service.keystore.invalidate(payload["agent_id"])
+        fingerprints = payload.get("fingerprints")
+        if fingerprints:
+            async_encryption_service.invalidate_keys(fingerprints)
+    
+    def clear_cache(self):
+        """
+        Drop all cached public and private keys.
+        """
+        self._public_keys.clear()
+        if encryption_service.keystore:
+            encryption_service.keystore.clear_cache()
+    
+
+    async def generate_keys_for_agent(self, db: AsyncSession, agent_id: UUID, scheme: str = None) -> bool:
         """
         Generate a new key pair for an agent and store the public key in the database.
         The private key is stored securely in the key storage directory.
+        The scheme is recorded in the key itself, so later wraps for the agent use it.
         
         Args:
             db: Database session
             agent_id: ID of the agent
+            scheme: Key-wrap scheme, "rsa" or "x25519". Defaults to KEY_WRAP_SCHEME or "rsa".
             
         Returns:
             True if successful, False otherwise
+
+        Raises:
+            CryptoPoolBusyError: If the crypto pool is saturated
+            ValueError: If the scheme is unknown
         """
+        scheme = get_scheme(scheme).name
         try:
             # Get the agent
             agent = await db.get(Agent, agent_id)
@@ -34,21 +81,32 @@ class KeyManagementService:
                 logger.error(f"Agent {agent_id} not found")
                 return False
             
-            # Generate a new key pair
-            public_key, private_key = encryption_service.generate_key_pair()
+            # Take a pre-generated key pair, or generate one off the event loop
+            public_key, private_key = await key_pool.generate_key_pair(scheme)
             
-            # Store the public key in the database
-            agent.public_key = public_key
-            db.add(agent)
-            await db.commit()
+            # The old key pair is being rotated out of the key caches
+            old_keys = [agent.public_key, encryption_service.retrieve_private_key(agent_id)]
+            fingerprints = [fingerprint(key) for key in old_keys if key]
             
-            # Store the private key securely
+            # Store the private key securely first: once the invalidation is published,
+            # other workers reload the agent's private key and must find the new one
             success = encryption_service.store_private_key(agent_id, private_key)
             if not success:
                 logger.error(f"Failed to store private key for agent {agent_id}")
+                await db.rollback()
                 return False
             
+            # Store the public key in the database; the agent's key grants were wrapped
+            # for the old public key, so they go in the same transaction
+            agent.public_key = public_key
+            db.add(agent)
+            await task_key_grant_service.delete_by_agent(db, agent_id)
+            await db.commit()
+            await invalidation_channel.publish("public_key", {"agent_id": str(agent_id), "fingerprints": fingerprints})
+            
             return True
+        except CryptoPoolBusyError:
+            raise
         except Exception as e:
             logger.error(f"Error generating keys for agent {agent_id}: {e}")
             await db.rollback()
@@ -65,12 +123,19 @@ class KeyManagementService:
         Returns:
             Public key as PEM string or None if not found
         """
+        cached = self._public_keys.get(str(agent_id))
+        if cached is not None:
+            self._public_keys.move_to_end(str(agent_id))
+            return cached
+        
         try:
             agent = await db.get(Agent, agent_id)
             if not agent:
                 logger.error(f"Agent {agent_id} not found")
                 return None
             
+            if agent.public_key:
+                self._cache_public_key(str(agent_id), agent.public_key)
             return agent.public_key
         except Exception as e:
             logger.error(f"Error getting public key for agent {agent_id}: {e}")
@@ -101,16 +166,33 @@ class KeyManagementService:
         """
         try:
             result = {}
+            missing = []
             for judge_id in judge_ids:
-                public_key = await self.get_agent_public_key(db, judge_id)
-                if public_key:
+                public_key = self._public_keys.get(str(judge_id))
+                if public_key is not None:
                     result[str(judge_id)] = public_key
+                else:
+                    missing.append(judge_id)
             
-            return result
+            # Fetch uncached keys in a single query
+            if missing:
+                rows = await db.execute(select(Agent.id, Agent.public_key).where(Agent.id.in_(missing)))
+                for agent_id, public_key in rows.all():
+                    if public_key:
+                        self._cache_public_key(str(agent_id), public_key)
+                        result[str(agent_id)] = public_key
+            
+            # Keep the caller's judge order
+            return {str(judge_id): result[str(judge_id)] for judge_id in judge_ids if str(judge_id) in result}
         except Exception as e:
             logger.error(f"Error getting public keys for judges: {e}")
             return {}
 
 
 # Create a singleton instance
-key_management_service = KeyManagementService()
\ No newline at end of file
+key_management_service = KeyManagementService()
+
+# Drop cached public keys rotated in any worker
+invalidation_channel.subscribe(
+    "public_key", key_management_service.invalidate_public_key, reset=key_management_service.clear_cache
+)
\ No newline at end of file
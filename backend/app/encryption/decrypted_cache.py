@@ -0,0 +1,179 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+import orjson
+
+from app.storage.blob_store import is_blob_ref, parse_blob_ref
+
+logger = logging.getLogger(__name__)
+
+# (object ID, principal ID, ciphertext hash)
+CacheKey = Tuple[str, str, str]
+
+
+def ciphertext_hash(stored: Union[str, bytes]) -> str:
+    """
+    Get the SHA-256 of stored ciphertext. Blob references already carry it,
+    so the blob itself is not read.
+    """
+    if isinstance(stored, str):
+        if is_blob_ref(stored):
+            return parse_blob_ref(stored)
+        stored = stored.encode('utf-8')
+    return hashlib.sha256(stored).hexdigest()
+
+
+class DecryptedCache:
+    """
+    Bounded cache of decrypted task payloads and deliverables.
+    Re-reading an object a principal already decrypted skips the key unwrap, the AES
+    decryption and the JSON parse. Entries are keyed by (object ID, principal ID,
+    ciphertext hash), so re-encrypted content is never served stale, and they expire
+    after `ttl` seconds. The least recently used entries are evicted beyond
+    `max_entries` or `max_bytes` of serialized plaintext.
+
+    Callers must check the principal's access before consulting the cache, and must
+    not mutate the returned objects, which are shared between hits.
+    Deployments that must not keep plaintext in memory disable the cache.
+    """
+
+    def __init__(self, enabled: bool = None, ttl: float = None, max_entries: int = None, max_bytes: int = None):
+        """
+        Initialize the cache.
+
+        Args:
+            enabled: Whether to cache at all. Defaults to DECRYPTED_CACHE_ENABLED or true.
+            ttl: Seconds an entry stays valid. Defaults to DECRYPTED_CACHE_TTL or 300.
+            max_entries: Maximum entries. Defaults to DECRYPTED_CACHE_MAX_ENTRIES or 10000.
+            max_bytes: Maximum serialized plaintext held. Defaults to DECRYPTED_CACHE_MAX_BYTES or 64 MiB.
+        """
+        self.enabled = enabled if enabled is not None else os.getenv("DECRYPTED_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl = ttl or float(os.getenv("DECRYPTED_CACHE_TTL", "300"))
+        self.max_entries = max_entries or int(os.getenv("DECRYPTED_CACHE_MAX_ENTRIES", "10000"))
+        self.max_bytes = max_bytes or int(os.getenv("DECRYPTED_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        # Key -> (expiry, size, value), in least recently used order
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.oversized = 0
+
+    @staticmethod
+    def key(object_id: Any, principal_id: Any, stored: Union[str, bytes]) -> CacheKey:
+        return str(object_id), str(principal_id), ciphertext_hash(stored)
+
+    def _drop(self, key: CacheKey):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        """
+        Get a cached decrypted value, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: CacheKey, value: Any):
+        """
+        Cache a decrypted value, evicting the least recently used entries over the limits.
+        """
+        if not self.enabled:
+            return
+        size = len(orjson.dumps(value))
+        if size > self.max_bytes:
+            self.oversized += 1
+            return
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (now + self.ttl, size, value)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest, (expiry, _, _) = next(iter(self._entries.items()))
+                self._drop(oldest)
+                if expiry <= now:
+                    self.expirations += 1
+                else:
+                    self.evictions += 1
+
+    async def get_or_decrypt(
+        self, object_id: Any, principal_id: Any, stored: Union[str, bytes], decrypt: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Get a decrypted value from the cache, or decrypt and cache it.
+
+        Args:
+            object_id: ID of the task or deliverable
+            principal_id: ID of the agent the value was decrypted for
+            stored: The stored ciphertext or its blob reference
+            decrypt: Called on a miss to decrypt the value
+        """
+        if not self.enabled:
+            return await decrypt()
+        key = self.key(object_id, principal_id, stored)
+        value = self.get(key)
+        if value is None:
+            value = await decrypt()
+            self.put(key, value)
+        return value
+
+    def invalidate_object(self, object_id: Any):
+        """
+        Drop every principal's entries for an object, e.g. when it is deleted.
+        """
+        object_id = str(object_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == object_id]:
+                self._drop(key)
+
+    def clear(self):
+        """
+        Drop all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache size, hit and eviction counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "oversized": self.oversized,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Create a singleton instance
+decrypted_cache = DecryptedCache()
@@ -0,0 +1,163 @@
+"""
+Binary envelope format for encrypted payloads and deliverables.
+
+Layout (integers are big-endian):
+
+    magic        4 bytes   b"\\x89XAE"
+    version      1 byte    1
+    flags        1 byte    FLAG_* bits
+    nonce        12 bytes  AES-GCM nonce
+    key count    2 bytes
+    per key:
+        id length       2 bytes
+        id              UTF-8 principal ID
+        wrapped length  2 bytes
+        wrapped key     RSA-OAEP wrapped AES-256 key
+    chunk size   4 bytes   only with FLAG_CHUNKED
+    compression  1 byte    only with FLAG_COMPRESSED; algorithm ID (see
+                           app.encryption.compression)
+    ciphertext   rest      AES-GCM ciphertext followed by the 16-byte tag, or
+                           with FLAG_CHUNKED a sequence of such chunks (see
+                           app.encryption.stream); with FLAG_COMPRESSED the
+                           plaintext is compressed
+
+The header (everything before the ciphertext) is authenticated as associated
+data, so the key table and flags cannot be altered without failing decryption.
+The leading 0x89 byte can never start the legacy format, which is base64 text.
+"""
+import struct
+from typing import Dict, NamedTuple, Optional, Union
+
+MAGIC = b"\x89XAE"
+VERSION = 1
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+# The ciphertext is split into independently authenticated chunks
+FLAG_CHUNKED = 0x01
+# The plaintext was compressed before encryption
+FLAG_COMPRESSED = 0x02
+
+_PREFIX = struct.Struct(">4sBB12sH")
+_LENGTH = struct.Struct(">H")
+_CHUNK_SIZE = struct.Struct(">I")
+_COMPRESSION = struct.Struct(">B")
+
+
+class EnvelopeError(ValueError):
+    """Raised when data is not a well-formed envelope"""
+    pass
+
+
+class EnvelopeTruncatedError(EnvelopeError):
+    """Raised when the data ends before the envelope header does"""
+    pass
+
+
+class EnvelopeHeader(NamedTuple):
+    flags: int
+    nonce: bytes
+    wrapped_keys: Dict[str, bytes]
+    length: int  # Header size in bytes; the header is the associated data
+    chunk_size: Optional[int] = None
+    compression: int = 0  # Compression algorithm ID, 0 if uncompressed
+
+
+def is_envelope(data: Union[bytes, str]) -> bool:
+    """
+    Check whether data is a binary envelope rather than the legacy base64 JSON format.
+    """
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:len(MAGIC)]) == MAGIC
+
+
+def pack_header(nonce: bytes, wrapped_keys: Dict[str, bytes], flags: int = 0, chunk_size: int = None,
+                compression: int = 0) -> bytes:
+    """
+    Build an envelope header.
+
+    Args:
+        nonce: AES-GCM nonce
+        wrapped_keys: Dict of principal ID -> wrapped data key
+        flags: Header flags
+        chunk_size: Plaintext bytes per chunk, required with FLAG_CHUNKED
+        compression: Compression algorithm ID; sets FLAG_COMPRESSED if not 0
+
+    Returns:
+        Header bytes, which are also the AES-GCM associated data
+    """
+    if len(nonce) != NONCE_SIZE:
+        raise EnvelopeError(f"Nonce must be {NONCE_SIZE} bytes")
+    if compression:
+        flags |= FLAG_COMPRESSED
+    parts = [_PREFIX.pack(MAGIC, VERSION, flags, nonce, len(wrapped_keys))]
+    for principal_id, wrapped in wrapped_keys.items():
+        encoded_id = principal_id.encode('utf-8')
+        parts.append(_LENGTH.pack(len(encoded_id)))
+        parts.append(encoded_id)
+        parts.append(_LENGTH.pack(len(wrapped)))
+        parts.append(wrapped)
+    if flags & FLAG_CHUNKED:
+        if not chunk_size:
+            raise EnvelopeError("Chunked envelopes need a chunk size")
+        parts.append(_CHUNK_SIZE.pack(chunk_size))
+    if flags & FLAG_COMPRESSED:
+        if not compression:
+            raise EnvelopeError("Compressed envelopes need a compression algorithm")
+        parts.append(_COMPRESSION.pack(compression))
+    return b"".join(parts)
+
+
+def unpack_header(data: bytes) -> EnvelopeHeader:
+    """
+    Parse an envelope header.
+
+    Args:
+        data: The envelope, or at least its header and first tag
+
+    Returns:
+        The parsed header
+
+    Raises:
+        EnvelopeTruncatedError: If the data ends before the header and first tag do
+        EnvelopeError: If the data is not a well-formed envelope
+    """
+    view = memoryview(data)
+    if len(view) < _PREFIX.size:
+        raise EnvelopeTruncatedError("Envelope is truncated")
+    magic, version, flags, nonce, key_count = _PREFIX.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise EnvelopeError("Not an encrypted envelope")
+    if version != VERSION:
+        raise EnvelopeError(f"Unsupported envelope version: {version}")
+
+    offset = _PREFIX.size
+    wrapped_keys = {}
+    try:
+        for _ in range(key_count):
+            (id_length,) = _LENGTH.unpack_from(view, offset)
+            offset += _LENGTH.size
+            principal_id = bytes(view[offset:offset + id_length]).decode('utf-8')
+            offset += id_length
+            (wrapped_length,) = _LENGTH.unpack_from(view, offset)
+            offset += _LENGTH.size
+            wrapped_keys[principal_id] = bytes(view[offset:offset + wrapped_length])
+            offset += wrapped_length
+        chunk_size = None
+        if flags & FLAG_CHUNKED:
+            (chunk_size,) = _CHUNK_SIZE.unpack_from(view, offset)
+            offset += _CHUNK_SIZE.size
+        compression = 0
+        if flags & FLAG_COMPRESSED:
+            (compression,) = _COMPRESSION.unpack_from(view, offset)
+            offset += _COMPRESSION.size
+    except struct.error:
+        raise EnvelopeTruncatedError("Envelope is truncated")
+    except UnicodeDecodeError as e:
+        raise EnvelopeError(f"Malformed envelope key table: {e}")
+    if offset > len(view) or len(view) - offset < TAG_SIZE:
+        raise EnvelopeTruncatedError("Envelope is truncated")
+    if flags & FLAG_CHUNKED and not chunk_size:
+        raise EnvelopeError("Chunked envelope has no chunk size")
+    if flags & FLAG_COMPRESSED and not compression:
+        raise EnvelopeError("Compressed envelope has no compression algorithm")
+    return EnvelopeHeader(flags, nonce, wrapped_keys, offset, chunk_size, compression)
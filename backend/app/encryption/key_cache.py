@@ -0,0 +1,107 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Tuple
+
+from app.encryption.key_wrap import scheme_of
+
+
+def fingerprint(pem: str) -> str:
+    """
+    Get the cache fingerprint of a PEM key: the SHA-256 of its text.
+    """
+    return hashlib.sha256(pem.encode('utf-8')).hexdigest()
+
+
+class KeyCache:
+    """
+    Bounded LRU cache of imported keys and their key-wrap ciphers, keyed by fingerprint.
+
+    `RSA.import_key` parses and validates the key on every call, which costs more than
+    the OAEP operation itself for small payloads. Cipher objects (PKCS1_OAEP or NaCl
+    SealedBox, see app.encryption.key_wrap) hold no per-message state, so one instance
+    per key is reused across calls and threads.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, pem: str) -> Tuple[Any, Any]:
+        """
+        Get the imported key and cipher for a PEM key, importing it on a miss.
+
+        Returns:
+            Tuple of (key, cipher with encrypt and decrypt methods)
+        """
+        key_id = fingerprint(pem)
+        with self._lock:
+            entry = self._entries.get(key_id)
+            if entry is not None:
+                self._entries.move_to_end(key_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Import outside the lock; a concurrent miss on the same key imports it twice
+        entry = scheme_of(pem).load(pem)
+        with self._lock:
+            self._entries[key_id] = entry
+            self._entries.move_to_end(key_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def cipher(self, pem: str) -> Any:
+        """
+        Get the key-wrap cipher for a PEM key.
+        """
+        return self.get(pem)[1]
+
+    def invalidate(self, fingerprints: Iterable[str]):
+        """
+        Drop the entries for the given key fingerprints.
+        """
+        with self._lock:
+            for key_id in fingerprints:
+                if self._entries.pop(key_id, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        """
+        Drop all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def counters(self) -> Dict[str, int]:
+        """
+        Get the raw counters, which can be summed across processes.
+        """
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters and the hit rate.
+        """
+        stats = self.counters()
+        stats["max_size"] = self.max_size
+        stats["hit_rate"] = hit_rate(stats)
+        return stats
+
+
+def hit_rate(counters: Dict[str, int]) -> float:
+    lookups = counters["hits"] + counters["misses"]
+    return counters["hits"] / lookups if lookups else 0.0
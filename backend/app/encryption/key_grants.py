@@ -0,0 +1,178 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import AsyncSessionLocal
+from app.db.services.task_service import task_service
+from app.db.services.task_key_grant_service import task_key_grant_service
+from app.encryption.async_service import CryptoPoolBusyError
+from app.encryption.db_service import key_management_service
+from app.encryption.rewrap import key_rewrap_service
+
+logger = logging.getLogger(__name__)
+
+
+class KeyGrantIssuer:
+    """
+    Issues task key grants to staking agents in the background.
+    Recording a stake queues a grant; a worker unwraps the task's data key with the
+    private key of one of its judges (see app.encryption.rewrap), wraps it for the
+    agent's public key and stores it in task_key_grants. From then on the agent's
+    wrapped key is a single indexed lookup, and agents holding their private key can
+    decrypt the payload themselves.
+    """
+
+    def __init__(self, workers: int = None, max_queued: int = None, retry_delay: float = 1.0, max_attempts: int = 3):
+        """
+        Initialize the issuer.
+
+        Args:
+            workers: Grants issued at once. Defaults to KEY_GRANT_WORKERS or 2.
+            max_queued: Grants waiting to be issued before new ones are dropped.
+                Defaults to KEY_GRANT_QUEUE_SIZE or 1000.
+            retry_delay: Seconds to wait before retrying a grant the crypto pool was too busy for
+            max_attempts: Attempts per grant while the crypto pool is busy
+        """
+        self.workers = workers or int(os.getenv("KEY_GRANT_WORKERS", "2"))
+        self.max_queued = max_queued or int(os.getenv("KEY_GRANT_QUEUE_SIZE", "1000"))
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # (task ID, agent ID) of queued grants, so a repeated stake does not queue twice
+        self._pending: Set[Tuple[str, str]] = set()
+        self.issued = 0
+        self.failures = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        """
+        Start the background workers.
+        """
+        if self.running:
+            return
+        self._queue = asyncio.Queue(self.max_queued)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info(f"Started key grant issuer with {self.workers} workers")
+
+    async def stop(self):
+        """
+        Stop the workers, dropping grants not issued yet.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._pending.clear()
+
+    async def join(self):
+        """
+        Wait until every queued grant was issued or failed.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    def schedule(self, task_id: UUID, agent_id: UUID) -> bool:
+        """
+        Queue a grant of a task's data key to an agent.
+
+        Returns:
+            False if the grant was dropped because the issuer is stopped or its queue is full
+        """
+        key = (str(task_id), str(agent_id))
+        if key in self._pending:
+            return True
+        if not self.running:
+            self.dropped += 1
+            logger.warning(f"Key grant issuer is not running; no grant for agent {agent_id} on task {task_id}")
+            return False
+        try:
+            self._queue.put_nowait((task_id, agent_id, 1))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Key grant queue is full; no grant for agent {agent_id} on task {task_id}")
+            return False
+        self._pending.add(key)
+        return True
+
+    async def issue(self, db: AsyncSession, task_id: UUID, agent_id: UUID) -> str:
+        """
+        Grant a task's data key to an agent now, unless it already has a grant.
+
+        Returns:
+            The agent's base64 wrapped key
+
+        Raises:
+            ValueError: If the task or the agent's public key does not exist
+            RewrapError: If no judge's private key can unwrap the data key
+            CryptoPoolBusyError: If the crypto pool is saturated
+        """
+        wrapped_key = await task_key_grant_service.get_wrapped_key(db, task_id, agent_id)
+        if wrapped_key is not None:
+            return wrapped_key
+
+        task = await task_service.get(db, task_id)
+        if not task:
+            raise ValueError(f"Task {task_id} not found")
+        public_key = await key_management_service.get_agent_public_key(db, agent_id)
+        if not public_key:
+            raise ValueError(f"Agent {agent_id} has no public key")
+
+        principal_id = str(agent_id)
+        key_map = await key_rewrap_service.rewrap_key_map(key_rewrap_service.task_key_map(task), {principal_id: public_key})
+        wrapped_key = await task_key_grant_service.put(db, task_id, agent_id, key_map[principal_id])
+        self.issued += 1
+        return wrapped_key
+
+    async def _work(self):
+        while True:
+            task_id, agent_id, attempt = await self._queue.get()
+            key = (str(task_id), str(agent_id))
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.issue(db, task_id, agent_id)
+                self._pending.discard(key)
+            except CryptoPoolBusyError as e:
+                if attempt < self.max_attempts:
+                    # Back off rather than compete with requests, then go to the back of the queue
+                    await asyncio.sleep(self.retry_delay)
+                    try:
+                        self._queue.put_nowait((task_id, agent_id, attempt + 1))
+                        continue
+                    except asyncio.QueueFull:
+                        pass
+                self._fail(key, e)
+            except Exception as e:
+                self._fail(key, e)
+            finally:
+                self._queue.task_done()
+
+    def _fail(self, key: Tuple[str, str], error: Exception):
+        self.failures += 1
+        self._pending.discard(key)
+        logger.error(f"Error granting task {key[0]} key to agent {key[1]}: {error}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue and grant counters.
+        """
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "issued": self.issued,
+            "failures": self.failures,
+            "dropped": self.dropped,
+        }
+
+
+# Create a singleton instance
+key_grant_issuer = KeyGrantIssuer()
@@ -0,0 +1,147 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.encryption.async_service import async_encryption_service
+from app.encryption.service import encryption_service
+
+logger = logging.getLogger(__name__)
+
+
+class KeyPool:
+    """
+    Pool of pre-generated RSA key pairs.
+    RSA key generation takes tens to hundreds of milliseconds, so a background refill
+    task keeps up to `size` key pairs ready, generating them in the crypto pool's worker
+    processes. Taking a key pair from the pool is a deque pop; when the pool is empty,
+    callers fall back to generating one on demand.
+    Key pairs are held in process memory only and are never reused once handed out.
+    The pool holds RSA key pairs; X25519 key pairs take microseconds and are generated inline.
+    """
+
+    def __init__(self, size: int = None, key_size: int = None, refill_concurrency: int = None, retry_delay: float = 5.0):
+        """
+        Initialize the key pool.
+
+        Args:
+            size: Key pairs to keep ready; 0 disables the pool. Defaults to KEY_POOL_SIZE or 16.
+            key_size: RSA key size in bits. Defaults to KEY_POOL_KEY_SIZE or 2048.
+            refill_concurrency: Key pairs generated at once while refilling, bounding how much
+                of the crypto pool the refill uses. Defaults to KEY_POOL_REFILL_CONCURRENCY or 2.
+            retry_delay: Seconds to wait after a failed refill before trying again
+        """
+        self.size = int(os.getenv("KEY_POOL_SIZE", "16")) if size is None else size
+        self.key_size = key_size or int(os.getenv("KEY_POOL_KEY_SIZE", "2048"))
+        self.refill_concurrency = refill_concurrency or int(os.getenv("KEY_POOL_REFILL_CONCURRENCY", "2"))
+        self.retry_delay = retry_delay
+        self._keys: deque = deque()
+        self._wanted: Optional[asyncio.Event] = None
+        self._filler: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._filler is not None
+
+    @property
+    def depth(self) -> int:
+        return len(self._keys)
+
+    async def start(self):
+        """
+        Start the background refill task.
+        """
+        if self.running or self.size <= 0:
+            return
+        self._wanted = asyncio.Event()
+        self._wanted.set()
+        self._filler = asyncio.create_task(self._refill())
+        logger.info(f"Started key pool with {self.size} key pairs")
+
+    async def stop(self):
+        """
+        Stop the refill task and drop the pre-generated key pairs.
+        """
+        if self._filler is not None:
+            self._filler.cancel()
+            await asyncio.gather(self._filler, return_exceptions=True)
+            self._filler = None
+        self._keys.clear()
+
+    async def _refill(self):
+        while True:
+            await self._wanted.wait()
+            self._wanted.clear()
+            while len(self._keys) < self.size:
+                batch = min(self.refill_concurrency, self.size - len(self._keys))
+                results: List[Any] = await asyncio.gather(
+                    *(async_encryption_service.generate_key_pair(self.key_size) for _ in range(batch)),
+                    return_exceptions=True,
+                )
+                errors = [result for result in results if isinstance(result, BaseException)]
+                for result in results:
+                    if not isinstance(result, BaseException):
+                        self._keys.append(result)
+                        self.generated += 1
+                if errors:
+                    # Typically a saturated crypto pool; back off rather than compete with requests
+                    self.failures += len(errors)
+                    logger.warning(f"Key pool refill failed: {errors[0]}")
+                    await asyncio.sleep(self.retry_delay)
+
+    def take(self) -> Optional[Tuple[str, str]]:
+        """
+        Take a pre-generated key pair, if one is ready, and schedule a refill.
+
+        Returns:
+            Tuple of (public_key, private_key) as PEM strings, or None if the pool is empty
+        """
+        try:
+            key_pair = self._keys.popleft()
+            self.hits += 1
+        except IndexError:
+            key_pair = None
+            self.misses += 1
+        if self._wanted is not None:
+            self._wanted.set()
+        return key_pair
+
+    async def generate_key_pair(self, scheme: str = "rsa") -> Tuple[str, str]:
+        """
+        Get a key pair from the pool, or generate one in the crypto pool if it is empty.
+
+        Args:
+            scheme: Key-wrap scheme; only RSA key pairs come from the pool
+
+        Raises:
+            CryptoPoolBusyError: If the pool is empty and the crypto pool is saturated
+        """
+        if scheme != "rsa":
+            return encryption_service.generate_key_pair(scheme=scheme)
+        key_pair = self.take()
+        if key_pair is None:
+            key_pair = await async_encryption_service.generate_key_pair(self.key_size)
+        return key_pair
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get pool depth and hit counters.
+        """
+        return {
+            "running": self.running,
+            "size": self.size,
+            "depth": len(self._keys),
+            "hits": self.hits,
+            "misses": self.misses,
+            "generated": self.generated,
+            "failures": self.failures,
+        }
+
+
+# Create a singleton instance
+key_pool = KeyPool()
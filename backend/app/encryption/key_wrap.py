@@ -0,0 +1,113 @@
+"""
+Key-wrap schemes for data keys.
+
+A scheme generates key pairs and builds the cipher that wraps (encrypts) and unwraps
+(decrypts) data keys with them. Keys are stored as PEM-style text, and the scheme is
+recognised from the key itself, so each agent can use its own scheme without a schema
+change:
+
+    rsa     RSA-OAEP with SHA-256; standard PEM keys
+    x25519  NaCl sealed boxes (X25519 + XSalsa20-Poly1305); the raw 32-byte key in
+            base64 between "X25519 PUBLIC KEY" or "X25519 PRIVATE KEY" PEM labels
+
+X25519 key generation and unwrapping take microseconds rather than the milliseconds
+RSA-2048 needs, and a wrapped key is 80 bytes instead of 256.
+"""
+import base64
+import os
+from typing import Any, Dict, Tuple
+
+from Crypto.PublicKey import RSA
+from Crypto.Cipher import PKCS1_OAEP
+from Crypto.Hash import SHA256
+from nacl.public import PrivateKey, PublicKey, SealedBox
+
+_X25519_PUBLIC_LABEL = "X25519 PUBLIC KEY"
+_X25519_PRIVATE_LABEL = "X25519 PRIVATE KEY"
+
+
+def _armor(label: str, raw: bytes) -> str:
+    return f"-----BEGIN {label}-----\n{base64.b64encode(raw).decode('ascii')}\n-----END {label}-----"
+
+
+def _dearmor(label: str, key: str) -> bytes:
+    lines = key.strip().splitlines()
+    if len(lines) < 3 or lines[0] != f"-----BEGIN {label}-----" or lines[-1] != f"-----END {label}-----":
+        raise ValueError(f"Not a {label}")
+    return base64.b64decode("".join(lines[1:-1]))
+
+
+class RSAScheme:
+    """RSA-OAEP key wrapping"""
+
+    name = "rsa"
+
+    def generate_key_pair(self, key_size: int = 2048) -> Tuple[str, str]:
+        key = RSA.generate(key_size)
+        return key.publickey().export_key().decode('utf-8'), key.export_key().decode('utf-8')
+
+    def load(self, key: str) -> Tuple[Any, Any]:
+        """
+        Import a PEM key.
+
+        Returns:
+            Tuple of (RSA key, PKCS1_OAEP cipher)
+        """
+        imported = RSA.import_key(key)
+        return imported, PKCS1_OAEP.new(imported, hashAlgo=SHA256)
+
+
+class X25519Scheme:
+    """NaCl sealed-box key wrapping"""
+
+    name = "x25519"
+
+    def generate_key_pair(self, key_size: int = None) -> Tuple[str, str]:
+        # X25519 keys have a fixed size; key_size is accepted for a uniform signature
+        key = PrivateKey.generate()
+        return (
+            _armor(_X25519_PUBLIC_LABEL, bytes(key.public_key)),
+            _armor(_X25519_PRIVATE_LABEL, bytes(key)),
+        )
+
+    def load(self, key: str) -> Tuple[Any, Any]:
+        """
+        Import a public or private X25519 key.
+
+        Returns:
+            Tuple of (NaCl key, SealedBox); a box built on a private key can also unwrap
+        """
+        if _X25519_PRIVATE_LABEL in key:
+            imported = PrivateKey(_dearmor(_X25519_PRIVATE_LABEL, key))
+        else:
+            imported = PublicKey(_dearmor(_X25519_PUBLIC_LABEL, key))
+        return imported, SealedBox(imported)
+
+
+SCHEMES: Dict[str, Any] = {scheme.name: scheme for scheme in (RSAScheme(), X25519Scheme())}
+
+# Scheme for newly generated agent keys unless one is requested
+DEFAULT_SCHEME = os.getenv("KEY_WRAP_SCHEME", "rsa")
+
+
+def get_scheme(name: str = None) -> Any:
+    """
+    Get a key-wrap scheme by name, or the default scheme.
+
+    Raises:
+        ValueError: If the scheme is unknown
+    """
+    name = name or DEFAULT_SCHEME
+    if name not in SCHEMES:
+        raise ValueError(f"Unsupported key-wrap scheme: {name}")
+    return SCHEMES[name]
+
+
+def scheme_of(key: str) -> Any:
+    """
+    Get the scheme of a stored key from its PEM label.
+    """
+    first_line = key.lstrip().split("\n", 1)[0]
+    if "X25519" in first_line:
+        return SCHEMES["x25519"]
+    return SCHEMES["rsa"]
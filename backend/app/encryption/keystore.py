@@ -0,0 +1,357 @@
+"""
+Private key storage backends.
+
+    sqlite  one indexed SQLite file (WAL mode) shared by every worker on the host
+    pem     one {agent_id}_private.pem file per agent, the original layout
+
+Both keep recently used keys in an in-memory LRU cache. A SQLite keystore can be
+given the old PEM directory, from which it imports keys it does not hold yet on
+first use; scripts/migrate_keystore.py imports the whole directory up front.
+"""
+import os
+import re
+import sqlite3
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PEM_SUFFIX = "_private.pem"
+
+
+class Keystore:
+    """
+    Base class for private key stores, with an LRU cache of hot keys.
+    Subclasses implement _load, _store and _delete.
+    """
+
+    def __init__(self, cache_size: int = 4096):
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load(self, agent_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def _store(self, agent_id: str, private_key: str):
+        raise NotImplementedError
+
+    def _delete(self, agent_id: str) -> bool:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def _cache_put(self, agent_id: str, private_key: str):
+        with self._cache_lock:
+            self._cache[agent_id] = private_key
+            self._cache.move_to_end(agent_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, agent_id: Any) -> Optional[str]:
+        """
+        Get an agent's private key.
+
+        Returns:
+            Private key as PEM string or None if not found
+        """
+        agent_id = str(agent_id)
+        with self._cache_lock:
+            private_key = self._cache.get(agent_id)
+            if private_key is not None:
+                self._cache.move_to_end(agent_id)
+                self.hits += 1
+                return private_key
+            self.misses += 1
+
+        private_key = self._load(agent_id)
+        if private_key is not None:
+            self._cache_put(agent_id, private_key)
+        return private_key
+
+    def put(self, agent_id: Any, private_key: str):
+        """
+        Store an agent's private key, replacing any previous one.
+        """
+        agent_id = str(agent_id)
+        self._store(agent_id, private_key)
+        self._cache_put(agent_id, private_key)
+
+    def delete(self, agent_id: Any) -> bool:
+        """
+        Delete an agent's private key.
+
+        Returns:
+            True if a key was deleted
+        """
+        self.invalidate(agent_id)
+        return self._delete(str(agent_id))
+
+    def invalidate(self, agent_id: Any):
+        """
+        Drop an agent's key from the cache, e.g. after another worker rotated it.
+        """
+        with self._cache_lock:
+            self._cache.pop(str(agent_id), None)
+
+    def clear_cache(self):
+        """
+        Drop all cached keys.
+        """
+        with self._cache_lock:
+            self._cache.clear()
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "cached": len(self._cache),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class PemDirectoryKeystore(Keystore):
+    """
+    One PEM file per agent, readable by the owner only.
+    """
+
+    backend = "pem"
+
+    def __init__(self, directory: str, cache_size: int = 4096):
+        super().__init__(cache_size)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, agent_id: str) -> str:
+        return os.path.join(self.directory, f"{agent_id}{PEM_SUFFIX}")
+
+    def _load(self, agent_id: str) -> Optional[str]:
+        try:
+            with open(self.path(agent_id), 'r') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _store(self, agent_id: str, private_key: str):
+        key_path = self.path(agent_id)
+        with open(key_path, 'w') as f:
+            f.write(private_key)
+        os.chmod(key_path, 0o600)  # Restrict permissions to owner only
+
+    def _delete(self, agent_id: str) -> bool:
+        try:
+            os.remove(self.path(agent_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def count(self) -> int:
+        return sum(1 for _ in iter_pem_directory(self.directory))
+
+
+class SQLiteKeystore(Keystore):
+    """
+    Private keys in a single SQLite file, indexed by agent ID.
+    The file is opened in WAL mode so several processes can read while one writes.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, cache_size: int = 4096, legacy_dir: str = None):
+        """
+        Args:
+            path: SQLite database file
+            cache_size: Keys kept in memory
+            legacy_dir: PEM directory to import missing keys from on first use
+        """
+        super().__init__(cache_size)
+        self.path = path
+        self.legacy_dir = legacy_dir
+        self.legacy_imports = 0
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # Opened lazily, and again in forked processes, which must not share a connection
+        if self._connection is None or self._connection_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS private_keys ("
+                "agent_id TEXT PRIMARY KEY, private_key TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            os.chmod(self.path, 0o600)  # Restrict permissions to owner only
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _load_stored(self, agent_id: str) -> Optional[str]:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT private_key FROM private_keys WHERE agent_id = ?", (agent_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _load(self, agent_id: str) -> Optional[str]:
+        private_key = self._load_stored(agent_id)
+        if private_key is None and self.legacy_dir:
+            private_key = self._import_legacy(agent_id)
+        return private_key
+
+    def _import_legacy(self, agent_id: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.legacy_dir, f"{agent_id}{PEM_SUFFIX}"), 'r') as f:
+                private_key = f.read()
+        except FileNotFoundError:
+            return None
+        # Never overwrite a key stored since the lookup, e.g. by a rotation
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO private_keys (agent_id, private_key, updated_at) VALUES (?, ?, ?)",
+                (agent_id, private_key, time.time()),
+            )
+        self.legacy_imports += 1
+        return self._load_stored(agent_id)
+
+    def _store(self, agent_id: str, private_key: str):
+        with self._lock:
+            self.connection.execute(
+                "INSERT INTO private_keys (agent_id, private_key, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(agent_id) DO UPDATE SET private_key = excluded.private_key, updated_at = excluded.updated_at",
+                (agent_id, private_key, time.time()),
+            )
+
+    def put_many(self, items: Iterator[Tuple[str, str]], overwrite: bool = False) -> int:
+        """
+        Store many keys in one transaction, without caching them.
+
+        Args:
+            items: (agent ID, private key) pairs
+            overwrite: Whether to replace keys already stored
+
+        Returns:
+            Number of keys written
+        """
+        verb = "INSERT OR REPLACE" if overwrite else "INSERT OR IGNORE"
+        now = time.time()
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN")
+            try:
+                before = connection.total_changes
+                connection.executemany(
+                    f"{verb} INTO private_keys (agent_id, private_key, updated_at) VALUES (?, ?, ?)",
+                    ((str(agent_id), private_key, now) for agent_id, private_key in items),
+                )
+                written = connection.total_changes - before
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return written
+
+    def _delete(self, agent_id: str) -> bool:
+        with self._lock:
+            cursor = self.connection.execute("DELETE FROM private_keys WHERE agent_id = ?", (agent_id,))
+        return cursor.rowcount > 0
+
+    def count(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM private_keys").fetchone()[0]
+
+    def close(self):
+        if self._connection is not None and self._connection_pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["legacy_imports"] = self.legacy_imports
+        return stats
+
+
+def iter_pem_directory(directory: str) -> Iterator[Tuple[str, str]]:
+    """
+    Iterate over the keys of a PEM keystore directory.
+
+    Yields:
+        (agent ID, file path) pairs
+    """
+    pattern = re.compile(rf"^(.+){re.escape(PEM_SUFFIX)}$")
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            match = pattern.match(entry.name)
+            if match and entry.is_file():
+                yield match.group(1), entry.path
+
+
+def migrate_pem_directory(directory: str, keystore: SQLiteKeystore, overwrite: bool = False,
+                          batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Import every key of a PEM keystore directory into a SQLite keystore.
+
+    Args:
+        directory: PEM keystore directory
+        keystore: Destination keystore
+        overwrite: Whether to replace keys the destination already holds
+        batch_size: Keys per transaction
+
+    Returns:
+        Counts of keys found and written
+    """
+    found = written = 0
+    batch = []
+    for agent_id, path in iter_pem_directory(directory):
+        with open(path, 'r') as f:
+            batch.append((agent_id, f.read()))
+        found += 1
+        if len(batch) >= batch_size:
+            written += keystore.put_many(batch, overwrite)
+            batch = []
+    if batch:
+        written += keystore.put_many(batch, overwrite)
+    return {"found": found, "written": written}
+
+
+def create_keystore(key_storage_dir: str, backend: str = None, cache_size: int = None) -> Keystore:
+    """
+    Create the keystore configured by the environment.
+
+    Args:
+        key_storage_dir: Directory of the keystore; the PEM directory, or the default
+            location of the SQLite file, which also imports keys left in it as PEM files
+        backend: "sqlite" or "pem". Defaults to KEYSTORE_BACKEND or "sqlite".
+        cache_size: Keys kept in memory. Defaults to KEYSTORE_CACHE_SIZE or 4096.
+    """
+    backend = backend or os.getenv("KEYSTORE_BACKEND", "sqlite")
+    cache_size = cache_size or int(os.getenv("KEYSTORE_CACHE_SIZE", "4096"))
+    if backend == "pem":
+        return PemDirectoryKeystore(key_storage_dir, cache_size)
+    if backend == "sqlite":
+        path = os.getenv("KEYSTORE_PATH") or os.path.join(key_storage_dir, "keystore.db")
+        return SQLiteKeystore(path, cache_size, legacy_dir=key_storage_dir)
+    raise ValueError(f"Unsupported keystore backend: {backend}")
@@ -0,0 +1,358 @@
+import os
+import base64
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.database import AsyncSessionLocal
+from app.db.models.agent import Agent, AgentType
+from app.db.models.task import Task, TaskStatus
+from app.db.services.deliverable_service import deliverable_service
+from app.encryption.async_service import async_encryption_service, CryptoPoolBusyError
+from app.encryption.db_service import key_management_service
+from app.encryption.decrypted_cache import decrypted_cache
+from app.encryption.envelope import is_envelope, unpack_header
+from app.events.invalidation import invalidation_channel
+from app.storage.blob_store import blob_store
+
+logger = logging.getLogger(__name__)
+
+# Tasks whose payload and deliverables judges may still need to read
+OPEN_STATUSES = (TaskStatus.CREATED, TaskStatus.STAKED, TaskStatus.IN_PROGRESS, TaskStatus.SUBMITTED)
+# Object IDs per cache invalidation message, well under the notification size limit
+INVALIDATION_BATCH = 100
+
+
+class RewrapError(Exception):
+    """Raised when none of the principals holding a data key can unwrap it here"""
+    pass
+
+
+class KeyRewrapService:
+    """
+    Service for changing who can read a task's payload and deliverables without
+    re-encrypting them.
+    Each object's data key is unwrapped once with the private key of a principal
+    already in its key map and wrapped for the judges missing from it; the key maps
+    are then updated in place. Wrapped keys of judges that stay are kept, and those
+    of removed judges are dropped.
+
+    The envelope header keeps the key table the data was encrypted with, since it is
+    authenticated; reads use the key maps, which hold the current judges' keys.
+    Removing a judge therefore does not revoke its access to the blob: a removed judge
+    that kept the ciphertext can still unwrap the data key from the header.
+    """
+
+    def __init__(self, concurrency: int = None, batch_size: int = None):
+        """
+        Args:
+            concurrency: Objects re-wrapped at once by a bulk job. Defaults to
+                REWRAP_CONCURRENCY or 8.
+            batch_size: Tasks a bulk job re-wraps and commits per database session.
+                Defaults to REWRAP_BATCH_SIZE or 50.
+        """
+        self.concurrency = concurrency or int(os.getenv("REWRAP_CONCURRENCY", "8"))
+        self.batch_size = batch_size or int(os.getenv("REWRAP_BATCH_SIZE", "50"))
+        # Last bulk job of each judge, and the ones still running
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self.rewrapped = 0
+        self.keys_wrapped = 0
+        self.keys_dropped = 0
+        self.failures = 0
+
+    async def rewrap_key_map(
+        self, key_map: Dict[str, str], public_keys: Dict[str, str], refresh: Iterable[str] = ()
+    ) -> Dict[str, str]:
+        """
+        Get the key map of one data key for a new set of principals.
+
+        Args:
+            key_map: Dict of principal ID -> base64 wrapped data key
+            public_keys: Dict of principal ID -> public key of every principal to keep or add
+            refresh: Principals whose wrapped key must be replaced, e.g. after a key rotation
+
+        Returns:
+            Dict of principal ID -> base64 wrapped data key, in the order of public_keys
+
+        Raises:
+            RewrapError: If the data key has to be unwrapped and no holder's private key can
+            CryptoPoolBusyError: If the crypto pool is saturated
+        """
+        refresh = {str(principal_id) for principal_id in refresh}
+        kept = {
+            principal_id: wrapped for principal_id, wrapped in key_map.items()
+            if principal_id in public_keys and principal_id not in refresh
+        }
+        missing = {principal_id: key for principal_id, key in public_keys.items() if principal_id not in kept}
+        if missing:
+            kept.update(await self._wrap_for(key_map, missing, refresh))
+            self.keys_wrapped += len(missing)
+        return {principal_id: kept[principal_id] for principal_id in public_keys}
+
+    async def _wrap_for(self, key_map: Dict[str, str], public_keys: Dict[str, str], refresh: Set[str]) -> Dict[str, str]:
+        # Principals being refreshed may hold a key wrapped for their old key pair, so try them last
+        holders = sorted(key_map, key=lambda principal_id: principal_id in refresh)
+        for principal_id in holders:
+            private_key = await key_management_service.get_agent_private_key(principal_id)
+            if not private_key:
+                continue
+            try:
+                return await async_encryption_service.rewrap_key(key_map[principal_id], private_key, public_keys)
+            except CryptoPoolBusyError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not unwrap data key with the key of {principal_id}: {e}")
+        raise RewrapError("No private key of a principal holding the data key is available")
+
+    def task_key_map(self, task: Task) -> Dict[str, str]:
+        if task.encryption_keys is not None:
+            return dict(task.encryption_keys)
+        # Tasks created before the key map was stored: read the envelope's key table
+        encrypted = blob_store.resolve_bytes(task.encrypted_payload_url)
+        if not is_envelope(encrypted):
+            return {}
+        return {
+            principal_id: base64.b64encode(wrapped).decode('utf-8')
+            for principal_id, wrapped in unpack_header(encrypted).wrapped_keys.items()
+        }
+
+    async def _rewrap_object(self, obj: Any, key_map: Dict[str, str], public_keys: Dict[str, str],
+                             refresh: Iterable[str], dropped_from: List[Any]) -> bool:
+        new_map = await self.rewrap_key_map(key_map, public_keys, refresh)
+        if new_map == obj.encryption_keys:
+            return False
+        dropped = set(key_map) - set(new_map)
+        obj.encryption_keys = new_map
+        if isinstance(obj, Task):
+            # The task's single key field holds the first judge's key
+            obj.encryption_key = next(iter(new_map.values()), None)
+        if dropped:
+            self.keys_dropped += len(dropped)
+            dropped_from.append(obj.id)
+        self.rewrapped += 1
+        return True
+
+    async def _invalidate(self, object_ids: List[Any]):
+        """
+        Drop the cached decrypted values of objects whose removed judges lost their keys,
+        in every worker. Called once the new key maps are committed.
+        """
+        object_ids = [str(object_id) for object_id in object_ids]
+        for start in range(0, len(object_ids), INVALIDATION_BATCH):
+            await invalidation_channel.publish(
+                "decrypted_object", {"object_ids": object_ids[start:start + INVALIDATION_BATCH]}
+            )
+
+    async def _rewrap_task_keys(self, task: Task, deliverables: List[Any], public_keys: Dict[str, str],
+                                refresh: Iterable[str], slots: asyncio.Semaphore, dropped_from: List[Any]) -> int:
+        """
+        Re-wrap the key maps of a task's payload and deliverables for its current judges.
+        IDs of objects that lost a judge's key are added to dropped_from.
+
+        Returns:
+            Number of key maps changed
+        """
+        judge_keys = {str(judge.id): public_keys[str(judge.id)] for judge in task.judges if str(judge.id) in public_keys}
+        if task.judges and not judge_keys:
+            # Never strip every key because the public keys could not be loaded
+            raise RewrapError("No judge public keys found")
+
+        async def rewrap(obj: Any, key_map: Dict[str, str]) -> bool:
+            async with slots:
+                return await self._rewrap_object(obj, key_map, judge_keys, refresh, dropped_from)
+
+        objects = [(task, self.task_key_map(task))]
+        objects += [(deliverable, dict(deliverable.encryption_keys)) for deliverable in deliverables if deliverable.encryption_keys]
+        # Let every object finish before failing, so none changes after the caller rolls back
+        outcomes = await asyncio.gather(*(rewrap(obj, key_map) for obj, key_map in objects), return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        return sum(outcomes)
+
+    async def set_task_judges(self, db: AsyncSession, task: Task, judge_ids: List[UUID]) -> Task:
+        """
+        Replace a task's judges and re-wrap the data keys of its payload and deliverables for them.
+
+        Args:
+            db: Database session
+            task: The task
+            judge_ids: IDs of the new judges; agents that are not judges are ignored
+
+        Returns:
+            The updated task
+
+        Raises:
+            RewrapError: If a data key could not be unwrapped; nothing is changed
+            CryptoPoolBusyError: If the crypto pool is saturated; nothing is changed
+        """
+        result = await db.execute(select(Agent).where(Agent.id.in_(judge_ids), Agent.agent_type == AgentType.JUDGE))
+        judges = {judge.id: judge for judge in result.scalars().all()}
+        dropped_from = []
+        try:
+            task.judges = [judges[judge_id] for judge_id in dict.fromkeys(judge_ids) if judge_id in judges]
+            public_keys = await key_management_service.get_judge_public_keys(db, [judge.id for judge in task.judges])
+            deliverables = await deliverable_service.get_by_task(db, task.id)
+            await self._rewrap_task_keys(
+                task, deliverables, public_keys, (), asyncio.Semaphore(self.concurrency), dropped_from
+            )
+        except Exception:
+            self.failures += 1
+            await db.rollback()
+            raise
+        db.add(task)
+        await db.commit()
+        await self._invalidate(dropped_from)
+        await db.refresh(task)
+        return task
+
+    async def rewrap_judge_tasks(self, judge_id: UUID, session_factory=None) -> Dict[str, Any]:
+        """
+        Re-wrap the judge's data keys on every open task it is assigned to, e.g. after it
+        rotated its key pair. The key maps of each task are also brought in line with the
+        task's current judges. Tasks are re-wrapped and committed in batches of batch_size,
+        each in its own session. Tasks whose keys cannot be re-wrapped are reported and
+        left unchanged; the job can simply be run again.
+
+        Args:
+            judge_id: ID of the judge
+            session_factory: Opens the database sessions. Defaults to AsyncSessionLocal.
+
+        Returns:
+            Counts of tasks and re-wrapped key maps, and the IDs of tasks that failed
+        """
+        session_factory = session_factory or AsyncSessionLocal
+        async with session_factory() as db:
+            result = await db.execute(
+                select(Task.id).join(Task.judges).where(Agent.id == judge_id, Task.status.in_(OPEN_STATUSES))
+            )
+            task_ids = list(dict.fromkeys(result.scalars().all()))
+
+        slots = asyncio.Semaphore(self.concurrency)
+        rewrapped, failed = 0, []
+        for start in range(0, len(task_ids), self.batch_size):
+            async with session_factory() as db:
+                batch_rewrapped, batch_failed = await self._rewrap_batch(
+                    db, judge_id, task_ids[start:start + self.batch_size], slots
+                )
+            rewrapped += batch_rewrapped
+            failed += batch_failed
+        return {"tasks": len(task_ids), "rewrapped": rewrapped, "failed": failed}
+
+    async def _rewrap_batch(self, db: AsyncSession, judge_id: UUID, task_ids: List[UUID],
+                            slots: asyncio.Semaphore) -> Tuple[int, List[UUID]]:
+        result = await db.execute(select(Task).where(Task.id.in_(task_ids)))
+        tasks = result.scalars().all()
+        deliverables = await deliverable_service.get_by_tasks(db, task_ids)
+        by_task: Dict[UUID, List[Any]] = {task.id: [] for task in tasks}
+        for deliverable in deliverables:
+            by_task[deliverable.task_id].append(deliverable)
+        # One public key lookup for every judge of every task in the batch
+        public_keys = await key_management_service.get_judge_public_keys(
+            db, list(dict.fromkeys(judge.id for task in tasks for judge in task.judges))
+        )
+
+        dropped_from: Dict[UUID, List[Any]] = {task.id: [] for task in tasks}
+        outcomes = await asyncio.gather(
+            *(
+                self._rewrap_task_keys(task, by_task[task.id], public_keys, (str(judge_id),), slots, dropped_from[task.id])
+                for task in tasks
+            ),
+            return_exceptions=True,
+        )
+        failed = []
+        rewrapped = 0
+        for task, outcome in zip(tasks, outcomes):
+            if not isinstance(outcome, BaseException):
+                rewrapped += outcome
+            else:
+                logger.error(f"Error re-wrapping keys of task {task.id} for judge {judge_id}: {outcome}")
+                failed.append(task.id)
+                dropped_from.pop(task.id)
+                # Leave the task and its deliverables as they were
+                for obj in [task, *by_task[task.id]]:
+                    await db.refresh(obj)
+        self.failures += len(failed)
+        await db.commit()
+        await self._invalidate([object_id for object_ids in dropped_from.values() for object_id in object_ids])
+        return rewrapped, failed
+
+    def start_judge_rewrap(self, judge_id: UUID) -> Dict[str, Any]:
+        """
+        Run rewrap_judge_tasks for a judge in the background, unless its job is running already.
+
+        Returns:
+            The job's status
+        """
+        key = str(judge_id)
+        if key not in self._running:
+            self._jobs[key] = {
+                "judge_id": key, "status": "RUNNING", "tasks": None, "rewrapped": None, "failed": [], "error": None,
+            }
+            self._running[key] = asyncio.create_task(self._run_job(judge_id))
+        return dict(self._jobs[key])
+
+    def judge_rewrap_job(self, judge_id: UUID) -> Optional[Dict[str, Any]]:
+        """
+        Get the status of the last background re-wrap job of a judge run by this process.
+        """
+        job = self._jobs.get(str(judge_id))
+        return dict(job) if job is not None else None
+
+    async def _run_job(self, judge_id: UUID):
+        key = str(judge_id)
+        job = self._jobs[key]
+        try:
+            job.update(await self.rewrap_judge_tasks(judge_id), status="COMPLETED")
+        except Exception as e:
+            logger.error(f"Error re-wrapping keys for judge {judge_id}: {e}")
+            job.update(status="FAILED", error=str(e))
+        finally:
+            self._running.pop(key, None)
+
+    async def join(self):
+        """
+        Wait until every running background job finished.
+        """
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    async def stop(self):
+        """
+        Cancel running background jobs. Tasks they committed stay re-wrapped, and running
+        the job again finishes the rest.
+        """
+        jobs = list(self._running.values())
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get re-wrap counters.
+        """
+        return {
+            "concurrency": self.concurrency,
+            "jobs_running": len(self._running),
+            "rewrapped": self.rewrapped,
+            "keys_wrapped": self.keys_wrapped,
+            "keys_dropped": self.keys_dropped,
+            "failures": self.failures,
+        }
+
+
+# Create a singleton instance
+key_rewrap_service = KeyRewrapService()
+
+
+def invalidate_decrypted_objects(payload: Dict[str, Any]):
+    for object_id in payload.get("object_ids", []):
+        decrypted_cache.invalidate_object(object_id)
+
+
+# Drop decrypted values of objects re-wrapped in any worker
+invalidation_channel.subscribe("decrypted_object", invalidate_decrypted_objects, reset=lambda: decrypted_cache.clear())
@@ -2,49 +2,95 @@ import os
 import base64
 import json
 import logging
-from typing import Dict, Tuple, Optional, Any
+from typing import BinaryIO, Dict, List, Tuple, Optional, Any, Union
 from uuid import UUID
 
-from Crypto.PublicKey import RSA
-from Crypto.Cipher import PKCS1_OAEP, AES
+from Crypto.Cipher import AES
 from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import pad, unpad
-from Crypto.Hash import SHA256
+
+from app.encryption.compression import Compression
+from app.encryption.key_cache import KeyCache
+from app.encryption.key_wrap import get_scheme
+from app.encryption.keystore import Keystore, create_keystore
+from app.encryption.envelope import FLAG_CHUNKED, FLAG_COMPRESSED, NONCE_SIZE, TAG_SIZE, EnvelopeHeader, is_envelope, pack_header, unpack_header
+from app.encryption.stream import DEFAULT_CHUNK_SIZE, ChunkReader, StreamDecryptor, StreamEncryptor, Unwrapper, decrypt_chunked
 
 logger = logging.getLogger(__name__)
 
 class EncryptionService:
     """
     Service for handling encryption and decryption operations in the XAAM platform.
-    Uses asymmetric encryption (RSA) for key exchange and symmetric encryption (AES) for data.
+    Uses asymmetric encryption (RSA, or X25519 sealed boxes; see app.encryption.key_wrap)
+    for key exchange and symmetric encryption (AES) for data.
+    
+    Data is written as a binary AES-GCM envelope (see app.encryption.envelope) unless
+    the legacy base64 JSON format is selected; both formats are read. Large data can
+    be streamed through chunked envelopes (see app.encryption.stream) in constant memory.
+    Binary envelopes of whole payloads may be compressed before encryption
+    (see app.encryption.compression).
     """
     
-    def __init__(self, key_storage_dir: str = None):
+    def __init__(self, key_storage_dir: str = None, key_cache_size: int = None, envelope_format: str = None,
+                 chunk_size: int = None, keystore: Keystore = None, compression: Compression = None):
         """
         Initialize the encryption service.
         
         Args:
             key_storage_dir: Directory to store keys. If None, keys will not be persisted.
+            keystore: Private key store. Defaults to the KEYSTORE_BACKEND store in key_storage_dir.
+            key_cache_size: Imported keys kept in memory. Defaults to CRYPTO_KEY_CACHE_SIZE or 1024.
+            envelope_format: Format of newly encrypted data, "binary" or the legacy "json".
+                Defaults to ENCRYPTION_ENVELOPE or "binary".
+            chunk_size: Plaintext bytes per chunk of streamed data. Defaults to
+                ENCRYPTION_CHUNK_SIZE or 256 KiB.
+            compression: Compression applied before encryption. Defaults to the
+                ENCRYPTION_COMPRESSION settings.
         """
         self.key_storage_dir = key_storage_dir
+        self.key_cache = KeyCache(key_cache_size or int(os.getenv("CRYPTO_KEY_CACHE_SIZE", "1024")))
+        self.envelope_format = envelope_format or os.getenv("ENCRYPTION_ENVELOPE", "binary")
+        if self.envelope_format not in ("binary", "json"):
+            raise ValueError(f"Unsupported envelope format: {self.envelope_format}")
+        self.chunk_size = chunk_size or int(os.getenv("ENCRYPTION_CHUNK_SIZE", str(DEFAULT_CHUNK_SIZE)))
         if key_storage_dir and not os.path.exists(key_storage_dir):
             os.makedirs(key_storage_dir, exist_ok=True)
+        self.keystore = keystore or (create_keystore(key_storage_dir) if key_storage_dir else None)
+        self.compression = compression or Compression()
+    
+    def invalidate_keys(self, fingerprints: List[str]):
+        """
+        Drop cached key objects, e.g. after the keys were rotated.
+        
+        Args:
+            fingerprints: Fingerprints of the PEM keys to drop
+        """
+        self.key_cache.invalidate(fingerprints)
+    
+    def key_cache_counters(self) -> Dict[str, int]:
+        """
+        Get the key cache counters of this process.
+        """
+        return self.key_cache.counters()
     
-    def generate_key_pair(self, key_size: int = 2048) -> Tuple[str, str]:
+    def compression_counters(self) -> Dict[str, Any]:
+        """
+        Get the compression counters of this process.
         """
-        Generate a new RSA key pair.
+        return self.compression.counters()
+    
+    def generate_key_pair(self, key_size: int = 2048, scheme: str = "rsa") -> Tuple[str, str]:
+        """
+        Generate a new key pair.
         
         Args:
-            key_size: Size of the RSA key in bits
+            key_size: Size of the RSA key in bits; ignored for X25519
+            scheme: Key-wrap scheme, "rsa" or "x25519"
             
         Returns:
             Tuple of (public_key, private_key) as PEM strings
         """
-        key = RSA.generate(key_size)
-        private_key = key.export_key().decode('utf-8')
-        public_key = key.publickey().export_key().decode('utf-8')
-        
-        return public_key, private_key
+        return get_scheme(scheme).generate_key_pair(key_size)
     
     def store_private_key(self, agent_id: UUID, private_key: str) -> bool:
         """
@@ -57,15 +103,12 @@ class EncryptionService:
         Returns:
             True if successful, False otherwise
         """
-        if not self.key_storage_dir:
+        if not self.keystore:
             logger.warning("Key storage directory not set, cannot store private key")
             return False
         
         try:
-            key_path = os.path.join(self.key_storage_dir, f"{agent_id}_private.pem")
-            with open(key_path, 'w') as f:
-                f.write(private_key)
-            os.chmod(key_path, 0o600)  # Restrict permissions to owner only
+            self.keystore.put(agent_id, private_key)
             return True
         except Exception as e:
             logger.error(f"Error storing private key: {e}")
@@ -81,60 +124,276 @@ class EncryptionService:
         Returns:
             Private key as PEM string or None if not found
         """
-        if not self.key_storage_dir:
+        if not self.keystore:
             logger.warning("Key storage directory not set, cannot retrieve private key")
             return None
         
         try:
-            key_path = os.path.join(self.key_storage_dir, f"{agent_id}_private.pem")
-            if not os.path.exists(key_path):
-                return None
-            
-            with open(key_path, 'r') as f:
-                return f.read()
+            return self.keystore.get(agent_id)
         except Exception as e:
             logger.error(f"Error retrieving private key: {e}")
             return None
     
-    def encrypt_with_public_key(self, public_key: str, data: bytes) -> bytes:
+    def wrap_key(self, data_key: bytes, public_keys: Dict[str, str]) -> Dict[str, bytes]:
         """
-        Encrypt data with a public key.
+        Wrap a data key with each public key.
         
         Args:
-            public_key: Public key as PEM string
-            data: Data to encrypt
+            data_key: AES key to wrap
+            public_keys: Dict of principal ID -> public key
             
         Returns:
-            Encrypted data
+            Dict of principal ID -> wrapped key
         """
-        try:
-            key = RSA.import_key(public_key)
-            cipher = PKCS1_OAEP.new(key, hashAlgo=SHA256)
+        return {
+            principal_id: self.key_cache.cipher(public_key).encrypt(data_key)
+            for principal_id, public_key in public_keys.items()
+        }
+    
+    def rewrap_key(self, encrypted_key: str, private_key: str, public_keys: Dict[str, str]) -> Dict[str, str]:
+        """
+        Unwrap a data key once and wrap it for other principals, leaving the data it
+        encrypts untouched.
+        
+        Args:
+            encrypted_key: The data key wrapped for an authorized principal (base64)
+            private_key: That principal's private key as PEM string
+            public_keys: Dict of principal ID -> public key to wrap the data key for
             
-            # RSA can only encrypt data up to a certain size, so we use a hybrid approach:
-            # 1. Generate a random AES key
-            # 2. Encrypt the data with the AES key
-            # 3. Encrypt the AES key with the RSA public key
-            # 4. Return the encrypted AES key and the encrypted data
+        Returns:
+            Dict of principal ID -> base64 wrapped key
+        """
+        try:
+            data_key = self.key_cache.cipher(private_key).decrypt(base64.b64decode(encrypted_key))
+            return {
+                principal_id: base64.b64encode(wrapped).decode('utf-8')
+                for principal_id, wrapped in self.wrap_key(data_key, public_keys).items()
+            }
+        except Exception as e:
+            logger.error(f"Error re-wrapping data key: {e}")
+            raise
+    
+    def _wrap(self, public_keys: Dict[str, str], data_key: bytes = None,
+              wrapped_keys: Dict[str, bytes] = None) -> Tuple[bytes, Dict[str, bytes]]:
+        """
+        Wrap a data key with each public key, generating a fresh AES-256 key if none is given.
+        Keys already in wrapped_keys are not wrapped again.
+        
+        Returns:
+            Tuple of (AES key, dict of principal ID -> wrapped key)
+        """
+        aes_key = data_key or get_random_bytes(32)  # 256-bit key
+        wrapped_keys = wrapped_keys or {}
+        missing = {principal_id: key for principal_id, key in public_keys.items() if principal_id not in wrapped_keys}
+        wrapped_keys = {**wrapped_keys, **self.wrap_key(aes_key, missing)}
+        return aes_key, {principal_id: wrapped_keys[principal_id] for principal_id in public_keys}
+    
+    def _unwrapper(self, wrapped_key: Optional[bytes], private_key: str) -> Unwrapper:
+        """
+        Build the function that unwraps an envelope's data key.
+        
+        Args:
+            wrapped_key: The principal's wrapped AES key. For envelopes with a single
+                key it may be None to use the key stored in the envelope.
+            private_key: The principal's private key as PEM string
+        """
+        cipher = self.key_cache.cipher(private_key)
+        
+        def unwrap(header: EnvelopeHeader) -> bytes:
+            key = wrapped_key
+            if key is None:
+                if len(header.wrapped_keys) != 1:
+                    raise ValueError("A wrapped key is required for envelopes with several recipients")
+                key = next(iter(header.wrapped_keys.values()))
+            return cipher.decrypt(key)
+        
+        return unwrap
+    
+    def _seal(self, data: bytes, public_keys: Dict[str, str], inline_key: bool = False, data_key: bytes = None,
+              wrapped_keys: Dict[str, bytes] = None, envelope_format: str = None) -> Tuple[bytes, Dict[str, bytes]]:
+        """
+        Encrypt data under an AES-256 key wrapped with each public key.
+        
+        Args:
+            data: Data to encrypt
+            public_keys: Dict of principal ID -> public key
+            inline_key: Whether the legacy format should carry the (single) wrapped key.
+                The binary envelope always carries its key table.
+            data_key: AES key to use. A fresh one is generated if None.
+            wrapped_keys: data_key already wrapped for some of the principals
+            envelope_format: "binary" or "json". Defaults to the service's envelope format.
             
-            aes_key = get_random_bytes(32)  # 256-bit key
+        Returns:
+            Tuple of (encrypted data, dict of principal ID -> wrapped key)
+        """
+        aes_key, wrapped_keys = self._wrap(public_keys, data_key, wrapped_keys)
+        
+        if (envelope_format or self.envelope_format) == "json":
+            # Legacy format: AES-CBC with base64 fields in base64-encoded JSON
             cipher_aes = AES.new(aes_key, AES.MODE_CBC)
+            package = {
+                'iv': base64.b64encode(cipher_aes.iv).decode('utf-8'),
+                'encrypted_data': base64.b64encode(cipher_aes.encrypt(pad(data, AES.block_size))).decode('utf-8')
+            }
+            if inline_key:
+                package['encrypted_key'] = base64.b64encode(next(iter(wrapped_keys.values()))).decode('utf-8')
+            return base64.b64encode(json.dumps(package).encode('utf-8')), wrapped_keys
+        
+        compression, data = self.compression.compress(data)
+        nonce = get_random_bytes(NONCE_SIZE)
+        header = pack_header(nonce, wrapped_keys, compression=compression)
+        cipher_aes = AES.new(aes_key, AES.MODE_GCM, nonce=nonce)
+        cipher_aes.update(header)
+        ciphertext, tag = cipher_aes.encrypt_and_digest(data)
+        return b"".join((header, ciphertext, tag)), wrapped_keys
+    
+    def _open(self, encrypted: Union[str, bytes], wrapped_key: Optional[bytes], private_key: str) -> bytes:
+        """
+        Decrypt data in either envelope format, chunked or not.
+        
+        Args:
+            encrypted: Binary envelope, or legacy base64 JSON package
+            wrapped_key: The principal's wrapped AES key. For envelopes with a single
+                key it may be None to use the key stored in the envelope.
+            private_key: The principal's private key as PEM string
             
-            # Pad the data to be a multiple of the block size
-            padded_data = pad(data, AES.block_size)
-            encrypted_data = cipher_aes.encrypt(padded_data)
+        Returns:
+            Decrypted data
+        """
+        if is_envelope(encrypted):
+            unwrap = self._unwrapper(wrapped_key, private_key)
+            header = unpack_header(encrypted)
+            if header.flags & FLAG_CHUNKED:
+                return decrypt_chunked(encrypted, unwrap)
+            view = memoryview(encrypted)
+            cipher_aes = AES.new(unwrap(header), AES.MODE_GCM, nonce=header.nonce)
+            cipher_aes.update(view[:header.length])
+            data = cipher_aes.decrypt_and_verify(view[header.length:-TAG_SIZE], view[-TAG_SIZE:])
+            if header.flags & FLAG_COMPRESSED:
+                data = self.compression.decompress(header.compression, data)
+            return data
+        
+        # Legacy format
+        cipher = self.key_cache.cipher(private_key)
+        package = json.loads(base64.b64decode(encrypted).decode('utf-8'))
+        if wrapped_key is None:
+            wrapped_key = base64.b64decode(package['encrypted_key'])
+        cipher_aes = AES.new(cipher.decrypt(wrapped_key), AES.MODE_CBC, base64.b64decode(package['iv']))
+        return unpad(cipher_aes.decrypt(base64.b64decode(package['encrypted_data'])), AES.block_size)
+    
+    def stream_encryptor(self, public_keys: Dict[str, str], chunk_size: int = None) -> StreamEncryptor:
+        """
+        Start encrypting a stream for several principals.
+        
+        Args:
+            public_keys: Dict of principal ID -> public key
+            chunk_size: Plaintext bytes per chunk. Defaults to the service's chunk size.
             
-            # Encrypt the AES key with the RSA public key
-            encrypted_aes_key = cipher.encrypt(aes_key)
+        Returns:
+            Encryptor whose wrapped_keys hold each principal's wrapped key
+        """
+        aes_key, wrapped_keys = self._wrap(public_keys)
+        return StreamEncryptor(aes_key, wrapped_keys, chunk_size or self.chunk_size)
+    
+    def stream_decryptor(self, encrypted_key: Optional[str], private_key: str) -> StreamDecryptor:
+        """
+        Start decrypting a chunked envelope.
+        
+        Args:
+            encrypted_key: Encrypted AES key (base64), or None if the envelope has a single key
+            private_key: Private key as PEM string
+        """
+        wrapped_key = base64.b64decode(encrypted_key) if encrypted_key else None
+        return StreamDecryptor(self._unwrapper(wrapped_key, private_key))
+    
+    def encrypt_stream(self, source: BinaryIO, destination: BinaryIO, public_keys: Dict[str, str],
+                       chunk_size: int = None) -> Dict[str, str]:
+        """
+        Encrypt a file-like object into a chunked envelope, one chunk in memory at a time.
+        
+        Args:
+            source: Binary file to read plaintext from
+            destination: Binary file to write the envelope to
+            public_keys: Dict of principal ID -> public key
+            chunk_size: Plaintext bytes per chunk. Defaults to the service's chunk size.
             
-            # Combine the IV, encrypted AES key, and encrypted data
-            result = {
-                'iv': base64.b64encode(cipher_aes.iv).decode('utf-8'),
-                'encrypted_key': base64.b64encode(encrypted_aes_key).decode('utf-8'),
-                'encrypted_data': base64.b64encode(encrypted_data).decode('utf-8')
+        Returns:
+            Dict of principal ID -> base64 wrapped key
+        """
+        try:
+            encryptor = self.stream_encryptor(public_keys, chunk_size)
+            while True:
+                data = source.read(encryptor.chunk_size)
+                if not data:
+                    break
+                destination.write(encryptor.update(data))
+            destination.write(encryptor.finalize())
+            return {
+                principal_id: base64.b64encode(wrapped).decode('utf-8')
+                for principal_id, wrapped in encryptor.wrapped_keys.items()
             }
+        except Exception as e:
+            logger.error(f"Error encrypting stream: {e}")
+            raise
+    
+    def decrypt_stream(self, source: BinaryIO, destination: BinaryIO, encrypted_key: Optional[str],
+                       private_key: str) -> int:
+        """
+        Decrypt a chunked envelope from a file-like object, one chunk in memory at a time.
+        Every chunk is verified before it is written, but if this raises, whatever was
+        already written must be discarded.
+        
+        Args:
+            source: Binary file to read the envelope from
+            destination: Binary file to write plaintext to
+            encrypted_key: Encrypted AES key (base64), or None if the envelope has a single key
+            private_key: Private key as PEM string
+            
+        Returns:
+            Number of plaintext bytes written
+        """
+        try:
+            decryptor = self.stream_decryptor(encrypted_key, private_key)
+            written = 0
+            while True:
+                data = source.read(DEFAULT_CHUNK_SIZE)
+                if not data:
+                    break
+                written += destination.write(decryptor.update(data))
+            return written + destination.write(decryptor.finalize())
+        except Exception as e:
+            logger.error(f"Error decrypting stream: {e}")
+            raise
+    
+    def open_chunks(self, source: BinaryIO, encrypted_key: Optional[str], private_key: str) -> ChunkReader:
+        """
+        Open a chunked envelope for random access to its chunks.
+        
+        Args:
+            source: Seekable binary file holding the envelope
+            encrypted_key: Encrypted AES key (base64), or None if the envelope has a single key
+            private_key: Private key as PEM string
+        """
+        wrapped_key = base64.b64decode(encrypted_key) if encrypted_key else None
+        return ChunkReader(source, self._unwrapper(wrapped_key, private_key))
+    
+    def encrypt_with_public_key(self, public_key: str, data: bytes) -> bytes:
+        """
+        Encrypt data with a public key.
+        
+        RSA can only encrypt a few hundred bytes, so the data is encrypted with a
+        random AES key and the AES key is wrapped with the public key.
+        
+        Args:
+            public_key: Public key as PEM string
+            data: Data to encrypt
             
-            return base64.b64encode(json.dumps(result).encode('utf-8'))
+        Returns:
+            Encrypted data
+        """
+        try:
+            encrypted, _ = self._seal(data, {"": public_key}, inline_key=True)
+            return encrypted
         except Exception as e:
             logger.error(f"Error encrypting with public key: {e}")
             raise
@@ -145,196 +404,111 @@ class EncryptionService:
         
         Args:
             private_key: Private key as PEM string
-            encrypted_data: Data to decrypt
+            encrypted_data: Data to decrypt, in either envelope format
             
         Returns:
             Decrypted data
         """
         try:
-            key = RSA.import_key(private_key)
-            cipher = PKCS1_OAEP.new(key, hashAlgo=SHA256)
-            
-            # Decode the encrypted data
-            encrypted_package = json.loads(base64.b64decode(encrypted_data).decode('utf-8'))
-            iv = base64.b64decode(encrypted_package['iv'])
-            encrypted_key = base64.b64decode(encrypted_package['encrypted_key'])
-            encrypted_data = base64.b64decode(encrypted_package['encrypted_data'])
-            
-            # Decrypt the AES key with the RSA private key
-            aes_key = cipher.decrypt(encrypted_key)
-            
-            # Decrypt the data with the AES key
-            cipher_aes = AES.new(aes_key, AES.MODE_CBC, iv)
-            padded_data = cipher_aes.decrypt(encrypted_data)
-            
-            # Unpad the data
-            return unpad(padded_data, AES.block_size)
+            return self._open(encrypted_data, None, private_key)
         except Exception as e:
             logger.error(f"Error decrypting with private key: {e}")
             raise
     
-    def encrypt_task_payload(self, payload: Dict[str, Any], judge_public_keys: Dict[str, str]) -> Dict[str, str]:
+    def encrypt_task_payload(self, payload: Dict[str, Any], judge_public_keys: Dict[str, str],
+                             data_key: bytes = None, wrapped_keys: Dict[str, bytes] = None,
+                             envelope_format: str = None) -> Dict[str, Any]:
         """
         Encrypt a task payload for multiple judges.
         
         Args:
             payload: Task payload to encrypt
             judge_public_keys: Dict of judge_id -> public_key
+            data_key: AES key to use, e.g. one already wrapped in parallel. A fresh one is generated if None.
+            wrapped_keys: data_key already wrapped for some of the judges
+            envelope_format: "binary" or "json". Defaults to the service's envelope format.
             
         Returns:
-            Dict of judge_id -> encrypted_key
+            Dict with encrypted_payload (bytes) and encrypted_keys (judge_id -> base64 wrapped key)
         """
         try:
-            # Convert payload to JSON and encode as bytes
-            payload_bytes = json.dumps(payload).encode('utf-8')
-            
-            # Generate a random AES key for the payload
-            aes_key = get_random_bytes(32)  # 256-bit key
-            cipher_aes = AES.new(aes_key, AES.MODE_CBC)
-            
-            # Encrypt the payload with the AES key
-            padded_data = pad(payload_bytes, AES.block_size)
-            encrypted_payload = cipher_aes.encrypt(padded_data)
-            
-            # Create the encrypted payload package
-            encrypted_payload_package = {
-                'iv': base64.b64encode(cipher_aes.iv).decode('utf-8'),
-                'encrypted_data': base64.b64encode(encrypted_payload).decode('utf-8')
-            }
-            
-            # Encrypt the AES key with each judge's public key
-            encrypted_keys = {}
-            for judge_id, public_key in judge_public_keys.items():
-                key = RSA.import_key(public_key)
-                cipher = PKCS1_OAEP.new(key, hashAlgo=SHA256)
-                encrypted_key = cipher.encrypt(aes_key)
-                encrypted_keys[judge_id] = base64.b64encode(encrypted_key).decode('utf-8')
-            
-            # Return the encrypted payload package and encrypted keys
+            encrypted_payload, wrapped_keys = self._seal(
+                json.dumps(payload).encode('utf-8'), judge_public_keys, data_key=data_key, wrapped_keys=wrapped_keys,
+                envelope_format=envelope_format
+            )
             return {
-                'encrypted_payload': base64.b64encode(json.dumps(encrypted_payload_package).encode('utf-8')).decode('utf-8'),
-                'encrypted_keys': encrypted_keys
+                'encrypted_payload': encrypted_payload,
+                'encrypted_keys': {
+                    judge_id: base64.b64encode(wrapped).decode('utf-8') for judge_id, wrapped in wrapped_keys.items()
+                }
             }
         except Exception as e:
             logger.error(f"Error encrypting task payload: {e}")
             raise
     
-    def decrypt_task_payload(self, encrypted_payload: str, encrypted_key: str, private_key: str) -> Dict[str, Any]:
+    def decrypt_task_payload(self, encrypted_payload: Union[str, bytes], encrypted_key: str, private_key: str) -> Dict[str, Any]:
         """
         Decrypt a task payload.
         
         Args:
-            encrypted_payload: Encrypted payload
-            encrypted_key: Encrypted AES key
+            encrypted_payload: Encrypted payload, in either envelope format
+            encrypted_key: Encrypted AES key (base64)
             private_key: Private key as PEM string
             
         Returns:
             Decrypted payload as a dict
         """
         try:
-            # Import the private key
-            key = RSA.import_key(private_key)
-            cipher = PKCS1_OAEP.new(key, hashAlgo=SHA256)
-            
-            # Decrypt the AES key
-            encrypted_key_bytes = base64.b64decode(encrypted_key)
-            aes_key = cipher.decrypt(encrypted_key_bytes)
-            
-            # Decode the encrypted payload package
-            encrypted_payload_package = json.loads(base64.b64decode(encrypted_payload).decode('utf-8'))
-            iv = base64.b64decode(encrypted_payload_package['iv'])
-            encrypted_data = base64.b64decode(encrypted_payload_package['encrypted_data'])
-            
-            # Decrypt the payload with the AES key
-            cipher_aes = AES.new(aes_key, AES.MODE_CBC, iv)
-            padded_data = cipher_aes.decrypt(encrypted_data)
-            payload_bytes = unpad(padded_data, AES.block_size)
-            
-            # Parse the payload as JSON
-            return json.loads(payload_bytes.decode('utf-8'))
+            return json.loads(self._open(encrypted_payload, base64.b64decode(encrypted_key), private_key))
         except Exception as e:
             logger.error(f"Error decrypting task payload: {e}")
             raise
     
-    def encrypt_deliverable(self, deliverable: Dict[str, Any], judge_public_keys: Dict[str, str]) -> Dict[str, Any]:
+    def encrypt_deliverable(self, deliverable: Dict[str, Any], judge_public_keys: Dict[str, str],
+                            data_key: bytes = None, wrapped_keys: Dict[str, bytes] = None,
+                            envelope_format: str = None) -> Dict[str, Any]:
         """
         Encrypt a deliverable for multiple judges.
         
         Args:
             deliverable: Deliverable to encrypt
             judge_public_keys: Dict of judge_id -> public_key
+            data_key: AES key to use, e.g. one already wrapped in parallel. A fresh one is generated if None.
+            wrapped_keys: data_key already wrapped for some of the judges
+            envelope_format: "binary" or "json". Defaults to the service's envelope format.
             
         Returns:
-            Dict with encrypted_content and encrypted_keys
+            Dict with encrypted_content (bytes) and encrypted_keys (judge_id -> base64 wrapped key)
         """
         try:
-            # Convert deliverable to JSON and encode as bytes
-            deliverable_bytes = json.dumps(deliverable).encode('utf-8')
-            
-            # Generate a random AES key for the deliverable
-            aes_key = get_random_bytes(32)  # 256-bit key
-            cipher_aes = AES.new(aes_key, AES.MODE_CBC)
-            
-            # Encrypt the deliverable with the AES key
-            padded_data = pad(deliverable_bytes, AES.block_size)
-            encrypted_deliverable = cipher_aes.encrypt(padded_data)
-            
-            # Create the encrypted deliverable package
-            encrypted_deliverable_package = {
-                'iv': base64.b64encode(cipher_aes.iv).decode('utf-8'),
-                'encrypted_data': base64.b64encode(encrypted_deliverable).decode('utf-8')
-            }
-            
-            # Encrypt the AES key with each judge's public key
-            encrypted_keys = {}
-            for judge_id, public_key in judge_public_keys.items():
-                key = RSA.import_key(public_key)
-                cipher = PKCS1_OAEP.new(key, hashAlgo=SHA256)
-                encrypted_key = cipher.encrypt(aes_key)
-                encrypted_keys[judge_id] = base64.b64encode(encrypted_key).decode('utf-8')
-            
-            # Return the encrypted deliverable package and encrypted keys
+            encrypted_content, wrapped_keys = self._seal(
+                json.dumps(deliverable).encode('utf-8'), judge_public_keys, data_key=data_key, wrapped_keys=wrapped_keys,
+                envelope_format=envelope_format
+            )
             return {
-                'encrypted_content': base64.b64encode(json.dumps(encrypted_deliverable_package).encode('utf-8')).decode('utf-8'),
-                'encrypted_keys': encrypted_keys
+                'encrypted_content': encrypted_content,
+                'encrypted_keys': {
+                    judge_id: base64.b64encode(wrapped).decode('utf-8') for judge_id, wrapped in wrapped_keys.items()
+                }
             }
         except Exception as e:
             logger.error(f"Error encrypting deliverable: {e}")
             raise
     
-    def decrypt_deliverable(self, encrypted_content: str, encrypted_key: str, private_key: str) -> Dict[str, Any]:
+    def decrypt_deliverable(self, encrypted_content: Union[str, bytes], encrypted_key: str, private_key: str) -> Dict[str, Any]:
         """
         Decrypt a deliverable.
         
         Args:
-            encrypted_content: Encrypted deliverable content
-            encrypted_key: Encrypted AES key
+            encrypted_content: Encrypted deliverable content, in either envelope format
+            encrypted_key: Encrypted AES key (base64)
             private_key: Private key as PEM string
             
         Returns:
             Decrypted deliverable as a dict
         """
         try:
-            # Import the private key
-            key = RSA.import_key(private_key)
-            cipher = PKCS1_OAEP.new(key, hashAlgo=SHA256)
-            
-            # Decrypt the AES key
-            encrypted_key_bytes = base64.b64decode(encrypted_key)
-            aes_key = cipher.decrypt(encrypted_key_bytes)
-            
-            # Decode the encrypted deliverable package
-            encrypted_deliverable_package = json.loads(base64.b64decode(encrypted_content).decode('utf-8'))
-            iv = base64.b64decode(encrypted_deliverable_package['iv'])
-            encrypted_data = base64.b64decode(encrypted_deliverable_package['encrypted_data'])
-            
-            # Decrypt the deliverable with the AES key
-            cipher_aes = AES.new(aes_key, AES.MODE_CBC, iv)
-            padded_data = cipher_aes.decrypt(encrypted_data)
-            deliverable_bytes = unpad(padded_data, AES.block_size)
-            
-            # Parse the deliverable as JSON
-            return json.loads(deliverable_bytes.decode('utf-8'))
+            return json.loads(self._open(encrypted_content, base64.b64decode(encrypted_key), private_key))
         except Exception as e:
             logger.error(f"Error decrypting deliverable: {e}")
             raise
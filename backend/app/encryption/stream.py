@@ -0,0 +1,321 @@
+"""
+Chunked streaming encryption on top of the binary envelope format.
+
+A chunked envelope has FLAG_CHUNKED and a chunk size in its header. The plaintext
+is split into chunks of chunk size bytes, of which only the last may be shorter
+(or empty, for empty input), and each chunk is sealed with AES-GCM under the data key:
+
+    nonce    the first 7 bytes of the header nonce, the 4-byte chunk index and
+             a final-chunk byte (1 for the last chunk, otherwise 0)
+    AAD      the envelope header
+    output   the chunk ciphertext followed by its 16-byte tag
+
+The index in the nonce stops chunks from being reordered and the final-chunk byte
+stops the stream from being truncated at a chunk boundary. Every chunk but the last
+is chunk size + 16 bytes long, so chunk i starts at header length + i * (chunk size + 16)
+and can be read and decrypted on its own.
+"""
+import struct
+from typing import BinaryIO, Callable, Dict, Optional
+
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+
+from app.encryption.envelope import (
+    FLAG_CHUNKED, FLAG_COMPRESSED, NONCE_SIZE, TAG_SIZE, EnvelopeError, EnvelopeHeader, EnvelopeTruncatedError,
+    pack_header, unpack_header,
+)
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# Largest header a decryptor buffers while looking for the end of the key table
+MAX_HEADER_SIZE = 1024 * 1024
+
+_NONCE_PREFIX_SIZE = 7
+_COUNTER = struct.Struct(">IB")
+_MAX_CHUNKS = 2 ** 32
+
+# Called with the parsed header to get the data key
+Unwrapper = Callable[[EnvelopeHeader], bytes]
+
+
+def _chunk_cipher(key: bytes, header: bytes, nonce: bytes, index: int, final: bool):
+    if index >= _MAX_CHUNKS:
+        raise EnvelopeError("Too many chunks")
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce[:_NONCE_PREFIX_SIZE] + _COUNTER.pack(index, final))
+    cipher.update(header)
+    return cipher
+
+
+def seal_chunk(key: bytes, header: bytes, nonce: bytes, index: int, data: bytes, final: bool) -> bytes:
+    """
+    Encrypt one chunk.
+
+    Returns:
+        The chunk ciphertext followed by its tag
+    """
+    ciphertext, tag = _chunk_cipher(key, header, nonce, index, final).encrypt_and_digest(data)
+    return ciphertext + tag
+
+
+def open_chunk(key: bytes, header: bytes, nonce: bytes, index: int, data: bytes, final: bool) -> bytes:
+    """
+    Decrypt and verify one chunk.
+
+    Raises:
+        ValueError: If the chunk was altered, moved or is not the final chunk it claims to be
+    """
+    view = memoryview(data)
+    if len(view) < TAG_SIZE:
+        raise EnvelopeError("Chunk is truncated")
+    return _chunk_cipher(key, header, nonce, index, final).decrypt_and_verify(view[:-TAG_SIZE], view[-TAG_SIZE:])
+
+
+def _check_chunk_size(chunk_size: int):
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise EnvelopeError(f"Chunk size must be between 1 and {MAX_CHUNK_SIZE} bytes")
+
+
+def _check_streamable(header: EnvelopeHeader):
+    if not header.flags & FLAG_CHUNKED:
+        raise EnvelopeError("Not a chunked envelope")
+    # Chunks are read at plaintext offsets, which compression would not preserve
+    if header.flags & FLAG_COMPRESSED:
+        raise EnvelopeError("Compressed envelopes cannot be streamed")
+    _check_chunk_size(header.chunk_size)
+
+
+class StreamEncryptor:
+    """
+    Incrementally encrypts data into a chunked envelope, buffering at most one chunk.
+
+    Feed plaintext to `update` and write out what it returns, then write the result of
+    `finalize`. The header is returned with the first output.
+    """
+
+    def __init__(self, key: bytes, wrapped_keys: Dict[str, bytes], chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            key: AES-256 data key
+            wrapped_keys: Dict of principal ID -> wrapped data key, stored in the header
+            chunk_size: Plaintext bytes per chunk
+        """
+        _check_chunk_size(chunk_size)
+        self.wrapped_keys = wrapped_keys
+        self.chunk_size = chunk_size
+        self._key = key
+        self._nonce = get_random_bytes(NONCE_SIZE)
+        self.header = pack_header(self._nonce, wrapped_keys, FLAG_CHUNKED, chunk_size)
+        self._pending = bytearray()
+        self._index = 0
+        self._header_written = False
+        self._finalized = False
+
+    def _start(self) -> list:
+        if self._finalized:
+            raise EnvelopeError("Stream is already finalized")
+        if self._header_written:
+            return []
+        self._header_written = True
+        return [self.header]
+
+    def _seal(self, data: bytes, final: bool) -> bytes:
+        sealed = seal_chunk(self._key, self.header, self._nonce, self._index, data, final)
+        self._index += 1
+        return sealed
+
+    def update(self, data: bytes) -> bytes:
+        """
+        Add plaintext.
+
+        Returns:
+            Envelope bytes completed by this data, possibly empty
+        """
+        out = self._start()
+        self._pending += data
+        # A full chunk is held back until more data arrives, since the last chunk
+        # must be sealed as final
+        while len(self._pending) > self.chunk_size:
+            out.append(self._seal(bytes(self._pending[:self.chunk_size]), final=False))
+            del self._pending[:self.chunk_size]
+        return b"".join(out)
+
+    def finalize(self) -> bytes:
+        """
+        Seal the last chunk.
+
+        Returns:
+            The remaining envelope bytes
+        """
+        out = self._start()
+        out.append(self._seal(bytes(self._pending), final=True))
+        self._pending.clear()
+        self._finalized = True
+        return b"".join(out)
+
+
+class StreamDecryptor:
+    """
+    Incrementally decrypts a chunked envelope, buffering at most one chunk.
+
+    Every chunk is verified before its plaintext is returned, but a stream is only
+    known to be complete once `finalize` succeeds; callers must discard the output
+    if it raises.
+    """
+
+    def __init__(self, unwrap: Unwrapper):
+        """
+        Args:
+            unwrap: Called with the parsed header to get the data key
+        """
+        self._unwrap = unwrap
+        self._buffer = bytearray()
+        self._header: Optional[EnvelopeHeader] = None
+        self._aad = b""
+        self._key = b""
+        self._index = 0
+        self._finalized = False
+
+    @property
+    def header(self) -> Optional[EnvelopeHeader]:
+        return self._header
+
+    def _open(self, data: bytes, final: bool) -> bytes:
+        plaintext = open_chunk(self._key, self._aad, self._header.nonce, self._index, data, final)
+        self._index += 1
+        return plaintext
+
+    def update(self, data: bytes) -> bytes:
+        """
+        Add envelope bytes.
+
+        Returns:
+            Plaintext of the chunks completed by this data, possibly empty
+
+        Raises:
+            EnvelopeError: If the data is not a chunked envelope
+            ValueError: If a chunk fails authentication
+        """
+        if self._finalized:
+            raise EnvelopeError("Stream is already finalized")
+        self._buffer += data
+        if self._header is None:
+            try:
+                header = unpack_header(self._buffer)
+            except EnvelopeTruncatedError:
+                if len(self._buffer) > MAX_HEADER_SIZE:
+                    raise EnvelopeError("Envelope header is too large")
+                return b""
+            _check_streamable(header)
+            self._key = self._unwrap(header)
+            self._aad = bytes(self._buffer[:header.length])
+            self._header = header
+            del self._buffer[:header.length]
+
+        record_size = self._header.chunk_size + TAG_SIZE
+        out = []
+        # As in StreamEncryptor, a full record may be the final chunk until more data arrives
+        while len(self._buffer) > record_size:
+            out.append(self._open(bytes(self._buffer[:record_size]), final=False))
+            del self._buffer[:record_size]
+        return b"".join(out)
+
+    def finalize(self) -> bytes:
+        """
+        Decrypt the last chunk.
+
+        Returns:
+            The remaining plaintext
+
+        Raises:
+            EnvelopeError: If the envelope is truncated
+            ValueError: If the last chunk fails authentication
+        """
+        if self._header is None:
+            raise EnvelopeError("Envelope is truncated")
+        plaintext = self._open(bytes(self._buffer), final=True)
+        self._buffer.clear()
+        self._finalized = True
+        return plaintext
+
+
+def decrypt_chunked(data: bytes, unwrap: Unwrapper) -> bytes:
+    """
+    Decrypt a whole chunked envelope held in memory.
+    """
+    decryptor = StreamDecryptor(unwrap)
+    return decryptor.update(data) + decryptor.finalize()
+
+
+class ChunkReader:
+    """
+    Random access to the chunks of a chunked envelope in a seekable file.
+
+    The header is read and the data key unwrapped once; each chunk is then read
+    and verified on its own.
+    """
+
+    def __init__(self, fileobj: BinaryIO, unwrap: Unwrapper):
+        """
+        Args:
+            fileobj: Seekable binary file holding the envelope
+            unwrap: Called with the parsed header to get the data key
+
+        Raises:
+            EnvelopeError: If the file is not a chunked envelope
+        """
+        self._file = fileobj
+        self._envelope_size = fileobj.seek(0, 2)
+        fileobj.seek(0)
+        buffer = bytearray()
+        while True:
+            data = fileobj.read(4096)
+            buffer += data
+            try:
+                header = unpack_header(buffer)
+                break
+            except EnvelopeTruncatedError:
+                if not data or len(buffer) > MAX_HEADER_SIZE:
+                    raise
+        _check_streamable(header)
+        self.header = header
+        self.chunk_size = header.chunk_size
+        self._aad = bytes(buffer[:header.length])
+        self._key = unwrap(header)
+
+        record_size = self.chunk_size + TAG_SIZE
+        body_size = self._envelope_size - header.length
+        self.chunk_count = max(1, -(-body_size // record_size))
+        # Plaintext size, from the length of the last (possibly short) chunk
+        self.size = body_size - self.chunk_count * TAG_SIZE
+
+    def read_chunk(self, index: int) -> bytes:
+        """
+        Read and decrypt one chunk.
+
+        Raises:
+            IndexError: If the chunk does not exist
+            ValueError: If the chunk fails authentication
+        """
+        if not 0 <= index < self.chunk_count:
+            raise IndexError(f"Chunk {index} out of range")
+        record_size = self.chunk_size + TAG_SIZE
+        self._file.seek(self.header.length + index * record_size)
+        data = self._file.read(record_size)
+        final = index == self.chunk_count - 1
+        return open_chunk(self._key, self._aad, self.header.nonce, index, data, final)
+
+    def read(self, offset: int, length: int) -> bytes:
+        """
+        Read a plaintext byte range, decrypting only the chunks that cover it.
+        """
+        if offset < 0 or length < 0:
+            raise ValueError("Offset and length must not be negative")
+        end = min(offset + length, self.size)
+        if offset >= end:
+            return b""
+        first = offset // self.chunk_size
+        last = (end - 1) // self.chunk_size
+        data = b"".join(self.read_chunk(index) for index in range(first, last + 1))
+        start = offset - first * self.chunk_size
+        return data[start:start + end - offset]
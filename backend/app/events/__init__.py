@@ -0,0 +1,10 @@
+"""
+Event streaming module for XAAM backend.
+
+This module fans out task, deliverable and stake status changes to
+Server-Sent Events subscribers so clients do not have to poll.
+"""
+
+from .status_events import StatusEvent, StatusEventBroker, SubscriberLimitError, status_events
+
+__all__ = ["StatusEvent", "StatusEventBroker", "SubscriberLimitError", "status_events"]
@@ -0,0 +1,244 @@
+import os
+import socket
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+from uuid import uuid4
+
+import asyncpg
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Postgres NOTIFY payloads are limited to 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+
+Handler = Callable[[Dict[str, Any]], None]
+ResetHandler = Callable[[], None]
+
+
+def listen_dsn(database_url: str) -> Optional[str]:
+    """
+    Convert an SQLAlchemy database URL to a plain asyncpg DSN.
+    Returns None for databases without LISTEN/NOTIFY support.
+    """
+    scheme, sep, rest = database_url.partition("://")
+    if not sep or not scheme.startswith("postgresql"):
+        return None
+    return f"postgresql://{rest}"
+
+
+class InvalidationChannel:
+    """
+    Cross-process message channel for keeping per-process caches coherent.
+
+    Messages are published on a topic and delivered to the handlers registered for it,
+    first in the publishing process and then, through Postgres LISTEN/NOTIFY, in every
+    other API worker. Each process holds one dedicated listening connection. When that
+    connection drops, notifications sent in the meantime are lost, so on reconnect the
+    reset handlers of every topic run to flush the caches they guard.
+
+    The listening connection also holds a Postgres advisory lock on a worker index,
+    which gives each connected worker a small integer no other worker holds.
+
+    Without a Postgres DATABASE_URL the channel runs in local-only mode.
+    """
+
+    CHANNEL = "xaam_invalidation"
+    # Advisory lock namespace and size of the worker index space
+    WORKER_LOCK_CLASS = 0x58414D
+    MAX_WORKERS = 1000
+
+    def __init__(self, dsn: str = None):
+        """
+        Initialize the channel.
+
+        Args:
+            dsn: Postgres DSN. Defaults to one derived from the DATABASE_URL environment variable.
+        """
+        self.dsn = dsn or listen_dsn(os.getenv("DATABASE_URL", "postgresql+asyncpg://postgres:postgres@db:5432/xaam"))
+        # Identifies this process so it can skip its own notifications
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self.handlers: Dict[str, List[Handler]] = {}
+        self.reset_handlers: Dict[str, List[ResetHandler]] = {}
+        self._connection = None
+        self._listener: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._pending: Set[asyncio.Task] = set()
+        self.worker_index: Optional[int] = None
+        self.sent = 0
+        self.received = 0
+        self.reconnects = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    def subscribe(self, topic: str, handler: Handler, reset: ResetHandler = None):
+        """
+        Register a handler for messages on a topic.
+
+        Args:
+            topic: Topic name
+            handler: Called with the message payload
+            reset: Called when messages may have been missed, to flush all cached state for the topic
+        """
+        self.handlers.setdefault(topic, []).append(handler)
+        if reset is not None:
+            self.reset_handlers.setdefault(topic, []).append(reset)
+
+    def _dispatch(self, topic: str, payload: Dict[str, Any]):
+        for handler in self.handlers.get(topic, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Error handling {topic} invalidation: {e}")
+
+    def _reset_all(self):
+        for topic, handlers in self.reset_handlers.items():
+            for handler in handlers:
+                try:
+                    handler()
+                except Exception as e:
+                    logger.error(f"Error resetting {topic} state: {e}")
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        try:
+            message = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            logger.warning(f"Ignoring malformed invalidation message: {payload[:100]}")
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        self._dispatch(message.get("topic"), message.get("payload") or {})
+
+    async def publish(self, topic: str, payload: Dict[str, Any] = None, local: bool = True):
+        """
+        Deliver a message to the topic's handlers in this process and all other workers.
+
+        Args:
+            topic: Topic name
+            payload: JSON-serializable message payload
+            local: Whether to run this process's handlers too
+        """
+        payload = payload or {}
+        if local:
+            self._dispatch(topic, payload)
+        if not self.connected:
+            return
+
+        message = orjson.dumps({"origin": self.origin, "topic": topic, "payload": payload}).decode()
+        if len(message) > MAX_PAYLOAD_BYTES:
+            logger.warning(f"Dropping oversized {topic} invalidation ({len(message)} bytes)")
+            return
+        try:
+            async with self._lock:
+                await self._connection.execute("SELECT pg_notify($1, $2)", self.CHANNEL, message)
+            self.sent += 1
+        except Exception as e:
+            logger.error(f"Error sending {topic} invalidation: {e}")
+
+    def publish_nowait(self, topic: str, payload: Dict[str, Any] = None, local: bool = True):
+        """
+        Publish from synchronous code running on the event loop.
+        Local handlers run immediately; the notification is sent in the background.
+        """
+        payload = payload or {}
+        if local:
+            self._dispatch(topic, payload)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if not self.connected:
+            return
+        task = loop.create_task(self.publish(topic, payload, local=False))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def start(self):
+        """
+        Start listening for notifications from other workers.
+        """
+        if self._listener is not None:
+            return
+        if not self.dsn:
+            logger.info("Cache invalidation channel running in local-only mode")
+            return
+        self._lock = asyncio.Lock()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        delay = 1.0
+        first = True
+        while True:
+            closed = asyncio.Event()
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.CHANNEL, self._on_notify)
+                self.worker_index = await self._claim_worker_index(connection)
+                self._connection = connection
+                if not first:
+                    self.reconnects += 1
+                first = False
+                # Notifications may have been missed while disconnected
+                self._reset_all()
+                delay = 1.0
+                logger.info("Listening for cache invalidations")
+                await closed.wait()
+                logger.warning("Cache invalidation connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation connection failed: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            finally:
+                self._connection = None
+                self.worker_index = None
+
+    async def _claim_worker_index(self, connection) -> Optional[int]:
+        """
+        Take the lowest worker index not held by another worker.
+        The session-level advisory lock is released when the connection closes.
+        """
+        for index in range(self.MAX_WORKERS):
+            if await connection.fetchval("SELECT pg_try_advisory_lock($1, $2)", self.WORKER_LOCK_CLASS, index):
+                return index
+        logger.error(f"All {self.MAX_WORKERS} worker indexes are taken")
+        return None
+
+    async def stop(self):
+        """
+        Stop listening and close the connection.
+        """
+        connection = self._connection
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if connection is not None and not connection.is_closed():
+            await connection.close()
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get channel counters.
+        """
+        return {
+            "mode": "postgres" if self.dsn else "local",
+            "connected": self.connected,
+            "origin": self.origin,
+            "worker_index": self.worker_index,
+            "topics": sorted(self.handlers),
+            "sent": self.sent,
+            "received": self.received,
+            "reconnects": self.reconnects,
+        }
+
+
+# Create a singleton instance
+invalidation_channel = InvalidationChannel()
@@ -0,0 +1,293 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api.responses import dumps
+from app.db.models.task import Task, task_judge_association
+from app.events.invalidation import InvalidationChannel, invalidation_channel
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriberLimitError(Exception):
+    """Raised when the broker already has the maximum number of subscribers"""
+    pass
+
+
+class StatusEvent:
+    """
+    A status change of a task, deliverable or stake.
+    `task_id`, `creator_id` and `judge_ids` describe who the event concerns so
+    subscribers can filter on them.
+    """
+
+    __slots__ = ("id", "type", "entity_id", "task_id", "creator_id", "judge_ids", "status", "data", "timestamp")
+
+    def __init__(
+        self,
+        id: int,
+        type: str,
+        entity_id: str,
+        task_id: Optional[str],
+        creator_id: Optional[str],
+        judge_ids: List[str],
+        status: Optional[str],
+        data: Optional[Dict[str, Any]] = None,
+    ):
+        self.id = id
+        self.type = type
+        self.entity_id = entity_id
+        self.task_id = task_id
+        self.creator_id = creator_id
+        self.judge_ids = judge_ids
+        self.status = status
+        self.data = data or {}
+        self.timestamp = time.time()
+
+    def matches(self, task_id: Optional[str], creator_id: Optional[str], judge_id: Optional[str]) -> bool:
+        if task_id and self.task_id != task_id:
+            return False
+        if creator_id and self.creator_id != creator_id:
+            return False
+        if judge_id and judge_id not in self.judge_ids:
+            return False
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "entity_id": self.entity_id,
+            "task_id": self.task_id,
+            "creator_id": self.creator_id,
+            "judge_ids": self.judge_ids,
+            "status": self.status,
+            "data": self.data,
+            "timestamp": self.timestamp,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StatusEvent":
+        event = cls(
+            id=data["id"],
+            type=data["type"],
+            entity_id=data["entity_id"],
+            task_id=data.get("task_id"),
+            creator_id=data.get("creator_id"),
+            judge_ids=data.get("judge_ids") or [],
+            status=data.get("status"),
+            data=data.get("data"),
+        )
+        event.timestamp = data.get("timestamp", event.timestamp)
+        return event
+
+    def to_sse(self) -> bytes:
+        """
+        Encode the event as a Server-Sent Events message.
+        """
+        return b"id: %d\nevent: %s\ndata: %s\n\n" % (self.id, self.type.encode(), dumps(self.to_dict()))
+
+
+def _value(status: Any) -> Optional[str]:
+    # Routes pass statuses as enums or plain strings
+    if status is None:
+        return None
+    return getattr(status, "value", str(status))
+
+
+class StatusEventBroker:
+    """
+    Fan-out of status change events to Server-Sent Events subscribers.
+    Events published in one API worker are forwarded to the others over the
+    invalidation channel, so a subscriber sees events from every worker.
+
+    Recent events are kept in a bounded history so reconnecting clients can resume
+    from their Last-Event-ID. Each subscriber has a bounded queue; a subscriber that
+    falls too far behind is disconnected and resumes from its last event on reconnect.
+    """
+
+    def __init__(self, history_size: int = None, queue_size: int = 256, max_subscribers: int = None):
+        """
+        Initialize the broker.
+
+        Args:
+            history_size: Events kept for resumption. Defaults to STATUS_EVENTS_HISTORY or 1000.
+            queue_size: Events buffered per subscriber before it is disconnected.
+            max_subscribers: Maximum concurrent subscribers. Defaults to STATUS_EVENTS_MAX_SUBSCRIBERS or 1000.
+        """
+        self.history: deque = deque(maxlen=history_size or int(os.getenv("STATUS_EVENTS_HISTORY", "1000")))
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers or int(os.getenv("STATUS_EVENTS_MAX_SUBSCRIBERS", "1000"))
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.last_id = 0
+        # Used for the ID suffix only while no worker index is held (local-only mode)
+        self.fallback_suffix = random.randrange(InvalidationChannel.MAX_WORKERS)
+        self.last_ms = 0
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    @property
+    def id_suffix(self) -> int:
+        """
+        Event IDs are millisecond timestamps with a worker-unique suffix, so they are
+        unique and roughly ordered across workers and Last-Event-ID works on any of them.
+        The suffix is the worker index held through the invalidation channel.
+        """
+        index = invalidation_channel.worker_index
+        return self.fallback_suffix if index is None else index
+
+    @property
+    def full(self) -> bool:
+        return len(self.subscribers) >= self.max_subscribers
+
+    def publish(
+        self,
+        type: str,
+        entity_id: Any,
+        status: Any,
+        task_id: Any = None,
+        creator_id: Any = None,
+        judge_ids: List[Any] = None,
+        data: Dict[str, Any] = None,
+    ) -> StatusEvent:
+        """
+        Record an event and deliver it to all subscribers in every worker.
+        """
+        self.last_ms = max(self.last_ms + 1, int(time.time() * 1000))
+        event = StatusEvent(
+            id=self.last_ms * InvalidationChannel.MAX_WORKERS + self.id_suffix,
+            type=type,
+            entity_id=str(entity_id),
+            task_id=str(task_id) if task_id else None,
+            creator_id=str(creator_id) if creator_id else None,
+            judge_ids=[str(judge_id) for judge_id in judge_ids or []],
+            status=_value(status),
+            data=data,
+        )
+        self.published += 1
+        self.deliver(event)
+        invalidation_channel.publish_nowait("status_event", event.to_dict(), local=False)
+        return event
+
+    def deliver(self, event: StatusEvent):
+        """
+        Record an event and hand it to this process's subscribers.
+        """
+        self.last_id = max(self.last_id, event.id)
+        self.history.append(event)
+
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Close the slow subscriber; it can resume with Last-Event-ID
+                self.subscribers.discard(queue)
+                self.dropped_subscribers += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def publish_for_task(
+        self,
+        db: AsyncSession,
+        type: str,
+        entity_id: Any,
+        task_id: Any,
+        status: Any,
+        data: Dict[str, Any] = None,
+    ) -> Optional[StatusEvent]:
+        """
+        Publish an event about a task or one of its deliverables or stakes,
+        looking up the task's creator and judges for filtering.
+        Errors are logged rather than raised so they never fail the status update itself.
+        """
+        try:
+            result = await db.execute(
+                select(Task.creator_id, task_judge_association.c.judge_id)
+                .outerjoin(task_judge_association, task_judge_association.c.task_id == Task.id)
+                .where(Task.id == task_id)
+            )
+            rows = result.all()
+            creator_id = rows[0][0] if rows else None
+            judge_ids = [row[1] for row in rows if row[1] is not None]
+            return self.publish(type, entity_id, status, task_id, creator_id, judge_ids, data)
+        except Exception as e:
+            logger.error(f"Error publishing {type} event for {entity_id}: {e}")
+            return None
+
+    def replay(self, last_event_id: int) -> List[StatusEvent]:
+        """
+        Get the buffered events published after `last_event_id`.
+        """
+        return [event for event in self.history if event.id > last_event_id]
+
+    async def subscribe(
+        self,
+        task_id: Optional[str] = None,
+        creator_id: Optional[str] = None,
+        judge_id: Optional[str] = None,
+        last_event_id: Optional[int] = None,
+    ) -> AsyncIterator[Optional[StatusEvent]]:
+        """
+        Yield matching events as they are published, starting with any buffered
+        events after `last_event_id`. Yields None when no event arrived within the
+        keep-alive interval so callers can send a heartbeat.
+
+        Raises:
+            SubscriberLimitError: If the broker is at its subscriber limit
+        """
+        if self.full:
+            raise SubscriberLimitError("Too many status event subscribers")
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        # Register before replaying so no event published in between is missed
+        self.subscribers.add(queue)
+        try:
+            replayed = set()
+            if last_event_id is not None:
+                for event in self.replay(last_event_id):
+                    replayed.add(event.id)
+                    if event.matches(task_id, creator_id, judge_id):
+                        yield event
+
+            keepalive = float(os.getenv("STATUS_EVENTS_KEEPALIVE", "15"))
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                if event.id in replayed:
+                    continue
+                if event.matches(task_id, creator_id, judge_id):
+                    yield event
+        finally:
+            self.subscribers.discard(queue)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get broker counters.
+        """
+        return {
+            "subscribers": len(self.subscribers),
+            "last_event_id": self.last_id,
+            "published": self.published,
+            "history": len(self.history),
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+
+# Create a singleton instance
+status_events = StatusEventBroker()
+
+# Deliver events published by other workers
+invalidation_channel.subscribe("status_event", lambda payload: status_events.deliver(StatusEvent.from_dict(payload)))
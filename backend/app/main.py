@@ -1,6 +1,6 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 import os
 import logging
 import sys
@@ -24,13 +24,40 @@ logger = logging.getLogger(__name__)
 # Uncomment this and comment out the above import if needed
 from app.db.database import Base, engine, get_db
 
+from app.middleware.rate_limit import RateLimitMiddleware, rate_limit_state
+from app.middleware.idempotency import IdempotencyMiddleware, idempotency_state
+from app.encryption.async_service import async_encryption_service, CryptoPoolBusyError
+from app.encryption.key_pool import key_pool
+from app.encryption.service import encryption_service
+from app.encryption.decrypted_cache import decrypted_cache
+from app.encryption.rewrap import key_rewrap_service
+from app.encryption.key_grants import key_grant_issuer
+from app.pipeline.task_creation import task_creation_pipeline
+from app.events.invalidation import invalidation_channel
+from app.events.status_events import status_events
+from app.middleware.metrics import MetricsMiddleware
+from app.metrics.prometheus import register_stats, render_metrics, mark_process_dead
+
 # Create FastAPI app
 app = FastAPI(
     title="XAAM API",
     description="API for the Xpress AI Agent Marketplace",
     version="0.1.0",
+    default_response_class=ORJSONResponse,
 )
 
+# Replay stored responses for retried blockchain POSTs carrying an Idempotency-Key header
+if os.getenv("IDEMPOTENCY_ENABLED", "true").lower() == "true":
+    app.add_middleware(IdempotencyMiddleware)
+
+# Configure per-client rate limiting and load shedding
+# Added before CORS so throttled responses still carry CORS headers
+if os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true":
+    app.add_middleware(RateLimitMiddleware)
+
+# Record request latency and concurrency; wraps rate limiting so throttled requests are timed too
+app.add_middleware(MetricsMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -40,13 +67,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Saturated crypto pool: shed the request instead of queueing it indefinitely
+@app.exception_handler(CryptoPoolBusyError)
+async def crypto_pool_busy_handler(request, exc: CryptoPoolBusyError):
+    return ORJSONResponse(
+        {"detail": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # Health check endpoint
 @app.get("/health", tags=["Health"])
 async def health_check():
     return {"status": "healthy"}
 
+# Rate limiting and load shedding counters
+@app.get("/health/rate-limits", tags=["Health"])
+async def rate_limit_stats():
+    middleware = rate_limit_state["middleware"]
+    if middleware is None:
+        return {"enabled": False}
+    return {"enabled": True, **middleware.stats()}
+
+# Prometheus metrics
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+# Expose component counters as gauges
+register_stats("xaam_crypto_pool", "Crypto worker pool", async_encryption_service.stats, ("max_workers", "pending", "waiting", "completed", "rejected", "parallel_wraps"))
+register_stats(
+    "xaam_crypto_key_cache", "Imported RSA key cache of the crypto workers",
+    async_encryption_service.key_cache_stats, ("size", "hits", "misses", "evictions", "invalidations", "hit_rate"),
+)
+register_stats(
+    "xaam_compression", "Compression of encrypted payloads and deliverables", async_encryption_service.compression_stats,
+    ("compressed", "skipped", "bytes_in", "bytes_out", "compress_seconds", "decompressed", "decompress_seconds", "ratio"),
+)
+register_stats(
+    "xaam_key_rewrap", "Data key re-wrapping for judge changes", key_rewrap_service.stats,
+    ("rewrapped", "keys_wrapped", "keys_dropped", "failures"),
+)
+register_stats("xaam_key_grants", "Background task key grants", key_grant_issuer.stats, ("queued", "issued", "failures", "dropped"))
+register_stats("xaam_key_pool", "Pre-generated RSA key pool", key_pool.stats, ("size", "depth", "hits", "misses", "generated", "failures"))
+register_stats(
+    "xaam_keystore", "Private keystore and its hot-key cache",
+    lambda: encryption_service.keystore.stats() if encryption_service.keystore else {},
+    ("cached", "hits", "misses", "evictions", "hit_rate"),
+)
+register_stats(
+    "xaam_decrypted_cache", "Cache of decrypted task payloads and deliverables", decrypted_cache.stats,
+    ("entries", "bytes", "hits", "misses", "evictions", "expirations", "oversized", "hit_rate"),
+)
+register_stats("xaam_status_events", "Status event feed", status_events.stats, ("subscribers", "published", "dropped_subscribers"))
+register_stats(
+    "xaam_rate_limit", "Rate limiting and load shedding",
+    lambda: rate_limit_state["middleware"].stats() if rate_limit_state["middleware"] else {},
+    ("in_flight", "shed"),
+)
+
+# Cross-worker cache invalidation channel
+@app.get("/health/cluster", tags=["Health"])
+async def cluster_stats():
+    return invalidation_channel.stats()
+
+# Idempotency key counters
+@app.get("/health/idempotency", tags=["Health"])
+async def idempotency_stats():
+    middleware = idempotency_state["middleware"]
+    if middleware is None:
+        return {"enabled": False}
+    return {"enabled": True, **middleware.stats()}
+
 # Include routers
-from app.api.routes import tasks, agents, judges, blockchain, encryption, deliverables, wallets
+from app.api.routes import tasks, agents, judges, blockchain, encryption, deliverables, wallets, blobs, events
 
 app.include_router(tasks.router, prefix="/api/tasks", tags=["Tasks"])
 app.include_router(agents.router, prefix="/api/agents", tags=["Agents"])
@@ -55,6 +150,8 @@ app.include_router(blockchain.router, prefix="/api/blockchain", tags=["Blockchai
 app.include_router(encryption.router, prefix="/api/encryption", tags=["Encryption"])
 app.include_router(deliverables.router, prefix="/api/deliverables", tags=["Deliverables"])
 app.include_router(wallets.router, prefix="/api/wallets", tags=["Wallets"])
+app.include_router(blobs.router, prefix="/api/blobs", tags=["Blobs"])
+app.include_router(events.router, prefix="/api/events", tags=["Events"])
 
 # Protocol compliance check
 def check_protocol_compliance():
@@ -110,11 +207,35 @@ async def startup_event():
         logger.info("Database tables created")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
+    
+    # Listen for cache invalidations from other workers
+    if os.getenv("INVALIDATION_CHANNEL_ENABLED", "true").lower() == "true":
+        await invalidation_channel.start()
+    
+    # Start the background task creation pipeline
+    if os.getenv("TASK_PIPELINE_ENABLED", "true").lower() == "true":
+        await task_creation_pipeline.start()
+    
+    # Pre-generate key pairs for agent key issuance
+    if os.getenv("KEY_POOL_ENABLED", "true").lower() == "true":
+        await key_pool.start()
+    
+    # Grant task data keys to staking agents in the background
+    if os.getenv("KEY_GRANTS_ENABLED", "true").lower() == "true":
+        await key_grant_issuer.start()
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down XAAM API")
+    # Stop background workers
+    await task_creation_pipeline.stop()
+    await key_pool.stop()
+    await key_grant_issuer.stop()
+    await key_rewrap_service.stop()
+    await invalidation_channel.stop()
+    async_encryption_service.shutdown()
+    mark_process_dead()
     # Close database connections
     await engine.dispose()
 
@@ -0,0 +1,12 @@
+"""
+Metrics module for XAAM backend.
+
+This module defines the Prometheus metrics exposed at /metrics: HTTP request
+latency and concurrency, database pool usage, encryption operations and
+Solana RPC calls. Metrics are served directly by the API, so no external
+collector or push gateway is needed.
+"""
+
+from .prometheus import observe_crypto, observe_rpc, register_stats, render_metrics
+
+__all__ = ["observe_crypto", "observe_rpc", "register_stats", "render_metrics"]
@@ -0,0 +1,168 @@
+import os
+import time
+import functools
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.db.database import engine
+
+# With PROMETHEUS_MULTIPROC_DIR set (multi-worker serving), counters and histograms
+# are written to per-process files and aggregated across workers at scrape time
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Latency buckets in seconds, from fast cached reads up to slow blockchain calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+http_request_duration_seconds = Histogram(
+    "xaam_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+http_requests_in_flight = Gauge(
+    "xaam_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    multiprocess_mode="livesum",
+)
+crypto_operations_total = Counter(
+    "xaam_crypto_operations_total",
+    "Encryption service operations",
+    ["operation", "status"],
+)
+crypto_operation_duration_seconds = Histogram(
+    "xaam_crypto_operation_duration_seconds",
+    "Encryption service operation latency, including time queued for the crypto pool",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+solana_rpc_duration_seconds = Histogram(
+    "xaam_solana_rpc_duration_seconds",
+    "Solana RPC call latency",
+    ["method"],
+    buckets=LATENCY_BUCKETS,
+)
+solana_rpc_errors_total = Counter(
+    "xaam_solana_rpc_errors_total",
+    "Solana RPC calls that raised an error",
+    ["method"],
+)
+
+
+class StatsCollector(Collector):
+    """
+    Exposes numeric values from a component's stats() dict as gauges at scrape time.
+    Values are read from the scraped process only.
+    """
+
+    def __init__(self, prefix: str, documentation: str, stats: Callable[[], Dict[str, Any]], keys: Iterable[str]):
+        self.prefix = prefix
+        self.documentation = documentation
+        self.stats = stats
+        self.keys = tuple(keys)
+
+    def collect(self):
+        try:
+            values = self.stats()
+        except Exception:
+            return
+        for key in self.keys:
+            value = values.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                yield GaugeMetricFamily(f"{self.prefix}_{key}", f"{self.documentation}: {key}", value=value)
+
+
+# Collectors for per-process component state, registered by the components' owners
+process_collectors: list = []
+
+
+def register_stats(prefix: str, documentation: str, stats: Callable[[], Dict[str, Any]], keys: Iterable[str]):
+    """
+    Expose numeric fields of a stats() dict as gauges.
+    """
+    collector = StatsCollector(prefix, documentation, stats, keys)
+    process_collectors.append(collector)
+    if not MULTIPROCESS:
+        REGISTRY.register(collector)
+
+
+def db_pool_stats() -> Dict[str, Any]:
+    """
+    Get connection pool counters for the API database engine.
+    """
+    pool = engine.pool
+    stats = {}
+    for key in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, key, None)
+        if callable(method):
+            stats[key] = method()
+    return stats
+
+
+def observe_crypto(operation: str, started: float, success: bool):
+    """
+    Record one encryption service operation.
+    """
+    crypto_operations_total.labels(operation, "success" if success else "error").inc()
+    crypto_operation_duration_seconds.labels(operation).observe(time.perf_counter() - started)
+
+
+def observe_rpc(method: str):
+    """
+    Decorator recording latency and errors of an async Solana RPC call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                solana_rpc_errors_total.labels(method).inc()
+                raise
+            finally:
+                solana_rpc_duration_seconds.labels(method).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Returns:
+        Tuple of (body, content type)
+    """
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+    from prometheus_client import multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in process_collectors:
+        registry.register(collector)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """
+    Drop this worker's live gauges from the multi-process aggregate on shutdown.
+    """
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid())
+
+
+register_stats("xaam_db_pool", "Database connection pool", db_pool_stats, ("size", "checkedin", "checkedout", "overflow"))
@@ -0,0 +1,241 @@
+import os
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi.responses import ORJSONResponse, Response
+
+from app.db.database import AsyncSessionLocal
+from app.db.services.idempotency_service import idempotency_service
+from app.middleware.rate_limit import client_key
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# Routes whose side effects (Solana transactions, balance updates) must not run twice
+DEFAULT_IDEMPOTENT_PATHS = (
+    "/api/blockchain/stake",
+    "/api/blockchain/unstake",
+    "/api/blockchain/transfer-reward",
+    "/api/blockchain/submit-deliverable",
+)
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware replaying stored responses for POST requests carrying an Idempotency-Key header.
+
+    The first request with a key claims it in the idempotency_keys table and runs normally;
+    its response is stored for `ttl_seconds`. Retries with the same key and body get the
+    stored response back without re-executing the route. A retry that arrives while the
+    first request is still running gets 409, and reusing a key with a different body
+    gets 422. Server errors are not stored, so the request can be retried.
+
+    Keys are scoped to the client sending them, so two clients picking the same key
+    never see each other's responses. A claim whose request died without finishing
+    (for example in a worker crash) can be retaken after `lease_seconds`.
+    """
+
+    def __init__(
+        self,
+        app,
+        paths: Tuple[str, ...] = DEFAULT_IDEMPOTENT_PATHS,
+        ttl_seconds: int = None,
+        lease_seconds: int = None,
+        cache_size: int = 1024,
+        purge_interval: float = 300,
+        session_factory=None,
+    ):
+        self.app = app
+        self.paths = set(paths)
+        self.ttl_seconds = ttl_seconds or int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+        self.lease_seconds = lease_seconds or int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "120"))
+        self.cache_size = cache_size
+        self.purge_interval = purge_interval
+        self.session_factory = session_factory or AsyncSessionLocal
+        # Completed responses recently seen by this process, to answer retries without a DB round trip
+        self.cache: OrderedDict = OrderedDict()
+        self.last_purge = time.monotonic()
+        self.replayed = 0
+        self.stored = 0
+        self.conflicts = 0
+        # Expose the middleware so stats can be read from request handlers
+        idempotency_state["middleware"] = self
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        key = dict(scope.get("headers") or []).get(IDEMPOTENCY_HEADER)
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        key = key.decode("latin-1")
+        if len(key) > MAX_KEY_LENGTH:
+            response = ORJSONResponse({"detail": "Idempotency-Key is too long"}, status_code=400)
+            await response(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        request_hash = hashlib.sha256(scope["method"].encode() + scope["path"].encode() + b"\n" + body).hexdigest()
+        client = client_key(scope)
+        path = scope["path"]
+
+        cached = self._cache_get(key, path, client)
+        if cached:
+            await self._replay(cached, request_hash, scope, receive, send)
+            return
+
+        async with self.session_factory() as db:
+            record = await idempotency_service.get(db, key, path, client)
+            if record is None:
+                record = await idempotency_service.begin(
+                    db, key, path, request_hash, self.ttl_seconds, client, self.lease_seconds
+                )
+                if record is None:
+                    # Another request claimed the key between our lookup and insert
+                    record = await idempotency_service.get(db, key, path, client)
+                else:
+                    await self._execute(db, record, body, scope, send)
+                    await self._maybe_purge(db)
+                    return
+
+            if record is None or not record.completed:
+                self.conflicts += 1
+                response = ORJSONResponse(
+                    {"detail": "A request with this Idempotency-Key is already in progress"},
+                    status_code=409,
+                    headers={"Retry-After": "1"},
+                )
+                await response(scope, receive, send)
+                return
+
+            stored = self._cache_put(key, path, client, record.request_hash, record.status_code,
+                                     record.content_type, record.response_body, record.expires_at)
+            await self._replay(stored, request_hash, scope, receive, send)
+
+    async def _read_body(self, receive) -> bytes:
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        return b"".join(chunks)
+
+    async def _execute(self, db, record, body: bytes, scope, send):
+        """
+        Run the route with the buffered body, capturing the response to store it.
+        """
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if body_sent:
+                return {"type": "http.disconnect"}
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status_code = 500
+        content_type = None
+        chunks = []
+        # Read before the record is expired by the commits below
+        key, path, client = record.key, record.path, record.client
+        request_hash, expires_at = record.request_hash, record.expires_at
+
+        async def capture(message):
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers") or []).get(b"content-type", b"").decode("latin-1") or None
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except Exception:
+            await idempotency_service.release(db, record)
+            raise
+
+        if status_code >= 500:
+            await idempotency_service.release(db, record)
+            return
+
+        response_body = b"".join(chunks)
+        await idempotency_service.complete(db, record, status_code, content_type, response_body)
+        self._cache_put(key, path, client, request_hash, status_code, content_type, response_body, expires_at)
+        self.stored += 1
+
+    async def _replay(self, stored: Tuple, request_hash: str, scope, receive, send):
+        stored_hash, status_code, content_type, body, _ = stored
+        if stored_hash != request_hash:
+            response = ORJSONResponse(
+                {"detail": "Idempotency-Key was already used with a different request"},
+                status_code=422,
+            )
+        else:
+            self.replayed += 1
+            response = Response(
+                content=body,
+                status_code=status_code,
+                media_type=content_type,
+                headers={"Idempotent-Replayed": "true"},
+            )
+        await response(scope, receive, send)
+
+    def _cache_get(self, key: str, path: str, client: str) -> Optional[Tuple]:
+        stored = self.cache.get((key, path, client))
+        if stored is None:
+            return None
+        if stored[4] <= time.time():
+            del self.cache[(key, path, client)]
+            return None
+        self.cache.move_to_end((key, path, client))
+        return stored
+
+    def _cache_put(self, key: str, path: str, client: str, request_hash: str, status_code: int,
+                   content_type: Optional[str], body: bytes, expires_at: datetime) -> Tuple:
+        # Expiry is stored as naive UTC in the database
+        expires = time.time() + (expires_at - datetime.utcnow()).total_seconds()
+        stored = (request_hash, status_code, content_type, body, expires)
+        self.cache[(key, path, client)] = stored
+        self.cache.move_to_end((key, path, client))
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return stored
+
+    async def _maybe_purge(self, db):
+        now = time.monotonic()
+        if now - self.last_purge < self.purge_interval:
+            return
+        self.last_purge = now
+        try:
+            purged = await idempotency_service.purge_expired(db)
+            if purged:
+                logger.info(f"Purged {purged} expired idempotency keys")
+        except Exception as e:
+            logger.warning(f"Error purging idempotency keys: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get idempotency counters.
+        """
+        return {
+            "cached": len(self.cache),
+            "stored": self.stored,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+        }
+
+
+# Holds the active middleware instance once the app has been built
+idempotency_state: Dict[str, Optional[IdempotencyMiddleware]] = {"middleware": None}
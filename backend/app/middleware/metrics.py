@@ -0,0 +1,41 @@
+import time
+
+from app.metrics.prometheus import http_request_duration_seconds, http_requests_in_flight
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route and requests in flight.
+    Requests are labelled with the matched route template (e.g. /api/tasks/{task_id})
+    rather than the raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            http_request_duration_seconds.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code),
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,286 @@
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.responses import ORJSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` requests per second with bursts of up to `burst` requests.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def wait_time(self, now: float = None) -> float:
+        """
+        Refill the bucket and check for a token without taking it.
+
+        Returns:
+            0 if a token is available, otherwise the number of seconds until one is
+        """
+        now = now if now is not None else time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float = None) -> float:
+        """
+        Try to take one token from the bucket.
+
+        Returns:
+            0 if a token was taken, otherwise the number of seconds until one is available
+        """
+        retry_after = self.wait_time(now)
+        if not retry_after:
+            self.tokens -= 1
+        return retry_after
+
+
+def matches_prefix(path: str, prefix: str) -> bool:
+    """
+    Check whether a path is the prefix or below it, so "/api/tasks" does not match "/api/tasksets".
+    """
+    return path == prefix or path.startswith(prefix.rstrip("/") + "/")
+
+
+class RateLimitPolicy:
+    """
+    Rate limit applied to a group of routes sharing a path prefix.
+    """
+
+    def __init__(self, name: str, prefix: str, rate: float, burst: float):
+        self.name = name
+        self.prefix = prefix
+        self.rate = rate
+        self.burst = burst
+
+    def __repr__(self):
+        return f"<RateLimitPolicy(name='{self.name}', prefix='{self.prefix}', rate={self.rate}, burst={self.burst})>"
+
+
+# Default route groups, most specific prefix first
+DEFAULT_POLICIES = [
+    RateLimitPolicy("encryption", "/api/encryption", rate=5, burst=10),
+    RateLimitPolicy("blockchain", "/api/blockchain", rate=5, burst=10),
+    RateLimitPolicy("tasks", "/api/tasks", rate=20, burst=40),
+    RateLimitPolicy("default", "/", rate=50, burst=100),
+]
+
+
+def load_policies() -> List[RateLimitPolicy]:
+    """
+    Load route group policies from the RATE_LIMITS environment variable.
+    RATE_LIMITS is a JSON object of group name -> {"prefix", "rate", "burst"}; groups not
+    listed keep their defaults.
+    """
+    policies = {policy.name: policy for policy in DEFAULT_POLICIES}
+    raw = os.getenv("RATE_LIMITS")
+    if raw:
+        try:
+            for name, config in json.loads(raw).items():
+                current = policies.get(name)
+                policies[name] = RateLimitPolicy(
+                    name,
+                    config.get("prefix", current.prefix if current else f"/api/{name}"),
+                    float(config.get("rate", current.rate if current else 50)),
+                    float(config.get("burst", current.burst if current else 100)),
+                )
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Invalid RATE_LIMITS configuration, using defaults: {e}")
+            policies = {policy.name: policy for policy in DEFAULT_POLICIES}
+
+    # Match the longest prefix first
+    return sorted(policies.values(), key=lambda policy: len(policy.prefix), reverse=True)
+
+
+class RateLimiter:
+    """
+    Per-client token buckets for each route group, bounded to `max_clients` buckets per group.
+
+    Agent and wallet headers are not authenticated, so a client could send a new
+    identity with every request to get a fresh bucket. Requests are therefore also
+    charged to a per-IP bucket allowing `ip_multiplier` times the group's rate,
+    which leaves room for several agents behind one host (such as the MCP server).
+    """
+
+    def __init__(self, policies: List[RateLimitPolicy], max_clients: int = 10000, ip_multiplier: float = None):
+        self.policies = policies
+        self.max_clients = max_clients
+        self.ip_multiplier = ip_multiplier or float(os.getenv("RATE_LIMIT_IP_MULTIPLIER", "10"))
+        self.buckets: Dict[str, OrderedDict] = {policy.name: OrderedDict() for policy in policies}
+        self.ip_buckets: Dict[str, OrderedDict] = {policy.name: OrderedDict() for policy in policies}
+        self.allowed: Dict[str, int] = {policy.name: 0 for policy in policies}
+        self.throttled: Dict[str, int] = {policy.name: 0 for policy in policies}
+
+    def policy_for(self, path: str) -> RateLimitPolicy:
+        for policy in self.policies:
+            if matches_prefix(path, policy.prefix):
+                return policy
+        return self.policies[-1]
+
+    def _bucket(self, buckets: OrderedDict, key: str, rate: float, burst: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, burst)
+            buckets[key] = bucket
+            if len(buckets) > self.max_clients:
+                buckets.popitem(last=False)
+        else:
+            buckets.move_to_end(key)
+        return bucket
+
+    def check(self, path: str, client_key: str, ip_key: Optional[str] = None) -> Tuple[RateLimitPolicy, float]:
+        """
+        Check whether a request is allowed.
+
+        Args:
+            path: Request path
+            client_key: Client identity from client_key()
+            ip_key: Address the request came from, if it differs from the client identity
+
+        Returns:
+            Tuple of (policy, retry_after); retry_after is 0 if the request is allowed
+        """
+        policy = self.policy_for(path)
+
+        buckets = [self._bucket(self.buckets[policy.name], client_key, policy.rate, policy.burst)]
+        if ip_key and ip_key != client_key:
+            buckets.append(self._bucket(
+                self.ip_buckets[policy.name], ip_key,
+                policy.rate * self.ip_multiplier, policy.burst * self.ip_multiplier,
+            ))
+        # Take a token only if every bucket has one, so a throttled request costs nothing
+        now = time.monotonic()
+        retry_after = max(bucket.wait_time(now) for bucket in buckets)
+        if not retry_after:
+            for bucket in buckets:
+                bucket.consume(now)
+
+        if retry_after:
+            self.throttled[policy.name] += 1
+        else:
+            self.allowed[policy.name] += 1
+        return policy, retry_after
+
+
+def client_ip(scope) -> str:
+    """
+    Identify the address a request came from.
+    """
+    headers = dict(scope.get("headers") or [])
+    forwarded = headers.get(b"x-forwarded-for")
+    if forwarded and os.getenv("TRUST_PROXY_HEADERS", "").lower() == "true":
+        return f"ip:{forwarded.decode('latin-1').split(',')[0].strip()}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def client_key(scope) -> str:
+    """
+    Identify the client making a request: agent ID, then wallet address, then IP address.
+    """
+    headers = dict(scope.get("headers") or [])
+    agent_id = headers.get(b"x-agent-id")
+    if agent_id:
+        return f"agent:{agent_id.decode('latin-1')}"
+    wallet = headers.get(b"x-wallet-address")
+    if wallet:
+        return f"wallet:{wallet.decode('latin-1')}"
+    return client_ip(scope)
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing per-client rate limits and a global concurrency limit.
+
+    Requests over a client's rate get 429 with Retry-After. Requests that cannot
+    start within `queue_budget` seconds because `max_concurrency` requests are
+    already in flight are shed with 503 and Retry-After instead of queueing.
+    """
+
+    def __init__(
+        self,
+        app,
+        policies: List[RateLimitPolicy] = None,
+        max_concurrency: int = None,
+        queue_budget: float = None,
+        # Event streams stay open indefinitely and are capped by the event broker instead
+        exempt_paths: Tuple[str, ...] = ("/health", "/metrics", "/docs", "/openapi.json", "/api/events/status"),
+    ):
+        self.app = app
+        self.limiter = RateLimiter(policies or load_policies())
+        self.max_concurrency = max_concurrency or int(os.getenv("MAX_CONCURRENT_REQUESTS", "100"))
+        self.queue_budget = queue_budget if queue_budget is not None else float(os.getenv("REQUEST_QUEUE_BUDGET", "0.5"))
+        self.exempt_paths = exempt_paths
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.shed = 0
+        # Expose the middleware so stats can be read from request handlers
+        rate_limit_state["middleware"] = self
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or any(matches_prefix(scope["path"], path) for path in self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        policy, retry_after = self.limiter.check(scope["path"], client_key(scope), client_ip(scope))
+        if retry_after:
+            response = ORJSONResponse(
+                {"detail": f"Rate limit exceeded for {policy.name} routes"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), timeout=self.queue_budget)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            response = ORJSONResponse(
+                {"detail": "Server is overloaded, please retry"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get rate limiting and load shedding counters.
+        """
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "shed": self.shed,
+            "allowed": dict(self.limiter.allowed),
+            "throttled": dict(self.limiter.throttled),
+        }
+
+
+# Holds the active middleware instance once the app has been built
+rate_limit_state: Dict[str, Optional[RateLimitMiddleware]] = {"middleware": None}
@@ -0,0 +1,10 @@
+"""
+Background processing pipelines for XAAM backend.
+
+This module provides staged, queue-based pipelines that move slow work
+(encryption, storage, blockchain calls) off the request path.
+"""
+
+from .task_creation import TaskCreationPipeline, PipelineFullError, task_creation_pipeline
+
+__all__ = ["TaskCreationPipeline", "PipelineFullError", "task_creation_pipeline"]
@@ -0,0 +1,345 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.database import AsyncSessionLocal
+from app.db.models.agent import Agent
+from app.db.models.task import TaskStatus
+from app.db.models.task_job import TaskJob, TaskJobStatus
+from app.db.services.task_service import task_service
+from app.db.services.task_job_service import task_job_service
+from app.db.services.wallet_service import wallet_service
+from app.schemas.task import TaskCreate
+from app.schemas.task_job import TaskJobCreate
+from app.encryption.async_service import async_encryption_service
+from app.encryption.db_service import key_management_service
+from app.storage.blob_store import blob_store
+from app.blockchain.solana_client import solana_client
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineFullError(Exception):
+    """Raised when the pipeline cannot accept more jobs"""
+    pass
+
+
+class StageMetrics:
+    """
+    Throughput and latency counters for one pipeline stage.
+    """
+
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.started_at = time.monotonic()
+
+    def record(self, seconds: float, success: bool):
+        if success:
+            self.processed += 1
+        else:
+            self.failed += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self, queue_depth: int) -> Dict[str, float]:
+        handled = self.processed + self.failed
+        uptime = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "queue_depth": queue_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_seconds": self.total_seconds / handled if handled else 0.0,
+            "max_seconds": self.max_seconds,
+            "throughput_per_second": self.processed / uptime,
+        }
+
+
+class TaskCreationJobItem:
+    """
+    In-memory state of a job moving through the pipeline.
+    The plaintext payload only lives here and is dropped once it has been encrypted.
+    """
+
+    def __init__(self, job_id: UUID, request: TaskJobCreate):
+        self.job_id = job_id
+        self.request = request
+        self.payload: Optional[Dict[str, Any]] = request.payload
+        self.encryption_result: Optional[Dict[str, Any]] = None
+        self.task_id: Optional[UUID] = None
+        self.nft_id: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+
+
+class TaskCreationPipeline:
+    """
+    Asynchronous task-creation pipeline.
+    Jobs pass through three stages, each with its own queue and workers:
+    encrypt (fetch judge keys and encrypt the payload), store (write the ciphertext
+    to the blob store and create the task) and mint (create the task NFT on Solana).
+    Job status is persisted in the task_jobs table so any API worker can report it.
+
+    Jobs only live in this process's queues, so the pipeline periodically touches the
+    jobs it holds; unfinished jobs nobody has touched for `stale_after` seconds (for
+    example after a restart) are marked FAILED by whichever worker notices first.
+    """
+
+    STAGES = ("encrypt", "store", "mint")
+
+    def __init__(
+        self,
+        workers_per_stage: int = None,
+        queue_size: int = None,
+        heartbeat_interval: float = None,
+        stale_after: float = None,
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            workers_per_stage: Concurrent workers per stage. Defaults to TASK_PIPELINE_WORKERS or 2.
+            queue_size: Maximum queued jobs per stage. Defaults to TASK_PIPELINE_QUEUE_SIZE or 1000.
+            heartbeat_interval: Seconds between touches of in-flight jobs. Defaults to
+                TASK_PIPELINE_HEARTBEAT or 30.
+            stale_after: Seconds without a touch after which an unfinished job is failed.
+                Defaults to TASK_PIPELINE_STALE_SECONDS or 300.
+        """
+        self.workers_per_stage = workers_per_stage or int(os.getenv("TASK_PIPELINE_WORKERS", "2"))
+        self.queue_size = queue_size or int(os.getenv("TASK_PIPELINE_QUEUE_SIZE", "1000"))
+        self.heartbeat_interval = heartbeat_interval or float(os.getenv("TASK_PIPELINE_HEARTBEAT", "30"))
+        self.stale_after = stale_after or float(os.getenv("TASK_PIPELINE_STALE_SECONDS", "300"))
+        # Jobs held by this process, and events waking long-polls when one of them changes
+        self.active: Dict[UUID, TaskCreationJobItem] = {}
+        self.updates: Dict[UUID, asyncio.Event] = {}
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.metrics: Dict[str, StageMetrics] = {stage: StageMetrics() for stage in self.STAGES}
+        self.workers: List[asyncio.Task] = []
+        self.handlers: Dict[str, Callable[[AsyncSession, TaskCreationJobItem], Awaitable[None]]] = {
+            "encrypt": self._encrypt,
+            "store": self._store,
+            "mint": self._mint,
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self.workers)
+
+    async def start(self):
+        """
+        Start the stage workers.
+        """
+        if self.running:
+            return
+        self.queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in self.STAGES}
+        for index, stage in enumerate(self.STAGES):
+            next_stage = self.STAGES[index + 1] if index + 1 < len(self.STAGES) else None
+            for _ in range(self.workers_per_stage):
+                self.workers.append(asyncio.create_task(self._worker(stage, next_stage)))
+        self.workers.append(asyncio.create_task(self._maintain()))
+        logger.info(f"Started task creation pipeline with {self.workers_per_stage} workers per stage")
+
+    async def stop(self):
+        """
+        Stop the stage workers. Jobs still in flight are left in their current status.
+        """
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def submit(self, db: AsyncSession, request: TaskJobCreate) -> TaskJob:
+        """
+        Record a new job and queue it for the first stage.
+
+        Raises:
+            PipelineFullError: If the pipeline is not running or its first queue is full
+        """
+        queue = self.queues.get(self.STAGES[0])
+        if not self.running or queue is None or queue.full():
+            raise PipelineFullError("Task creation pipeline is not accepting jobs")
+
+        job = await task_job_service.create(db, obj_in={
+            "creator_id": request.creator_id,
+            "title": request.title,
+            "status": TaskJobStatus.QUEUED,
+        })
+        item = TaskCreationJobItem(job.id, request)
+        self.active[job.id] = item
+        queue.put_nowait(item)
+        return job
+
+    def _notify(self, job_id: UUID, finished: bool):
+        if finished:
+            self.active.pop(job_id, None)
+        event = self.updates.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def wait_for_update(self, job_id: UUID, timeout: float):
+        """
+        Wait until a job held by this process moves to another stage, or for `timeout`
+        seconds. Jobs held by other workers can only be polled, so this just sleeps for them.
+        """
+        if job_id not in self.active:
+            await asyncio.sleep(timeout)
+            return
+        event = self.updates.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _maintain(self):
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await task_job_service.touch(db, list(self.active))
+                    failed = await task_job_service.fail_stale(db, self.stale_after)
+                    if failed:
+                        logger.warning(f"Marked {failed} abandoned task creation jobs as failed")
+            except Exception as e:
+                logger.error(f"Error maintaining task creation jobs: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def _worker(self, stage: str, next_stage: Optional[str]):
+        queue = self.queues[stage]
+        handler = self.handlers[stage]
+        while True:
+            item = await queue.get()
+            start = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as db:
+                    try:
+                        await handler(db, item)
+                        item.timings[stage] = time.perf_counter() - start
+                        self.metrics[stage].record(item.timings[stage], True)
+                        if next_stage is None:
+                            await task_job_service.update_status(
+                                db, item.job_id, TaskJobStatus.COMPLETED, stage_timings=item.timings, nft_id=item.nft_id
+                            )
+                        self._notify(item.job_id, finished=next_stage is None)
+                        if next_stage:
+                            await self.queues[next_stage].put(item)
+                    except Exception as e:
+                        item.timings[stage] = time.perf_counter() - start
+                        self.metrics[stage].record(item.timings[stage], False)
+                        logger.error(f"Task creation job {item.job_id} failed in {stage} stage: {e}")
+                        await db.rollback()
+                        await task_job_service.update_status(
+                            db, item.job_id, TaskJobStatus.FAILED,
+                            stage_timings=item.timings, error=f"{stage}: {str(e)}", task_id=None
+                        )
+                        await self._discard_task(db, item)
+                        self._notify(item.job_id, finished=True)
+            except Exception as e:
+                logger.error(f"Error recording task creation job {item.job_id}: {e}")
+                self._notify(item.job_id, finished=True)
+            finally:
+                queue.task_done()
+
+    async def _discard_task(self, db: AsyncSession, item: TaskCreationJobItem):
+        """
+        Delete the task created by the store stage of a job that failed later,
+        so no task without an NFT is left behind.
+        """
+        if item.task_id is None:
+            return
+        try:
+            await task_service.remove(db, id=item.task_id)
+        except Exception as e:
+            logger.error(f"Error removing task {item.task_id} of failed job {item.job_id}: {e}")
+            await db.rollback()
+        item.task_id = None
+
+    async def _encrypt(self, db: AsyncSession, item: TaskCreationJobItem):
+        await task_job_service.update_status(db, item.job_id, TaskJobStatus.ENCRYPTING)
+
+        judge_public_keys = await key_management_service.get_judge_public_keys(db, item.request.judges)
+        if not judge_public_keys:
+            raise ValueError("No judge public keys found")
+
+        item.encryption_result = await async_encryption_service.encrypt_task_payload(item.payload, judge_public_keys)
+        item.payload = None
+
+    async def _store(self, db: AsyncSession, item: TaskCreationJobItem):
+        await task_job_service.update_status(db, item.job_id, TaskJobStatus.STORING, stage_timings=item.timings)
+
+        encrypted_keys = item.encryption_result["encrypted_keys"]
+        request = item.request
+        task_create = TaskCreate(
+            title=request.title,
+            summary=request.summary,
+            encrypted_payload_url=await blob_store.put_async(item.encryption_result["encrypted_payload"]),
+            encryption_key=encrypted_keys[next(iter(encrypted_keys))] if encrypted_keys else None,
+            encryption_keys=encrypted_keys,
+            creator_id=request.creator_id,
+            deadline=request.deadline,
+            reward_amount=request.reward_amount,
+            reward_currency=request.reward_currency,
+            judges=request.judges,
+            # Placeholder until the mint stage assigns the NFT
+            nft_id=f"pending_{uuid4().hex[:8]}",
+            status=TaskStatus.CREATED,
+        )
+        task = await task_service.create_with_judges(db, task_create)
+        item.task_id = task.id
+        item.encryption_result = None
+
+        await task_job_service.update_status(db, item.job_id, TaskJobStatus.STORING, task_id=task.id)
+
+    async def _mint(self, db: AsyncSession, item: TaskCreationJobItem):
+        await task_job_service.update_status(db, item.job_id, TaskJobStatus.MINTING, stage_timings=item.timings)
+
+        request = item.request
+        result = await db.execute(select(Agent.wallet_address).where(Agent.id.in_(request.judges)))
+        judge_wallets = list(result.scalars().all())
+
+        creator_wallet = request.creator_wallet
+        wallet = None
+        if creator_wallet:
+            wallet = await wallet_service.get_by_address(db, creator_wallet)
+        else:
+            wallet = await wallet_service.get_by_agent(db, request.creator_id)
+
+        task = await task_service.get(db, item.task_id)
+        nft = await solana_client.create_task_nft(
+            title=request.title,
+            summary=request.summary,
+            encrypted_payload_url=task.encrypted_payload_url,
+            deadline=int(request.deadline.timestamp()),
+            reward_amount=int(request.reward_amount * 1_000_000_000),
+            reward_currency=request.reward_currency,
+            judges=judge_wallets,
+        )
+        nft_id = nft["task_nft"]
+
+        await task_service.update(db, db_obj=task, obj_in={"nft_id": nft_id})
+        if wallet:
+            await wallet_service.add_nft(db, wallet.id, nft_id)
+        item.nft_id = nft_id
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get per-stage throughput metrics.
+        """
+        return {
+            "running": self.running,
+            "workers_per_stage": self.workers_per_stage,
+            "active_jobs": len(self.active),
+            "stages": {
+                stage: self.metrics[stage].snapshot(self.queues[stage].qsize() if stage in self.queues else 0)
+                for stage in self.STAGES
+            },
+        }
+
+
+# Create a singleton instance
+task_creation_pipeline = TaskCreationPipeline()
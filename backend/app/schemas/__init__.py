@@ -1,16 +1,20 @@
 from app.schemas.agent import Agent, AgentCreate, AgentUpdate
 from app.schemas.task import Task, TaskCreate, TaskUpdate
-from app.schemas.deliverable import Deliverable, DeliverableCreate, DeliverableUpdate
+from app.schemas.deliverable import Deliverable, DeliverableCreate, DeliverableUpdate, DeliverableBatchDecrypt
 from app.schemas.stake import Stake, StakeCreate, StakeUpdate
 from app.schemas.wallet import Wallet, WalletCreate, WalletUpdate
 from app.schemas.judge import Judge, JudgeCreate, JudgeUpdate
+from app.schemas.task_job import TaskJob, TaskJobCreate, TaskJobUpdate
+from app.schemas.task_overview import TaskOverview
 
 # Export all schemas
 __all__ = [
     "Agent", "AgentCreate", "AgentUpdate",
     "Task", "TaskCreate", "TaskUpdate",
-    "Deliverable", "DeliverableCreate", "DeliverableUpdate",
+    "Deliverable", "DeliverableCreate", "DeliverableUpdate", "DeliverableBatchDecrypt",
     "Stake", "StakeCreate", "StakeUpdate",
     "Wallet", "WalletCreate", "WalletUpdate",
-    "Judge", "JudgeCreate", "JudgeUpdate"
+    "Judge", "JudgeCreate", "JudgeUpdate",
+    "TaskJob", "TaskJobCreate", "TaskJobUpdate",
+    "TaskOverview"
 ]
\ No newline at end of file
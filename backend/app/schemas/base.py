@@ -1,14 +1,23 @@
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Type
 from uuid import UUID
 
 
 class BaseSchema(BaseModel):
     """Base schema with common fields for all schemas"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: Optional[UUID] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
\ No newline at end of file
+
+@lru_cache(maxsize=None)
+def list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    """
+    Get a cached TypeAdapter for a list of the given schema.
+    Building a TypeAdapter compiles a validator and serializer, so it is done once per schema.
+    """
+    return TypeAdapter(List[schema])
\ No newline at end of file
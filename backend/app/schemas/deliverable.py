@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Dict, List
 from enum import Enum
 from datetime import datetime
 from uuid import UUID
@@ -42,4 +42,17 @@ class DeliverableUpdate(DeliverableBase):
 
 class Deliverable(DeliverableBase, BaseSchema):
     """Schema for returning a Deliverable"""
-    pass
\ No newline at end of file
+    pass
+
+
+class DeliverableBatchDecrypt(BaseModel):
+    """Schema for decrypting several deliverables for a judge: a task's, or the listed ones"""
+    judge_id: UUID
+    task_id: Optional[UUID] = None
+    deliverable_ids: Optional[List[UUID]] = None
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if (self.task_id is None) == (self.deliverable_ids is None):
+            raise ValueError("Provide either task_id or deliverable_ids")
+        return self
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict
 from enum import Enum
 from datetime import datetime
 from uuid import UUID
@@ -22,6 +22,7 @@ class TaskBase(BaseModel):
     summary: Optional[str] = None
     encrypted_payload_url: Optional[str] = None
     encryption_key: Optional[str] = None
+    encryption_keys: Optional[Dict[str, str]] = None  # Judge ID -> Encrypted key
     creator_id: Optional[UUID] = None
     status: Optional[TaskStatus] = None
     deadline: Optional[datetime] = None
@@ -48,4 +49,11 @@ class TaskUpdate(TaskBase):
 
 class Task(TaskBase, BaseSchema):
     """Schema for returning a Task"""
-    pass
\ No newline at end of file
+
+    @field_validator("judges", mode="before")
+    @classmethod
+    def judge_ids(cls, value):
+        # ORM tasks carry the judge agents themselves
+        if value is None:
+            return value
+        return [getattr(judge, "id", judge) for judge in value]
\ No newline at end of file
@@ -0,0 +1,50 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any
+from enum import Enum
+from datetime import datetime
+from uuid import UUID
+from app.schemas.base import BaseSchema
+
+
+class TaskJobStatus(str, Enum):
+    QUEUED = "QUEUED"
+    ENCRYPTING = "ENCRYPTING"
+    STORING = "STORING"
+    MINTING = "MINTING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+
+class TaskJobBase(BaseModel):
+    """Base schema for TaskJob"""
+    creator_id: Optional[UUID] = None
+    title: Optional[str] = None
+    status: Optional[TaskJobStatus] = None
+    task_id: Optional[UUID] = None
+    nft_id: Optional[str] = None
+    error: Optional[str] = None
+    stage_timings: Optional[Dict[str, float]] = None
+    completed_at: Optional[datetime] = None
+
+
+class TaskJobCreate(BaseModel):
+    """Schema for submitting a task to the asynchronous creation pipeline"""
+    title: str
+    summary: str
+    creator_id: UUID
+    deadline: datetime
+    reward_amount: float
+    reward_currency: str = "USDC"
+    judges: List[UUID]
+    payload: Dict[str, Any]
+    creator_wallet: Optional[str] = None
+
+
+class TaskJobUpdate(TaskJobBase):
+    """Schema for updating a TaskJob"""
+    pass
+
+
+class TaskJob(TaskJobBase, BaseSchema):
+    """Schema for returning a TaskJob"""
+    pass
\ No newline at end of file
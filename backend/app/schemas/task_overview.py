@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict
+from datetime import datetime
+from uuid import UUID
+from app.schemas.task import Task
+from app.schemas.deliverable import DeliverableStatus
+
+
+class ScoreSummary(BaseModel):
+    """Aggregate of judge scores"""
+    count: int = 0
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class JudgeSummary(BaseModel):
+    """A task's judge and how many of its deliverables they have scored"""
+    id: UUID
+    name: str
+    wallet_address: str
+    public_key: str
+    reputation_score: float
+    scored_deliverables: int = 0
+
+
+class DeliverableSummary(BaseModel):
+    """A deliverable without its encrypted content or keys"""
+    id: UUID
+    agent_id: UUID
+    status: DeliverableStatus
+    submission_time: datetime
+    score: ScoreSummary
+    pending_judges: int = 0
+
+
+class StakeSummary(BaseModel):
+    """Stake counts and amounts for a task"""
+    count: int = 0
+    total_amount: float = 0.0
+    by_status: Dict[str, int] = {}
+
+
+class TaskOverview(BaseModel):
+    """Everything the task page needs in one response"""
+    task: Task
+    judges: List[JudgeSummary]
+    deliverables: List[DeliverableSummary]
+    score: ScoreSummary
+    stakes: StakeSummary
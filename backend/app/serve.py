@@ -0,0 +1,61 @@
+"""
+Production entry point for the XAAM API.
+
+Runs app.main under several uvicorn worker processes with the uvloop event
+loop and the httptools HTTP parser when they are installed. Per-process
+caches (agent public keys, the Solana client configuration, the status
+event feed) are kept coherent across workers by the Postgres LISTEN/NOTIFY
+invalidation channel in app.events.invalidation. Rate limits and the
+request concurrency limit are enforced per worker.
+
+Usage:
+    python -m app.serve
+
+Environment:
+    WEB_CONCURRENCY: Number of worker processes. Defaults to the CPU count.
+    HOST, PORT: Address to bind. Defaults to 0.0.0.0:8000.
+    PROMETHEUS_MULTIPROC_DIR: Directory for aggregating /metrics across workers.
+        Defaults to a fresh temporary directory when running more than one worker.
+"""
+import os
+import tempfile
+import importlib.util
+
+import uvicorn
+
+
+def worker_count() -> int:
+    """
+    Get the number of worker processes to run.
+    """
+    configured = int(os.getenv("WEB_CONCURRENCY", "0"))
+    return configured if configured > 0 else os.cpu_count() or 1
+
+
+def available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main():
+    workers = worker_count()
+    if workers > 1 and int(os.getenv("CRYPTO_POOL_WORKERS", "0")) <= 0:
+        # Each worker runs its own crypto pool; split the CPUs between them
+        os.environ["CRYPTO_POOL_WORKERS"] = str(max(1, (os.cpu_count() or 1) // workers))
+    if workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Let /metrics aggregate counters and histograms from all workers
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="xaam_metrics_")
+
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=workers,
+        loop="uvloop" if available("uvloop") else "asyncio",
+        http="httptools" if available("httptools") else "h11",
+        proxy_headers=True,
+        timeout_keep_alive=int(os.getenv("KEEP_ALIVE_TIMEOUT", "5")),
+    )
+
+
+if __name__ == "__main__":
+    main()
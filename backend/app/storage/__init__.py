@@ -0,0 +1,10 @@
+"""
+Blob storage module for XAAM backend.
+
+This module provides content-addressed storage for encrypted task payloads
+and deliverables, so that database rows only hold references to ciphertext.
+"""
+
+from .blob_store import BlobStore, LocalBlobStore, BlobNotFoundError, BlobTooLargeError, blob_store, is_blob_ref
+
+__all__ = ["BlobStore", "LocalBlobStore", "BlobNotFoundError", "BlobTooLargeError", "blob_store", "is_blob_ref"]
@@ -0,0 +1,349 @@
+import os
+import re
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import AsyncIterator, BinaryIO, Optional
+
+logger = logging.getLogger(__name__)
+
+# Prefix used for blob references stored in the database
+BLOB_REF_PREFIX = "sha256:"
+
+# Size of the chunks used when streaming blobs in and out of storage
+CHUNK_SIZE = 64 * 1024
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobNotFoundError(FileNotFoundError):
+    """Raised when a referenced blob does not exist in the store"""
+    pass
+
+
+class BlobTooLargeError(ValueError):
+    """Raised when a streamed blob exceeds the allowed size"""
+    pass
+
+
+def is_blob_ref(value: Optional[str]) -> bool:
+    """
+    Check whether a value is a blob reference rather than inline content.
+
+    Args:
+        value: Value of an encrypted_payload_url / encrypted_content_url column
+
+    Returns:
+        True if the value references a blob in the store
+    """
+    return bool(value) and value.startswith(BLOB_REF_PREFIX) and bool(_DIGEST_RE.match(value[len(BLOB_REF_PREFIX):]))
+
+
+def make_blob_ref(digest: str) -> str:
+    """
+    Build a blob reference from a SHA-256 hex digest.
+    """
+    return f"{BLOB_REF_PREFIX}{digest}"
+
+
+def parse_blob_ref(ref: str) -> str:
+    """
+    Extract the SHA-256 hex digest from a blob reference.
+
+    Args:
+        ref: Blob reference or bare hex digest
+
+    Returns:
+        The hex digest
+
+    Raises:
+        ValueError: If the reference is malformed
+    """
+    digest = ref[len(BLOB_REF_PREFIX):] if ref.startswith(BLOB_REF_PREFIX) else ref
+    digest = digest.lower()
+    if not _DIGEST_RE.match(digest):
+        raise ValueError(f"Invalid blob reference: {ref}")
+    return digest
+
+
+class BlobStore:
+    """
+    Interface for content-addressed blob storage backends.
+    Blobs are immutable and identified by the SHA-256 digest of their content,
+    so storing the same ciphertext twice only keeps a single copy.
+    """
+
+    def put(self, data: bytes) -> str:
+        """
+        Store a blob.
+
+        Args:
+            data: Blob content
+
+        Returns:
+            Blob reference
+        """
+        raise NotImplementedError
+
+    async def put_stream(self, chunks: AsyncIterator[bytes], max_size: Optional[int] = None) -> str:
+        """
+        Store a blob from an async stream of chunks without buffering it in memory.
+
+        Args:
+            chunks: Async iterator of blob content chunks
+            max_size: Maximum blob size in bytes, or None for no limit
+
+        Returns:
+            Blob reference
+
+        Raises:
+            BlobTooLargeError: If the stream is larger than max_size; nothing is stored
+        """
+        raise NotImplementedError
+
+    def open(self, ref: str) -> BinaryIO:
+        """
+        Open a blob for reading.
+
+        Args:
+            ref: Blob reference
+
+        Returns:
+            Binary file-like object positioned at the start of the blob
+        """
+        raise NotImplementedError
+
+    def size(self, ref: str) -> int:
+        """
+        Get the size of a blob in bytes.
+        """
+        raise NotImplementedError
+
+    def exists(self, ref: str) -> bool:
+        """
+        Check whether a blob exists.
+        """
+        raise NotImplementedError
+
+    def delete(self, ref: str) -> bool:
+        """
+        Delete a blob.
+
+        Returns:
+            True if the blob was deleted, False if it did not exist
+        """
+        raise NotImplementedError
+
+    def local_path(self, ref: str) -> Optional[str]:
+        """
+        Get a filesystem path for a blob, if the backend has one.
+        Used to serve blobs with zero-copy file responses.
+        """
+        return None
+
+    def get(self, ref: str) -> bytes:
+        """
+        Read a whole blob into memory.
+
+        Args:
+            ref: Blob reference
+
+        Returns:
+            Blob content
+        """
+        with self.open(ref) as f:
+            return f.read()
+
+    def resolve(self, value: str) -> str:
+        """
+        Resolve a column value to the encrypted content it refers to.
+        Values that are not blob references are legacy inline content and are returned as-is.
+
+        Args:
+            value: Blob reference or inline encrypted content
+
+        Returns:
+            Encrypted content as a string
+        """
+        if not is_blob_ref(value):
+            return value
+        return self.get(value).decode('utf-8')
+
+    def resolve_bytes(self, value: str) -> bytes:
+        """
+        Resolve a column value to the encrypted content it refers to, as bytes.
+        Unlike resolve(), this also handles blobs holding binary envelopes.
+
+        Args:
+            value: Blob reference or inline encrypted content
+
+        Returns:
+            Encrypted content
+        """
+        if not is_blob_ref(value):
+            return value.encode('utf-8')
+        return self.get(value)
+
+    async def put_async(self, data: bytes) -> str:
+        """
+        Store a blob from code running on the event loop, writing it on the default
+        thread executor.
+        """
+        return await asyncio.to_thread(self.put, data)
+
+    async def resolve_bytes_async(self, value: str) -> bytes:
+        """
+        Like resolve_bytes(), reading blobs on the default thread executor so
+        callers on the event loop are not blocked by file I/O.
+        """
+        if not is_blob_ref(value):
+            return value.encode('utf-8')
+        return await asyncio.to_thread(self.get, value)
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Blob store backed by the local filesystem.
+    Blobs are sharded into subdirectories by digest prefix and written atomically
+    through a temporary file, so readers never observe partial blobs.
+    """
+
+    def __init__(self, root_dir: str):
+        """
+        Initialize the local blob store.
+
+        Args:
+            root_dir: Directory to store blobs in
+        """
+        self.root_dir = root_dir
+        self.tmp_dir = os.path.join(root_dir, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root_dir, digest[:2], digest[2:4], digest)
+
+    def _commit(self, tmp_path: str, digest: str) -> str:
+        """
+        Move a fully written temporary file into place, or discard it if the blob already exists.
+        """
+        path = self._path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        return make_blob_ref(digest)
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if os.path.exists(self._path(digest)):
+            return make_blob_ref(digest)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            return self._commit(tmp_path, digest)
+        except Exception as e:
+            logger.error(f"Error storing blob {digest}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_file(self, fileobj: BinaryIO) -> str:
+        """
+        Store a blob from a binary file-like object, reading it in chunks.
+
+        Args:
+            fileobj: File-like object to read from
+
+        Returns:
+            Blob reference
+        """
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+                    f.write(chunk)
+            return self._commit(tmp_path, hasher.hexdigest())
+        except Exception as e:
+            logger.error(f"Error storing blob from file: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def put_stream(self, chunks: AsyncIterator[bytes], max_size: Optional[int] = None) -> str:
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise BlobTooLargeError(f"Blob exceeds the maximum size of {max_size} bytes")
+                    hasher.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+            return self._commit(tmp_path, hasher.hexdigest())
+        except BlobTooLargeError:
+            os.remove(tmp_path)
+            raise
+        except Exception as e:
+            logger.error(f"Error storing blob from stream: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, ref: str) -> BinaryIO:
+        path = self._path(parse_blob_ref(ref))
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            raise BlobNotFoundError(f"Blob not found: {ref}")
+
+    def size(self, ref: str) -> int:
+        path = self._path(parse_blob_ref(ref))
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            raise BlobNotFoundError(f"Blob not found: {ref}")
+
+    def exists(self, ref: str) -> bool:
+        return os.path.exists(self._path(parse_blob_ref(ref)))
+
+    def delete(self, ref: str) -> bool:
+        path = self._path(parse_blob_ref(ref))
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def local_path(self, ref: str) -> Optional[str]:
+        return self._path(parse_blob_ref(ref))
+
+
+def create_blob_store(backend: str = None) -> BlobStore:
+    """
+    Create the blob store configured for this deployment.
+
+    Args:
+        backend: Backend name. If None, the BLOB_STORE_BACKEND environment variable is used.
+
+    Returns:
+        BlobStore instance
+    """
+    backend = backend or os.environ.get('BLOB_STORE_BACKEND', 'local')
+    if backend == 'local':
+        return LocalBlobStore(root_dir=os.environ.get('BLOB_STORAGE_DIR', '/tmp/xaam_blobs'))
+    raise ValueError(f"Unsupported blob store backend: {backend}")
+
+
+# Create a singleton instance
+blob_store = create_blob_store()
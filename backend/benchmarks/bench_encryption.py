@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for EncryptionService.
+
+Measures wall time and peak Python memory of each EncryptionService method
+across RSA key sizes, payload sizes (1 KB to 100 MB) and judge counts (1 to 50).
+Results can be saved as a baseline and later runs compared against it; the
+comparison exits with status 1 when a case got slower or bigger than the
+thresholds allow, so it can gate CI.
+
+By default each dimension is swept on its own around a base case (2048-bit
+keys, 1 KB payload, 1 judge); --full runs the whole cross product.
+
+Usage:
+    python -m benchmarks.bench_encryption --save-baseline
+    python -m benchmarks.bench_encryption --compare
+    python -m benchmarks.bench_encryption --payload-sizes 1KB,1MB --judges 1,10 --full
+"""
+import argparse
+import gc
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+# Add the backend directory to the path so we can import the app
+sys.path.append(str(Path(__file__).parent.parent))
+
+import Crypto
+
+from app.encryption.service import EncryptionService
+
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "encryption.json"
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+# Case = (method, key size, payload bytes, judges)
+Case = Tuple[str, int, int, int]
+
+
+def parse_size(value: str) -> int:
+    """Parse a size such as 512, 1KB or 100MB"""
+    value = value.strip().upper()
+    for unit in ("GB", "MB", "KB", "B"):
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * SIZE_UNITS[unit])
+    return int(value)
+
+
+def format_size(size: int) -> str:
+    for unit in ("GB", "MB", "KB"):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def case_name(case: Case) -> str:
+    method, key_size, payload_size, judges = case
+    if method == "generate_key_pair":
+        return f"{method} rsa={key_size}"
+    return f"{method} rsa={key_size} payload={format_size(payload_size)} judges={judges}"
+
+
+def make_payload(size: int) -> Dict[str, str]:
+    """Build a task payload whose JSON encoding is about `size` bytes"""
+    return {"instructions": "x" * max(size - 20, 0)}
+
+
+class KeyRing:
+    """Generates and caches test key pairs per key size"""
+
+    def __init__(self, service: EncryptionService):
+        self.service = service
+        self.keys: Dict[int, List[Tuple[str, str]]] = {}
+
+    def get(self, key_size: int, count: int) -> List[Tuple[str, str]]:
+        keys = self.keys.setdefault(key_size, [])
+        while len(keys) < count:
+            keys.append(self.service.generate_key_pair(key_size))
+        return keys[:count]
+
+
+def prepare(service: EncryptionService, ring: KeyRing, case: Case) -> Callable[[], object]:
+    """
+    Build the callable measured for a case. Inputs (keys, plaintexts and
+    ciphertexts for the decrypt methods) are created outside the measurement.
+    """
+    method, key_size, payload_size, judges = case
+
+    if method == "generate_key_pair":
+        return lambda: service.generate_key_pair(key_size)
+
+    keys = ring.get(key_size, judges)
+    public_keys = {f"judge-{i}": public for i, (public, _) in enumerate(keys)}
+    private_key = keys[0][1]
+
+    if method == "encrypt_with_public_key":
+        data = b"x" * payload_size
+        return lambda: service.encrypt_with_public_key(keys[0][0], data)
+    if method == "decrypt_with_private_key":
+        encrypted = service.encrypt_with_public_key(keys[0][0], b"x" * payload_size)
+        return lambda: service.decrypt_with_private_key(private_key, encrypted)
+
+    payload = make_payload(payload_size)
+    if method == "encrypt_task_payload":
+        return lambda: service.encrypt_task_payload(payload, public_keys)
+    if method == "decrypt_task_payload":
+        encrypted = service.encrypt_task_payload(payload, public_keys)
+        return lambda: service.decrypt_task_payload(
+            encrypted["encrypted_payload"], encrypted["encrypted_keys"]["judge-0"], private_key
+        )
+    if method == "encrypt_deliverable":
+        return lambda: service.encrypt_deliverable(payload, public_keys)
+    if method == "decrypt_deliverable":
+        encrypted = service.encrypt_deliverable(payload, public_keys)
+        return lambda: service.decrypt_deliverable(
+            encrypted["encrypted_content"], encrypted["encrypted_keys"]["judge-0"], private_key
+        )
+    raise ValueError(f"Unknown method: {method}")
+
+
+def measure(fn: Callable[[], object], rounds: int) -> Dict[str, float]:
+    """
+    Time `rounds` calls, then run once more under tracemalloc for peak memory.
+    Timing and tracing are separate because tracemalloc slows allocation-heavy code.
+    """
+    fn()  # Warm up
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": statistics.median(times),
+        "min_seconds": min(times),
+        "peak_bytes": peak,
+        "rounds": rounds,
+    }
+
+
+def build_cases(
+    methods: List[str], key_sizes: List[int], payload_sizes: List[int], judge_counts: List[int], full: bool
+) -> List[Case]:
+    """
+    Build the case list: the full cross product, or one sweep per dimension around the base case.
+    """
+    if full:
+        combos = set(itertools.product(key_sizes, payload_sizes, judge_counts))
+    else:
+        base_key, base_payload, base_judges = key_sizes[0], payload_sizes[0], judge_counts[0]
+        combos = {(k, base_payload, base_judges) for k in key_sizes}
+        combos |= {(base_key, p, base_judges) for p in payload_sizes}
+        combos |= {(base_key, base_payload, j) for j in judge_counts}
+
+    cases = set()
+    for method in methods:
+        for key_size, payload_size, judges in combos:
+            if method == "generate_key_pair":
+                # Only the key size matters
+                cases.add((method, key_size, 0, 0))
+            elif method in ("encrypt_with_public_key", "decrypt_with_private_key"):
+                cases.add((method, key_size, payload_size, 1))
+            else:
+                cases.add((method, key_size, payload_size, judges))
+    return sorted(cases, key=lambda case: (methods.index(case[0]), case[1], case[2], case[3]))
+
+
+def rounds_for(case: Case, rounds: int) -> int:
+    # Keep multi-megabyte cases from dominating the run
+    payload_size = case[2]
+    if payload_size >= 10 * SIZE_UNITS["MB"]:
+        return 1
+    if payload_size >= SIZE_UNITS["MB"]:
+        return max(1, rounds // 5)
+    return rounds
+
+
+def run_suite(cases: List[Case], rounds: int) -> Dict[str, Dict[str, float]]:
+    service = EncryptionService()
+    ring = KeyRing(service)
+    results = {}
+    print(f"{'case':<72} {'median':>10} {'min':>10} {'peak mem':>10}")
+    for case in cases:
+        fn = prepare(service, ring, case)
+        result = measure(fn, rounds_for(case, rounds))
+        del fn
+        results[case_name(case)] = result
+        print(f"{case_name(case):<72} {result['seconds'] * 1000:>8.2f}ms {result['min_seconds'] * 1000:>8.2f}ms "
+              f"{result['peak_bytes'] / SIZE_UNITS['MB']:>8.2f}MB")
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    time_threshold: float,
+    memory_threshold: float,
+    min_time_delta: float = 0.001,
+    min_memory_delta: int = 64 * 1024,
+) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    A case regresses when its fastest call is more than `time_threshold` (a
+    fraction) slower or it uses more than `memory_threshold` more peak memory.
+    The fastest call is compared rather than the median because it is the least
+    affected by scheduling noise. Differences below the absolute minimums are ignored.
+
+    Returns:
+        Descriptions of the regressed cases
+    """
+    regressions = []
+    print(f"\n{'case':<72} {'time':>9} {'memory':>9}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<72} {'new':>9}")
+            continue
+        time_ratio = result["min_seconds"] / base["min_seconds"] if base["min_seconds"] else 1.0
+        memory_ratio = result["peak_bytes"] / base["peak_bytes"] if base["peak_bytes"] else 1.0
+        flags = []
+        if time_ratio > 1 + time_threshold and result["min_seconds"] - base["min_seconds"] > min_time_delta:
+            flags.append(f"time {time_ratio:.2f}x")
+        if memory_ratio > 1 + memory_threshold and result["peak_bytes"] - base["peak_bytes"] > min_memory_delta:
+            flags.append(f"memory {memory_ratio:.2f}x")
+        marker = "  REGRESSION" if flags else ""
+        print(f"{name:<72} {time_ratio:>8.2f}x {memory_ratio:>8.2f}x{marker}")
+        if flags:
+            regressions.append(f"{name}: {', '.join(flags)}")
+    return regressions
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "pycryptodome": Crypto.__version__,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+
+
+def main():
+    methods = [
+        "generate_key_pair",
+        "encrypt_with_public_key",
+        "decrypt_with_private_key",
+        "encrypt_task_payload",
+        "decrypt_task_payload",
+        "encrypt_deliverable",
+        "decrypt_deliverable",
+    ]
+    parser = argparse.ArgumentParser(description="Benchmark EncryptionService time and peak memory")
+    parser.add_argument("--methods", default=",".join(methods), help="Comma-separated methods to benchmark")
+    parser.add_argument("--key-sizes", default="2048,3072,4096", help="Comma-separated RSA key sizes")
+    parser.add_argument("--payload-sizes", default="1KB,10KB,100KB,1MB,10MB,100MB",
+                        help="Comma-separated payload sizes (B, KB, MB suffixes)")
+    parser.add_argument("--judges", default="1,5,10,50", help="Comma-separated judge counts")
+    parser.add_argument("--full", action="store_true", help="Run the full cross product instead of sweeps")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed calls per case (fewer for large payloads)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare the results with the baseline")
+    parser.add_argument("--time-threshold", type=float, default=0.25,
+                        help="Allowed slowdown as a fraction before a case is flagged")
+    parser.add_argument("--memory-threshold", type=float, default=0.10,
+                        help="Allowed peak-memory growth as a fraction before a case is flagged")
+    parser.add_argument("--output", type=Path, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    selected = [method.strip() for method in args.methods.split(",") if method.strip()]
+    unknown = set(selected) - set(methods)
+    if unknown:
+        parser.error(f"Unknown methods: {', '.join(sorted(unknown))}")
+    cases = build_cases(
+        [method for method in methods if method in selected],
+        [int(size) for size in args.key_sizes.split(",")],
+        [parse_size(size) for size in args.payload_sizes.split(",")],
+        [int(count) for count in args.judges.split(",")],
+        args.full,
+    )
+
+    baseline = None
+    if args.compare:
+        if not args.baseline.exists():
+            parser.error(f"No baseline at {args.baseline}; run with --save-baseline first")
+        baseline = json.loads(args.baseline.read_text())
+
+    print(f"Running {len(cases)} EncryptionService cases")
+    results = run_suite(cases, args.rounds)
+    report = {"environment": environment(), "results": results}
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"\nBaseline saved to {args.baseline}")
+    if baseline is not None:
+        if baseline["environment"].get("machine") != report["environment"]["machine"]:
+            print("\nWarning: the baseline was recorded on a different machine type")
+        regressions = compare(results, baseline["results"], args.time_threshold, args.memory_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
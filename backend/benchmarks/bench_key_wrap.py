@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark key-wrap schemes.
+
+Compares key generation, wrapping and unwrapping throughput of RSA-OAEP
+(at each requested key size) and X25519 sealed boxes. Wrap and unwrap use
+the cached key objects, as EncryptionService does; "import" measures the
+cost of a key cache miss.
+
+Usage:
+    python -m benchmarks.bench_key_wrap --rounds 200 --rsa-sizes 2048,3072
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+# Add the backend directory to the path so we can import the app
+sys.path.append(str(Path(__file__).parent.parent))
+
+from Crypto.Random import get_random_bytes
+
+from app.encryption.key_wrap import get_scheme
+
+
+def run(name: str, operation: str, fn: Callable, rounds: int) -> float:
+    fn()  # Warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = time.perf_counter() - start
+    throughput = rounds / elapsed
+    print(f"{name:<12} {operation:<8} {throughput:>12,.0f} ops/s  {elapsed / rounds * 1e6:>10.1f} us/op")
+    return throughput
+
+
+def bench_scheme(name: str, scheme_name: str, key_size: int, rounds: int, keygen_rounds: int):
+    scheme = get_scheme(scheme_name)
+    public_key, private_key = scheme.generate_key_pair(key_size)
+    _, wrapper = scheme.load(public_key)
+    _, unwrapper = scheme.load(private_key)
+    data_key = get_random_bytes(32)
+    wrapped = wrapper.encrypt(data_key)
+    assert unwrapper.decrypt(wrapped) == data_key
+
+    run(name, "keygen", lambda: scheme.generate_key_pair(key_size), keygen_rounds)
+    run(name, "import", lambda: scheme.load(private_key), rounds)
+    run(name, "wrap", lambda: wrapper.encrypt(data_key), rounds)
+    run(name, "unwrap", lambda: unwrapper.decrypt(wrapped), rounds)
+    print(f"{name:<12} wrapped key is {len(wrapped)} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark key-wrap schemes")
+    parser.add_argument("--rounds", type=int, default=200, help="Operations per wrap, unwrap and import measurement")
+    parser.add_argument("--keygen-rounds", type=int, default=10, help="RSA key pairs to generate; X25519 uses --rounds")
+    parser.add_argument("--rsa-sizes", default="2048", help="Comma-separated RSA key sizes")
+    args = parser.parse_args()
+
+    for key_size in (int(size) for size in args.rsa_sizes.split(",")):
+        bench_scheme(f"rsa-{key_size}", "rsa", key_size, args.rounds, args.keygen_rounds)
+    bench_scheme("x25519", "x25519", None, args.rounds, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
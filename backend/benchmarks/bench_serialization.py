@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark list-serialization throughput for API responses.
+
+Compares the default FastAPI path (per-item response_model validation,
+jsonable_encoder and stdlib json) against orjson and the cached
+TypeAdapter path used by app.api.responses.list_response.
+
+Usage:
+    python -m benchmarks.bench_serialization --items 1000 --rounds 20
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, List
+from uuid import uuid4
+
+# Add the backend directory to the path so we can import the app
+sys.path.append(str(Path(__file__).parent.parent))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.api.responses import list_response
+from app.schemas.base import list_adapter
+from app.schemas.task import Task
+
+
+def make_tasks(count: int) -> List[SimpleNamespace]:
+    """Build ORM-like task objects"""
+    now = datetime.utcnow()
+    return [
+        SimpleNamespace(
+            id=uuid4(),
+            created_at=now,
+            updated_at=now,
+            nft_id=f"nft_{i:08d}",
+            title=f"Task {i}",
+            summary="Classify the sentiment of a batch of product reviews",
+            encrypted_payload_url="sha256:" + "ab" * 32,
+            encryption_key="A" * 344,
+            creator_id=uuid4(),
+            status="CREATED",
+            deadline=now + timedelta(days=7),
+            reward_amount=100.0,
+            reward_currency="USDC",
+            # ORM tasks carry the judge agents, not their ids
+            judges=[SimpleNamespace(id=uuid4()), SimpleNamespace(id=uuid4())],
+        )
+        for i in range(count)
+    ]
+
+
+def stdlib_path(items) -> bytes:
+    validated = [Task.model_validate(item) for item in items]
+    return json.dumps(jsonable_encoder(validated)).encode('utf-8')
+
+
+def orjson_path(items) -> bytes:
+    validated = [Task.model_validate(item) for item in items]
+    return orjson.dumps(jsonable_encoder(validated))
+
+
+def adapter_path(items) -> bytes:
+    return list_response(Task, items).body
+
+
+def run(name: str, fn: Callable, items, rounds: int) -> float:
+    fn(items)  # Warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(items)
+    elapsed = time.perf_counter() - start
+    throughput = len(items) * rounds / elapsed
+    print(f"{name:<32} {throughput:>12,.0f} items/s  {elapsed / rounds * 1000:>8.2f} ms/response")
+    return throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list-serialization throughput")
+    parser.add_argument("--items", type=int, default=1000, help="Items per response")
+    parser.add_argument("--rounds", type=int, default=20, help="Responses to serialize per path")
+    args = parser.parse_args()
+
+    items = make_tasks(args.items)
+    list_adapter(Task)  # Build the cached adapter outside the timed section
+
+    # Sanity check: all paths produce equivalent JSON
+    assert json.loads(stdlib_path(items)) == json.loads(adapter_path(items))
+
+    print(f"Serializing {args.items} tasks x {args.rounds} rounds")
+    baseline = run("response_model + stdlib json", stdlib_path, items, args.rounds)
+    run("response_model + orjson", orjson_path, items, args.rounds)
+    fast = run("cached TypeAdapter.dump_json", adapter_path, items, args.rounds)
+    print(f"Speedup: {fast / baseline:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
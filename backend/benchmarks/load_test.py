@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+HTTP load test for the full task lifecycle.
+
+Simulated sponsors, workers and judges drive the API through the
+create -> stake -> submit -> judge -> reward flow, with a configurable
+number of flows in flight at once. Every request is timed and labelled
+by its route template, and the report gives per-endpoint p50/p95/p99
+latency, requests/sec and error counts as JSON.
+
+The target is either an already running API (--base-url) or a local
+uvicorn instance started for the run (--serve DATABASE_URL), backed by
+SQLite or Postgres. Steps that send Solana transactions (stake, on-chain
+submission and reward transfer) need a reachable validator; pass
+--no-chain to measure the API and database paths only.
+
+Usage:
+    python -m benchmarks.load_test --serve sqlite+aiosqlite:///./loadtest.db --no-chain --flows 200 --concurrency 20
+    python -m benchmarks.load_test --base-url http://localhost:8000 --flows 500 --concurrency 50 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+# Add the backend directory to the path so we can import the app
+sys.path.append(str(Path(__file__).parent.parent))
+
+import httpx
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class LoadStats:
+    """
+    Latencies and error counts per endpoint label.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.status_codes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, endpoint: str, seconds: float, status_code: Optional[int]):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        codes = self.status_codes.setdefault(endpoint, {})
+        code = str(status_code) if status_code is not None else "error"
+        codes[code] = codes.get(code, 0) + 1
+        if status_code is None or status_code >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            result[endpoint] = {
+                "requests": len(ordered),
+                "errors": self.errors.get(endpoint, 0),
+                "status_codes": self.status_codes.get(endpoint, {}),
+                "requests_per_second": len(ordered) / elapsed if elapsed else 0.0,
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p95_ms": percentile(ordered, 95) * 1000,
+                "p99_ms": percentile(ordered, 99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return result
+
+
+class FlowError(Exception):
+    """Raised when a step of a flow fails and the rest of the flow cannot run"""
+    pass
+
+
+class LoadClient:
+    """
+    HTTP client recording the latency of every request under its endpoint label.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, stats: LoadStats):
+        self.client = client
+        self.stats = stats
+
+    async def call(self, method: str, endpoint: str, url: str, **kwargs) -> Any:
+        """
+        Send a request and return its JSON body.
+
+        Args:
+            method: HTTP method
+            endpoint: Label to record the latency under, usually the route template
+            url: Request path
+
+        Raises:
+            FlowError: If the request failed or returned an error status
+        """
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.stats.record(endpoint, time.perf_counter() - start, None)
+            raise FlowError(f"{method} {url}: {e}")
+        self.stats.record(endpoint, time.perf_counter() - start, response.status_code)
+        if response.status_code >= 400:
+            raise FlowError(f"{method} {url}: {response.status_code} {response.text[:200]}")
+        return response.json()
+
+
+async def create_agent(api: LoadClient, role: str, index: int, fund: float) -> Dict[str, Any]:
+    """Register a sponsor, worker or judge with keys and a funded wallet"""
+    wallet_address = f"load_{role}_{uuid4().hex}"
+    agent = await api.call("POST", "POST /api/agents/", "/api/agents/", json={
+        "name": f"Load {role} {index}",
+        "description": f"Load test {role}",
+        "agent_type": "JUDGE" if role == "judge" else "WORKER",
+        "wallet_address": wallet_address,
+        "public_key": "pending",
+    })
+    if role == "judge":
+        await api.call("POST", "POST /api/encryption/keys/generate/{agent_id}",
+                       f"/api/encryption/keys/generate/{agent['id']}")
+    else:
+        await api.call("POST", "POST /api/wallets/create/{agent_id}", f"/api/wallets/create/{agent['id']}")
+        await api.call("POST", "POST /api/wallets/fund/{agent_id}", f"/api/wallets/fund/{agent['id']}",
+                       json={"amount": fund, "currency": "SOL"})
+    return agent
+
+
+async def run_flow(api: LoadClient, sponsor: Dict[str, Any], worker: Dict[str, Any],
+                   judges: List[Dict[str, Any]], args) -> None:
+    """Run one task through its whole lifecycle"""
+    payload = {"instructions": "Summarize the attached document", "document": "x" * args.payload_bytes}
+    task = await api.call("POST", "POST /api/tasks/", "/api/tasks/", json={
+        "task_in": {
+            "title": f"Load task {uuid4().hex[:8]}",
+            "summary": "Load test task",
+            "encrypted_payload_url": "pending",
+            "creator_id": sponsor["id"],
+            "deadline": (datetime.utcnow() + timedelta(days=7)).isoformat(),
+            "reward_amount": args.reward,
+            "reward_currency": "SOL",
+            "judges": [judge["id"] for judge in judges],
+        },
+        "payload": payload,
+    })
+    task_id = task["id"]
+
+    if args.chain:
+        await api.call("POST", "POST /api/blockchain/stake", "/api/blockchain/stake", json={
+            "agent_wallet": worker["wallet_address"],
+            "task_id": task_id,
+            "amount": args.stake,
+        }, headers={"Idempotency-Key": f"stake:{task_id}:{worker['id']}"})
+
+    content = {"summary": "The document describes a load test", "body": "y" * args.payload_bytes}
+    deliverable = await api.call("POST", "POST /api/deliverables/", "/api/deliverables/", json={
+        "deliverable_in": {
+            "task_id": task_id,
+            "agent_id": worker["id"],
+            "encrypted_content_url": "pending",
+            "encryption_keys": {},
+        },
+        "content": content,
+    })
+
+    if args.chain:
+        await api.call("POST", "POST /api/blockchain/submit-deliverable", "/api/blockchain/submit-deliverable", json={
+            "agent_wallet": worker["wallet_address"],
+            "task_id": task_id,
+            "encrypted_content_url": deliverable["encrypted_content_url"],
+            "encryption_keys": deliverable["encryption_keys"],
+        }, headers={"Idempotency-Key": f"submit:{task_id}:{worker['id']}"})
+
+    for judge in judges:
+        await api.call("POST", "POST /api/judges/{judge_id}/score", f"/api/judges/{judge['id']}/score", json={
+            "task_id": task_id,
+            "agent_id": worker["id"],
+            "score": 4.0,
+            "feedback": "Meets the requirements",
+        })
+
+    if args.chain:
+        await api.call("POST", "POST /api/blockchain/transfer-reward", "/api/blockchain/transfer-reward", json={
+            "task_id": task_id,
+            "winner_wallet": worker["wallet_address"],
+            "creator_wallet": sponsor["wallet_address"],
+            "amount": args.reward,
+            "currency": "SOL",
+        }, headers={"Idempotency-Key": f"reward:{task_id}"})
+
+    await api.call("GET", "GET /api/tasks/{task_id}", f"/api/tasks/{task_id}")
+
+
+async def run_load(args) -> Dict[str, Any]:
+    """Create the simulated agents, run all flows and build the report"""
+    setup_stats = LoadStats()
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        setup = LoadClient(client, setup_stats)
+        fund = args.stake * args.flows + 1
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def create(role: str, index: int):
+            async with semaphore:
+                return await create_agent(setup, role, index, fund)
+
+        setup_start = time.perf_counter()
+        sponsors = await asyncio.gather(*(create("sponsor", i) for i in range(args.sponsors)))
+        workers = await asyncio.gather(*(create("worker", i) for i in range(args.workers)))
+        judges = await asyncio.gather(*(create("judge", i) for i in range(args.judges)))
+        setup_elapsed = time.perf_counter() - setup_start
+
+        api = LoadClient(client, stats)
+        failures: Dict[str, int] = {}
+        completed = 0
+
+        async def flow(index: int):
+            nonlocal completed
+            sponsor = sponsors[index % len(sponsors)]
+            worker = workers[index % len(workers)]
+            task_judges = [judges[(index + offset) % len(judges)] for offset in range(args.judges_per_task)]
+            async with semaphore:
+                try:
+                    await run_flow(api, sponsor, worker, task_judges, args)
+                    completed += 1
+                except FlowError as e:
+                    reason = str(e).split(":", 1)[0]
+                    failures[reason] = failures.get(reason, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(flow(i) for i in range(args.flows)))
+        elapsed = time.perf_counter() - start
+
+    total_requests = sum(len(values) for values in stats.latencies.values())
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "base_url": args.base_url,
+        "config": {
+            "flows": args.flows,
+            "concurrency": args.concurrency,
+            "sponsors": args.sponsors,
+            "workers": args.workers,
+            "judges": args.judges,
+            "judges_per_task": args.judges_per_task,
+            "payload_bytes": args.payload_bytes,
+            "chain": args.chain,
+        },
+        "setup": {"seconds": setup_elapsed, "endpoints": setup_stats.summary(setup_elapsed)},
+        "duration_seconds": elapsed,
+        "flows": {
+            "completed": completed,
+            "failed": args.flows - completed,
+            "failures": failures,
+            "flows_per_second": completed / elapsed if elapsed else 0.0,
+        },
+        "requests": {
+            "total": total_requests,
+            "errors": sum(stats.errors.values()),
+            "requests_per_second": total_requests / elapsed if elapsed else 0.0,
+        },
+        "endpoints": stats.summary(elapsed),
+    }
+
+
+def run_server(port: int):
+    """
+    Serve the API in this process. SQLite databases get the column type shims
+    the Postgres-specific models need.
+    """
+    import uvicorn
+
+    from app.main import app
+
+    if os.getenv("DATABASE_URL", "").startswith("sqlite"):
+        from sqlalchemy import JSON
+        from sqlalchemy.dialects.postgresql import UUID
+        from sqlalchemy.ext.compiler import compiles
+
+        from app.db.models.wallet import Wallet
+
+        @compiles(UUID, "sqlite")
+        def compile_uuid_sqlite(type_, compiler, **kw):
+            return "CHAR(36)"
+
+        Wallet.__table__.c.nfts.type = JSON()
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url: str, log_path: Optional[str] = None, timeout: float = 60.0):
+    """Start a local API server on a free port and wait until it is healthy"""
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=database_url)
+    log = open(log_path, "ab") if log_path else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test", "--run-server", "--port", str(port)],
+        cwd=str(Path(__file__).parent.parent),
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"API server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("API server did not become healthy in time")
+
+
+def print_report(report: Dict[str, Any]):
+    flows = report["flows"]
+    print(f"{flows['completed']}/{report['config']['flows']} flows in {report['duration_seconds']:.2f}s "
+          f"({flows['flows_per_second']:.1f} flows/s, {report['requests']['requests_per_second']:.1f} req/s)")
+    for reason, count in flows["failures"].items():
+        print(f"  failed at {reason}: {count}")
+    print(f"{'endpoint':<45} {'reqs':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:<45} {row['requests']:>6} {row['errors']:>5} {row['requests_per_second']:>8.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the task lifecycle over HTTP")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="API to test")
+    parser.add_argument("--serve", metavar="DATABASE_URL",
+                        help="Start a local API server backed by this database instead of using --base-url")
+    parser.add_argument("--server-log", help="Write the output of the --serve server to this file")
+    parser.add_argument("--flows", type=int, default=100, help="Number of task lifecycles to run")
+    parser.add_argument("--concurrency", type=int, default=10, help="Flows in flight at once")
+    parser.add_argument("--sponsors", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--judges", type=int, default=5)
+    parser.add_argument("--judges-per-task", type=int, default=3)
+    parser.add_argument("--payload-bytes", type=int, default=1024, help="Size of task payloads and deliverables")
+    parser.add_argument("--stake", type=float, default=0.01, help="SOL staked per flow")
+    parser.add_argument("--reward", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--no-chain", dest="chain", action="store_false",
+                        help="Skip the steps that send Solana transactions")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--run-server", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=8000, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_server:
+        run_server(args.port)
+        return
+
+    args.judges_per_task = min(args.judges_per_task, args.judges)
+    process = None
+    if args.serve:
+        process, args.base_url = start_server(args.serve, args.server_log)
+    try:
+        report = asyncio.run(run_load(args))
+    except FlowError as e:
+        sys.exit(f"Setup failed: {e}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Script to import the private keys of a PEM keystore directory into the SQLite keystore
+
+Usage:
+    python scripts/migrate_keystore.py --source /tmp/xaam_keys --dest /tmp/xaam_keys/keystore.db
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import the app
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.encryption.keystore import SQLiteKeystore, iter_pem_directory, migrate_pem_directory
+
+
+def main():
+    key_storage_dir = os.environ.get('KEY_STORAGE_DIR', '/tmp/xaam_keys')
+    parser = argparse.ArgumentParser(description="Import PEM private keys into the SQLite keystore")
+    parser.add_argument("--source", default=key_storage_dir, help="PEM keystore directory")
+    parser.add_argument(
+        "--dest", default=os.getenv("KEYSTORE_PATH") or os.path.join(key_storage_dir, "keystore.db"),
+        help="SQLite keystore file",
+    )
+    parser.add_argument("--overwrite", action="store_true", help="Replace keys the keystore already holds")
+    parser.add_argument("--delete-source", action="store_true", help="Delete each PEM file once the keystore holds its key")
+    args = parser.parse_args()
+
+    keystore = SQLiteKeystore(args.dest)
+    try:
+        counts = migrate_pem_directory(args.source, keystore, overwrite=args.overwrite)
+        print(f"Found {counts['found']} PEM keys, wrote {counts['written']}; keystore holds {keystore.count()} keys")
+
+        if args.delete_source:
+            deleted = 0
+            for agent_id, path in iter_pem_directory(args.source):
+                with open(path, 'r') as f:
+                    pem = f.read()
+                # Only delete files whose key the keystore holds verbatim
+                if keystore.get(agent_id) == pem:
+                    os.remove(path)
+                    deleted += 1
+            print(f"Deleted {deleted} PEM files")
+    finally:
+        keystore.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 import pytest
 import asyncio
 from typing import AsyncGenerator, Generator
@@ -7,6 +8,10 @@ from fastapi.testclient import TestClient
 from uuid import uuid4
 from datetime import datetime, timedelta
 
+# Keep the app's background workers from connecting to the configured database
+for flag in ("INVALIDATION_CHANNEL_ENABLED", "TASK_PIPELINE_ENABLED", "KEY_POOL_ENABLED", "KEY_GRANTS_ENABLED"):
+    os.environ.setdefault(flag, "false")
+
 # Import the FastAPI app and dependencies
 from app.main import app
 from app.db.database import Base, get_db
@@ -141,4 +141,23 @@ async def test_get_transaction(client: TestClient):
     assert "block" in response.json()
     assert "timestamp" in response.json()
     assert "fee" in response.json()
-    assert "signatures" in response.json()
\ No newline at end of file
+    assert "signatures" in response.json()
+
+
+def test_reload_keeps_keypair_when_file_is_missing(tmp_path):
+    """
+    Test that reloading fails instead of generating a new payer keypair
+    """
+    from app.blockchain.solana_client import KeypairLoadError, SolanaClient
+
+    keypair_path = tmp_path / "payer.json"
+    solana = SolanaClient(keypair_path=str(keypair_path))
+    payer = solana.keypair.public_key
+
+    keypair_path.unlink()
+    with pytest.raises(KeypairLoadError):
+        solana.reload()
+    keypair_path.write_text("not json")
+    with pytest.raises(KeypairLoadError):
+        solana.reload()
+    assert solana.keypair.public_key == payer
@@ -0,0 +1,215 @@
+import json
+import base64
+import pytest
+import httpx
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+
+from app.api.routes import deliverables, encryption, tasks
+from app.db.database import get_db
+from app.db.models.agent import Agent, AgentType
+from app.db.models.task import Task, TaskStatus, task_judge_association
+from app.db.models.deliverable import Deliverable
+from app.db.models.task_key_grant import TaskKeyGrant
+from app.encryption import rewrap
+from app.encryption.async_service import AsyncEncryptionService
+from app.encryption.decrypted_cache import DecryptedCache
+from app.encryption.envelope import is_envelope
+from app.encryption.service import EncryptionService
+from app.storage.blob_store import LocalBlobStore
+
+
+@compiles(UUID, "sqlite")
+def compile_uuid_sqlite(type_, compiler, **kw):
+    # The models use the PostgreSQL UUID type; store it as text in the test database
+    return "CHAR(36)"
+
+
+@pytest.fixture
+async def setup(tmp_path, monkeypatch):
+    """Seed a task and a deliverable for one judge, and route the app to test services"""
+    service = EncryptionService()
+    store = LocalBlobStore(str(tmp_path))
+    crypto = AsyncEncryptionService(pool_type="thread", max_workers=2)
+    private_keys = {}
+    loaded = []
+
+    def agent(agent_type: AgentType) -> Agent:
+        public_key, private_key = service.generate_key_pair(scheme="x25519")
+        agent = Agent(
+            id=uuid4(), name=agent_type.value.title(), description="Test agent", agent_type=agent_type,
+            wallet_address=f"wallet-{uuid4().hex}", public_key=public_key,
+        )
+        private_keys[str(agent.id)] = private_key
+        return agent
+
+    async def get_agent_private_key(agent_id):
+        loaded.append(str(agent_id))
+        return private_keys.get(str(agent_id))
+
+    monkeypatch.setattr(rewrap, "blob_store", store)
+    monkeypatch.setattr(rewrap, "async_encryption_service", crypto)
+    monkeypatch.setattr(rewrap.key_management_service, "get_agent_private_key", get_agent_private_key)
+    monkeypatch.setattr(rewrap.key_management_service, "_public_keys", OrderedDict())
+    monkeypatch.setattr(encryption, "blob_store", store)
+    monkeypatch.setattr(encryption, "async_encryption_service", crypto)
+    monkeypatch.setattr(encryption, "decrypted_cache", DecryptedCache(enabled=False))
+    monkeypatch.setattr(tasks, "blob_store", store)
+    monkeypatch.setattr(tasks, "async_encryption_service", crypto)
+    monkeypatch.setattr(tasks, "decrypted_cache", DecryptedCache(enabled=False))
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for table in (Agent.__table__, Task.__table__, task_judge_association, Deliverable.__table__, TaskKeyGrant.__table__):
+            await conn.run_sync(table.create)
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as db:
+        judge, worker = agent(AgentType.JUDGE), agent(AgentType.WORKER)
+        judge_keys = {str(judge.id): judge.public_key}
+        payload = service.encrypt_task_payload({"task": "payload"}, judge_keys)
+        content = service.encrypt_deliverable({"answer": 42}, judge_keys)
+        task = Task(
+            id=uuid4(), nft_id="nft_1", title="Task", summary="Summary",
+            encrypted_payload_url=store.put(payload["encrypted_payload"]),
+            encryption_key=payload["encrypted_keys"][str(judge.id)], encryption_keys=payload["encrypted_keys"],
+            creator_id=judge.id, status=TaskStatus.CREATED, deadline=datetime.utcnow() + timedelta(days=1),
+            reward_amount=100.0,
+        )
+        task.judges = [judge]
+        deliverable = Deliverable(
+            id=uuid4(), task_id=task.id, agent_id=worker.id,
+            encrypted_content_url=store.put(content["encrypted_content"]), encryption_keys=content["encrypted_keys"],
+        )
+        db.add_all([judge, worker, task, deliverable])
+        await db.commit()
+
+    app = FastAPI()
+    app.include_router(tasks.router, prefix="/api/tasks")
+    app.include_router(encryption.router, prefix="/api/encryption")
+    app.include_router(deliverables.router, prefix="/api/deliverables")
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield app, service, store, private_keys, loaded, task, deliverable, judge, worker
+    crypto.shutdown()
+    await engine.dispose()
+
+
+def decrypt_sealed(store, sealed, private_key, decrypt):
+    """Decrypt a client-side decryption response the way an agent would"""
+    assert sealed["url"] == f"/api/blobs/{sealed['ref'].split(':', 1)[1]}"
+    return decrypt(store.get(sealed["ref"]), sealed["wrapped_key"], private_key)
+
+
+class TestClientDecryption:
+    """Tests for returning ciphertext references and wrapped keys instead of plaintext"""
+
+    @pytest.mark.asyncio
+    async def test_worker_decrypts_payload_with_its_grant(self, setup):
+        """Test that staking issues the worker's grant once and never loads its private key"""
+        app, service, store, private_keys, loaded, task, _, judge, worker = setup
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            staked = await client.post(f"/api/tasks/{task.id}/stake/{worker.id}?decryption=client")
+            fetched = await client.post(
+                f"/api/encryption/task/decrypt/{task.id}?decryption=client", json=str(worker.id)
+            )
+
+        assert staked.status_code == fetched.status_code == 200
+        assert "payload" not in staked.json()
+        sealed = staked.json()["encrypted_payload"]
+        assert fetched.json()["encrypted_payload"] == sealed
+        assert decrypt_sealed(
+            store, sealed, private_keys[str(worker.id)], service.decrypt_task_payload
+        ) == {"task": "payload"}
+        # Only the judge's key was used, once, to issue the grant
+        assert loaded == [str(judge.id)]
+
+    @pytest.mark.asyncio
+    async def test_server_mode_decrypts_with_the_worker_grant(self, setup):
+        """Test that a worker whose background grant has not landed is granted inline, never given a judge's key"""
+        app, _, _, _, loaded, task, _, judge, worker = setup
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            staked = await client.post(f"/api/tasks/{task.id}/stake/{worker.id}")
+            fetched = await client.post(f"/api/encryption/task/decrypt/{task.id}", json=str(worker.id))
+            missing = await client.post(f"/api/encryption/task/decrypt/{uuid4()}", json=str(worker.id))
+
+        assert staked.status_code == fetched.status_code == 200
+        assert staked.json()["payload"] == fetched.json()["payload"] == {"task": "payload"}
+        # The judge's key issued the grant once; the worker's key decrypted each time
+        assert loaded == [str(judge.id), str(worker.id), str(worker.id)]
+        assert missing.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_judge_decrypts_deliverable_locally(self, setup):
+        """Test the deliverable routes in client mode, and that the server mode is unchanged"""
+        app, service, store, private_keys, loaded, _, deliverable, judge, _ = setup
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            fetched = await client.post(
+                f"/api/encryption/deliverable/decrypt/{deliverable.id}?decryption=client", json=str(judge.id)
+            )
+            judged = await client.post(
+                f"/api/deliverables/{deliverable.id}/judge/{judge.id}?decryption=client",
+                json={"score": 4.5, "feedback": "Good"},
+            )
+            server = await client.post(f"/api/encryption/deliverable/decrypt/{deliverable.id}", json=str(judge.id))
+            invalid = await client.post(
+                f"/api/encryption/deliverable/decrypt/{deliverable.id}?decryption=proxy", json=str(judge.id)
+            )
+
+        assert fetched.status_code == judged.status_code == 200
+        sealed = fetched.json()["encrypted_deliverable"]
+        assert sealed == judged.json()["encrypted_content"]
+        assert sealed["wrapped_key"] == deliverable.encryption_keys[str(judge.id)]
+        assert decrypt_sealed(
+            store, sealed, private_keys[str(judge.id)], service.decrypt_deliverable
+        ) == {"answer": 42}
+        assert judged.json()["deliverable"]["scores"] == {str(judge.id): 4.5}
+        assert server.json() == {"deliverable": {"answer": 42}}
+        assert loaded == [str(judge.id)]
+        assert invalid.status_code == 400
+
+
+class TestEncryptResponses:
+    """Tests for the envelope format of the encrypt routes' responses"""
+
+    @pytest.mark.asyncio
+    async def test_legacy_package_unless_binary_is_requested(self, setup):
+        """Test that the encrypt routes keep returning the legacy package, and the binary envelope on request"""
+        app, service, _, private_keys, _, _, _, judge, _ = setup
+        private_key = private_keys[str(judge.id)]
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            legacy = await client.post(
+                "/api/encryption/task/encrypt", json={"payload": {"task": 1}, "judge_ids": [str(judge.id)]}
+            )
+            binary = await client.post(
+                "/api/encryption/deliverable/encrypt?envelope=binary",
+                json={"deliverable": {"answer": 42}, "judge_ids": [str(judge.id)]},
+            )
+            invalid = await client.post(
+                "/api/encryption/task/encrypt?envelope=xml", json={"payload": {}, "judge_ids": [str(judge.id)]}
+            )
+
+        assert legacy.status_code == binary.status_code == 200
+        encrypted, keys = legacy.json()["encrypted_payload"], legacy.json()["encrypted_keys"]
+        assert set(json.loads(base64.b64decode(encrypted))) == {"iv", "encrypted_data"}
+        assert service.decrypt_task_payload(encrypted, keys[str(judge.id)], private_key) == {"task": 1}
+        encrypted, keys = binary.json()["encrypted_content"], binary.json()["encrypted_keys"]
+        assert is_envelope(base64.b64decode(encrypted))
+        assert service.decrypt_deliverable(
+            base64.b64decode(encrypted), keys[str(judge.id)], private_key
+        ) == {"answer": 42}
+        assert invalid.status_code == 400
@@ -0,0 +1,161 @@
+import pytest
+import httpx
+import orjson
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+
+from app.api.routes import encryption
+from app.db.database import get_db
+from app.db.models.agent import Agent, AgentType
+from app.db.models.task import Task, TaskStatus, task_judge_association
+from app.db.models.deliverable import Deliverable
+from app.encryption.async_service import AsyncEncryptionService
+from app.encryption.decrypted_cache import DecryptedCache
+from app.encryption.service import EncryptionService
+from app.storage.blob_store import LocalBlobStore
+
+
+@compiles(UUID, "sqlite")
+def compile_uuid_sqlite(type_, compiler, **kw):
+    # The models use the PostgreSQL UUID type; store it as text in the test database
+    return "CHAR(36)"
+
+
+def make_agent(agent_type: AgentType, public_key: str = "public-key") -> Agent:
+    return Agent(
+        id=uuid4(),
+        name=f"{agent_type.value.title()}",
+        description="Test agent",
+        agent_type=agent_type,
+        wallet_address=f"{agent_type.value}-wallet-{uuid4().hex}",
+        public_key=public_key,
+    )
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for table in (Agent.__table__, Task.__table__, task_judge_association, Deliverable.__table__):
+            await conn.run_sync(table.create)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def setup(engine, tmp_path, monkeypatch):
+    """Seed a task with encrypted deliverables and route the app to test services"""
+    service = EncryptionService()
+    public_key, private_key = service.generate_key_pair(scheme="x25519")
+    other_public_key, _ = service.generate_key_pair(scheme="x25519")
+    store = LocalBlobStore(str(tmp_path))
+    crypto = AsyncEncryptionService(pool_type="thread", max_workers=2, max_pending=2)
+
+    async def get_agent_private_key(agent_id):
+        return private_key
+
+    monkeypatch.setattr(encryption, "blob_store", store)
+    monkeypatch.setattr(encryption, "async_encryption_service", crypto)
+    monkeypatch.setattr(encryption, "decrypted_cache", DecryptedCache(enabled=False))
+    monkeypatch.setattr(encryption.key_management_service, "get_agent_private_key", get_agent_private_key)
+
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as db:
+        judge = make_agent(AgentType.JUDGE, public_key)
+        workers = [make_agent(AgentType.WORKER) for _ in range(6)]
+        db.add_all([judge, *workers])
+        task = Task(
+            id=uuid4(), nft_id="nft_1", title="Task", summary="Summary",
+            encrypted_payload_url="sha256:" + "ab" * 32, creator_id=workers[0].id,
+            status=TaskStatus.SUBMITTED, deadline=datetime.utcnow() + timedelta(days=1), reward_amount=100.0,
+        )
+        db.add(task)
+        deliverables = []
+        for i, worker in enumerate(workers):
+            # The last deliverable was encrypted for another judge only
+            keys = {str(judge.id): public_key} if i < 5 else {str(uuid4()): other_public_key}
+            result = service.encrypt_deliverable({"answer": i}, keys)
+            deliverable = Deliverable(
+                id=uuid4(), task_id=task.id, agent_id=worker.id,
+                encrypted_content_url=store.put(result["encrypted_content"]),
+                encryption_keys=result["encrypted_keys"],
+            )
+            deliverables.append(deliverable)
+        db.add_all(deliverables)
+        await db.commit()
+
+    app = FastAPI()
+    app.include_router(encryption.router, prefix="/api/encryption")
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield app, task.id, judge.id, [deliverable.id for deliverable in deliverables]
+    crypto.shutdown()
+
+
+def parse_lines(response) -> dict:
+    results = [orjson.loads(line) for line in response.content.splitlines()]
+    return {result["deliverable_id"]: result for result in results}
+
+
+class TestDecryptBatch:
+    """Tests for batch deliverable decryption"""
+
+    @pytest.mark.asyncio
+    async def test_decrypts_task_deliverables_in_one_query(self, setup, engine):
+        """Test that a task's deliverables are fetched in one query and streamed back"""
+        app, task_id, judge_id, deliverable_ids = setup
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post(
+                "/api/encryption/deliverable/decrypt-batch", json={"judge_id": str(judge_id), "task_id": str(task_id)}
+            )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        results = parse_lines(response)
+        assert len(results) == 6
+        for i, deliverable_id in enumerate(deliverable_ids[:5]):
+            assert results[str(deliverable_id)]["deliverable"] == {"answer": i}
+        assert "error" in results[str(deliverable_ids[5])]
+        # The judge lookup and the deliverables query
+        assert len([sql for sql in statements if "deliverables" in sql]) == 1
+        assert len(statements) == 2
+
+    @pytest.mark.asyncio
+    async def test_decrypts_listed_deliverables(self, setup):
+        """Test the deliverable list form and request validation"""
+        app, task_id, judge_id, deliverable_ids = setup
+        missing = uuid4()
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.post("/api/encryption/deliverable/decrypt-batch", json={
+                "judge_id": str(judge_id),
+                "deliverable_ids": [str(deliverable_ids[1]), str(missing), str(deliverable_ids[1])],
+            })
+            both = await client.post("/api/encryption/deliverable/decrypt-batch", json={
+                "judge_id": str(judge_id), "task_id": str(task_id), "deliverable_ids": [],
+            })
+            too_many = await client.post("/api/encryption/deliverable/decrypt-batch", json={
+                "judge_id": str(judge_id), "deliverable_ids": [str(uuid4()) for _ in range(encryption.DECRYPT_BATCH_MAX + 1)],
+            })
+
+        results = parse_lines(response)
+        assert results == {
+            str(deliverable_ids[1]): {"deliverable_id": str(deliverable_ids[1]), "deliverable": {"answer": 1}},
+            str(missing): {"deliverable_id": str(missing), "error": "Deliverable not found"},
+        }
+        assert both.status_code == 422
+        assert too_many.status_code == 400
@@ -0,0 +1,96 @@
+import pytest
+import hashlib
+from uuid import uuid4
+
+from app.encryption import decrypted_cache as decrypted_cache_module
+from app.encryption.decrypted_cache import DecryptedCache, ciphertext_hash
+
+
+class Decryptor:
+    """Counts decryptions and returns a fixed value"""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+class TestDecryptedCache:
+    """Tests for the decrypted-content cache"""
+
+    def test_ciphertext_hash(self):
+        """Test that blob references are hashed by their digest and inline content by its bytes"""
+        digest = "ab" * 32
+        assert ciphertext_hash(f"sha256:{digest}") == digest
+        assert ciphertext_hash(b"envelope") == hashlib.sha256(b"envelope").hexdigest()
+        assert ciphertext_hash("legacy") == hashlib.sha256(b"legacy").hexdigest()
+
+    @pytest.mark.asyncio
+    async def test_hits_are_keyed_by_object_principal_and_ciphertext(self):
+        """Test that only the same object, principal and ciphertext hit the cache"""
+        cache = DecryptedCache(enabled=True)
+        decrypt = Decryptor({"answer": 42})
+        task_id, agent_id = uuid4(), uuid4()
+
+        for _ in range(3):
+            assert await cache.get_or_decrypt(task_id, agent_id, b"ciphertext", decrypt) == {"answer": 42}
+        await cache.get_or_decrypt(task_id, uuid4(), b"ciphertext", decrypt)
+        await cache.get_or_decrypt(task_id, agent_id, b"re-encrypted", decrypt)
+
+        assert decrypt.calls == 3
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 3, 3)
+
+        cache.invalidate_object(task_id)
+        assert cache.stats()["entries"] == 0
+        assert cache.stats()["bytes"] == 0
+
+    @pytest.mark.asyncio
+    async def test_entries_expire(self, monkeypatch):
+        """Test that entries are decrypted again after the TTL"""
+        now = [1000.0]
+        monkeypatch.setattr(decrypted_cache_module.time, "monotonic", lambda: now[0])
+        cache = DecryptedCache(enabled=True, ttl=60)
+        decrypt = Decryptor({"answer": 42})
+
+        await cache.get_or_decrypt("task", "agent", b"ciphertext", decrypt)
+        now[0] += 59
+        await cache.get_or_decrypt("task", "agent", b"ciphertext", decrypt)
+        now[0] += 2
+        await cache.get_or_decrypt("task", "agent", b"ciphertext", decrypt)
+
+        assert decrypt.calls == 2
+        assert cache.stats()["expirations"] == 1
+
+    def test_memory_and_entry_caps(self):
+        """Test that least recently used entries are evicted beyond either limit"""
+        cache = DecryptedCache(enabled=True, max_entries=3, max_bytes=100)
+        value = {"data": "x" * 20}  # About 30 bytes serialized
+        for i in range(3):
+            cache.put(cache.key(f"object-{i}", "judge", b"c"), value)
+        cache.get(cache.key("object-0", "judge", b"c"))
+        cache.put(cache.key("object-3", "judge", b"c"), value)
+        cache.put(cache.key("huge", "judge", b"c"), {"data": "x" * 200})
+
+        stats = cache.stats()
+        assert stats["entries"] == 3
+        assert stats["bytes"] <= 100
+        assert stats["evictions"] == 1
+        assert stats["oversized"] == 1
+        assert cache.get(cache.key("object-1", "judge", b"c")) is None
+        assert cache.get(cache.key("object-0", "judge", b"c")) == value
+
+    @pytest.mark.asyncio
+    async def test_opt_out(self):
+        """Test that a disabled cache never holds plaintext"""
+        cache = DecryptedCache(enabled=False)
+        decrypt = Decryptor({"answer": 42})
+
+        for _ in range(2):
+            await cache.get_or_decrypt("task", "agent", b"ciphertext", decrypt)
+
+        assert decrypt.calls == 2
+        assert cache.stats()["entries"] == 0
@@ -2,12 +2,20 @@ import pytest
 import json
 import base64
 from unittest.mock import patch, MagicMock
+import io
 import os
 import tempfile
 from uuid import UUID, uuid4
 
 from app.encryption.service import EncryptionService
 from app.encryption.db_service import KeyManagementService
+from app.encryption.async_service import AsyncEncryptionService, CryptoPoolBusyError
+from app.encryption.key_cache import KeyCache, fingerprint
+from app.encryption.key_pool import KeyPool
+from app.encryption.key_wrap import get_scheme, scheme_of
+from app.encryption.keystore import PemDirectoryKeystore, SQLiteKeystore, create_keystore, migrate_pem_directory
+from app.encryption.compression import ALGORITHMS, Compression
+from app.encryption.envelope import FLAG_COMPRESSED, TAG_SIZE, EnvelopeError, is_envelope, unpack_header
 
 
 class TestEncryptionService:
@@ -165,6 +173,544 @@ class TestEncryptionService:
         # Check that the decrypted deliverable matches the original
         assert decrypted_deliverable == deliverable
 
+    
+    def test_binary_envelope_is_compact_and_authenticated(self, encryption_service):
+        """Test that the default envelope is binary, smaller than the legacy format and tamper-evident"""
+        public_key, private_key = encryption_service.generate_key_pair()
+        payload = {"data": "x" * 10000}
+        
+        result = encryption_service.encrypt_task_payload(payload, {"judge": public_key})
+        legacy = EncryptionService(envelope_format="json").encrypt_task_payload(payload, {"judge": public_key})
+        
+        assert is_envelope(result["encrypted_payload"])
+        assert len(result["encrypted_payload"]) < len(json.dumps(payload)) + 600
+        assert len(legacy["encrypted_payload"]) > len(json.dumps(payload)) * 1.7
+        
+        tampered = bytearray(result["encrypted_payload"])
+        tampered[-20] ^= 1
+        with pytest.raises(ValueError):
+            encryption_service.decrypt_task_payload(bytes(tampered), result["encrypted_keys"]["judge"], private_key)
+    
+    def test_reads_legacy_format(self, encryption_service):
+        """Test that data written in the legacy JSON format still decrypts"""
+        public_key, private_key = encryption_service.generate_key_pair()
+        legacy_service = EncryptionService(envelope_format="json")
+        
+        data = legacy_service.encrypt_with_public_key(public_key, b"secret")
+        deliverable = legacy_service.encrypt_deliverable({"answer": 42}, {"judge": public_key})
+        # Legacy content was stored as text
+        content = deliverable["encrypted_content"].decode('utf-8')
+        
+        assert not is_envelope(data)
+        assert encryption_service.decrypt_with_private_key(private_key, data) == b"secret"
+        assert encryption_service.decrypt_deliverable(
+            content, deliverable["encrypted_keys"]["judge"], private_key
+        ) == {"answer": 42}
+    
+    def test_envelope_key_table(self, encryption_service):
+        """Test that the envelope header carries each judge's wrapped key"""
+        public_key, _ = encryption_service.generate_key_pair()
+        result = encryption_service.encrypt_deliverable({"answer": 42}, {"judge-1": public_key, "judge-2": public_key})
+        
+        wrapped_keys = unpack_header(result["encrypted_content"]).wrapped_keys
+        assert {judge_id: base64.b64encode(key).decode() for judge_id, key in wrapped_keys.items()} == result["encrypted_keys"]
+
+
+class TestKeystore:
+    """Tests for the private keystore backends"""
+    
+    def test_sqlite_keystore(self, tmp_path):
+        """Test storing, replacing and deleting keys in one SQLite file with a bounded cache"""
+        keystore = SQLiteKeystore(str(tmp_path / "keystore.db"), cache_size=2)
+        agents = [uuid4() for _ in range(3)]
+        for i, agent_id in enumerate(agents):
+            keystore.put(agent_id, f"key-{i}")
+        
+        assert keystore.get(agents[2]) == "key-2"
+        assert keystore.get(agents[0]) == "key-0"
+        assert keystore.get(uuid4()) is None
+        stats = keystore.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 2, 2)
+        
+        keystore.put(agents[0], "rotated")
+        assert keystore.delete(agents[1])
+        assert not keystore.delete(agents[1])
+        keystore.close()
+        
+        reopened = SQLiteKeystore(str(tmp_path / "keystore.db"))
+        assert reopened.get(agents[0]) == "rotated"
+        assert reopened.get(agents[1]) is None
+        assert reopened.count() == 2
+        assert os.listdir(tmp_path) != [] and all(name.startswith("keystore.db") for name in os.listdir(tmp_path))
+    
+    def test_imports_legacy_pem_files(self, tmp_path):
+        """Test that keys left in the PEM directory are imported on first use and by the migration"""
+        legacy = PemDirectoryKeystore(str(tmp_path / "pem"))
+        agents = [uuid4() for _ in range(5)]
+        for agent_id in agents:
+            legacy.put(agent_id, f"pem-{agent_id}")
+        
+        keystore = SQLiteKeystore(str(tmp_path / "keystore.db"), legacy_dir=str(tmp_path / "pem"))
+        assert keystore.get(agents[0]) == f"pem-{agents[0]}"
+        keystore.put(agents[1], "rotated")
+        assert keystore.stats()["legacy_imports"] == 1
+        
+        # The migration skips keys already held, so the rotated key survives
+        assert migrate_pem_directory(str(tmp_path / "pem"), keystore, batch_size=2) == {"found": 5, "written": 3}
+        assert migrate_pem_directory(str(tmp_path / "pem"), keystore) == {"found": 5, "written": 0}
+        keystore.invalidate(agents[1])
+        assert keystore.get(agents[1]) == "rotated"
+        assert keystore.count() == 5
+    
+    def test_service_uses_configured_backend(self, tmp_path, monkeypatch):
+        """Test that the service stores keys in the configured keystore"""
+        monkeypatch.delenv("KEYSTORE_PATH", raising=False)
+        agent_id = uuid4()
+        
+        sqlite_service = EncryptionService(key_storage_dir=str(tmp_path))
+        assert sqlite_service.store_private_key(agent_id, "private")
+        assert sqlite_service.retrieve_private_key(agent_id) == "private"
+        assert os.listdir(tmp_path) != [] and not (tmp_path / f"{agent_id}_private.pem").exists()
+        
+        pem_service = EncryptionService(keystore=create_keystore(str(tmp_path / "pem"), backend="pem"))
+        assert pem_service.store_private_key(agent_id, "private")
+        assert (tmp_path / "pem" / f"{agent_id}_private.pem").read_text() == "private"
+        with pytest.raises(ValueError):
+            create_keystore(str(tmp_path), backend="s3")
+
+
+class TestKeyWrapSchemes:
+    """Tests for the pluggable key-wrap schemes"""
+    
+    def test_x25519_key_pairs(self):
+        """Test that X25519 keys are PEM-style text recognised as their scheme"""
+        public_key, private_key = EncryptionService().generate_key_pair(scheme="x25519")
+        
+        assert public_key.startswith("-----BEGIN X25519 PUBLIC KEY-----")
+        assert private_key.startswith("-----BEGIN X25519 PRIVATE KEY-----")
+        assert scheme_of(public_key).name == scheme_of(private_key).name == "x25519"
+        with pytest.raises(ValueError):
+            get_scheme("dsa")
+    
+    @pytest.mark.parametrize("envelope_format", ["binary", "json"])
+    def test_mixed_judge_panel(self, envelope_format):
+        """Test that judges with RSA and X25519 keys can all decrypt the same deliverable"""
+        service = EncryptionService(envelope_format=envelope_format)
+        rsa_public, rsa_private = service.generate_key_pair(1024)
+        x_public, x_private = service.generate_key_pair(scheme="x25519")
+        
+        result = service.encrypt_deliverable({"answer": 42}, {"rsa-judge": rsa_public, "x-judge": x_public})
+        
+        assert len(base64.b64decode(result["encrypted_keys"]["x-judge"])) == 80
+        for judge_id, private_key in (("rsa-judge", rsa_private), ("x-judge", x_private)):
+            assert service.decrypt_deliverable(
+                result["encrypted_content"], result["encrypted_keys"][judge_id], private_key
+            ) == {"answer": 42}
+        with pytest.raises(Exception):
+            service.decrypt_deliverable(result["encrypted_content"], result["encrypted_keys"]["rsa-judge"], x_private)
+    
+    def test_x25519_streams_and_inline_keys(self):
+        """Test X25519 keys with chunked envelopes and single-recipient encryption"""
+        service = EncryptionService(chunk_size=100)
+        public_key, private_key = service.generate_key_pair(scheme="x25519")
+        
+        envelope = io.BytesIO()
+        encrypted_keys = service.encrypt_stream(io.BytesIO(b"x" * 250), envelope, {"agent": public_key})
+        output = io.BytesIO()
+        service.decrypt_stream(io.BytesIO(envelope.getvalue()), output, encrypted_keys["agent"], private_key)
+        
+        assert output.getvalue() == b"x" * 250
+        assert service.decrypt_with_private_key(private_key, service.encrypt_with_public_key(public_key, b"secret")) == b"secret"
+
+
+class TestStreamingEncryption:
+    """Tests for chunked streaming encryption"""
+    
+    @pytest.fixture(scope="class")
+    def keys(self):
+        return EncryptionService().generate_key_pair()
+    
+    @pytest.fixture
+    def encryption_service(self):
+        return EncryptionService(chunk_size=1024)
+    
+    @pytest.mark.parametrize("size", [0, 1, 1024, 1025, 5000])
+    def test_stream_round_trip(self, encryption_service, keys, size):
+        """Test streaming files of sizes around the chunk boundaries, decrypted whole and streamed"""
+        public_key, private_key = keys
+        plaintext = os.urandom(size)
+        
+        envelope = io.BytesIO()
+        encrypted_keys = encryption_service.encrypt_stream(io.BytesIO(plaintext), envelope, {"judge": public_key})
+        output = io.BytesIO()
+        written = encryption_service.decrypt_stream(io.BytesIO(envelope.getvalue()), output, encrypted_keys["judge"], private_key)
+        
+        assert written == size
+        assert output.getvalue() == plaintext
+        assert encryption_service.decrypt_with_private_key(private_key, envelope.getvalue()) == plaintext
+        assert unpack_header(envelope.getvalue()).chunk_size == 1024
+    
+    def test_decryptor_buffers_one_chunk(self, encryption_service, keys):
+        """Test that the decryptor accepts arbitrary pieces and holds at most one record"""
+        public_key, private_key = keys
+        plaintext = os.urandom(10000)
+        encryptor = encryption_service.stream_encryptor({"judge": public_key})
+        envelope = b"".join(encryptor.update(plaintext[i:i + 333]) for i in range(0, len(plaintext), 333))
+        envelope += encryptor.finalize()
+        
+        decryptor = encryption_service.stream_decryptor(None, private_key)
+        out = []
+        for i in range(0, len(envelope), 77):
+            out.append(decryptor.update(envelope[i:i + 77]))
+            assert len(decryptor._buffer) <= 1024 + TAG_SIZE + 77
+        out.append(decryptor.finalize())
+        assert b"".join(out) == plaintext
+    
+    def test_random_access(self, encryption_service, keys):
+        """Test reading single chunks and byte ranges without decrypting the rest"""
+        public_key, private_key = keys
+        plaintext = os.urandom(4500)
+        envelope = io.BytesIO()
+        encrypted_keys = encryption_service.encrypt_stream(io.BytesIO(plaintext), envelope, {"judge": public_key})
+        
+        reader = encryption_service.open_chunks(envelope, encrypted_keys["judge"], private_key)
+        
+        assert reader.chunk_count == 5
+        assert reader.size == 4500
+        assert reader.read_chunk(2) == plaintext[2048:3072]
+        assert reader.read_chunk(4) == plaintext[4096:]
+        assert reader.read(1000, 100) == plaintext[1000:1100]
+        assert reader.read(4000, 1000) == plaintext[4000:]
+        with pytest.raises(IndexError):
+            reader.read_chunk(5)
+    
+    def test_rejects_reordered_and_truncated_streams(self, encryption_service, keys):
+        """Test that swapping chunks or dropping the last chunks fails authentication"""
+        public_key, private_key = keys
+        envelope = io.BytesIO()
+        encrypted_keys = encryption_service.encrypt_stream(io.BytesIO(os.urandom(3000)), envelope, {"judge": public_key})
+        data = envelope.getvalue()
+        header_length = unpack_header(data).length
+        record = 1024 + TAG_SIZE
+        first, second = data[header_length:header_length + record], data[header_length + record:header_length + 2 * record]
+        
+        swapped = data[:header_length] + second + first + data[header_length + 2 * record:]
+        truncated = data[:header_length + 2 * record]
+        for corrupt in (swapped, truncated):
+            with pytest.raises(ValueError):
+                encryption_service.decrypt_stream(io.BytesIO(corrupt), io.BytesIO(), encrypted_keys["judge"], private_key)
+    
+    @pytest.mark.asyncio
+    async def test_async_iterators(self, keys, monkeypatch):
+        """Test encrypting and decrypting async byte iterators, with the key work off the event loop"""
+        import threading
+        from app.encryption import async_service
+        
+        public_key, private_key = keys
+        service = AsyncEncryptionService(pool_type="thread", max_workers=1)
+        plaintext = os.urandom(600 * 1024)
+        threads = []
+        for name in ("stream_encryptor", "stream_decryptor"):
+            method = getattr(async_service.encryption_service, name)
+            
+            def record(*args, method=method):
+                threads.append(threading.current_thread())
+                return method(*args)
+            
+            monkeypatch.setattr(async_service.encryption_service, name, record)
+        
+        async def pieces(data, size):
+            for i in range(0, len(data), size):
+                yield data[i:i + size]
+        
+        encrypted_keys, envelope = await service.encrypt_iter(pieces(plaintext, 100 * 1024), {"judge": public_key}, chunk_size=64 * 1024)
+        encrypted = b"".join([chunk async for chunk in envelope])
+        decrypted = b"".join([chunk async for chunk in service.decrypt_iter(pieces(encrypted, 50000), encrypted_keys["judge"], private_key)])
+        
+        assert unpack_header(encrypted).chunk_size == 64 * 1024
+        assert decrypted == plaintext
+        assert len(threads) == 2 and threading.main_thread() not in threads
+
+
+class TestCompression:
+    """Tests for compression before encryption"""
+
+    @pytest.fixture(scope="class")
+    def keys(self):
+        return EncryptionService().generate_key_pair(scheme="x25519")
+
+    @pytest.mark.parametrize("algorithm", ["zlib", "zstd"])
+    def test_compressed_round_trip(self, keys, algorithm):
+        """Test that compressed envelopes are flagged, smaller and readable without compression configured"""
+        if algorithm == "zstd":
+            pytest.importorskip("zstandard")
+        public_key, private_key = keys
+        service = EncryptionService(compression=Compression(algorithm))
+        payload = {"rows": [{"id": i, "label": "repetitive JSON"} for i in range(500)]}
+
+        result = service.encrypt_task_payload(payload, {"judge": public_key})
+        header = unpack_header(result["encrypted_payload"])
+
+        assert header.flags & FLAG_COMPRESSED
+        assert header.compression == ALGORITHMS[algorithm]
+        assert len(result["encrypted_payload"]) < len(json.dumps(payload)) / 5
+        plain_service = EncryptionService(compression=Compression("none"))
+        assert plain_service.decrypt_task_payload(result["encrypted_payload"], result["encrypted_keys"]["judge"], private_key) == payload
+        counters = service.compression_counters()
+        assert counters["compressed"] == 1
+        assert counters["bytes_out"] < counters["bytes_in"] == len(json.dumps(payload))
+        assert plain_service.compression_counters()["decompressed"] == 1
+
+    def test_small_and_incompressible_data_is_stored_as_is(self, keys):
+        """Test that data below the minimum size or that does not shrink is not compressed"""
+        public_key, private_key = keys
+        service = EncryptionService(compression=Compression("zlib", min_size=64))
+
+        small = service.encrypt_with_public_key(public_key, b"x" * 32)
+        noise = service.encrypt_with_public_key(public_key, os.urandom(4096))
+
+        for envelope in (small, noise):
+            assert not unpack_header(envelope).flags & FLAG_COMPRESSED
+        assert service.decrypt_with_private_key(private_key, small) == b"x" * 32
+        assert service.compression_counters()["skipped"] == 2
+
+    def test_decompressed_size_is_capped(self, keys):
+        """Test that an envelope expanding beyond the limit is rejected"""
+        public_key, private_key = keys
+        envelope = EncryptionService(compression=Compression("zlib")).encrypt_with_public_key(public_key, b"\0" * 100000)
+
+        with pytest.raises(EnvelopeError):
+            EncryptionService(compression=Compression(max_size=50000)).decrypt_with_private_key(private_key, envelope)
+        with pytest.raises(EnvelopeError):
+            EncryptionService().stream_decryptor(None, private_key).update(envelope)
+
+    def test_invalid_algorithm(self):
+        """Test that an unknown algorithm is rejected"""
+        with pytest.raises(ValueError):
+            Compression("lzma")
+
+
+class TestKeyPool:
+    """Tests for the pre-generated key pool"""
+    
+    @pytest.fixture
+    def generated(self, monkeypatch):
+        import asyncio
+        from app.encryption import key_pool
+        
+        generated = []
+        
+        async def fake_generate_key_pair(key_size):
+            await asyncio.sleep(0)
+            generated.append(key_size)
+            return f"public-{len(generated)}", f"private-{len(generated)}"
+        
+        monkeypatch.setattr(key_pool.async_encryption_service, "generate_key_pair", fake_generate_key_pair)
+        return generated
+    
+    async def test_refills_after_take(self, generated):
+        """Test that the pool fills to its size, hands out distinct key pairs and refills"""
+        import asyncio
+        
+        pool = KeyPool(size=3, key_size=1024, refill_concurrency=2)
+        await pool.start()
+        try:
+            for _ in range(20):
+                await asyncio.sleep(0)
+            assert pool.depth == 3
+            assert generated == [1024] * 3
+            
+            first, second = pool.take(), pool.take()
+            assert first == ("public-1", "private-1")
+            assert second == ("public-2", "private-2")
+            for _ in range(20):
+                await asyncio.sleep(0)
+            
+            stats = pool.stats()
+            assert stats["depth"] == 3
+            assert stats["hits"] == 2
+            assert stats["generated"] == 5
+        finally:
+            await pool.stop()
+    
+    async def test_x25519_bypasses_pool(self, generated):
+        """Test that X25519 key pairs are generated inline without using the pool"""
+        pool = KeyPool(size=0)
+        public_key, _ = await pool.generate_key_pair("x25519")
+        
+        assert scheme_of(public_key).name == "x25519"
+        assert generated == []
+        assert pool.stats()["misses"] == 0
+    
+    async def test_falls_back_when_empty(self, generated):
+        """Test that an empty or disabled pool generates key pairs on demand"""
+        pool = KeyPool(size=0)
+        await pool.start()
+        
+        assert not pool.running
+        assert await pool.generate_key_pair() == ("public-1", "private-1")
+        assert pool.stats()["misses"] == 1
+
+
+class TestKeyCache:
+    """Tests for the imported RSA key cache"""
+    
+    @pytest.fixture(scope="class")
+    def key_pairs(self):
+        service = EncryptionService()
+        return [service.generate_key_pair() for _ in range(3)]
+    
+    def test_lru_eviction_and_invalidation(self, key_pairs):
+        """Test that the cache reuses ciphers, evicts the least recently used key and drops invalidated keys"""
+        cache = KeyCache(max_size=2)
+        first, second, third = (public for public, _ in key_pairs)
+        
+        assert cache.cipher(first) is cache.cipher(first)
+        cache.cipher(second)
+        cache.cipher(first)
+        cache.cipher(third)  # Evicts the second key
+        cache.invalidate([fingerprint(first), fingerprint(second)])
+        
+        stats = cache.stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 3
+        assert stats["evictions"] == 1
+        assert stats["invalidations"] == 1
+        assert stats["size"] == 1
+        assert stats["hit_rate"] == 0.4
+    
+    def test_service_reuses_imported_keys(self, key_pairs):
+        """Test that repeated encryption for the same judges imports each key once"""
+        service = EncryptionService()
+        judge_public_keys = {str(i): public for i, (public, _) in enumerate(key_pairs)}
+        
+        for _ in range(3):
+            result = service.encrypt_deliverable({"answer": 42}, judge_public_keys)
+        decrypted = service.decrypt_deliverable(result["encrypted_content"], result["encrypted_keys"]["0"], key_pairs[0][1])
+        
+        assert decrypted == {"answer": 42}
+        counters = service.key_cache_counters()
+        assert counters["misses"] == 4
+        assert counters["hits"] == 6
+
+
+@pytest.mark.asyncio
+class TestAsyncEncryptionService:
+    """Tests for the AsyncEncryptionService facade"""
+    
+    @pytest.mark.parametrize("pool_type", ["thread", "process"])
+    async def test_round_trip_in_pool(self, pool_type):
+        """Test encrypting and decrypting a task payload through the worker pool"""
+        service = AsyncEncryptionService(pool_type=pool_type, max_workers=2, max_pending=2)
+        try:
+            public_key, private_key = await service.generate_key_pair()
+            payload = {"description": "This is a test task"}
+            
+            encryption_result = await service.encrypt_task_payload(payload, {"judge": public_key})
+            decrypted_payload = await service.decrypt_task_payload(
+                encryption_result["encrypted_payload"],
+                encryption_result["encrypted_keys"]["judge"],
+                private_key
+            )
+            
+            assert decrypted_payload == payload
+            assert service.stats()["completed"] == 3
+            assert service.stats()["pending"] == 0
+        finally:
+            service.shutdown()
+    
+    async def test_fails_fast_when_saturated(self, monkeypatch):
+        """Test that callers beyond the wait queue or wait timeout get CryptoPoolBusyError"""
+        import asyncio
+        import threading
+        from app.encryption import async_service
+
+        release = threading.Event()
+        monkeypatch.setattr(async_service, "_invoke", lambda method, *args: release.wait(5))
+        service = AsyncEncryptionService(pool_type="thread", max_workers=1, max_pending=1, max_waiting=1, wait_timeout=0.2)
+        try:
+            running = asyncio.create_task(service.generate_key_pair())
+            await asyncio.sleep(0.05)
+            waiting = asyncio.create_task(service.generate_key_pair())
+            await asyncio.sleep(0.05)
+
+            # The wait queue is full
+            with pytest.raises(CryptoPoolBusyError):
+                await service.generate_key_pair()
+            # The waiting caller gives up after wait_timeout
+            with pytest.raises(CryptoPoolBusyError):
+                await waiting
+
+            release.set()
+            assert await running is True
+            stats = service.stats()
+            assert stats["rejected"] == 2
+            assert stats["waiting"] == 0
+            assert stats["pending"] == 0
+        finally:
+            release.set()
+            service.shutdown()
+
+    async def test_key_revocations_reach_pool_processes(self):
+        """Test that invalidated keys are dropped from the key caches of pool processes"""
+        service = AsyncEncryptionService(pool_type="process", max_workers=1, max_pending=1)
+        try:
+            public_key, _ = await service.generate_key_pair()
+            for _ in range(2):
+                await service.encrypt_with_public_key(public_key, b"data")
+            assert service.key_cache_stats()["hits"] == 1
+            
+            service.invalidate_keys([fingerprint(public_key)])
+            await service.encrypt_with_public_key(public_key, b"data")
+            
+            stats = service.key_cache_stats()
+            assert stats["invalidations"] == 1
+            assert stats["misses"] == 2
+            assert stats["processes"] == 1
+        finally:
+            service.shutdown()
+
+    async def test_wraps_keys_for_many_judges_in_parallel(self, monkeypatch):
+        """Test that large judge panels are wrapped in batches and every judge can decrypt"""
+        from app.encryption import async_service
+
+        service = AsyncEncryptionService(pool_type="thread", max_workers=4, max_pending=8, wrap_batch_size=2)
+        calls = []
+        original = async_service._invoke
+
+        def recording_invoke(method, *args):
+            calls.append((method, len(args[1]) if method == "wrap_key" else None))
+            return original(method, *args)
+
+        monkeypatch.setattr(async_service, "_invoke", recording_invoke)
+        try:
+            key_pairs = [await service.generate_key_pair(1024) for _ in range(3)]
+            judges = {f"judge-{i}": key_pairs[i % 3][0] for i in range(10)}
+            calls.clear()
+
+            result = await service.encrypt_deliverable({"answer": 42}, judges)
+
+            assert list(result["encrypted_keys"]) == list(judges)
+            assert sorted(size for method, size in calls if method == "wrap_key") == [2, 2, 3, 3]
+            assert calls[-1] == ("encrypt_deliverable", None)
+            assert service.stats()["parallel_wraps"] == 1
+            for i, judge_id in enumerate(judges):
+                assert await service.decrypt_deliverable(
+                    result["encrypted_content"], result["encrypted_keys"][judge_id], key_pairs[i % 3][1]
+                ) == {"answer": 42}
+
+            # Small panels are wrapped in the encrypting call itself
+            calls.clear()
+            await service.encrypt_task_payload({"x": 1}, {"judge": key_pairs[0][0]})
+            assert calls == [("encrypt_task_payload", None)]
+        finally:
+            service.shutdown()
+
+    def test_invalid_pool_type(self):
+        """Test that unknown pool types are rejected"""
+        with pytest.raises(ValueError):
+            AsyncEncryptionService(pool_type="gpu")
+
 
 @pytest.mark.asyncio
 class TestKeyManagementService:
@@ -264,4 +810,57 @@ class TestKeyManagementService:
         assert public_keys == {
             str(judge1_id): "judge1_public_key",
             str(judge2_id): "judge2_public_key"
-        }
\ No newline at end of file
+        }    
+    async def test_rotation_invalidates_cached_key_objects(self, monkeypatch):
+        """Test that a public key rotation notice drops the old key pair from the key caches"""
+        from app.encryption import db_service
+        
+        revoked = []
+        monkeypatch.setattr(db_service.async_encryption_service, "invalidate_keys", revoked.extend)
+        service = KeyManagementService()
+        service._cache_public_key("agent", "old_public_key")
+        
+        service.invalidate_public_key({"agent_id": "agent", "fingerprints": ["a", "b"]})
+        
+        assert "agent" not in service._public_keys
+        assert revoked == ["a", "b"]
+    
+    async def test_rotation_stores_private_key_before_publishing(self, monkeypatch):
+        """Test that the new private key is stored before the rotation is committed and published"""
+        from unittest.mock import AsyncMock
+        from app.encryption import db_service
+        
+        events = []
+        agent = MagicMock(public_key=None)
+        db = MagicMock()
+        db.get = AsyncMock(return_value=agent)
+        db.execute = AsyncMock()
+        db.commit = AsyncMock(side_effect=lambda: events.append("commit"))
+        db.rollback = AsyncMock(side_effect=lambda: events.append("rollback"))
+        stored = [True, False]
+        
+        async def generate_key_pair(scheme):
+            return "public_key", "private_key"
+        
+        async def publish(topic, payload):
+            events.append(topic)
+        
+        def store_private_key(agent_id, private_key):
+            events.append("store")
+            return stored.pop(0)
+        
+        monkeypatch.setattr(db_service.key_pool, "generate_key_pair", generate_key_pair)
+        monkeypatch.setattr(db_service.invalidation_channel, "publish", publish)
+        monkeypatch.setattr(db_service.encryption_service, "retrieve_private_key", lambda agent_id: None)
+        monkeypatch.setattr(db_service.encryption_service, "store_private_key", store_private_key)
+        service = KeyManagementService()
+        
+        assert await service.generate_keys_for_agent(db, uuid4(), "x25519") is True
+        assert events == ["store", "commit", "public_key"]
+        
+        # A failed store is rolled back and never published
+        events.clear()
+        agent.public_key = "old_public_key"
+        assert await service.generate_keys_for_agent(db, uuid4(), "x25519") is False
+        assert events == ["store", "rollback"]
+        assert agent.public_key == "old_public_key"
@@ -0,0 +1,122 @@
+import pytest
+import asyncio
+
+import orjson
+
+from app.events.invalidation import InvalidationChannel, listen_dsn
+from app.events.status_events import StatusEventBroker
+
+
+async def collect(subscription, count):
+    events = []
+    async for event in subscription:
+        if event is not None:
+            events.append(event)
+        if len(events) == count:
+            break
+    return events
+
+
+class TestStatusEventBroker:
+    """Tests for the status event broker behind the SSE feed"""
+
+    @pytest.mark.asyncio
+    async def test_subscribers_receive_filtered_events(self):
+        """Test that subscribers only receive events matching their filters"""
+        broker = StatusEventBroker(history_size=10)
+        reader = asyncio.create_task(collect(broker.subscribe(judge_id="judge-1"), 2))
+        await asyncio.sleep(0)
+
+        broker.publish("task.status", "task-1", "STAKED", task_id="task-1", creator_id="c", judge_ids=["judge-1"])
+        broker.publish("task.status", "task-2", "STAKED", task_id="task-2", creator_id="c", judge_ids=["judge-2"])
+        broker.publish("deliverable.status", "d-1", "JUDGED", task_id="task-1", creator_id="c", judge_ids=["judge-1"])
+
+        events = await asyncio.wait_for(reader, timeout=1)
+        assert [event.entity_id for event in events] == ["task-1", "d-1"]
+        assert broker.stats()["subscribers"] == 0
+
+    @pytest.mark.asyncio
+    async def test_resume_from_last_event_id(self):
+        """Test that a reconnecting subscriber gets the events it missed"""
+        broker = StatusEventBroker(history_size=10)
+        for status in ("CREATED", "STAKED", "SUBMITTED"):
+            broker.publish("task.status", "task-1", status, task_id="task-1")
+
+        first_id = broker.history[0].id
+
+        events = await asyncio.wait_for(collect(broker.subscribe(task_id="task-1", last_event_id=first_id), 2), timeout=1)
+        assert [event.status for event in events] == ["STAKED", "SUBMITTED"]
+        assert events[0].id > first_id
+        assert events[0].to_sse().startswith(b"id: %d\nevent: task.status\ndata: {" % events[0].id)
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_is_disconnected(self):
+        """Test that a subscriber whose queue overflows is closed"""
+        broker = StatusEventBroker(history_size=10, queue_size=1)
+        subscription = broker.subscribe()
+        first = asyncio.create_task(subscription.__anext__())
+        await asyncio.sleep(0)
+
+        for _ in range(3):
+            broker.publish("task.status", "task-1", "STAKED")
+
+        with pytest.raises(StopAsyncIteration):
+            await first
+        assert broker.stats()["dropped_subscribers"] == 1
+
+
+class TestInvalidationChannel:
+    """Tests for the cross-worker cache invalidation channel"""
+
+    def test_listen_dsn(self):
+        """Test that only Postgres URLs enable LISTEN/NOTIFY"""
+        assert listen_dsn("postgresql+asyncpg://u:p@db:5432/xaam") == "postgresql://u:p@db:5432/xaam"
+        assert listen_dsn("sqlite+aiosqlite:///:memory:") is None
+
+    @pytest.mark.asyncio
+    async def test_local_and_remote_dispatch(self):
+        """Test that handlers run for local publishes and other workers' notifications only"""
+        channel = InvalidationChannel(dsn="postgresql://unused")
+        received = []
+        channel.subscribe("public_key", received.append)
+
+        await channel.publish("public_key", {"agent_id": "a"})
+        channel._on_notify(None, 1, channel.CHANNEL, orjson.dumps(
+            {"origin": "other-worker", "topic": "public_key", "payload": {"agent_id": "b"}}).decode())
+        channel._on_notify(None, 1, channel.CHANNEL, orjson.dumps(
+            {"origin": channel.origin, "topic": "public_key", "payload": {"agent_id": "c"}}).decode())
+
+        assert received == [{"agent_id": "a"}, {"agent_id": "b"}]
+        assert channel.stats()["received"] == 1
+
+    @pytest.mark.asyncio
+    async def test_claims_first_free_worker_index(self):
+        """Test that a worker takes the lowest index no other worker holds"""
+        class Connection:
+            held = {0, 1}
+
+            async def fetchval(self, query, lock_class, index):
+                return index not in self.held
+
+        channel = InvalidationChannel(dsn="postgresql://unused")
+        assert await channel._claim_worker_index(Connection()) == 2
+
+    def test_event_ids_differ_across_worker_indexes(self, monkeypatch):
+        """Test that workers publishing in the same millisecond produce distinct event IDs"""
+        import sys
+        module = sys.modules["app.events.status_events"]
+
+        monkeypatch.setattr(module.time, "time", lambda: 1000.0)
+        ids = set()
+        for index in range(3):
+            monkeypatch.setattr(module.invalidation_channel, "worker_index", index)
+            ids.add(StatusEventBroker(history_size=10).publish("task.status", "task-1", "STAKED").id)
+        assert len(ids) == 3
+
+    def test_remote_status_events_reach_subscribers(self):
+        """Test that events forwarded from another worker are added to the feed history"""
+        broker = StatusEventBroker(history_size=10)
+        event = StatusEventBroker(history_size=10).publish("task.status", "task-1", "STAKED", task_id="task-1")
+
+        broker.deliver(type(event).from_dict(orjson.loads(orjson.dumps(event.to_dict()))))
+        assert [e.id for e in broker.replay(0)] == [event.id]
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+import pytest
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from fastapi import FastAPI, Body, HTTPException
+
+from app.db.models.idempotency_key import IdempotencyKey
+from app.db.services.idempotency_service import idempotency_service
+from app.middleware.idempotency import IdempotencyMiddleware
+
+
+@compiles(UUID, "sqlite")
+def compile_uuid_sqlite(type_, compiler, **kw):
+    # The models use the PostgreSQL UUID type; store it as text in the test database
+    return "CHAR(36)"
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(IdempotencyKey.__table__.create)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=True)
+    await engine.dispose()
+
+
+def make_app(session_factory):
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/api/blockchain/stake")
+    async def stake(amount: float = Body(..., embed=True)):
+        app.state.calls += 1
+        if amount < 0:
+            raise HTTPException(status_code=500, detail="Solana error")
+        return {"amount": amount, "call": app.state.calls}
+
+    return IdempotencyMiddleware(app, session_factory=session_factory), app
+
+
+class TestIdempotencyMiddleware:
+    """Tests for replaying responses to requests with an Idempotency-Key header"""
+
+    @pytest.mark.asyncio
+    async def test_retry_is_replayed_without_executing(self, session_factory):
+        """Test that a retry with the same key gets the stored response"""
+        middleware, app = make_app(session_factory)
+        async with httpx.AsyncClient(app=middleware, base_url="http://test") as client:
+            headers = {"Idempotency-Key": "abc"}
+            first = await client.post("/api/blockchain/stake", json={"amount": 1.5}, headers=headers)
+            # Clear the in-process cache so the replay comes from the database
+            middleware.cache.clear()
+            second = await client.post("/api/blockchain/stake", json={"amount": 1.5}, headers=headers)
+            third = await client.post("/api/blockchain/stake", json={"amount": 1.5}, headers=headers)
+
+        assert first.status_code == second.status_code == third.status_code == 200
+        assert first.json() == second.json() == third.json() == {"amount": 1.5, "call": 1}
+        assert second.headers["idempotent-replayed"] == "true"
+        assert app.state.calls == 1
+        assert middleware.stats()["replayed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_key_reused_with_different_body(self, session_factory):
+        """Test that reusing a key for a different request is rejected"""
+        middleware, app = make_app(session_factory)
+        async with httpx.AsyncClient(app=middleware, base_url="http://test") as client:
+            headers = {"Idempotency-Key": "abc"}
+            await client.post("/api/blockchain/stake", json={"amount": 1.5}, headers=headers)
+            response = await client.post("/api/blockchain/stake", json={"amount": 2.0}, headers=headers)
+
+        assert response.status_code == 422
+        assert app.state.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_server_errors_are_not_stored(self, session_factory):
+        """Test that a failed request can be retried with the same key"""
+        middleware, app = make_app(session_factory)
+        async with httpx.AsyncClient(app=middleware, base_url="http://test") as client:
+            headers = {"Idempotency-Key": "abc"}
+            first = await client.post("/api/blockchain/stake", json={"amount": -1}, headers=headers)
+            second = await client.post("/api/blockchain/stake", json={"amount": -1}, headers=headers)
+            unkeyed = await client.post("/api/blockchain/stake", json={"amount": 1})
+
+        assert first.status_code == second.status_code == 500
+        assert unkeyed.status_code == 200
+        assert app.state.calls == 3
+
+    @pytest.mark.asyncio
+    async def test_keys_are_scoped_per_client(self, session_factory):
+        """Test that two clients using the same key do not see each other's responses"""
+        middleware, app = make_app(session_factory)
+        async with httpx.AsyncClient(app=middleware, base_url="http://test") as client:
+            first = await client.post(
+                "/api/blockchain/stake", json={"amount": 1.5},
+                headers={"Idempotency-Key": "abc", "X-Agent-ID": "agent-1"}
+            )
+            other = await client.post(
+                "/api/blockchain/stake", json={"amount": 2.0},
+                headers={"Idempotency-Key": "abc", "X-Agent-ID": "agent-2"}
+            )
+
+        assert first.status_code == other.status_code == 200
+        assert other.json() == {"amount": 2.0, "call": 2}
+        assert app.state.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_abandoned_claim_is_reclaimed_after_lease(self, session_factory):
+        """Test that a claim left by a crashed request blocks retries only until its lease runs out"""
+        middleware, app = make_app(session_factory)
+        async with session_factory() as db:
+            record = await idempotency_service.begin(
+                db, "abc", "/api/blockchain/stake", "hash", 3600, "ip:127.0.0.1", lease_seconds=60
+            )
+            assert record is not None
+
+        async with httpx.AsyncClient(app=middleware, base_url="http://test") as client:
+            headers = {"Idempotency-Key": "abc"}
+            blocked = await client.post("/api/blockchain/stake", json={"amount": 1.5}, headers=headers)
+
+            async with session_factory() as db:
+                record = await idempotency_service.get(db, "abc", "/api/blockchain/stake", "ip:127.0.0.1")
+                record.locked_until = datetime.utcnow() - timedelta(seconds=1)
+                await db.commit()
+
+            retried = await client.post("/api/blockchain/stake", json={"amount": 1.5}, headers=headers)
+
+        assert blocked.status_code == 409
+        assert retried.status_code == 200
+        assert app.state.calls == 1
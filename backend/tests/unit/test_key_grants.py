@@ -0,0 +1,169 @@
+import pytest
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+
+from app.db.models.agent import Agent, AgentType
+from app.db.models.task import Task, TaskStatus, task_judge_association
+from app.db.models.task_key_grant import TaskKeyGrant
+from app.db.services.task_key_grant_service import task_key_grant_service
+from app.encryption import db_service, key_grants, rewrap
+from app.encryption.async_service import AsyncEncryptionService
+from app.encryption.key_grants import KeyGrantIssuer
+from app.encryption.service import EncryptionService
+from app.storage.blob_store import LocalBlobStore
+
+
+@compiles(UUID, "sqlite")
+def compile_uuid_sqlite(type_, compiler, **kw):
+    # The models use the PostgreSQL UUID type; store it as text in the test database
+    return "CHAR(36)"
+
+
+@pytest.fixture
+async def session_factory(monkeypatch):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for table in (Agent.__table__, Task.__table__, task_judge_association, TaskKeyGrant.__table__):
+            await conn.run_sync(table.create)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    # Background workers open their sessions on the test database
+    monkeypatch.setattr(key_grants, "AsyncSessionLocal", factory)
+    yield factory
+    await engine.dispose()
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """A task encrypted for one judge, a staking worker, and the private keys the server holds"""
+    service = EncryptionService()
+    store = LocalBlobStore(str(tmp_path))
+    crypto = AsyncEncryptionService(pool_type="thread", max_workers=2)
+    private_keys = {}
+
+    def agent(agent_type: AgentType) -> Agent:
+        public_key, private_key = service.generate_key_pair(scheme="x25519")
+        agent = Agent(
+            id=uuid4(), name=agent_type.value.title(), description="Test agent", agent_type=agent_type,
+            wallet_address=f"wallet-{uuid4().hex}", public_key=public_key,
+        )
+        private_keys[str(agent.id)] = private_key
+        return agent
+
+    async def get_agent_private_key(agent_id):
+        return private_keys.get(str(agent_id))
+
+    judge, worker = agent(AgentType.JUDGE), agent(AgentType.WORKER)
+    payload = service.encrypt_task_payload({"task": "payload"}, {str(judge.id): judge.public_key})
+    task = Task(
+        id=uuid4(), nft_id="nft_1", title="Task", summary="Summary",
+        encrypted_payload_url=store.put(payload["encrypted_payload"]),
+        encryption_key=payload["encrypted_keys"][str(judge.id)], encryption_keys=payload["encrypted_keys"],
+        creator_id=judge.id, status=TaskStatus.STAKED, deadline=datetime.utcnow() + timedelta(days=1), reward_amount=100.0,
+    )
+    task.judges = [judge]
+
+    monkeypatch.setattr(rewrap, "blob_store", store)
+    monkeypatch.setattr(rewrap, "async_encryption_service", crypto)
+    monkeypatch.setattr(rewrap.key_management_service, "get_agent_private_key", get_agent_private_key)
+    monkeypatch.setattr(rewrap.key_management_service, "_public_keys", OrderedDict())
+    yield service, store, task, judge, worker, private_keys
+    crypto.shutdown()
+
+
+async def seed(session_factory, env):
+    _, _, task, judge, worker, _ = env
+    async with session_factory() as db:
+        db.add_all([judge, worker, task])
+        await db.commit()
+
+
+class TestKeyGrants:
+    """Tests for granting task data keys to staking workers"""
+
+    @pytest.mark.asyncio
+    async def test_issued_grant_decrypts_payload(self, session_factory, env):
+        """Test that a worker decrypts the payload with its grant, found in one lookup"""
+        service, store, task, _, worker, private_keys = env
+        await seed(session_factory, env)
+        issuer = KeyGrantIssuer(workers=1)
+        async with session_factory() as db:
+            assert await task_key_grant_service.get_wrapped_key(db, task.id, worker.id) is None
+            wrapped_key = await issuer.issue(db, task.id, worker.id)
+            # Issuing again keeps the stored grant
+            assert await issuer.issue(db, task.id, worker.id) == wrapped_key
+            assert await task_key_grant_service.get_wrapped_key(db, task.id, worker.id) == wrapped_key
+
+        payload = service.decrypt_task_payload(
+            store.get(task.encrypted_payload_url), wrapped_key, private_keys[str(worker.id)]
+        )
+        assert payload == {"task": "payload"}
+        assert issuer.stats()["issued"] == 1
+
+    @pytest.mark.asyncio
+    async def test_scheduled_grants_are_issued_once(self, session_factory, env):
+        """Test that background workers issue a scheduled grant, and a repeated stake queues nothing"""
+        _, _, task, _, worker, _ = env
+        await seed(session_factory, env)
+        issuer = KeyGrantIssuer(workers=2)
+        await issuer.start()
+        try:
+            assert issuer.schedule(task.id, worker.id)
+            assert issuer.schedule(task.id, worker.id)
+            assert issuer.stats()["queued"] == 1
+            await issuer.join()
+        finally:
+            await issuer.stop()
+
+        async with session_factory() as db:
+            assert await task_key_grant_service.get_wrapped_key(db, task.id, worker.id) is not None
+        assert issuer.stats() == {"workers": 0, "queued": 0, "issued": 1, "failures": 0, "dropped": 0}
+
+    @pytest.mark.asyncio
+    async def test_failures_and_drops_are_counted(self, session_factory, env):
+        """Test that grants are dropped while stopped, and grants without a holder's key fail"""
+        _, _, task, judge, worker, private_keys = env
+        await seed(session_factory, env)
+        issuer = KeyGrantIssuer(workers=1)
+        assert not issuer.schedule(task.id, worker.id)
+
+        del private_keys[str(judge.id)]
+        await issuer.start()
+        try:
+            assert issuer.schedule(task.id, worker.id)
+            await issuer.join()
+        finally:
+            await issuer.stop()
+
+        async with session_factory() as db:
+            assert await task_key_grant_service.get_wrapped_key(db, task.id, worker.id) is None
+        assert issuer.stats()["failures"] == 1
+        assert issuer.stats()["dropped"] == 1
+
+    @pytest.mark.asyncio
+    async def test_key_rotation_revokes_grants(self, session_factory, env, monkeypatch):
+        """Test that rotating an agent's key pair deletes its grants, so the next one is wrapped for the new key"""
+        service, store, task, _, worker, private_keys = env
+        await seed(session_factory, env)
+        issuer = KeyGrantIssuer(workers=1)
+        new_public_key, new_private_key = service.generate_key_pair(scheme="x25519")
+
+        async def generate_key_pair(scheme):
+            return new_public_key, new_private_key
+
+        monkeypatch.setattr(db_service.key_pool, "generate_key_pair", generate_key_pair)
+        monkeypatch.setattr(db_service.encryption_service, "retrieve_private_key", lambda agent_id: None)
+        monkeypatch.setattr(db_service.encryption_service, "store_private_key", lambda agent_id, key: True)
+        async with session_factory() as db:
+            await issuer.issue(db, task.id, worker.id)
+            assert await db_service.key_management_service.generate_keys_for_agent(db, worker.id, "x25519")
+            assert await task_key_grant_service.get_wrapped_key(db, task.id, worker.id) is None
+            wrapped_key = await issuer.issue(db, task.id, worker.id)
+
+        payload = service.decrypt_task_payload(store.get(task.encrypted_payload_url), wrapped_key, new_private_key)
+        assert payload == {"task": "payload"}
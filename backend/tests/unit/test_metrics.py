@@ -0,0 +1,57 @@
+import pytest
+import httpx
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+
+from app.metrics.prometheus import observe_rpc, render_metrics
+from app.middleware.metrics import MetricsMiddleware
+
+
+def sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetrics:
+    """Tests for the Prometheus metrics exposed at /metrics"""
+
+    @pytest.mark.asyncio
+    async def test_requests_are_labelled_by_route_template(self):
+        """Test that request latency is recorded per route template rather than raw path"""
+        app = FastAPI()
+
+        @app.get("/items/{item_id}")
+        async def get_item(item_id: int):
+            return {"id": item_id}
+
+        labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+        before = sample("xaam_http_request_duration_seconds_count", labels)
+        unmatched_before = sample("xaam_http_request_duration_seconds_count",
+                                  {"method": "GET", "route": "unmatched", "status": "404"})
+
+        async with httpx.AsyncClient(app=MetricsMiddleware(app), base_url="http://test") as client:
+            await client.get("/items/1")
+            await client.get("/items/2")
+            await client.get("/missing")
+
+        assert sample("xaam_http_request_duration_seconds_count", labels) == before + 2
+        assert sample("xaam_http_request_duration_seconds_count",
+                      {"method": "GET", "route": "unmatched", "status": "404"}) == unmatched_before + 1
+        assert sample("xaam_http_requests_in_flight", {}) == 0
+
+    @pytest.mark.asyncio
+    async def test_rpc_errors_are_counted(self):
+        """Test that failing RPC calls are timed and counted as errors"""
+        @observe_rpc("test_call")
+        async def failing_call():
+            raise ConnectionError("RPC unavailable")
+
+        with pytest.raises(ConnectionError):
+            await failing_call()
+
+        assert sample("xaam_solana_rpc_errors_total", {"method": "test_call"}) == 1
+        assert sample("xaam_solana_rpc_duration_seconds_count", {"method": "test_call"}) == 1
+
+        body, content_type = render_metrics()
+        assert content_type.startswith("text/plain")
+        assert b'xaam_solana_rpc_errors_total{method="test_call"} 1.0' in body
+        assert b"xaam_db_pool_size" in body
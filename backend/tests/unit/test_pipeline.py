@@ -0,0 +1,208 @@
+import pytest
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.db.models.task_job import TaskJobStatus
+from app.pipeline.task_creation import TaskCreationPipeline, TaskCreationJobItem, StageMetrics, PipelineFullError
+from app.schemas.task_job import TaskJobCreate
+
+
+def _request() -> TaskJobCreate:
+    return TaskJobCreate(
+        title="Test Task",
+        summary="Test summary",
+        creator_id=uuid4(),
+        deadline=datetime.utcnow() + timedelta(days=1),
+        reward_amount=10.0,
+        judges=[uuid4()],
+        payload={"instructions": "test"},
+    )
+
+
+class TestTaskCreationPipeline:
+    """Tests for the asynchronous task creation pipeline"""
+
+    def test_stage_metrics_snapshot(self):
+        """Test that stage metrics aggregate successes, failures and latency"""
+        metrics = StageMetrics()
+        metrics.record(0.2, True)
+        metrics.record(0.4, False)
+
+        snapshot = metrics.snapshot(queue_depth=3)
+        assert snapshot["queue_depth"] == 3
+        assert snapshot["processed"] == 1
+        assert snapshot["failed"] == 1
+        assert snapshot["avg_seconds"] == pytest.approx(0.3)
+        assert snapshot["max_seconds"] == pytest.approx(0.4)
+
+    @pytest.mark.asyncio
+    async def test_submit_rejected_when_not_running(self):
+        """Test that jobs are rejected before the pipeline is started"""
+        pipeline = TaskCreationPipeline(workers_per_stage=1, queue_size=1)
+
+        with pytest.raises(PipelineFullError):
+            await pipeline.submit(None, _request())
+
+        await pipeline.start()
+        try:
+            assert pipeline.stats()["running"] is True
+            assert set(pipeline.stats()["stages"]) == {"encrypt", "store", "mint"}
+        finally:
+            await pipeline.stop()
+        assert pipeline.running is False
+
+
+class _Result:
+    def __init__(self, values):
+        self.values = values
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.values
+
+
+class _Session:
+    """Stand-in for an AsyncSession; the services using it are stubbed"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        return _Result(["judge_wallet"])
+
+    async def rollback(self):
+        pass
+
+
+class TestPipelineStages:
+    """Tests running jobs through the pipeline stages with stubbed DB and Solana"""
+
+    @pytest.fixture
+    def stubs(self, monkeypatch):
+        """Stub the services the stages call and record what happened"""
+        from app.pipeline import task_creation as module
+
+        state = {"statuses": [], "removed": [], "task": None, "mint_error": None, "put_threads": []}
+
+        async def update_status(db, job_id, status, stage_timings=None, **fields):
+            state["statuses"].append((status, {**fields, "stage_timings": dict(stage_timings or {})}))
+
+        async def touch(db, job_ids):
+            pass
+
+        async def fail_stale(db, older_than):
+            return 0
+
+        async def get_judge_public_keys(db, judge_ids):
+            return {str(judge_id): "public-key" for judge_id in judge_ids}
+
+        async def encrypt_task_payload(payload, keys):
+            return {"encrypted_payload": b"ciphertext", "encrypted_keys": {judge: "wrapped" for judge in keys}}
+
+        async def create_with_judges(db, task_create):
+            state["task"] = SimpleNamespace(id=uuid4(), encrypted_payload_url=task_create.encrypted_payload_url)
+            return state["task"]
+
+        async def get_task(db, task_id):
+            return state["task"]
+
+        async def update_task(db, db_obj, obj_in):
+            return db_obj
+
+        async def remove_task(db, id):
+            state["removed"].append(id)
+
+        async def get_wallet(db, creator_id):
+            return None
+
+        async def create_task_nft(**kwargs):
+            if state["mint_error"]:
+                raise state["mint_error"]
+            return {"task_nft": "nft_minted"}
+
+        monkeypatch.setattr(module, "AsyncSessionLocal", _Session)
+        monkeypatch.setattr(module.task_job_service, "update_status", update_status)
+        monkeypatch.setattr(module.task_job_service, "touch", touch)
+        monkeypatch.setattr(module.task_job_service, "fail_stale", fail_stale)
+        monkeypatch.setattr(module.key_management_service, "get_judge_public_keys", get_judge_public_keys)
+        monkeypatch.setattr(module.async_encryption_service, "encrypt_task_payload", encrypt_task_payload)
+        def put(data):
+            state["put_threads"].append(threading.current_thread())
+            return "sha256:" + "ab" * 32
+
+        monkeypatch.setattr(module.blob_store, "put", put)
+        monkeypatch.setattr(module.task_service, "create_with_judges", create_with_judges)
+        monkeypatch.setattr(module.task_service, "get", get_task)
+        monkeypatch.setattr(module.task_service, "update", update_task)
+        monkeypatch.setattr(module.task_service, "remove", remove_task)
+        monkeypatch.setattr(module.wallet_service, "get_by_agent", get_wallet)
+        monkeypatch.setattr(module.solana_client, "create_task_nft", create_task_nft)
+        return state
+
+    async def _run_job(self, pipeline):
+        """Push one job through all stages and wait for it to finish"""
+        item = TaskCreationJobItem(uuid4(), _request())
+        pipeline.active[item.job_id] = item
+        await pipeline.queues["encrypt"].put(item)
+        for stage in TaskCreationPipeline.STAGES:
+            await asyncio.wait_for(pipeline.queues[stage].join(), timeout=5)
+        return item
+
+    async def test_job_runs_all_stages(self, stubs):
+        """Test that a job is encrypted, stored and minted"""
+        pipeline = TaskCreationPipeline(workers_per_stage=1, queue_size=10, heartbeat_interval=60)
+        await pipeline.start()
+        try:
+            item = await self._run_job(pipeline)
+        finally:
+            await pipeline.stop()
+
+        statuses = [status for status, _ in stubs["statuses"]]
+        assert statuses[0] == TaskJobStatus.ENCRYPTING
+        assert statuses[-1] == TaskJobStatus.COMPLETED
+        assert stubs["statuses"][-1][1]["nft_id"] == "nft_minted"
+        assert set(item.timings) == {"encrypt", "store", "mint"}
+        assert stubs["statuses"][-1][1]["stage_timings"] == item.timings
+        # The ciphertext is written off the event loop
+        assert stubs["put_threads"] and threading.main_thread() not in stubs["put_threads"]
+        assert item.job_id not in pipeline.active
+        assert pipeline.stats()["stages"]["mint"]["processed"] == 1
+
+    async def test_mint_failure_removes_task(self, stubs):
+        """Test that a task stored for a job is deleted when minting fails"""
+        stubs["mint_error"] = RuntimeError("RPC unavailable")
+        pipeline = TaskCreationPipeline(workers_per_stage=1, queue_size=10, heartbeat_interval=60)
+        await pipeline.start()
+        try:
+            await self._run_job(pipeline)
+        finally:
+            await pipeline.stop()
+
+        status, fields = stubs["statuses"][-1]
+        assert status == TaskJobStatus.FAILED
+        assert fields["task_id"] is None
+        assert "RPC unavailable" in fields["error"]
+        assert stubs["removed"] == [stubs["task"].id]
+        assert pipeline.stats()["stages"]["mint"]["failed"] == 1
+
+    async def test_wait_for_update_wakes_on_stage_change(self):
+        """Test that long-polls on a local job wake when it changes stage"""
+        pipeline = TaskCreationPipeline(workers_per_stage=1, queue_size=10)
+        job_id = uuid4()
+        pipeline.active[job_id] = TaskCreationJobItem(job_id, _request())
+
+        waiter = asyncio.create_task(pipeline.wait_for_update(job_id, timeout=5))
+        await asyncio.sleep(0)
+        pipeline._notify(job_id, finished=True)
+
+        await asyncio.wait_for(waiter, timeout=1)
+        assert job_id not in pipeline.active
+        assert job_id not in pipeline.updates
@@ -0,0 +1,120 @@
+import pytest
+import asyncio
+
+from app.middleware.rate_limit import TokenBucket, RateLimiter, RateLimitPolicy, RateLimitMiddleware, client_key, client_ip
+
+
+class TestRateLimiter:
+    """Tests for token buckets and route group policies"""
+
+    def test_token_bucket_burst_and_refill(self):
+        """Test that a bucket allows a burst and then refills at its rate"""
+        bucket = TokenBucket(rate=2, burst=3)
+        now = bucket.updated_at
+
+        assert [bucket.consume(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert bucket.consume(now) == pytest.approx(0.5)
+        assert bucket.consume(now + 0.5) == 0.0
+
+    def test_policy_matches_longest_prefix(self):
+        """Test that requests are grouped by the most specific route prefix"""
+        limiter = RateLimiter([
+            RateLimitPolicy("tasks", "/api/tasks", rate=1, burst=1),
+            RateLimitPolicy("default", "/", rate=100, burst=100),
+        ])
+
+        assert limiter.policy_for("/api/tasks/123").name == "tasks"
+        assert limiter.policy_for("/api/agents").name == "default"
+        assert limiter.policy_for("/api/tasks").name == "tasks"
+        assert limiter.policy_for("/api/tasksets").name == "default"
+
+    def test_clients_are_limited_independently(self):
+        """Test that one client exhausting its bucket does not affect another"""
+        limiter = RateLimiter([RateLimitPolicy("default", "/", rate=1, burst=1)])
+
+        assert limiter.check("/api/tasks", "agent:a")[1] == 0
+        assert limiter.check("/api/tasks", "agent:a")[1] > 0
+        assert limiter.check("/api/tasks", "agent:b")[1] == 0
+        assert limiter.throttled["default"] == 1
+
+    def test_client_key_prefers_agent_id(self):
+        """Test client identification order"""
+        scope = {"headers": [(b"x-wallet-address", b"wallet1")], "client": ("10.0.0.1", 1234)}
+        assert client_key(scope) == "wallet:wallet1"
+
+        scope["headers"].append((b"x-agent-id", b"agent1"))
+        assert client_key(scope) == "agent:agent1"
+
+        assert client_key({"headers": [], "client": ("10.0.0.1", 1234)}) == "ip:10.0.0.1"
+        assert client_ip(scope) == "ip:10.0.0.1"
+
+    def test_rotating_agent_ids_share_ip_bucket(self):
+        """Test that a client sending a new agent ID per request is still limited by its address"""
+        limiter = RateLimiter([RateLimitPolicy("default", "/", rate=1, burst=2)], ip_multiplier=2)
+
+        results = [limiter.check("/api/tasks", f"agent:{i}", "ip:10.0.0.1")[1] for i in range(5)]
+
+        assert results[:4] == [0, 0, 0, 0]
+        assert results[4] > 0
+        assert limiter.check("/api/tasks", "agent:x", "ip:10.0.0.2")[1] == 0
+
+    def test_throttled_client_does_not_drain_ip_bucket(self):
+        """Test that a request refused by the client bucket takes no token from the shared IP bucket"""
+        limiter = RateLimiter([RateLimitPolicy("default", "/", rate=1, burst=1)], ip_multiplier=2)
+
+        results = [limiter.check("/api/tasks", "agent:a", "ip:10.0.0.1")[1] for _ in range(5)]
+
+        assert results[0] == 0
+        assert all(retry_after > 0 for retry_after in results[1:])
+        assert limiter.check("/api/tasks", "agent:b", "ip:10.0.0.1")[1] == 0
+
+
+class TestRateLimitMiddleware:
+    """Tests for the rate limiting middleware"""
+
+    async def _request(self, middleware, path="/api/tasks"):
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "path": path, "headers": [], "client": ("10.0.0.1", 1234)}
+        await middleware(scope, receive, send)
+        return sent[0]["status"]
+
+    async def test_throttles_with_429(self):
+        """Test that requests over the client's rate are rejected"""
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        middleware = RateLimitMiddleware(app, policies=[RateLimitPolicy("default", "/", rate=1, burst=2)])
+
+        assert [await self._request(middleware) for _ in range(3)] == [200, 200, 429]
+        assert await self._request(middleware, "/health") == 200
+
+    async def test_sheds_load_with_503(self):
+        """Test that requests are shed when the concurrency limit is saturated"""
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        middleware = RateLimitMiddleware(
+            app,
+            policies=[RateLimitPolicy("default", "/", rate=100, burst=100)],
+            max_concurrency=1,
+            queue_budget=0.01,
+        )
+
+        first = asyncio.ensure_future(self._request(middleware))
+        await asyncio.sleep(0)
+        assert await self._request(middleware) == 503
+        release.set()
+        assert await first == 200
+        assert middleware.stats()["shed"] == 1
@@ -0,0 +1,62 @@
+import orjson
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.api.responses import list_response
+from app.db.models.agent import AgentType as ModelAgentType
+from app.schemas.agent import Agent
+from app.schemas.task import Task
+
+
+class TestListResponse:
+    """Tests for list_response serialization of ORM objects"""
+
+    def test_tasks_with_judges(self):
+        """Test that tasks carrying judge agents serialize with the judges' ids"""
+        now = datetime.utcnow()
+        judges = [SimpleNamespace(id=uuid4(), name="Judge"), SimpleNamespace(id=uuid4(), name="Judge")]
+        task = SimpleNamespace(
+            id=uuid4(),
+            created_at=now,
+            updated_at=now,
+            nft_id="nft_00000001",
+            title="Task",
+            summary="Summary",
+            encrypted_payload_url="sha256:" + "ab" * 32,
+            encryption_key=None,
+            creator_id=uuid4(),
+            status="CREATED",
+            deadline=now + timedelta(days=7),
+            reward_amount=100.0,
+            reward_currency="USDC",
+            judges=judges,
+        )
+
+        response = list_response(Task, [task])
+        body = orjson.loads(response.body)
+
+        assert response.status_code == 200
+        assert body[0]["judges"] == [str(judge.id) for judge in judges]
+
+    def test_agents_with_model_enum(self):
+        """Test that agents whose type is the ORM enum serialize"""
+        agent = SimpleNamespace(
+            id=uuid4(),
+            created_at=None,
+            updated_at=None,
+            name="Worker",
+            description="Worker agent",
+            agent_type=ModelAgentType.WORKER,
+            wallet_address="wallet",
+            public_key="key",
+            reputation_score=0.0,
+            completed_tasks=0,
+            successful_tasks=0,
+            social_profiles=None,
+            portfolio_url=None,
+        )
+
+        body = orjson.loads(list_response(Agent, [agent]).body)
+
+        assert body[0]["agent_type"] == "WORKER"
@@ -0,0 +1,232 @@
+import pytest
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+
+from app.db.models.agent import Agent, AgentType
+from app.db.models.task import Task, TaskStatus, task_judge_association
+from app.db.models.deliverable import Deliverable
+from app.encryption import rewrap
+from app.encryption.async_service import AsyncEncryptionService
+from app.encryption.decrypted_cache import DecryptedCache
+from app.encryption.rewrap import KeyRewrapService, RewrapError
+from app.encryption.service import EncryptionService
+from app.storage.blob_store import LocalBlobStore
+
+
+@compiles(UUID, "sqlite")
+def compile_uuid_sqlite(type_, compiler, **kw):
+    # The models use the PostgreSQL UUID type; store it as text in the test database
+    return "CHAR(36)"
+
+
+class Principals:
+    """Agents with X25519 key pairs, and the private keys the server holds"""
+
+    def __init__(self, service: EncryptionService):
+        self.service = service
+        self.private_keys = {}
+
+    def agent(self, agent_type: AgentType = AgentType.JUDGE) -> Agent:
+        public_key, private_key = self.service.generate_key_pair(scheme="x25519")
+        agent = Agent(
+            id=uuid4(),
+            name=agent_type.value.title(),
+            description="Test agent",
+            agent_type=agent_type,
+            wallet_address=f"wallet-{uuid4().hex}",
+            public_key=public_key,
+        )
+        self.private_keys[str(agent.id)] = private_key
+        return agent
+
+    def rotate(self, agent: Agent):
+        agent.public_key, self.private_keys[str(agent.id)] = self.service.generate_key_pair(scheme="x25519")
+
+    async def get_agent_private_key(self, agent_id):
+        return self.private_keys.get(str(agent_id))
+
+
+@pytest.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for table in (Agent.__table__, Task.__table__, task_judge_association, Deliverable.__table__):
+            await conn.run_sync(table.create)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """Route the re-wrap service to a test blob store, crypto pool, cache and keystore"""
+    service = EncryptionService()
+    principals = Principals(service)
+    store = LocalBlobStore(str(tmp_path))
+    crypto = AsyncEncryptionService(pool_type="thread", max_workers=2)
+    cache = DecryptedCache(enabled=True)
+    unwraps = []
+    rewrap_key = crypto.rewrap_key
+
+    async def counting_rewrap_key(encrypted_key, private_key, public_keys):
+        unwraps.append(sorted(public_keys))
+        return await rewrap_key(encrypted_key, private_key, public_keys)
+
+    monkeypatch.setattr(crypto, "rewrap_key", counting_rewrap_key)
+    monkeypatch.setattr(rewrap, "blob_store", store)
+    monkeypatch.setattr(rewrap, "async_encryption_service", crypto)
+    monkeypatch.setattr(rewrap, "decrypted_cache", cache)
+    published = []
+    publish = rewrap.invalidation_channel.publish
+
+    async def recording_publish(topic, payload=None, local=True):
+        published.append((topic, payload))
+        await publish(topic, payload, local)
+
+    monkeypatch.setattr(rewrap.invalidation_channel, "publish", recording_publish)
+    monkeypatch.setattr(rewrap.key_management_service, "get_agent_private_key", principals.get_agent_private_key)
+    monkeypatch.setattr(rewrap.key_management_service, "_public_keys", OrderedDict())
+    yield service, principals, store, cache, unwraps, published
+    crypto.shutdown()
+
+
+async def seed_task(db, env, judges, status=TaskStatus.SUBMITTED, store_key_map=True):
+    """Create a task encrypted for the judges, with one deliverable"""
+    service, principals, store, _, _, _ = env
+    worker = principals.agent(AgentType.WORKER)
+    public_keys = {str(judge.id): judge.public_key for judge in judges}
+    payload = service.encrypt_task_payload({"task": "payload"}, public_keys)
+    content = service.encrypt_deliverable({"answer": 42}, public_keys)
+    task = Task(
+        id=uuid4(), nft_id="nft_1", title="Task", summary="Summary",
+        encrypted_payload_url=store.put(payload["encrypted_payload"]),
+        encryption_key=next(iter(payload["encrypted_keys"].values())),
+        encryption_keys=payload["encrypted_keys"] if store_key_map else None,
+        creator_id=worker.id, status=status, deadline=datetime.utcnow() + timedelta(days=1), reward_amount=100.0,
+    )
+    task.judges = list(judges)
+    deliverable = Deliverable(
+        id=uuid4(), task_id=task.id, agent_id=worker.id,
+        encrypted_content_url=store.put(content["encrypted_content"]), encryption_keys=content["encrypted_keys"],
+    )
+    db.add_all([worker, task, deliverable])
+    await db.commit()
+    return task, deliverable
+
+
+def can_read(env, task, deliverable, judge) -> bool:
+    """Check that a judge decrypts the task payload and the deliverable with its key map entries"""
+    service, principals, store, _, _, _ = env
+    private_key = principals.private_keys[str(judge.id)]
+    judge_id = str(judge.id)
+    return (
+        service.decrypt_task_payload(store.get(task.encrypted_payload_url), task.encryption_keys[judge_id], private_key)
+        == {"task": "payload"}
+        and service.decrypt_deliverable(
+            store.get(deliverable.encrypted_content_url), deliverable.encryption_keys[judge_id], private_key
+        ) == {"answer": 42}
+    )
+
+
+class TestKeyRewrap:
+    """Tests for re-wrapping data keys when judges change"""
+
+    @pytest.mark.asyncio
+    async def test_replacing_judges_rewraps_key_maps_only(self, session_factory, env):
+        """Test that new judges get wrapped keys, kept judges keep theirs and removed ones lose access"""
+        _, principals, store, cache, unwraps, published = env
+        rewrap_service = KeyRewrapService()
+        async with session_factory() as db:
+            removed, kept, added = (principals.agent() for _ in range(3))
+            db.add_all([removed, kept, added])
+            task, deliverable = await seed_task(db, env, [removed, kept])
+            payload_ref, content_ref = task.encrypted_payload_url, deliverable.encrypted_content_url
+            kept_key = deliverable.encryption_keys[str(kept.id)]
+            cache.put(cache.key(deliverable.id, removed.id, content_ref), {"answer": 42})
+
+            task = await rewrap_service.set_task_judges(db, task, [kept.id, added.id])
+            await db.refresh(deliverable)
+
+        assert {judge.id for judge in task.judges} == {kept.id, added.id}
+        assert list(task.encryption_keys) == list(deliverable.encryption_keys) == [str(kept.id), str(added.id)]
+        assert task.encryption_key == task.encryption_keys[str(kept.id)]
+        assert deliverable.encryption_keys[str(kept.id)] == kept_key
+        # Content was not re-encrypted, and each data key was unwrapped once
+        assert (task.encrypted_payload_url, deliverable.encrypted_content_url) == (payload_ref, content_ref)
+        assert unwraps == [[str(added.id)], [str(added.id)]]
+        assert can_read(env, task, deliverable, added)
+        # Other workers drop their decrypted copies too
+        assert published == [("decrypted_object", {"object_ids": [str(task.id), str(deliverable.id)]})]
+        assert cache.stats()["entries"] == 0
+        assert rewrap_service.stats()["keys_dropped"] == 2
+
+    @pytest.mark.asyncio
+    async def test_reads_key_table_of_older_tasks(self, session_factory, env):
+        """Test that tasks without a stored key map are re-wrapped from their envelope header"""
+        _, principals, _, _, _, _ = env
+        async with session_factory() as db:
+            judge, added = principals.agent(), principals.agent()
+            db.add_all([judge, added])
+            task, deliverable = await seed_task(db, env, [judge], store_key_map=False)
+
+            task = await KeyRewrapService().set_task_judges(db, task, [judge.id, added.id])
+
+        assert can_read(env, task, deliverable, added)
+
+    @pytest.mark.asyncio
+    async def test_fails_without_an_authorized_key(self, session_factory, env):
+        """Test that nothing changes when no holder of the data key has a private key here"""
+        _, principals, _, _, _, _ = env
+        async with session_factory() as db:
+            judge, added = principals.agent(), principals.agent()
+            db.add_all([judge, added])
+            task, _ = await seed_task(db, env, [judge])
+            del principals.private_keys[str(judge.id)]
+
+            with pytest.raises(RewrapError):
+                await KeyRewrapService().set_task_judges(db, task, [judge.id, added.id])
+            await db.refresh(task)
+            assert list(task.encryption_keys) == [str(judge.id)]
+            assert [judge.id for judge in task.judges] == [judge.id]
+
+    @pytest.mark.asyncio
+    async def test_rewraps_open_tasks_of_a_rotated_judge(self, session_factory, env, monkeypatch):
+        """Test that the background job re-wraps a judge's keys on its open tasks only, reporting failures"""
+        _, principals, _, _, _, _ = env
+        async with session_factory() as db:
+            rotated, other, lonely = principals.agent(), principals.agent(), principals.agent()
+            db.add_all([rotated, other, lonely])
+            open_tasks = [await seed_task(db, env, [rotated, other]) for _ in range(3)]
+            closed_task, _ = await seed_task(db, env, [rotated, other], status=TaskStatus.COMPLETED)
+            # Only the rotated judge holds this task's keys, and its old private key is gone
+            orphan_task, _ = await seed_task(db, env, [rotated, lonely])
+            del principals.private_keys[str(lonely.id)]
+            closed_keys = dict(closed_task.encryption_keys)
+            orphan_keys = dict(orphan_task.encryption_keys)
+
+            principals.rotate(rotated)
+            await db.commit()
+            monkeypatch.setattr(rewrap, "AsyncSessionLocal", session_factory)
+            rewrap_service = KeyRewrapService(batch_size=2)
+            assert rewrap_service.start_judge_rewrap(rotated.id)["status"] == "RUNNING"
+            await rewrap_service.join()
+            job = rewrap_service.judge_rewrap_job(rotated.id)
+            for task, deliverable in open_tasks:
+                await db.refresh(task)
+                await db.refresh(deliverable)
+                assert can_read(env, task, deliverable, rotated)
+            await db.refresh(closed_task)
+            await db.refresh(orphan_task)
+
+        assert job == {
+            "judge_id": str(rotated.id), "status": "COMPLETED", "tasks": 4, "rewrapped": 6,
+            "failed": [orphan_task.id], "error": None,
+        }
+        assert rewrap_service.stats()["jobs_running"] == 0
+        assert closed_task.encryption_keys == closed_keys
+        assert orphan_task.encryption_keys == orphan_keys
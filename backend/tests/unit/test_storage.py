@@ -0,0 +1,176 @@
+import pytest
+import hashlib
+import tempfile
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.routes import blobs
+from app.storage.blob_store import (
+    LocalBlobStore, BlobNotFoundError, BlobTooLargeError, is_blob_ref, parse_blob_ref
+)
+
+
+class TestLocalBlobStore:
+    """Tests for the LocalBlobStore class"""
+
+    @pytest.fixture
+    def blob_store(self):
+        """Create a temporary blob store for testing"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield LocalBlobStore(root_dir=temp_dir)
+
+    def test_put_and_get(self, blob_store):
+        """Test storing and reading back a blob"""
+        data = b"encrypted payload"
+        ref = blob_store.put(data)
+
+        assert is_blob_ref(ref)
+        assert parse_blob_ref(ref) == hashlib.sha256(data).hexdigest()
+        assert blob_store.get(ref) == data
+        assert blob_store.size(ref) == len(data)
+
+    def test_put_deduplicates(self, blob_store):
+        """Test that identical content is stored once under the same reference"""
+        ref1 = blob_store.put(b"same ciphertext")
+        ref2 = blob_store.put(b"same ciphertext")
+
+        assert ref1 == ref2
+        assert blob_store.delete(ref1)
+        assert not blob_store.exists(ref2)
+
+    async def test_put_stream(self, blob_store):
+        """Test storing a blob from an async stream of chunks"""
+        chunks = [b"a" * 1000, b"b" * 1000, b"", b"c"]
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        ref = await blob_store.put_stream(stream())
+        assert blob_store.get(ref) == b"".join(chunks)
+        assert blob_store.put(b"".join(chunks)) == ref
+
+    async def test_put_stream_max_size(self, blob_store):
+        """Test that an oversized stream is rejected without leaving anything behind"""
+        async def stream():
+            for _ in range(3):
+                yield b"x" * 1000
+
+        with pytest.raises(BlobTooLargeError):
+            await blob_store.put_stream(stream(), max_size=2500)
+
+        assert await blob_store.put_stream(stream(), max_size=3000)
+
+    def test_resolve_legacy_inline_value(self, blob_store):
+        """Test that non-reference values are returned unchanged"""
+        ref = blob_store.put(b"eyJpdiI6ICIuLi4ifQ==")
+
+        assert blob_store.resolve(ref) == "eyJpdiI6ICIuLi4ifQ=="
+        assert blob_store.resolve("eyJpdiI6ICIuLi4ifQ==") == "eyJpdiI6ICIuLi4ifQ=="
+        assert blob_store.resolve_bytes(ref) == b"eyJpdiI6ICIuLi4ifQ=="
+        assert blob_store.resolve_bytes("eyJpdiI6ICIuLi4ifQ==") == b"eyJpdiI6ICIuLi4ifQ=="
+        assert blob_store.resolve_bytes(blob_store.put(b"\x89XAE\x01")) == b"\x89XAE\x01"
+
+    async def test_async_put_and_resolve(self, blob_store):
+        """Test the event loop variants of put and resolve_bytes"""
+        ref = await blob_store.put_async(b"\x89XAE\x01")
+
+        assert ref == blob_store.put(b"\x89XAE\x01")
+        assert await blob_store.resolve_bytes_async(ref) == b"\x89XAE\x01"
+        assert await blob_store.resolve_bytes_async("eyJpdiI6ICIuLi4ifQ==") == b"eyJpdiI6ICIuLi4ifQ=="
+
+    def test_missing_and_invalid_refs(self, blob_store):
+        """Test errors for missing blobs and malformed references"""
+        with pytest.raises(BlobNotFoundError):
+            blob_store.get("sha256:" + "0" * 64)
+
+        with pytest.raises(ValueError):
+            blob_store.get("sha256:../../etc/passwd")
+
+
+class TestBlobRoutes:
+    """Tests for the blob upload and download routes"""
+
+    DATA = bytes(range(256)) * 4
+
+    @pytest.fixture
+    async def client(self, monkeypatch):
+        """Create a client for the blob routes backed by a temporary store"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = LocalBlobStore(root_dir=temp_dir)
+            monkeypatch.setattr(blobs, "blob_store", store)
+            monkeypatch.setattr(blobs, "UPLOADS_ENABLED", True)
+            monkeypatch.setattr(blobs, "MAX_UPLOAD_BYTES", 2048)
+            app = FastAPI()
+            app.include_router(blobs.router, prefix="/api/blobs")
+            async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                client.digest = parse_blob_ref(store.put(self.DATA))
+                yield client
+
+    async def test_get_full_blob(self, client):
+        """Test downloading a whole blob"""
+        response = await client.get(f"/api/blobs/{client.digest}")
+
+        assert response.status_code == 200
+        assert response.content == self.DATA
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["etag"] == f'"{client.digest}"'
+
+    async def test_get_ranges(self, client):
+        """Test explicit, open-ended, suffix and clamped ranges"""
+        size = len(self.DATA)
+        cases = {
+            "bytes=10-19": (10, 19),
+            "bytes=1000-": (1000, size - 1),
+            "bytes=-24": (size - 24, size - 1),
+            "bytes=1000-5000": (1000, size - 1),
+            "bytes=-5000": (0, size - 1),
+        }
+        for header, (start, end) in cases.items():
+            response = await client.get(f"/api/blobs/{client.digest}", headers={"Range": header})
+
+            assert response.status_code == 206, header
+            assert response.content == self.DATA[start:end + 1]
+            assert response.headers["content-range"] == f"bytes {start}-{end}/{size}"
+
+    async def test_get_unsatisfiable_and_ignored_ranges(self, client):
+        """Test that out-of-bounds ranges get 416 and unsupported ones the full blob"""
+        response = await client.get(f"/api/blobs/{client.digest}", headers={"Range": "bytes=5000-"})
+        assert response.status_code == 416
+        assert response.headers["content-range"] == f"bytes */{len(self.DATA)}"
+
+        for header in ("bytes=0-1,5-6", "items=0-1", "bytes=a-b"):
+            response = await client.get(f"/api/blobs/{client.digest}", headers={"Range": header})
+            assert response.status_code == 200, header
+            assert response.content == self.DATA
+
+    async def test_head_and_missing(self, client):
+        """Test HEAD and lookups of missing or malformed digests"""
+        response = await client.head(f"/api/blobs/{client.digest}")
+        assert response.status_code == 200
+        assert response.headers["content-length"] == str(len(self.DATA))
+
+        assert (await client.head(f"/api/blobs/{'0' * 64}")).status_code == 404
+        assert (await client.get(f"/api/blobs/{'0' * 64}")).status_code == 404
+        assert (await client.get("/api/blobs/not-a-digest")).status_code == 400
+
+    async def test_upload_limits(self, client, monkeypatch):
+        """Test that uploads are size-capped and can be disabled"""
+        response = await client.post("/api/blobs/", content=b"y" * 100)
+        assert response.status_code == 201
+        assert response.json()["size"] == 100
+
+        response = await client.post("/api/blobs/", content=b"y" * 4096)
+        assert response.status_code == 413
+
+        async def chunked():
+            for _ in range(4):
+                yield b"z" * 1024
+
+        response = await client.post("/api/blobs/", content=chunked())
+        assert response.status_code == 413
+
+        monkeypatch.setattr(blobs, "UPLOADS_ENABLED", False)
+        response = await client.post("/api/blobs/", content=b"y" * 100)
+        assert response.status_code == 403
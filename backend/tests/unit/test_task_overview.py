@@ -0,0 +1,146 @@
+import pytest
+import httpx
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+
+from app.api.routes import tasks
+from app.db.database import get_db
+from app.db.models.agent import Agent, AgentType
+from app.db.models.task import Task, TaskStatus, task_judge_association
+from app.db.models.deliverable import Deliverable, DeliverableStatus
+from app.db.models.stake import Stake, StakeStatus
+from app.db.services.task_service import task_service
+
+
+@compiles(UUID, "sqlite")
+def compile_uuid_sqlite(type_, compiler, **kw):
+    # The models use the PostgreSQL UUID type; store it as text in the test database
+    return "CHAR(36)"
+
+
+def make_agent(agent_type: AgentType, index: int) -> Agent:
+    return Agent(
+        id=uuid4(),
+        name=f"{agent_type.value.title()} {index}",
+        description="Test agent",
+        agent_type=agent_type,
+        wallet_address=f"{agent_type.value}-wallet-{index}-{uuid4().hex[:8]}",
+        public_key="public-key",
+    )
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        for table in (Agent.__table__, Task.__table__, task_judge_association,
+                      Deliverable.__table__, Stake.__table__):
+            await conn.run_sync(table.create)
+    yield engine
+    await engine.dispose()
+
+
+async def seed(session_factory, judges: int, deliverables: int, stakes: int):
+    async with session_factory() as db:
+        sponsor = make_agent(AgentType.WORKER, 0)
+        judge_agents = [make_agent(AgentType.JUDGE, i) for i in range(judges)]
+        workers = [make_agent(AgentType.WORKER, i + 1) for i in range(max(deliverables, stakes))]
+        db.add_all([sponsor, *judge_agents, *workers])
+        task = Task(
+            id=uuid4(),
+            nft_id="nft_1",
+            title="Task",
+            summary="Summary",
+            encrypted_payload_url="sha256:" + "ab" * 32,
+            creator_id=sponsor.id,
+            status=TaskStatus.SUBMITTED,
+            deadline=datetime.utcnow() + timedelta(days=1),
+            reward_amount=100.0,
+            judges=judge_agents,
+        )
+        db.add(task)
+        for i in range(deliverables):
+            # The first judge scores every deliverable, the others none
+            db.add(Deliverable(
+                task_id=task.id,
+                agent_id=workers[i].id,
+                encrypted_content_url="sha256:" + "cd" * 32,
+                encryption_keys={str(judge.id): "key" for judge in judge_agents},
+                scores={str(judge_agents[0].id): float(i + 1)},
+                status=DeliverableStatus.JUDGED,
+            ))
+        for i in range(stakes):
+            db.add(Stake(
+                task_id=task.id,
+                agent_id=workers[i].id,
+                amount=2.0,
+                status=StakeStatus.ACTIVE if i % 2 == 0 else StakeStatus.RETURNED,
+            ))
+        await db.commit()
+        return task.id, [judge.id for judge in judge_agents]
+
+
+class TestTaskOverview:
+    """Tests for the aggregated task overview"""
+
+    @pytest.mark.asyncio
+    async def test_fixed_query_count(self, engine):
+        """Test that the overview takes the same number of queries for small and large tasks"""
+        session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        small_id, _ = await seed(session_factory, judges=1, deliverables=1, stakes=1)
+        large_id, _ = await seed(session_factory, judges=5, deliverables=20, stakes=7)
+
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        counts = []
+        for task_id in (small_id, large_id):
+            statements.clear()
+            async with session_factory() as db:
+                overview = await task_service.get_overview(db, task_id)
+            counts.append(len(statements))
+
+        assert counts[0] == counts[1] == 4
+        assert len(overview["judges"]) == 5
+        assert overview["judges"][0]["scored_deliverables"] in (0, 20)
+        assert sum(judge["scored_deliverables"] for judge in overview["judges"]) == 20
+        assert len(overview["deliverables"]) == 20
+        assert overview["deliverables"][0]["pending_judges"] == 4
+        assert overview["score"] == {"count": 20, "mean": 10.5, "min": 1.0, "max": 20.0}
+        assert overview["stakes"] == {"count": 7, "total_amount": 14.0, "by_status": {"ACTIVE": 4, "RETURNED": 3}}
+
+    @pytest.mark.asyncio
+    async def test_route_supports_conditional_requests(self, engine):
+        """Test that the overview route returns an ETag and honours If-None-Match"""
+        session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        task_id, _ = await seed(session_factory, judges=2, deliverables=1, stakes=0)
+
+        app = FastAPI()
+        app.include_router(tasks.router, prefix="/api/tasks")
+
+        async def override_get_db():
+            async with session_factory() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            first = await client.get(f"/api/tasks/{task_id}/overview")
+            cached = await client.get(f"/api/tasks/{task_id}/overview", headers={"If-None-Match": first.headers["etag"]})
+            missing = await client.get(f"/api/tasks/{uuid4()}/overview")
+
+        assert first.status_code == 200
+        body = first.json()
+        assert body["task"]["id"] == str(task_id)
+        assert "encryption_keys" not in body["deliverables"][0]
+        assert body["deliverables"][0]["score"]["count"] == 1
+        assert first.headers["cache-control"].startswith("private")
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == first.headers["etag"]
+        assert missing.status_code == 404
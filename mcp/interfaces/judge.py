@@ -5,6 +5,8 @@ from fastapi import WebSocket
 from typing import Dict, Any, List
 import os
 
+from protocol.encoding import send_json
+
 logger = logging.getLogger(__name__)
 
 # API base URL
@@ -25,7 +27,7 @@ async def handle_judge_message(client_id: str, message_type: str, data: Dict[str
     elif message_type == "get_judge_stats":
         await handle_get_judge_stats(client_id, data, websocket)
     else:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": f"Unknown message type: {message_type}"
         })
@@ -36,12 +38,12 @@ async def handle_list_assigned_tasks(client_id: str, data: Dict[str, Any], webso
     """
     judge_id = data.get("judge_id", client_id)
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # Get tasks assigned to this judge
         response = await client.get(f"{API_BASE_URL}/api/judges/{judge_id}/tasks")
         tasks = response.json()
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "assigned_tasks",
             "tasks": tasks
         })
@@ -54,20 +56,20 @@ async def handle_get_task_deliverables(client_id: str, data: Dict[str, Any], web
     judge_id = data.get("judge_id", client_id)
     
     if not task_id:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": "Missing task_id"
         })
         return
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # Get task details
         task_response = await client.get(f"{API_BASE_URL}/api/tasks/{task_id}")
         task = task_response.json()
         
         # Verify this judge is assigned to the task
         if judge_id not in task.get("judges", []):
-            await websocket.send_json({
+            await send_json(websocket, {
                 "type": "error",
                 "message": "You are not assigned to judge this task"
             })
@@ -89,7 +91,7 @@ async def handle_get_task_deliverables(client_id: str, data: Dict[str, Any], web
         else:
             deliverables = []
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "task_deliverables",
             "task_id": task_id,
             "deliverables": deliverables
@@ -106,7 +108,7 @@ async def handle_submit_score(client_id: str, data: Dict[str, Any], websocket: W
     feedback = data.get("feedback")
     
     if not all([task_id, agent_id, score, feedback]):
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": "Missing required fields"
         })
@@ -118,13 +120,13 @@ async def handle_submit_score(client_id: str, data: Dict[str, Any], websocket: W
         if not (0 <= score_value <= 5):
             raise ValueError("Score must be between 0 and 5")
     except ValueError as e:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": str(e)
         })
         return
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # Submit score
         response = await client.post(
             f"{API_BASE_URL}/api/judges/{judge_id}/score",
@@ -140,7 +142,7 @@ async def handle_submit_score(client_id: str, data: Dict[str, Any], websocket: W
         # In a real implementation, we would check if all judges have submitted scores
         # and update the task status accordingly
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "score_submitted",
             "result": result
         })
@@ -151,7 +153,7 @@ async def handle_get_judge_stats(client_id: str, data: Dict[str, Any], websocket
     """
     judge_id = data.get("judge_id", client_id)
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # Get judge details
         judge_response = await client.get(f"{API_BASE_URL}/api/judges/{judge_id}")
         judge = judge_response.json()
@@ -173,7 +175,7 @@ async def handle_get_judge_stats(client_id: str, data: Dict[str, Any], websocket
             }
         }
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "judge_stats",
             "stats": stats
         })
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import json
 import httpx
@@ -5,11 +6,16 @@ from fastapi import WebSocket
 from typing import Dict, Any, List
 import os
 
+from protocol.encoding import send_json
+
 logger = logging.getLogger(__name__)
 
 # API base URL
 API_BASE_URL = os.getenv("API_BASE_URL", "http://api:8000")
 
+# Maximum time to wait for an asynchronous task creation job to finish
+TASK_JOB_TIMEOUT = float(os.getenv("TASK_JOB_TIMEOUT", "300"))
+
 async def handle_sponsor_message(client_id: str, message_type: str, data: Dict[str, Any], websocket: WebSocket):
     """
     Handle messages from sponsor agents (task creators)
@@ -27,7 +33,7 @@ async def handle_sponsor_message(client_id: str, message_type: str, data: Dict[s
     elif message_type == "get_task_results":
         await handle_get_task_results(client_id, data, websocket)
     else:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": f"Unknown message type: {message_type}"
         })
@@ -36,11 +42,11 @@ async def handle_list_judges(client_id: str, data: Dict[str, Any], websocket: We
     """
     List available judges for task creation
     """
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         response = await client.get(f"{API_BASE_URL}/api/judges")
         judges = response.json()
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "judges_list",
             "judges": judges
         })
@@ -49,12 +55,16 @@ async def handle_create_task(client_id: str, data: Dict[str, Any], websocket: We
     """
     Create a new task
     """
+    if "payload" in data:
+        await handle_create_task_job(client_id, data, websocket)
+        return
+    
     required_fields = ["title", "summary", "encrypted_payload_url", "deadline", 
                        "reward_amount", "reward_currency", "judges"]
     
     for field in required_fields:
         if field not in data:
-            await websocket.send_json({
+            await send_json(websocket, {
                 "type": "error",
                 "message": f"Missing required field: {field}"
             })
@@ -63,7 +73,7 @@ async def handle_create_task(client_id: str, data: Dict[str, Any], websocket: We
     # Add creator_id to the data
     data["creator_id"] = client_id
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # Create task
         task_response = await client.post(
             f"{API_BASE_URL}/api/tasks",
@@ -86,17 +96,104 @@ async def handle_create_task(client_id: str, data: Dict[str, Any], websocket: We
         # Update task with NFT ID
         # In a real implementation, we would update the task in the database
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "task_created",
             "task": task,
             "nft": nft
         })
 
+async def handle_create_task_job(client_id: str, data: Dict[str, Any], websocket: WebSocket):
+    """
+    Create a new task through the asynchronous creation pipeline.
+    The API encrypts the payload, stores it and mints the task NFT in the background;
+    we poll the job until it finishes.
+    """
+    required_fields = ["title", "summary", "payload", "deadline", 
+                       "reward_amount", "judges"]
+    
+    for field in required_fields:
+        if field not in data:
+            await send_json(websocket, {
+                "type": "error",
+                "message": f"Missing required field: {field}"
+            })
+            return
+    
+    # Add creator_id to the data
+    data["creator_id"] = client_id
+    
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}, timeout=60) as client:
+        job_response = await client.post(
+            f"{API_BASE_URL}/api/tasks/jobs",
+            json=data
+        )
+        if job_response.status_code != 202:
+            await send_json(websocket, {
+                "type": "error",
+                "message": f"Failed to queue task: {job_response.text}"
+            })
+            return
+        job = job_response.json()
+        
+        await send_json(websocket, {
+            "type": "task_queued",
+            "job": job
+        })
+        
+        # Long-poll the job until it completes or fails, giving up after TASK_JOB_TIMEOUT
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + TASK_JOB_TIMEOUT
+        while job.get("status") not in ("COMPLETED", "FAILED"):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                await send_json(websocket, {
+                    "type": "error",
+                    "message": f"Timed out waiting for task creation job {job['id']}",
+                    "job": job
+                })
+                return
+            try:
+                job_response = await client.get(
+                    f"{API_BASE_URL}/api/tasks/jobs/{job['id']}",
+                    params={"wait": min(25, remaining)}
+                )
+            except httpx.HTTPError as e:
+                logger.warning(f"Error polling task creation job {job['id']}: {e}")
+                await asyncio.sleep(1)
+                continue
+            if job_response.status_code == 200:
+                job = job_response.json()
+            elif job_response.status_code in (429, 503) or job_response.status_code >= 500:
+                # Transient; back off and keep polling until the deadline
+                await asyncio.sleep(float(job_response.headers.get("Retry-After", "1")))
+            else:
+                await send_json(websocket, {
+                    "type": "error",
+                    "message": f"Failed to get task creation job {job['id']}: {job_response.text}"
+                })
+                return
+        
+        if job["status"] == "FAILED":
+            await send_json(websocket, {
+                "type": "error",
+                "message": f"Task creation failed: {job.get('error')}"
+            })
+            return
+        
+        task_response = await client.get(f"{API_BASE_URL}/api/tasks/{job['task_id']}")
+        
+        await send_json(websocket, {
+            "type": "task_created",
+            "task": task_response.json(),
+            "nft": {"task_nft": job["nft_id"]},
+            "job": job
+        })
+
 async def handle_list_created_tasks(client_id: str, data: Dict[str, Any], websocket: WebSocket):
     """
     List tasks created by this sponsor
     """
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # In a real implementation, we would query the database for tasks created by this sponsor
         # For now, we'll just filter the tasks by creator_id
         response = await client.get(f"{API_BASE_URL}/api/tasks")
@@ -104,7 +201,7 @@ async def handle_list_created_tasks(client_id: str, data: Dict[str, Any], websoc
         
         created_tasks = [task for task in all_tasks if task.get("creator_id") == client_id]
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "created_tasks",
             "tasks": created_tasks
         })
@@ -116,20 +213,20 @@ async def handle_get_task_deliverables(client_id: str, data: Dict[str, Any], web
     task_id = data.get("task_id")
     
     if not task_id:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": "Missing task_id"
         })
         return
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # Get task details
         task_response = await client.get(f"{API_BASE_URL}/api/tasks/{task_id}")
         task = task_response.json()
         
         # Verify this sponsor is the creator of the task
         if task.get("creator_id") != client_id:
-            await websocket.send_json({
+            await send_json(websocket, {
                 "type": "error",
                 "message": "You are not the creator of this task"
             })
@@ -152,7 +249,7 @@ async def handle_get_task_deliverables(client_id: str, data: Dict[str, Any], web
         else:
             deliverables = []
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "task_deliverables",
             "task_id": task_id,
             "deliverables": deliverables
@@ -165,20 +262,20 @@ async def handle_get_task_results(client_id: str, data: Dict[str, Any], websocke
     task_id = data.get("task_id")
     
     if not task_id:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": "Missing task_id"
         })
         return
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # Get task details
         task_response = await client.get(f"{API_BASE_URL}/api/tasks/{task_id}")
         task = task_response.json()
         
         # Verify this sponsor is the creator of the task
         if task.get("creator_id") != client_id:
-            await websocket.send_json({
+            await send_json(websocket, {
                 "type": "error",
                 "message": "You are not the creator of this task"
             })
@@ -205,7 +302,7 @@ async def handle_get_task_results(client_id: str, data: Dict[str, Any], websocke
                 "message": "Task not yet completed"
             }
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "task_results",
             "results": results
         })
\ No newline at end of file
@@ -5,6 +5,9 @@ from fastapi import WebSocket
 from typing import Dict, Any, List
 import os
 
+from protocol.encoding import send_json
+from protocol.retry import post_idempotent
+
 logger = logging.getLogger(__name__)
 
 # API base URL
@@ -27,7 +30,7 @@ async def handle_worker_message(client_id: str, message_type: str, data: Dict[st
     elif message_type == "list_completed_tasks":
         await handle_list_completed_tasks(client_id, data, websocket)
     else:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": f"Unknown message type: {message_type}"
         })
@@ -38,7 +41,7 @@ async def handle_list_tasks(client_id: str, data: Dict[str, Any], websocket: Web
     """
     status = data.get("status", "CREATED")  # Default to tasks that are newly created
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         response = await client.get(f"{API_BASE_URL}/api/tasks?status={status}")
         tasks = response.json()
         
@@ -56,7 +59,7 @@ async def handle_list_tasks(client_id: str, data: Dict[str, Any], websocket: Web
                 "judges": task["judges"]  # Worker needs to know judges to evaluate trust
             })
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "tasks_list",
             "tasks": filtered_tasks
         })
@@ -69,13 +72,13 @@ async def handle_get_task_details(client_id: str, data: Dict[str, Any], websocke
     agent_id = data.get("agent_id")
     
     if not task_id or not agent_id:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": "Missing task_id or agent_id"
         })
         return
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # Get task details
         task_response = await client.get(f"{API_BASE_URL}/api/tasks/{task_id}")
         task = task_response.json()
@@ -85,7 +88,7 @@ async def handle_get_task_details(client_id: str, data: Dict[str, Any], websocke
         # For now, we'll just check if the task status is STAKED or later
         if task["status"] in ["STAKED", "IN_PROGRESS", "SUBMITTED", "JUDGED", "COMPLETED"]:
             # Include encrypted payload URL and key
-            await websocket.send_json({
+            await send_json(websocket, {
                 "type": "task_details",
                 "task": {
                     "id": task["id"],
@@ -102,7 +105,7 @@ async def handle_get_task_details(client_id: str, data: Dict[str, Any], websocke
             })
         else:
             # Only include public information
-            await websocket.send_json({
+            await send_json(websocket, {
                 "type": "task_details",
                 "task": {
                     "id": task["id"],
@@ -126,25 +129,27 @@ async def handle_stake_for_task(client_id: str, data: Dict[str, Any], websocket:
     amount = data.get("amount")
     
     if not task_id or not agent_id or not amount:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": "Missing task_id, agent_id, or amount"
         })
         return
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # Get agent details
         agent_response = await client.get(f"{API_BASE_URL}/api/agents/{agent_id}")
         agent = agent_response.json()
         
         # Stake SOL
-        stake_response = await client.post(
+        stake_response = await post_idempotent(
+            client,
             f"{API_BASE_URL}/api/blockchain/stake",
             json={
                 "agent_wallet": agent["wallet_address"],
                 "task_id": task_id,
                 "amount": amount
-            }
+            },
+            prefix=f"stake:{task_id}:{agent_id}"
         )
         stake = stake_response.json()
         
@@ -158,7 +163,7 @@ async def handle_stake_for_task(client_id: str, data: Dict[str, Any], websocket:
         task_response = await client.get(f"{API_BASE_URL}/api/tasks/{task_id}")
         task = task_response.json()
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "stake_confirmed",
             "stake": stake,
             "task": {
@@ -185,13 +190,13 @@ async def handle_submit_deliverable(client_id: str, data: Dict[str, Any], websoc
     encryption_keys = data.get("encryption_keys")
     
     if not task_id or not agent_id or not encrypted_content_url or not encryption_keys:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": "Missing required fields"
         })
         return
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # In a real implementation, we would store the deliverable in the database
         # For now, we'll just update the task status
         
@@ -201,7 +206,7 @@ async def handle_submit_deliverable(client_id: str, data: Dict[str, Any], websoc
             json={"status": "SUBMITTED"}
         )
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "deliverable_submitted",
             "deliverable": {
                 "id": f"del_{task_id}_{agent_id}",
@@ -219,17 +224,17 @@ async def handle_list_completed_tasks(client_id: str, data: Dict[str, Any], webs
     agent_id = data.get("agent_id")
     
     if not agent_id:
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "error",
             "message": "Missing agent_id"
         })
         return
     
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(headers={"X-Agent-ID": client_id}) as client:
         # In a real implementation, we would query the database for tasks completed by this agent
         # For now, we'll just return a mock list
         
-        await websocket.send_json({
+        await send_json(websocket, {
             "type": "completed_tasks",
             "tasks": [
                 {
@@ -3,6 +3,8 @@ import json
 from typing import Dict, Any, List, Optional, Callable, Awaitable
 import asyncio
 
+from protocol.encoding import dumps, loads
+
 logger = logging.getLogger(__name__)
 
 class MCPProtocol:
@@ -80,7 +82,7 @@ class MCPProtocol:
         Parse an incoming MCP message
         """
         try:
-            data = json.loads(message)
+            data = loads(message)
             return data
         except json.JSONDecodeError as e:
             logger.error(f"Error parsing message: {str(e)}")
@@ -94,10 +96,10 @@ class MCPProtocol:
         Format an outgoing MCP response
         """
         try:
-            return json.dumps(data)
+            return dumps(data)
         except Exception as e:
             logger.error(f"Error formatting response: {str(e)}")
-            return json.dumps({
+            return dumps({
                 "status": "error",
                 "error": "Error formatting response"
             })
@@ -0,0 +1,211 @@
+"""
+Client-side decryption of task payloads and deliverables.
+
+With ?decryption=client the API's stake, decrypt and judge routes return the content's
+ciphertext reference and the caller's wrapped data key instead of the plaintext:
+
+    {"ref": "sha256:...", "url": "/api/blobs/...", "wrapped_key": "<base64>"}
+
+(legacy inline content comes as "ciphertext" with a null "url"). Agents fetch the
+ciphertext and decrypt it here with their own private key, so reads cost the server a
+database lookup rather than a private-key operation.
+
+Both formats the API writes are read: binary AES-GCM envelopes, whole or chunked and
+optionally compressed (layout in the backend's app.encryption.envelope and
+app.encryption.stream), and the legacy base64 JSON (AES-CBC) format. Data keys are
+unwrapped with RSA-OAEP (SHA-256) or, for X25519 keys, NaCl sealed boxes.
+zstd-compressed envelopes need the optional zstandard package.
+"""
+import base64
+import io
+import json
+import struct
+import zlib
+from typing import Any, Dict, NamedTuple, Optional
+
+import httpx
+from Crypto.Cipher import AES, PKCS1_OAEP
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Util.Padding import unpad
+from nacl.public import PrivateKey, SealedBox
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+MAGIC = b"\x89XAE"
+VERSION = 1
+TAG_SIZE = 16
+FLAG_CHUNKED = 0x01
+FLAG_COMPRESSED = 0x02
+# Compression algorithm IDs stored in the envelope header
+ZLIB = 1
+ZSTD = 2
+# Largest plaintext a compressed envelope may expand to
+MAX_DECOMPRESSED_SIZE = 256 * 1024 * 1024
+
+_PREFIX = struct.Struct(">4sBB12sH")
+_LENGTH = struct.Struct(">H")
+_CHUNK_SIZE = struct.Struct(">I")
+_COUNTER = struct.Struct(">IB")
+_NONCE_PREFIX_SIZE = 7
+_X25519_PRIVATE_LABEL = "X25519 PRIVATE KEY"
+
+
+class DecryptionError(ValueError):
+    """Raised when content cannot be decrypted with the given key"""
+    pass
+
+
+class _Header(NamedTuple):
+    flags: int
+    nonce: bytes
+    length: int
+    chunk_size: Optional[int]
+    compression: int
+
+
+def _unpack_header(data: bytes) -> _Header:
+    try:
+        magic, version, flags, nonce, key_count = _PREFIX.unpack_from(data, 0)
+        if version != VERSION:
+            raise DecryptionError(f"Unsupported envelope version: {version}")
+        offset = _PREFIX.size
+        # Skip the key table; the caller's wrapped key comes with the response
+        for _ in range(key_count):
+            for _ in range(2):
+                (length,) = _LENGTH.unpack_from(data, offset)
+                offset += _LENGTH.size + length
+        chunk_size = None
+        if flags & FLAG_CHUNKED:
+            (chunk_size,) = _CHUNK_SIZE.unpack_from(data, offset)
+            offset += _CHUNK_SIZE.size
+        compression = 0
+        if flags & FLAG_COMPRESSED:
+            compression = data[offset]
+            offset += 1
+    except (struct.error, IndexError):
+        raise DecryptionError("Envelope is truncated")
+    if len(data) - offset < TAG_SIZE or (flags & FLAG_CHUNKED and not chunk_size):
+        raise DecryptionError("Envelope is truncated")
+    return _Header(flags, nonce, offset, chunk_size, compression)
+
+
+def unwrap_key(wrapped_key: bytes, private_key: str) -> bytes:
+    """
+    Unwrap a data key with an RSA or X25519 private key in PEM-style text.
+    """
+    try:
+        if _X25519_PRIVATE_LABEL in private_key:
+            lines = private_key.strip().splitlines()
+            return SealedBox(PrivateKey(base64.b64decode("".join(lines[1:-1])))).decrypt(wrapped_key)
+        return PKCS1_OAEP.new(RSA.import_key(private_key), hashAlgo=SHA256).decrypt(wrapped_key)
+    except Exception as e:
+        raise DecryptionError(f"Cannot unwrap data key: {e}")
+
+
+def _decompress(algorithm_id: int, data: bytes, max_size: int) -> bytes:
+    if algorithm_id == ZLIB:
+        decompressor = zlib.decompressobj()
+        plaintext = decompressor.decompress(data, max_size + 1)
+        if not decompressor.eof:
+            raise DecryptionError("Compressed data is truncated or exceeds the size limit")
+    elif algorithm_id == ZSTD:
+        if zstandard is None:
+            raise DecryptionError("zstd compressed data needs the zstandard package")
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+            plaintext = reader.read(max_size + 1)
+    else:
+        raise DecryptionError(f"Unsupported compression algorithm: {algorithm_id}")
+    if len(plaintext) > max_size:
+        raise DecryptionError("Decompressed data exceeds the size limit")
+    return plaintext
+
+
+def _open_chunks(data: memoryview, header: _Header, key: bytes) -> bytes:
+    aad = bytes(data[:header.length])
+    nonce_prefix = header.nonce[:_NONCE_PREFIX_SIZE]
+    record_size = header.chunk_size + TAG_SIZE
+    out = []
+    offset, index = header.length, 0
+    while True:
+        # Every chunk but the last is a full record; the last is sealed as final
+        final = len(data) - offset <= record_size
+        record = data[offset:] if final else data[offset:offset + record_size]
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce_prefix + _COUNTER.pack(index, final))
+        cipher.update(aad)
+        out.append(cipher.decrypt_and_verify(record[:-TAG_SIZE], record[-TAG_SIZE:]))
+        if final:
+            return b"".join(out)
+        offset += record_size
+        index += 1
+
+
+def decrypt(encrypted: bytes, wrapped_key: str, private_key: str, max_size: int = MAX_DECOMPRESSED_SIZE) -> bytes:
+    """
+    Decrypt content in either format the API writes.
+
+    Args:
+        encrypted: Binary envelope, or legacy base64 JSON package
+        wrapped_key: The caller's base64 wrapped data key
+        private_key: The caller's private key as PEM-style text
+        max_size: Largest size compressed content may expand to
+
+    Returns:
+        Decrypted content
+
+    Raises:
+        DecryptionError: If the key cannot unwrap the data key, or the content was
+            altered or is malformed
+    """
+    key = unwrap_key(base64.b64decode(wrapped_key), private_key)
+    try:
+        if encrypted[:len(MAGIC)] == MAGIC:
+            view = memoryview(encrypted)
+            header = _unpack_header(view)
+            if header.flags & FLAG_CHUNKED:
+                return _open_chunks(view, header, key)
+            cipher = AES.new(key, AES.MODE_GCM, nonce=header.nonce)
+            cipher.update(view[:header.length])
+            data = cipher.decrypt_and_verify(view[header.length:-TAG_SIZE], view[-TAG_SIZE:])
+            if header.flags & FLAG_COMPRESSED:
+                data = _decompress(header.compression, data, max_size)
+            return data
+
+        # Legacy format
+        package = json.loads(base64.b64decode(encrypted).decode('utf-8'))
+        cipher = AES.new(key, AES.MODE_CBC, base64.b64decode(package['iv']))
+        return unpad(cipher.decrypt(base64.b64decode(package['encrypted_data'])), AES.block_size)
+    except DecryptionError:
+        raise
+    except Exception as e:
+        raise DecryptionError(f"Cannot decrypt content: {e}")
+
+
+async def fetch_ciphertext(client: httpx.AsyncClient, base_url: str, sealed: Dict[str, Any]) -> bytes:
+    """
+    Get the ciphertext a client-side decryption response refers to.
+
+    Args:
+        client: HTTP client for the API
+        base_url: API base URL
+        sealed: The "encrypted_payload" / "encrypted_deliverable" / "encrypted_content" object
+    """
+    if sealed.get("url") is None:
+        return sealed["ciphertext"].encode('utf-8')
+    response = await client.get(f"{base_url}{sealed['url']}")
+    response.raise_for_status()
+    return response.content
+
+
+async def decrypt_sealed(client: httpx.AsyncClient, base_url: str, sealed: Dict[str, Any], private_key: str) -> Any:
+    """
+    Fetch and decrypt the JSON content of a client-side decryption response.
+
+    Returns:
+        The task payload or deliverable
+    """
+    encrypted = await fetch_ciphertext(client, base_url, sealed)
+    return json.loads(decrypt(encrypted, sealed["wrapped_key"], private_key))
@@ -0,0 +1,31 @@
+import orjson
+from typing import Any
+from fastapi import WebSocket
+
+
+def dumps(data: Any) -> str:
+    """
+    Serialize a message to a JSON string using orjson
+    """
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+
+def loads(message: Any) -> Any:
+    """
+    Parse a JSON message (str or bytes) using orjson
+    """
+    return orjson.loads(message)
+
+
+async def send_json(websocket: WebSocket, data: Any):
+    """
+    Send a JSON frame over a WebSocket, encoded with orjson instead of the stdlib encoder
+    """
+    await websocket.send_text(dumps(data))
+
+
+async def receive_json(websocket: WebSocket) -> Any:
+    """
+    Receive a JSON frame from a WebSocket, decoded with orjson
+    """
+    return loads(await websocket.receive_text())
@@ -0,0 +1,103 @@
+import time
+from collections import Counter as TypeCounter
+from typing import Callable, Dict
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Histogram, Counter, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# Latency buckets in seconds; handlers call the XAAM API, so include slow responses
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Message types are client-supplied; cap how many distinct labels we create
+MAX_MESSAGE_TYPES = 100
+
+message_handler_duration_seconds = Histogram(
+    "xaam_mcp_message_handler_duration_seconds",
+    "MCP message handler latency by client and message type",
+    ["client_type", "message_type"],
+    buckets=LATENCY_BUCKETS,
+)
+messages_total = Counter(
+    "xaam_mcp_messages_total",
+    "MCP messages handled by client and message type",
+    ["client_type", "message_type", "status"],
+)
+
+_seen_message_types = set()
+
+
+def message_type_label(message_type: str) -> str:
+    """
+    Get a bounded label value for a message type.
+    """
+    # Clients may send any JSON value; lists and dicts are unhashable
+    if not isinstance(message_type, str):
+        return "other"
+    if message_type in _seen_message_types:
+        return message_type
+    if len(_seen_message_types) < MAX_MESSAGE_TYPES:
+        _seen_message_types.add(message_type)
+        return message_type
+    return "other"
+
+
+class ConnectedClientsCollector(Collector):
+    """
+    Reports connected WebSocket clients by type at scrape time.
+    """
+
+    def __init__(self, clients: Callable[[], Dict[str, Dict]]):
+        self.clients = clients
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "xaam_mcp_connected_clients", "Connected MCP clients by type", labels=["client_type"]
+        )
+        counts = TypeCounter(
+            client.get("type") if isinstance(client.get("type"), str) else "unknown"
+            for client in self.clients().values()
+        )
+        for client_type in ("worker", "sponsor", "judge"):
+            counts.setdefault(client_type, 0)
+        for client_type, count in sorted(counts.items()):
+            gauge.add_metric([client_type], count)
+        yield gauge
+
+
+def register_connected_clients(clients: Callable[[], Dict[str, Dict]]):
+    """
+    Expose the connected client registry as a gauge.
+    """
+    REGISTRY.register(ConnectedClientsCollector(clients))
+
+
+class observe_message:
+    """
+    Context manager recording the latency and outcome of one MCP message handler.
+    """
+
+    def __init__(self, client_type: str, message_type: str):
+        self.client_type = client_type if client_type in ("worker", "sponsor", "judge") else "unknown"
+        self.message_type = message_type_label(message_type or "missing")
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        message_handler_duration_seconds.labels(self.client_type, self.message_type).observe(
+            time.perf_counter() - self.start
+        )
+        messages_total.labels(self.client_type, self.message_type, "error" if exc_type else "success").inc()
+        return False
+
+
+def render_metrics():
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Returns:
+        Tuple of (body, content type)
+    """
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
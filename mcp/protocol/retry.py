@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import uuid
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: the first attempt is still running (409), the client
+# was throttled (429), or the server failed before storing a response (5xx)
+RETRYABLE_STATUSES = {409, 429, 500, 502, 503, 504}
+
+
+async def post_idempotent(
+    client: httpx.AsyncClient,
+    url: str,
+    json: Dict[str, Any],
+    prefix: str,
+    attempts: int = 3,
+    backoff: float = 0.5,
+) -> httpx.Response:
+    """
+    POST with a fresh Idempotency-Key, retrying transient failures under the same key.
+
+    The key is generated once per call, so retries of this call replay the first
+    response instead of repeating it, while a later call (for example a second
+    stake on the same task) gets a new key and is executed.
+    """
+    headers = {"Idempotency-Key": f"{prefix}:{uuid.uuid4()}"}
+    response: Optional[httpx.Response] = None
+    for attempt in range(attempts):
+        try:
+            response = await client.post(url, json=json, headers=headers)
+        except httpx.TransportError as e:
+            if attempt == attempts - 1:
+                raise
+            logger.warning(f"POST {url} failed ({e}), retrying")
+            await asyncio.sleep(backoff * 2 ** attempt)
+            continue
+        if response.status_code not in RETRYABLE_STATUSES or attempt == attempts - 1:
+            return response
+        retry_after = response.headers.get("Retry-After")
+        delay = float(retry_after) if retry_after and retry_after.isdigit() else backoff * 2 ** attempt
+        logger.warning(f"POST {url} returned {response.status_code}, retrying in {delay}s")
+        await asyncio.sleep(delay)
+    return response
@@ -6,9 +6,14 @@ import sys
 import uvicorn
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from typing import Dict, List, Any, Optional
 import httpx
 
+from protocol.encoding import send_json, receive_json
+from protocol.metrics import observe_message, register_connected_clients, render_metrics
+from protocol.retry import post_idempotent
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -73,12 +78,19 @@ API_BASE_URL = os.getenv("API_BASE_URL", "http://api:8000")
 
 # Connected clients
 connected_clients = {}
+register_connected_clients(lambda: connected_clients)
 
 # Health check endpoint
 @app.get("/health", tags=["Health"])
 async def health_check():
     return {"status": "healthy"}
 
+# Prometheus metrics
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # WebSocket endpoint for MCP connections
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -87,12 +99,12 @@ async def websocket_endpoint(websocket: WebSocket):
     
     try:
         # Wait for initial connection message with client ID
-        data = await websocket.receive_json()
+        data = await receive_json(websocket)
         client_id = data.get("client_id")
         client_type = data.get("client_type")  # "worker", "sponsor", or "judge"
         
         if not client_id or not client_type:
-            await websocket.send_json({"error": "Missing client_id or client_type"})
+            await send_json(websocket, {"error": "Missing client_id or client_type"})
             await websocket.close()
             return
         
@@ -103,12 +115,16 @@ async def websocket_endpoint(websocket: WebSocket):
         }
         
         logger.info(f"Client {client_id} ({client_type}) connected")
-        await websocket.send_json({"status": "connected", "message": f"Welcome, {client_id}"})
+        await send_json(websocket, {"status": "connected", "message": f"Welcome, {client_id}"})
         
         # Main message loop
         while True:
-            data = await websocket.receive_json()
-            await process_message(client_id, client_type, data, websocket)
+            data = await receive_json(websocket)
+            if not isinstance(data, dict):
+                await send_json(websocket, {"error": "Messages must be JSON objects"})
+                continue
+            with observe_message(client_type, data.get("type")):
+                await process_message(client_id, client_type, data, websocket)
             
     except WebSocketDisconnect:
         logger.info(f"Client {client_id} disconnected")
@@ -126,7 +142,7 @@ async def process_message(client_id: str, client_type: str, data: Dict[str, Any]
     message_type = data.get("type")
     
     if not message_type:
-        await websocket.send_json({"error": "Missing message type"})
+        await send_json(websocket, {"error": "Missing message type"})
         return
     
     # Import handlers based on client type
@@ -140,7 +156,7 @@ async def process_message(client_id: str, client_type: str, data: Dict[str, Any]
         from interfaces.judge import handle_judge_message
         await handle_judge_message(client_id, message_type, data, websocket)
     else:
-        await websocket.send_json({"error": f"Unknown client type: {client_type}"})
+        await send_json(websocket, {"error": f"Unknown client type: {client_type}"})
 
 # MCP tool endpoints
 @app.post("/tools/{tool_name}")
@@ -208,13 +224,15 @@ async def stake_for_task(task_id: str, agent_id: str, amount: float):
         agent = agent_response.json()
         
         # Stake SOL
-        stake_response = await client.post(
+        stake_response = await post_idempotent(
+            client,
             f"{API_BASE_URL}/api/blockchain/stake",
             json={
                 "agent_wallet": agent["wallet_address"],
                 "task_id": task_id,
                 "amount": amount
-            }
+            },
+            prefix=f"stake:{task_id}:{agent_id}"
         )
         
         # Update task status
@@ -192,4 +192,157 @@ async def test_callable_resource(mcp_protocol):
     
     # Verify the result
     assert result["status"] == "success"
-    assert result["resource"] == {"data": "dynamic_data"}
\ No newline at end of file
+    assert result["resource"] == {"data": "dynamic_data"}
+@pytest.mark.asyncio
+async def test_post_idempotent_reuses_key_only_across_retries():
+    """
+    Test that retries of one call share a key and separate calls get new keys
+    """
+    import httpx
+    from protocol.retry import post_idempotent
+
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers["Idempotency-Key"])
+        if len(seen) == 1:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"ok": True})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        first = await post_idempotent(client, "http://api/stake", json={}, prefix="stake:t:a")
+        second = await post_idempotent(client, "http://api/stake", json={}, prefix="stake:t:a")
+
+    assert first.status_code == second.status_code == 200
+    assert seen[0] == seen[1]
+    assert seen[2] != seen[1]
+    assert seen[0].startswith("stake:t:a:")
+
+def test_message_type_label_handles_non_string_types():
+    """
+    Test that unhashable client-supplied message types map to a bounded label
+    """
+    from protocol.metrics import message_type_label, observe_message
+
+    assert message_type_label(["stake_for_task"]) == "other"
+    assert message_type_label({"type": "x"}) == "other"
+    assert message_type_label("list_tasks") == "list_tasks"
+    assert observe_message("worker", {"a": 1}).message_type == "other"
+
+def seal_envelope(key: bytes, wrapped_keys: dict, data: bytes, chunk_size: int = None, compression: int = 0) -> bytes:
+    """
+    Encrypt data into a binary envelope the way the API writes it
+    """
+    import struct
+    from Crypto.Cipher import AES
+    from Crypto.Random import get_random_bytes
+
+    nonce = get_random_bytes(12)
+    flags = (1 if chunk_size else 0) | (2 if compression else 0)
+    header = struct.pack(">4sBB12sH", b"\x89XAE", 1, flags, nonce, len(wrapped_keys))
+    for principal_id, wrapped in wrapped_keys.items():
+        header += struct.pack(">H", len(principal_id)) + principal_id.encode() + struct.pack(">H", len(wrapped)) + wrapped
+    if chunk_size:
+        header += struct.pack(">I", chunk_size)
+    if compression:
+        header += bytes([compression])
+    if not chunk_size:
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(header)
+        ciphertext, tag = cipher.encrypt_and_digest(data)
+        return header + ciphertext + tag
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)] or [b""]
+    out = [header]
+    for index, chunk in enumerate(chunks):
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce[:7] + struct.pack(">IB", index, index == len(chunks) - 1))
+        cipher.update(header)
+        ciphertext, tag = cipher.encrypt_and_digest(chunk)
+        out.append(ciphertext + tag)
+    return b"".join(out)
+
+def test_decrypts_every_envelope_format_locally():
+    """
+    Test that client-side decryption reads whole, compressed, chunked and legacy content
+    with RSA and X25519 keys
+    """
+    import base64
+    import zlib
+    from Crypto.Cipher import AES, PKCS1_OAEP
+    from Crypto.Hash import SHA256
+    from Crypto.PublicKey import RSA
+    from Crypto.Random import get_random_bytes
+    from Crypto.Util.Padding import pad
+    from nacl.public import PrivateKey, SealedBox
+    from protocol.decryption import DecryptionError, decrypt
+
+    rsa_key = RSA.generate(2048)
+    rsa_private = rsa_key.export_key().decode()
+    x25519_key = PrivateKey.generate()
+    x25519_private = (
+        "-----BEGIN X25519 PRIVATE KEY-----\n"
+        f"{base64.b64encode(bytes(x25519_key)).decode()}\n"
+        "-----END X25519 PRIVATE KEY-----"
+    )
+    data_key = get_random_bytes(32)
+    rsa_wrapped = PKCS1_OAEP.new(rsa_key.publickey(), hashAlgo=SHA256).encrypt(data_key)
+    x25519_wrapped = SealedBox(x25519_key.public_key).encrypt(data_key)
+    wrapped_keys = {"judge": rsa_wrapped, "worker": x25519_wrapped}
+    plaintext = b'{"task": "payload"}' * 100
+
+    cipher = AES.new(data_key, AES.MODE_CBC)
+    legacy = base64.b64encode(json.dumps({
+        "iv": base64.b64encode(cipher.iv).decode(),
+        "encrypted_data": base64.b64encode(cipher.encrypt(pad(plaintext, AES.block_size))).decode(),
+    }).encode())
+    chunked = seal_envelope(data_key, wrapped_keys, plaintext, chunk_size=500)
+    cases = [
+        (seal_envelope(data_key, wrapped_keys, plaintext), plaintext),
+        (seal_envelope(data_key, wrapped_keys, zlib.compress(plaintext), compression=1), plaintext),
+        (chunked, plaintext),
+        # The last chunk is a full one
+        (seal_envelope(data_key, wrapped_keys, plaintext[:1000], chunk_size=500), plaintext[:1000]),
+        (legacy, plaintext),
+    ]
+    rsa_key_b64 = base64.b64encode(rsa_wrapped).decode()
+    x25519_key_b64 = base64.b64encode(x25519_wrapped).decode()
+    for encrypted, expected in cases:
+        assert decrypt(encrypted, rsa_key_b64, rsa_private) == expected
+        assert decrypt(encrypted, x25519_key_b64, x25519_private) == expected
+
+    # An envelope cut at a chunk boundary fails rather than returning a prefix
+    with pytest.raises(DecryptionError):
+        decrypt(chunked[:-(len(plaintext) % 500 + 16)], rsa_key_b64, rsa_private)
+    with pytest.raises(DecryptionError):
+        decrypt(cases[0][0], rsa_key_b64, x25519_private)
+
+@pytest.mark.asyncio
+async def test_decrypt_sealed_fetches_blob():
+    """
+    Test that a client-side decryption response is fetched from the blob route and decrypted
+    """
+    import base64
+    import httpx
+    from Crypto.Random import get_random_bytes
+    from nacl.public import PrivateKey, SealedBox
+    from protocol.decryption import decrypt_sealed
+
+    key = PrivateKey.generate()
+    private_key = (
+        "-----BEGIN X25519 PRIVATE KEY-----\n"
+        f"{base64.b64encode(bytes(key)).decode()}\n"
+        "-----END X25519 PRIVATE KEY-----"
+    )
+    data_key = get_random_bytes(32)
+    wrapped = SealedBox(key.public_key).encrypt(data_key)
+    envelope = seal_envelope(data_key, {"worker": wrapped}, b'{"answer": 42}')
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.path)
+        return httpx.Response(200, content=envelope)
+
+    sealed = {"ref": "sha256:" + "ab" * 32, "url": "/api/blobs/" + "ab" * 32, "wrapped_key": base64.b64encode(wrapped).decode()}
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        assert await decrypt_sealed(client, "http://api", sealed, private_key) == {"answer": 42}
+
+    assert requested == ["/api/blobs/" + "ab" * 32]